@@ -213,6 +213,7 @@ CREATE TABLE "Voucher_Usage" (
   
   "created_at" timestamp DEFAULT CURRENT_TIMESTAMP,
   
+  UNIQUE(voucher_key, order_key), -- One usage row per voucher per order (re-attribution upserts)
   INDEX idx_voucher_usage_voucher ("voucher_key"),
   INDEX idx_voucher_usage_date ("time_key"),
   INDEX idx_voucher_usage_customer ("customer_key")
@@ -298,6 +299,21 @@ CREATE TABLE "Sales_Summary" (
   UNIQUE(time_key, platform)
 );
 
+-- VOUCHER SUMMARY - Pre-aggregated v_voucher_effectiveness, refreshed per touched voucher
+CREATE TABLE "Voucher_Summary" (
+  "voucher_key" int PRIMARY KEY REFERENCES "Dim_Vouchers"("voucher_key"),
+  "total_usage" int DEFAULT 0,
+  "unique_customers" int DEFAULT 0,
+  "total_discount_given" decimal(12,2) DEFAULT 0,
+  "avg_discount_per_use" decimal(10,2) DEFAULT 0,
+  "total_order_value_generated" decimal(12,2) DEFAULT 0,
+  "new_customer_acquisitions" int DEFAULT 0,
+  "net_revenue_generated" decimal(12,2) DEFAULT 0,
+  "first_used_at" timestamp,
+  "last_used_at" timestamp,
+  "updated_at" timestamp DEFAULT CURRENT_TIMESTAMP
+);
+
 -- =============================================================================
 -- ANALYTICAL VIEWS
 -- =============================================================================
@@ -0,0 +1,226 @@
+"""
+Shared async connector framework for the marketplace APIs.
+
+A Connector owns one pooled httpx.AsyncClient, a token bucket for its
+platform's call limit and a concurrency limiter. Subclasses only say how
+to sign a request (sign) and how to read a response envelope (unwrap);
+request(), offset/cursor pagination and batched fetching are common.
+Credentials that may need I/O to refresh are fetched in authenticate(),
+awaited before each request, so sign() itself never blocks the event loop.
+
+ExtractionScheduler runs several connectors at once with one shared
+concurrency limit, so Lazada and Shopee extract in parallel without
+together opening more connections than the limit allows:
+
+    results = run_extraction({
+        "lazada": (LazadaClient(), lambda c: lazada_api_calls.collect_orders(c, since)),
+        "shopee": (ShopeeClient(), lambda c: shopee_api_calls.collect_orders(c, time_from, time_to)),
+    })
+"""
+import asyncio
+import json
+import random
+import time
+from contextlib import AsyncExitStack
+
+import httpx
+
+from app import config
+
+
+class ApiError(Exception):
+    def __init__(self, code, message, response=None, retryable=False):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+        self.response = response
+        self.retryable = retryable
+
+
+class TokenBucket:
+    """
+    Async token bucket: rate tokens per second, bursts up to capacity.
+
+    acquire() reserves a token and sleeps until it is due, so waiting
+    callers are spaced 1/rate apart instead of waking together.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if delay:
+            await asyncio.sleep(delay)
+
+
+def backoff_delay(attempt, base=None, cap=30.0):
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2**attempt))."""
+    base = config.API_BACKOFF_SECONDS if base is None else base
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class Connector:
+    name = "connector"
+    error_class = ApiError
+
+    def __init__(self, base_url, qps, max_concurrency=None, max_retries=None, timeout=None, limiter=None):
+        self.base_url = base_url.rstrip("/")
+        self.max_concurrency = max_concurrency or config.API_MAX_CONCURRENCY
+        self.max_retries = config.API_MAX_RETRIES if max_retries is None else max_retries
+        self.timeout = timeout or config.API_TIMEOUT
+
+        self.bucket = TokenBucket(qps)
+        self.limiter = limiter or asyncio.Semaphore(self.max_concurrency)
+        self._session = None
+        self.stats = {"requests": 0, "retries": 0, "errors": 0}
+
+    async def __aenter__(self):
+        self._session = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.aclose()
+        self._session = None
+
+    # -------------------------------------------------------- platform hooks
+
+    async def authenticate(self):
+        """Make sure the credentials sign() uses are current (refresh them off the event loop)."""
+
+    def sign(self, api_path, params):
+        """Return the query parameters to send, including auth and signature."""
+        return params
+
+    def unwrap(self, body):
+        """Return the payload of a successful response; raise error_class otherwise."""
+        return body
+
+    # --------------------------------------------------------------- requests
+
+    async def request(self, api_path, params=None):
+        """
+        Signed GET with rate limiting and retries.
+
+        Returns:
+            The unwrapped response payload
+
+        Raises:
+            ApiError: Non-retryable API error, or retries exhausted
+        """
+        params = {k: v for k, v in (params or {}).items() if v is not None}
+        attempt = 0
+        while True:
+            await self.bucket.acquire()
+            try:
+                await self.authenticate()
+                async with self.limiter:
+                    self.stats["requests"] += 1
+                    response = await self._session.get(self.base_url + api_path, params=self.sign(api_path, dict(params)))
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise self.error_class(str(response.status_code), response.text[:200], retryable=True)
+                return self.unwrap(response.json())
+            except ApiError as e:
+                error = e
+            except (httpx.TransportError, json.JSONDecodeError) as e:
+                error = self.error_class(type(e).__name__, str(e), retryable=True)
+
+            if not error.retryable or attempt >= self.max_retries:
+                self.stats["errors"] += 1
+                raise error
+            self.stats["retries"] += 1
+            await asyncio.sleep(backoff_delay(attempt))
+            attempt += 1
+
+    async def paginate_offset(self, api_path, params, list_key, page_size, total_key,
+                              offset_param="offset", limit_param="limit"):
+        """
+        Fetch every page of an offset/limit endpoint.
+
+        The first page gives the total; the other pages are requested
+        concurrently. Returns the records in page order.
+        """
+        first = await self.request(api_path, {**params, offset_param: 0, limit_param: page_size}) or {}
+        records = list(first.get(list_key) or [])
+        total = int(first.get(total_key) or len(records))
+
+        pages = await asyncio.gather(*(
+            self.request(api_path, {**params, offset_param: offset, limit_param: page_size})
+            for offset in range(page_size, total, page_size)
+        ))
+        for page in pages:
+            records.extend((page or {}).get(list_key) or [])
+        return records
+
+    async def paginate_cursor(self, api_path, params, list_key, page_size, cursor_param="cursor",
+                              next_key="next_cursor", more_key="more", size_param="page_size"):
+        """Fetch every page of a cursor endpoint (pages are sequential by nature)."""
+        records, cursor = [], ""
+        while True:
+            page = await self.request(api_path, {**params, cursor_param: cursor, size_param: page_size}) or {}
+            records.extend(page.get(list_key) or [])
+            cursor = page.get(next_key)
+            if not page.get(more_key) or not cursor:
+                return records
+
+    async def fetch_batched(self, api_path, ids, batch_size, build_params):
+        """
+        Call api_path once per batch_size ids, all batches concurrently.
+
+        Args:
+            build_params: batch (list) -> query parameters
+
+        Returns:
+            list: One payload per batch, in order
+        """
+        ids = list(ids)
+        return await asyncio.gather(*(
+            self.request(api_path, build_params(ids[i:i + batch_size])) for i in range(0, len(ids), batch_size)
+        ))
+
+
+class ExtractionScheduler:
+    """Run connector jobs in parallel under one shared concurrency limit."""
+
+    def __init__(self, max_concurrency=None):
+        self.max_concurrency = max_concurrency or config.API_MAX_CONCURRENCY
+
+    async def run(self, jobs):
+        """
+        Args:
+            jobs (dict): name -> (connector, fn) where fn(connector) returns a coroutine
+
+        Returns:
+            dict: name -> result, or name -> {"status": "error", "detail"} for jobs that failed
+        """
+        limiter = asyncio.Semaphore(self.max_concurrency)
+        names = list(jobs)
+        async with AsyncExitStack() as stack:
+            for connector, _ in jobs.values():
+                connector.limiter = limiter
+                await stack.enter_async_context(connector)
+            outcomes = await asyncio.gather(*(fn(connector) for connector, fn in jobs.values()), return_exceptions=True)
+
+        results = {}
+        for name, outcome in zip(names, outcomes):
+            if isinstance(outcome, Exception):
+                print(f"Extraction from {name} failed: {outcome}")
+                outcome = {"status": "error", "detail": str(outcome)}
+            results[name] = outcome
+        return results
+
+
+def run_extraction(jobs, max_concurrency=None):
+    """Synchronous entry point for ExtractionScheduler.run()."""
+    return asyncio.run(ExtractionScheduler(max_concurrency).run(jobs))
@@ -0,0 +1,191 @@
+"""
+Async Lazada Open Platform client, built on the shared Connector (connector.py).
+
+Calls pass through a token bucket tuned to the app's QPS limit
+(LAZADA_QPS) and a concurrency cap, and are retried with jittered
+exponential backoff on rate limits, 5xx answers and network errors.
+Paginated endpoints fetch the first page, read the total and request the
+remaining pages concurrently.
+
+    async with LazadaClient() as client:
+        orders = await client.get_orders(update_after="2024-05-01T00:00:00+08:00")
+        items = await client.get_order_items([o["order_id"] for o in orders])
+
+fetch_lazada_orders() wraps the same for synchronous callers.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+
+import httpx
+
+from app import config
+from app.Extraction.connector import ApiError, Connector, TokenBucket, backoff_delay  # noqa: F401 (re-exported)
+from app.Extraction.token_manager import TokenManager
+
+ORDERS_PATH = "/orders/get"
+ORDER_ITEMS_PATH = "/orders/items/get"
+ORDERS_PAGE_SIZE = 100  # Lazada's maximum for /orders/get
+ORDER_ITEMS_BATCH = 50  # order_ids per /orders/items/get call
+
+# Lazada error codes worth retrying (anything else is returned to the caller)
+RETRY_CODES = {"ApiCallLimit", "AppCallLimit", "ServiceTimeout", "ServiceUnavailable", "ISP.ServiceError"}
+
+
+class LazadaApiError(ApiError):
+    pass
+
+
+def generate_signature(secret, api_path, parameters):
+    """
+    Generate signature for Lazada API request
+
+    Args:
+        secret (str): App secret
+        api_path (str): API endpoint path
+        parameters (dict): Request parameters
+
+    Returns:
+        str: Generated signature
+    """
+    parameters_str = api_path + "".join(f"{key}{value}" for key, value in sorted(parameters.items()))
+    return hmac.new(secret.encode("utf-8"), parameters_str.encode("utf-8"), hashlib.sha256).hexdigest().upper()
+
+
+def refresh_access_token(refresh_token, app_key=None, app_secret=None):
+    """
+    Refresh access token using refresh token
+
+    Args:
+        refresh_token (str): Refresh token
+
+    Returns:
+        dict: success plus the new access_token, refresh_token and expires_in,
+            or success False with error
+    """
+    app_key = app_key or config.LAZADA_APP_KEY
+    api_path = "/auth/token/refresh"
+    params = {
+        "app_key": app_key,
+        "timestamp": str(int(time.time() * 1000)),
+        "sign_method": "sha256",
+        "refresh_token": refresh_token,
+    }
+    params["sign"] = generate_signature(app_secret or config.LAZADA_APP_SECRET, api_path, params)
+    try:
+        response = httpx.post(config.LAZADA_AUTH_URL + api_path, data=params, timeout=config.API_TIMEOUT)
+        body = response.json()
+    except (httpx.HTTPError, json.JSONDecodeError) as e:
+        return {"success": False, "error": str(e)}
+    if response.status_code == 200 and "access_token" in body:
+        return {
+            "success": True,
+            "access_token": body.get("access_token"),
+            "refresh_token": body.get("refresh_token"),
+            "expires_in": body.get("expires_in"),
+            "refresh_expires_in": body.get("refresh_expires_in"),
+        }
+    return {"success": False, "error": body.get("message", "Unknown error"), "code": body.get("code", "Unknown")}
+
+
+# Shared token cache; LazadaClient uses it whenever the cache file exists
+lazada_tokens = TokenManager("lazada", refresh_access_token, config.LAZADA_TOKEN_FILE)
+
+
+class LazadaClient(Connector):
+    name = "lazada"
+    error_class = LazadaApiError
+
+    def __init__(self, app_key=None, app_secret=None, access_token=None, base_url=None, qps=None, tokens=None,
+                 **kwargs):
+        self.app_key = app_key or config.LAZADA_APP_KEY
+        self.app_secret = app_secret or config.LAZADA_APP_SECRET
+        # An explicit token wins; otherwise the token cache, then the .env value
+        if tokens is None and not access_token and lazada_tokens.available():
+            tokens = lazada_tokens
+        self.tokens = tokens
+        self.access_token = access_token or (None if tokens else config.LAZADA_ACCESS_TOKEN)
+        self._managed_token = None  # last token from self.tokens, set by authenticate()
+        if not self.app_key or not self.app_secret:
+            raise ValueError("LAZADA_APP_KEY and LAZADA_APP_SECRET must be set in .env file")
+        super().__init__(base_url or config.LAZADA_API_BASE, qps or config.LAZADA_QPS, **kwargs)
+
+    async def authenticate(self):
+        if not self.access_token and self.tokens:
+            self._managed_token = await self.tokens.access_token_async()
+
+    def sign(self, api_path, params):
+        signed = {
+            "app_key": self.app_key,
+            "timestamp": str(int(time.time() * 1000)),
+            "sign_method": "sha256",
+        }
+        access_token = self.access_token or self._managed_token
+        if access_token:
+            signed["access_token"] = access_token
+        signed.update(params)
+        signed["sign"] = generate_signature(self.app_secret, api_path, signed)
+        return signed
+
+    def unwrap(self, body):
+        code = str(body.get("code", "0"))
+        if code != "0":
+            raise LazadaApiError(code, body.get("message", ""), body, retryable=code in RETRY_CODES)
+        return body.get("data")
+
+    async def get_orders(self, created_after=None, update_after=None, status=None, **params):
+        """
+        All orders created/updated after the given ISO 8601 time.
+
+        Returns:
+            list: Order dicts as returned by /orders/get
+        """
+        if not created_after and not update_after:
+            raise ValueError("created_after or update_after is required")
+        params.update(created_after=created_after, update_after=update_after, status=status,
+                      sort_by="updated_at", sort_direction="ASC")
+        return await self.paginate_offset(ORDERS_PATH, params, "orders", ORDERS_PAGE_SIZE, "countTotal")
+
+    async def get_order_items(self, order_ids):
+        """
+        Items for many orders, ORDER_ITEMS_BATCH order IDs per call, batches
+        fetched concurrently.
+
+        Returns:
+            list: Item dicts, each with its order_id
+        """
+        responses = await self.fetch_batched(
+            ORDER_ITEMS_PATH, order_ids, ORDER_ITEMS_BATCH, lambda batch: {"order_ids": json.dumps([int(o) for o in batch])}
+        )
+        items = []
+        for orders in responses:
+            for order in orders or []:
+                for item in order.get("order_items") or []:
+                    items.append({"order_id": order.get("order_id"), **item})
+        return items
+
+    async def get_traffic(self, start_date, end_date, page_size=ORDERS_PAGE_SIZE):
+        """Daily traffic rows between start_date and end_date (YYYY-MM-DD) from LAZADA_TRAFFIC_PATH."""
+        params = {"startTime": start_date, "endTime": end_date}
+        return await self.paginate_offset(config.LAZADA_TRAFFIC_PATH, params, "data", page_size, "total")
+
+
+async def collect_orders(client, update_after, with_items=True):
+    """Orders updated after update_after plus their items, using an open client (e.g. a scheduler job)."""
+    orders = await client.get_orders(update_after=update_after)
+    items = await client.get_order_items([o["order_id"] for o in orders]) if with_items and orders else []
+    return {"orders": orders, "order_items": items, "stats": dict(client.stats)}
+
+
+async def extract_orders(update_after, client=None, with_items=True):
+    """collect_orders() in its own client session."""
+    client = client or LazadaClient()
+    async with client:
+        return await collect_orders(client, update_after, with_items)
+
+
+def fetch_lazada_orders(update_after, with_items=True, **client_kwargs):
+    """Synchronous wrapper around extract_orders() for scripts and the loader."""
+    return asyncio.run(extract_orders(update_after, LazadaClient(**client_kwargs), with_items))
@@ -0,0 +1,128 @@
+"""
+Async Shopee Open Platform (v2) client, built on the shared Connector (connector.py).
+
+Order lists are cursor-paginated and limited to 15-day windows, so a long
+range is split into windows fetched concurrently, each walking its cursor.
+Order details come 50 order_sn per call, batches fetched concurrently.
+
+    async with ShopeeClient() as client:
+        orders = await client.get_orders(time_from, time_to)
+        details = await client.get_order_details([o["order_sn"] for o in orders])
+"""
+import asyncio
+import hashlib
+import hmac
+import time
+
+from app import config
+from app.Extraction.connector import ApiError, Connector
+
+ORDER_LIST_PATH = "/api/v2/order/get_order_list"
+ORDER_DETAIL_PATH = "/api/v2/order/get_order_detail"
+ORDER_LIST_PAGE_SIZE = 100
+ORDER_DETAIL_BATCH = 50
+MAX_WINDOW_SECONDS = 15 * 24 * 3600  # get_order_list time range limit
+DETAIL_FIELDS = "buyer_user_id,item_list,total_amount,payment_method,pay_time,voucher_info"
+
+RETRY_ERRORS = {"error_server", "error_busy", "error_rate_limit", "error_inner"}
+
+
+class ShopeeApiError(ApiError):
+    pass
+
+
+def generate_signature(partner_key, partner_id, api_path, timestamp, access_token="", shop_id=""):
+    """
+    Generate signature for a Shopee v2 shop-level request
+
+    Args:
+        partner_key (str): Partner key (secret)
+        partner_id (str): Partner ID
+        api_path (str): API endpoint path
+        timestamp (int): Unix seconds, also sent as a parameter
+        access_token (str): Shop access token
+        shop_id (str): Shop ID
+
+    Returns:
+        str: Generated signature
+    """
+    base_string = f"{partner_id}{api_path}{timestamp}{access_token or ''}{shop_id or ''}"
+    return hmac.new(partner_key.encode("utf-8"), base_string.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def time_windows(time_from, time_to, window=MAX_WINDOW_SECONDS):
+    """Split [time_from, time_to] (unix seconds) into windows the order list API accepts."""
+    start = int(time_from)
+    while start < int(time_to):
+        end = min(start + window, int(time_to))
+        yield start, end
+        start = end
+
+
+class ShopeeClient(Connector):
+    name = "shopee"
+    error_class = ShopeeApiError
+
+    def __init__(self, partner_id=None, partner_key=None, shop_id=None, access_token=None, base_url=None, qps=None,
+                 **kwargs):
+        self.partner_id = partner_id or config.SHOPEE_PARTNER_ID
+        self.partner_key = partner_key or config.SHOPEE_PARTNER_KEY
+        self.shop_id = shop_id or config.SHOPEE_SHOP_ID
+        self.access_token = access_token or config.SHOPEE_ACCESS_TOKEN
+        if not self.partner_id or not self.partner_key:
+            raise ValueError("SHOPEE_PARTNER_ID and SHOPEE_PARTNER_KEY must be set in .env file")
+        super().__init__(base_url or config.SHOPEE_API_BASE, qps or config.SHOPEE_QPS, **kwargs)
+
+    def sign(self, api_path, params):
+        timestamp = int(time.time())
+        params.update(
+            partner_id=self.partner_id,
+            timestamp=timestamp,
+            access_token=self.access_token,
+            shop_id=self.shop_id,
+            sign=generate_signature(self.partner_key, self.partner_id, api_path, timestamp, self.access_token, self.shop_id),
+        )
+        return {k: v for k, v in params.items() if v is not None}
+
+    def unwrap(self, body):
+        error = body.get("error")
+        if error:
+            raise ShopeeApiError(error, body.get("message", ""), body, retryable=error in RETRY_ERRORS)
+        return body.get("response")
+
+    async def get_orders(self, time_from, time_to, time_range_field="update_time", order_status=None):
+        """
+        Orders whose time_range_field falls in [time_from, time_to] (unix seconds).
+
+        Returns:
+            list: Order dicts (order_sn, order_status, ...) from get_order_list
+        """
+        params = {"time_range_field": time_range_field, "order_status": order_status}
+        windows = await asyncio.gather(*(
+            self.paginate_cursor(ORDER_LIST_PATH, {**params, "time_from": start, "time_to": end},
+                                 "order_list", ORDER_LIST_PAGE_SIZE)
+            for start, end in time_windows(time_from, time_to)
+        ))
+        return [order for window in windows for order in window]
+
+    async def get_order_details(self, order_sns, fields=DETAIL_FIELDS):
+        """Full order details, ORDER_DETAIL_BATCH order_sn per call, batches fetched concurrently."""
+        responses = await self.fetch_batched(
+            ORDER_DETAIL_PATH, order_sns, ORDER_DETAIL_BATCH,
+            lambda batch: {"order_sn_list": ",".join(batch), "response_optional_fields": fields},
+        )
+        return [order for response in responses for order in (response or {}).get("order_list") or []]
+
+
+async def collect_orders(client, time_from, time_to, with_details=True):
+    """Orders in the time range plus their details, using an open client (e.g. a scheduler job)."""
+    orders = await client.get_orders(time_from, time_to)
+    details = await client.get_order_details([o["order_sn"] for o in orders]) if with_details and orders else []
+    return {"orders": orders, "order_details": details, "stats": dict(client.stats)}
+
+
+async def extract_orders(time_from, time_to, client=None, with_details=True):
+    """collect_orders() in its own client session."""
+    client = client or ShopeeClient()
+    async with client:
+        return await collect_orders(client, time_from, time_to, with_details)
@@ -0,0 +1,189 @@
+"""
+OAuth token cache shared by extraction workers.
+
+TokenManager keeps the current tokens in memory and in a JSON cache file
+written atomically (temp file + os.replace), so readers never see a half
+written file. access_token() is a memory lookup; once the token is within
+TOKEN_REFRESH_AHEAD_SECONDS of the 5-minute expiry buffer it starts one
+background refresh and keeps returning the still-valid token. Async code
+uses access_token_async(), which runs anything beyond the memory lookup
+(cache file read, blocking refresh) in a worker thread.
+
+Refreshes are deduplicated: one refresh thread per process, and an
+exclusive lock file across processes. A process that gets the lock after
+another one refreshed re-reads the cache and uses those tokens instead of
+refreshing again (which could invalidate the other process's refresh
+token).
+"""
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: refreshes are only deduplicated within a process
+    fcntl = None
+
+from app import config
+
+
+class TokenError(Exception):
+    pass
+
+
+class TokenManager:
+    def __init__(self, name, refresh_fn, path=None, expiry_buffer=None, refresh_ahead=None):
+        """
+        Args:
+            name (str): Label used in log lines
+            refresh_fn: refresh_token -> dict with success, access_token,
+                refresh_token, expires_in (as refresh_access_token() returns)
+            path (str): JSON cache file
+            expiry_buffer (int): Seconds before expiry a token counts as expired
+            refresh_ahead (int): Seconds before the buffer to refresh in the background
+        """
+        self.name = name
+        self.refresh_fn = refresh_fn
+        self.path = path
+        self.expiry_buffer = config.TOKEN_EXPIRY_BUFFER_SECONDS if expiry_buffer is None else expiry_buffer
+        self.refresh_ahead = config.TOKEN_REFRESH_AHEAD_SECONDS if refresh_ahead is None else refresh_ahead
+
+        self._tokens = None
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+        self._stop = threading.Event()
+        self._watcher = None
+
+    # ------------------------------------------------------------------ cache
+
+    def available(self):
+        return self._tokens is not None or os.path.exists(self.path)
+
+    def _read_file(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, token_data):
+        """Store new tokens in memory and atomically in the cache file."""
+        tokens = {key: value for key, value in token_data.items() if key != "success"}
+        tokens.setdefault("created_at", int(time.time()))
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(tokens, f, indent=2)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, self.path)
+        self._tokens = tokens
+        return tokens
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self.path + ".lock", "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # ---------------------------------------------------------------- expiry
+
+    def seconds_left(self, tokens=None):
+        """Seconds until tokens count as expired (expiry minus the buffer)."""
+        tokens = tokens or self._tokens
+        if not tokens or "created_at" not in tokens or "expires_in" not in tokens:
+            return 0
+        return tokens["created_at"] + int(tokens["expires_in"]) - self.expiry_buffer - time.time()
+
+    def _fresh(self, tokens):
+        return self.seconds_left(tokens) > self.refresh_ahead
+
+    # --------------------------------------------------------------- refresh
+
+    def access_token(self):
+        """
+        Current access token.
+
+        Only blocks when the token is already inside the expiry buffer (no
+        background refresh ran in time); otherwise a refresh due soon runs in
+        the background.
+        """
+        if self._tokens is None:
+            self._tokens = self._read_file()
+            if self._tokens is None:
+                raise TokenError(f"No {self.name} tokens cached at {self.path}; run the OAuth flow first")
+
+        left = self.seconds_left()
+        if left <= 0:
+            self.refresh(wait=True)
+            if self.seconds_left() <= 0:
+                raise TokenError(f"{self.name} access token expired and could not be refreshed")
+        elif left <= self.refresh_ahead:
+            self.refresh(wait=False)
+        return self._tokens["access_token"]
+
+    async def access_token_async(self):
+        """access_token() without blocking the event loop: only a fresh in-memory token is read inline."""
+        tokens = self._tokens
+        if tokens is not None and self._fresh(tokens):
+            return tokens["access_token"]
+        return await asyncio.to_thread(self.access_token)
+
+    def refresh(self, wait=True):
+        """Start (or join) this process's single refresh."""
+        with self._lock:
+            thread = self._refresh_thread
+            if thread is None or not thread.is_alive():
+                thread = threading.Thread(target=self._refresh, name=f"{self.name}-token-refresh", daemon=True)
+                self._refresh_thread = thread
+                thread.start()
+        if wait:
+            thread.join()
+
+    def _refresh(self):
+        with self._file_lock():
+            current = self._read_file() or self._tokens
+            if current and self._fresh(current):
+                self._tokens = current  # another process refreshed while we waited
+                return
+            if not current or not current.get("refresh_token"):
+                print(f"Cannot refresh {self.name} token: no refresh token cached")
+                return
+            result = self.refresh_fn(current["refresh_token"])
+            if not result.get("success"):
+                print(f"{self.name} token refresh failed: {result.get('error')}")
+                return
+            merged = {**current, **{k: v for k, v in result.items() if v is not None}}
+            merged["created_at"] = int(time.time())
+            self.save(merged)
+            print(f"Refreshed {self.name} access token")
+
+    # ------------------------------------------------------------ background
+
+    def start(self, check_seconds=60):
+        """Check the token every check_seconds in a daemon thread and refresh ahead of expiry."""
+        if self._watcher and self._watcher.is_alive():
+            return
+        self._stop.clear()
+
+        def watch():
+            while not self._stop.wait(check_seconds):
+                try:
+                    self.access_token()
+                except TokenError as e:
+                    print(e)
+
+        self._watcher = threading.Thread(target=watch, name=f"{self.name}-token-watch", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
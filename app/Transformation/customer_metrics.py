@@ -0,0 +1,362 @@
+"""
+Incremental RFM / LTV metrics for Dim_Customer.
+
+CustomerMetrics keeps running aggregates per customer_key (orders, items,
+spend, first and last order day) and folds each new Fact_Orders batch in
+with one groupby, so segments and tiers are recomputed only for the
+customers in that batch; the order history is never re-read.
+
+Fact_Orders rows are order items without an order ID, so an order is a
+customer's purchase day on one platform. Items already counted (by
+order_item_key) are ignored when a batch is loaded again, and cancelled or
+returned items count for nothing. Only the item keys and purchase days of
+the last CUSTOMER_METRICS_WINDOW_DAYS (before the latest order day seen)
+are kept, so the state does not grow with the order history: items dated
+before that window are taken as counted already. An item counted before
+it was cancelled stays counted, and so would a late backfill be ignored;
+rebuild from the full history (reset() then update()) to correct either.
+
+Derived per customer:
+
+    - buyer_segment: New (fewer than REGULAR_MIN_ORDERS orders) / Returning
+    - LTV_tier: Gold / Silver / Bronze by lifetime spend
+    - customer_segment (enhanced Dim_Customers): Inactive after
+      INACTIVE_AFTER_DAYS without an order, else VIP (Gold), Regular
+      (Returning) or New
+
+Fixed spend thresholds keep the tiers incremental: quantile-based RFM scores
+would change for every customer whenever anyone buys. Only recency changes
+without a purchase: refresh_customer_recency() (run after every scheduled
+load) rewrites the customers who became Inactive since its previous run.
+
+Rows are written to Dim_Customer and, with CUSTOMER_METRICS_ENHANCED, to
+the enhanced schema's Dim_Customers (same customer_key, platform_buyer_id
+as customer_id).
+"""
+import os
+import pickle
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from app import config
+from app.Transformation.harmonize_dim_customer import customer_keys, flush_customer_keys
+
+# Purchase days are counted as customer_key * _DAY_FACTOR + time_key * 10 + platform_key
+_DAY_FACTOR = 1_000_000_000
+
+
+def _time_key_dates(time_keys):
+    """YYYYMMDD time_keys -> datetime64 dates."""
+    return pd.to_datetime(pd.Series(time_keys).astype("Int64").astype(str), format="%Y%m%d", errors="coerce")
+
+
+def _days_before(time_key, days):
+    """The YYYYMMDD time_key days before time_key."""
+    return int((_time_key_dates([time_key]).iloc[0] - pd.Timedelta(days=days)).strftime("%Y%m%d"))
+
+
+def _contains(sorted_keys, values):
+    """Vectorized membership test against a sorted unique array (binary search, no hashing)."""
+    positions = np.searchsorted(sorted_keys, values).clip(max=max(len(sorted_keys) - 1, 0))
+    return (sorted_keys[positions] == values) if len(sorted_keys) else np.zeros(len(values), dtype=bool)
+
+
+def _insert_sorted(sorted_keys, new_keys):
+    """Merge keys not yet in sorted_keys into it, keeping it sorted."""
+    new_keys = np.unique(new_keys)
+    return np.insert(sorted_keys, np.searchsorted(sorted_keys, new_keys), new_keys)
+
+
+def _empty_state():
+    state = pd.DataFrame({
+        "total_orders": pd.Series(dtype="int32"),
+        "total_items": pd.Series(dtype="int32"),
+        "total_spent": pd.Series(dtype="float64"),
+        "first_time_key": pd.Series(dtype="int32"),
+        "last_time_key": pd.Series(dtype="int32"),
+    })
+    state.index = pd.Index([], dtype="int64", name="customer_key")
+    return state
+
+
+class CustomerMetrics:
+    def __init__(self, state_path=None):
+        self.state_path = state_path or os.path.join(config.STATE_DIR, "customer_metrics.pkl")
+        self.customers = _empty_state()
+        self._lock = threading.Lock()
+        self.reset()
+
+    def load(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "rb") as f:
+                state = pickle.load(f)
+            self.customers, self._counted_items, self._order_days = (
+                state["customers"], state["counted_items"], state["order_days"]
+            )
+            self._counted_time_keys = state.get("counted_time_keys", np.zeros(len(self._counted_items), dtype="int64"))
+            self._window_start = state.get("window_start", 0)
+            self._inactive_before = state.get("inactive_before", 0)
+        return self
+
+    def save(self):
+        """Write the aggregates atomically (temp file + rename)."""
+        with self._lock:
+            state = {"customers": self.customers, "counted_items": self._counted_items, "order_days": self._order_days,
+                     "counted_time_keys": self._counted_time_keys, "window_start": self._window_start,
+                     "inactive_before": self._inactive_before}
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.state_path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.state_path)
+
+    def reset(self):
+        with self._lock:
+            self.customers = _empty_state()
+            # Sorted order_item_keys counted in the window, with their time_keys
+            self._counted_items = np.array([], dtype="int64")
+            self._counted_time_keys = np.array([], dtype="int64")
+            self._order_days = np.array([], dtype="int64")
+            self._window_start = 0  # items on or before this time_key are taken as counted
+            self._inactive_before = 0  # last_time_key cut-off of the previous recency pass
+
+    def _trim(self):
+        """Drop the item keys and purchase days that fell out of the window."""
+        start = _days_before(int(self.customers["last_time_key"].max()), config.CUSTOMER_METRICS_WINDOW_DAYS)
+        if start <= self._window_start:
+            return
+        keep = self._counted_time_keys > start
+        self._counted_items, self._counted_time_keys = self._counted_items[keep], self._counted_time_keys[keep]
+        self._order_days = self._order_days[(self._order_days % _DAY_FACTOR) // 10 > start]
+        self._window_start = start
+
+    def update(self, fact_orders):
+        """
+        Fold a Fact_Orders batch into the running aggregates.
+
+        Args:
+            fact_orders (DataFrame): order_item_key, time_key, customer_key,
+                platform_key, paid_price and optional cancellation_reason / return_reason
+
+        Returns:
+            Index: customer_keys whose aggregates changed
+        """
+        batch = fact_orders.dropna(subset=["customer_key", "time_key"])
+        batch = batch.drop_duplicates("order_item_key", keep="last")
+        completed = np.ones(len(batch), dtype=bool)
+        for column in ("cancellation_reason", "return_reason"):
+            if column in batch:
+                reason = batch[column]
+                completed &= (reason.isna() | (reason.astype(str).str.strip() == "")).to_numpy()
+        batch = batch[completed]
+
+        with self._lock:
+            batch = batch[batch["time_key"].to_numpy(dtype="int64") > self._window_start]
+            item_keys = batch["order_item_key"].to_numpy(dtype="int64")
+            batch = batch[~_contains(self._counted_items, item_keys)]
+            if batch.empty:
+                return pd.Index([], dtype="int64", name="customer_key")
+
+            customer = batch["customer_key"].to_numpy(dtype="int64")
+            time_key = batch["time_key"].to_numpy(dtype="int64")
+            day_keys = customer * _DAY_FACTOR + time_key * 10 + batch["platform_key"].to_numpy(dtype="int64")
+            new_days = np.unique(day_keys[~_contains(self._order_days, day_keys)])
+
+            frame = pd.DataFrame({
+                "customer_key": customer,
+                "paid_price": pd.to_numeric(batch["paid_price"], errors="coerce").fillna(0).to_numpy(dtype="float64"),
+                "time_key": time_key,
+            })
+            agg = frame.groupby("customer_key").agg(
+                total_items=("paid_price", "size"),
+                total_spent=("paid_price", "sum"),
+                first_time_key=("time_key", "min"),
+                last_time_key=("time_key", "max"),
+            )
+            orders = pd.Series(new_days // _DAY_FACTOR).value_counts()
+            agg["total_orders"] = orders.reindex(agg.index, fill_value=0)
+
+            current = self.customers.reindex(agg.index)
+            known = current["total_orders"].notna().to_numpy()
+            merged = pd.DataFrame({
+                "total_orders": current["total_orders"].fillna(0).to_numpy() + agg["total_orders"].to_numpy(),
+                "total_items": current["total_items"].fillna(0).to_numpy() + agg["total_items"].to_numpy(),
+                "total_spent": current["total_spent"].fillna(0).to_numpy() + agg["total_spent"].to_numpy(),
+                "first_time_key": np.fmin(current["first_time_key"].to_numpy(dtype="float64"), agg["first_time_key"].to_numpy()),
+                "last_time_key": np.fmax(current["last_time_key"].to_numpy(dtype="float64"), agg["last_time_key"].to_numpy()),
+            }, index=agg.index).astype(self.customers.dtypes.to_dict())
+
+            self.customers.loc[merged.index[known]] = merged[known]
+            if not known.all():
+                self.customers = pd.concat([self.customers, merged[~known]])
+            item_keys = batch["order_item_key"].to_numpy(dtype="int64")
+            positions = np.searchsorted(self._counted_items, item_keys)
+            self._counted_items = np.insert(self._counted_items, positions, item_keys)
+            self._counted_time_keys = np.insert(self._counted_time_keys, positions, time_key)
+            self._order_days = _insert_sorted(self._order_days, new_days)
+            self._trim()
+            return agg.index
+
+    def lapsed(self, as_of):
+        """
+        customer_keys that became Inactive (no order in INACTIVE_AFTER_DAYS)
+        by as_of since the previous call; every Inactive customer on the first.
+        """
+        cutoff = _days_before(int(pd.Timestamp(as_of).strftime("%Y%m%d")), config.INACTIVE_AFTER_DAYS)
+        with self._lock:
+            last = self.customers["last_time_key"]
+            keys = self.customers.index[((last < cutoff) & (last >= self._inactive_before)).to_numpy()]
+            self._inactive_before = max(self._inactive_before, cutoff)
+        return keys
+
+    def profiles(self, keys=None, as_of=None):
+        """
+        RFM values and segments for the customer_keys in keys (every customer when None).
+
+        Args:
+            as_of: Date recency is measured from (default: the latest order day seen)
+
+        Returns:
+            DataFrame: customer_key, total_orders, total_items, total_spent,
+                average_order_value, first_order_date, last_order_date,
+                recency_days, buyer_segment, LTV_tier, customer_segment,
+                customer_lifetime_value
+        """
+        with self._lock:
+            state = self.customers if keys is None else self.customers.loc[self.customers.index.intersection(keys)]
+            if as_of is None:
+                as_of = _time_key_dates([self.customers["last_time_key"].max()]).iloc[0] if len(self.customers) else None
+        as_of = pd.Timestamp(as_of) if as_of is not None else pd.NaT
+
+        profiles = state.reset_index()
+        profiles["total_spent"] = profiles["total_spent"].round(2)
+        profiles["average_order_value"] = (
+            profiles["total_spent"] / profiles["total_orders"].where(profiles["total_orders"] > 0)
+        ).round(2).fillna(0)
+        profiles["first_order_date"] = _time_key_dates(profiles.pop("first_time_key")).to_numpy()
+        profiles["last_order_date"] = _time_key_dates(profiles.pop("last_time_key")).to_numpy()
+        profiles["recency_days"] = (as_of - profiles["last_order_date"]).dt.days
+
+        returning = profiles["total_orders"] >= config.REGULAR_MIN_ORDERS
+        profiles["buyer_segment"] = np.where(returning, "Returning", "New")
+        profiles["LTV_tier"] = np.select(
+            [profiles["total_spent"] >= config.LTV_GOLD_MIN_SPEND, profiles["total_spent"] >= config.LTV_SILVER_MIN_SPEND],
+            ["Gold", "Silver"], "Bronze",
+        )
+        profiles["customer_segment"] = np.select(
+            [profiles["recency_days"] > config.INACTIVE_AFTER_DAYS, profiles["LTV_tier"] == "Gold", returning],
+            ["Inactive", "VIP", "Regular"], "New",
+        )
+        profiles["customer_lifetime_value"] = profiles["total_spent"]
+        return profiles
+
+
+def dim_customer_rows(profiles, index=None):
+    """
+    Profiles -> Dim_Customer columns for an upsert. platform_buyer_id
+    (NOT NULL) comes from the customer key index.
+    """
+    index = index or customer_keys
+    return pd.DataFrame({
+        "customer_key": profiles["customer_key"].to_numpy(),
+        "platform_buyer_id": index.natural_ids(profiles["customer_key"], "platform_buyer_id").to_numpy(),
+        "buyer_segment": profiles["buyer_segment"].to_numpy(),
+        "LTV_tier": profiles["LTV_tier"].to_numpy(),
+        "last_order_date": profiles["last_order_date"].to_numpy(),
+    })
+
+
+def dim_customers_rows(profiles, index=None):
+    """
+    Profiles -> enhanced Dim_Customers columns for an upsert, keyed by the
+    same customer_key with platform_buyer_id as customer_id.
+    """
+    index = index or customer_keys
+    return pd.DataFrame({
+        "customer_key": profiles["customer_key"].to_numpy(),
+        "customer_id": index.natural_ids(profiles["customer_key"], "platform_buyer_id").to_numpy(),
+        "total_orders": profiles["total_orders"].to_numpy(),
+        "total_spent": profiles["total_spent"].to_numpy(),
+        "average_order_value": profiles["average_order_value"].to_numpy(),
+        "first_order_date": profiles["first_order_date"].to_numpy(),
+        "last_order_date": profiles["last_order_date"].to_numpy(),
+        "customer_segment": profiles["customer_segment"].to_numpy(),
+        "customer_lifetime_value": profiles["customer_lifetime_value"].to_numpy(),
+        "is_active": (profiles["customer_segment"] != "Inactive").to_numpy(),
+        "updated_at": pd.Timestamp.now(),
+    })
+
+
+def write_customer_rows(profiles, index=None, enhanced=None):
+    """
+    Upsert pending new customers, then the Dim_Customer (and, with
+    enhanced, Dim_Customers) rows of the profiled customers.
+
+    Args:
+        enhanced (bool): Defaults to config.CUSTOMER_METRICS_ENHANCED
+    """
+    from app.loading_script import load_tables
+
+    enhanced = config.CUSTOMER_METRICS_ENHANCED if enhanced is None else enhanced
+    dsn = (index or customer_keys).db_conn_string
+    steps = [lambda: flush_customer_keys(index),
+             lambda: load_tables({"Dim_Customer": dim_customer_rows(profiles, index)}, dsn)]
+    if enhanced:
+        steps.append(lambda: load_tables({"Dim_Customers": dim_customers_rows(profiles, index)}, dsn,
+                                         schema_path=config.ENHANCED_SCHEMA_PATH))
+    for step in steps:
+        result = step()
+        if result["status"] != "success":
+            raise RuntimeError(result["detail"])
+
+
+def update_customer_metrics(fact_orders, metrics=None, index=None, as_of=None, flush=False, enhanced=None):
+    """
+    Fold a Fact_Orders batch into the customer metrics and build the
+    Dim_Customer rows of the customers it touched.
+
+    Args:
+        fact_orders (DataFrame): Fact_Orders rows of the batch
+        metrics (CustomerMetrics): Defaults to one loaded from config.STATE_DIR
+        index (SurrogateKeyIndex): Customer key index (the shared customer_keys by default)
+        as_of: Date recency is measured from
+        flush (bool): Upsert the rows (with pending new customers) to the database
+        enhanced (bool): With flush, also upsert Dim_Customers (default:
+            config.CUSTOMER_METRICS_ENHANCED)
+
+    Returns:
+        DataFrame: Dim_Customer rows of the affected customers
+    """
+    metrics = metrics or CustomerMetrics().load()
+    affected = metrics.update(fact_orders)
+    profiles = metrics.profiles(affected, as_of)
+    if flush and not profiles.empty:
+        write_customer_rows(profiles, index, enhanced)
+    metrics.save()
+    return dim_customer_rows(profiles, index)
+
+
+def refresh_customer_recency(metrics=None, index=None, as_of=None, flush=False, enhanced=None):
+    """
+    Re-segment the customers who went without an order long enough to turn
+    Inactive since the previous pass. Run on the load schedule: without a
+    purchase nothing else updates them.
+
+    Args:
+        as_of: Date recency is measured from (default: today in ORDER_TIMEZONE)
+        flush, enhanced: As for update_customer_metrics()
+
+    Returns:
+        DataFrame: Dim_Customer rows of the customers that turned Inactive
+    """
+    metrics = metrics or CustomerMetrics().load()
+    if as_of is None:
+        as_of = pd.Timestamp.now(tz=config.ORDER_TIMEZONE).tz_localize(None).normalize()
+    profiles = metrics.profiles(metrics.lapsed(as_of), as_of)
+    if flush and not profiles.empty:
+        write_customer_rows(profiles, index, enhanced)
+    metrics.save()
+    return dim_customer_rows(profiles, index)
@@ -0,0 +1,30 @@
+"""
+Dim_Customer surrogate keys.
+
+customer_keys maps platform_buyer_id -> customer_key (see key_resolver.py).
+Fact transforms call resolve_customer_keys() once per batch and
+flush_customer_keys() after, which writes the new Dim_Customer rows.
+"""
+from app.Transformation.key_resolver import SurrogateKeyIndex
+
+customer_keys = SurrogateKeyIndex("Dim_Customer", "customer_key", ["platform_buyer_id"])
+
+
+def resolve_customer_keys(df, buyer_id_column="platform_buyer_id", index=None):
+    """
+    Add a customer_key column to a fact batch.
+
+    Args:
+        df (DataFrame): Fact rows
+        buyer_id_column (str): Column holding the marketplace buyer ID
+        index (SurrogateKeyIndex): Defaults to the shared customer_keys
+
+    Returns:
+        DataFrame: df with customer_key (Int64); new buyers get new keys
+    """
+    index = index or customer_keys
+    return df.assign(customer_key=index.resolve(df[buyer_id_column], "platform_buyer_id").to_numpy())
+
+
+def flush_customer_keys(index=None):
+    return (index or customer_keys).flush()
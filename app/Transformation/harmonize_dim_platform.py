@@ -0,0 +1,22 @@
+"""
+Dim_Platform rows and platform name -> platform_key lookup.
+"""
+import pandas as pd
+
+# Fixed surrogate keys (see the Dim_Platform comments in the schema)
+PLATFORM_KEYS = {"Lazada": 1, "Shopee": 2}
+PLATFORM_REGION = "PH"
+
+
+def build_dim_platform(region=PLATFORM_REGION):
+    return pd.DataFrame({
+        "platform_key": list(PLATFORM_KEYS.values()),
+        "platform_name": list(PLATFORM_KEYS),
+        "platform_region": region,
+    })
+
+
+def resolve_platform_keys(platforms):
+    """Vectorized platform name (any case) -> platform_key; unknown names become <NA>."""
+    lookup = {name.lower(): key for name, key in PLATFORM_KEYS.items()}
+    return pd.Series(platforms).astype("string").str.strip().str.lower().map(lookup).astype("Int64")
@@ -0,0 +1,78 @@
+"""
+Dim_Product surrogate keys.
+
+One product_key covers a product on both marketplaces: product_keys maps
+lazada_item_id and shopee_item_id to it (see key_resolver.py). An item seen
+on one platform first gets its own key; link_products() later points the
+other platform's item ID at that key. A Shopee item that already has a key
+of its own is merged into the Lazada item's key (its facts move with it),
+unless that key already belongs to another Lazada item.
+"""
+import pandas as pd
+
+from app.Transformation.key_resolver import SurrogateKeyIndex
+
+ITEM_ID_COLUMNS = {"lazada": "lazada_item_id", "shopee": "shopee_item_id"}
+
+product_keys = SurrogateKeyIndex("Dim_Product", "product_key", list(ITEM_ID_COLUMNS.values()))
+
+
+def resolve_product_keys(df, item_id_column="item_id", platform_column="platform", index=None):
+    """
+    Add a product_key column to a fact batch that may mix platforms.
+
+    Args:
+        df (DataFrame): Fact rows
+        item_id_column (str): Column holding the marketplace item ID
+        platform_column (str): Column holding "Lazada"/"Shopee"
+        index (SurrogateKeyIndex): Defaults to the shared product_keys
+
+    Returns:
+        DataFrame: df with product_key (Int64); new items get new keys
+    """
+    index = index or product_keys
+    keys = pd.Series(pd.NA, index=df.index, dtype="Int64")
+    platforms = df[platform_column].astype("string").str.lower()
+    for platform, natural_column in ITEM_ID_COLUMNS.items():
+        rows = (platforms == platform).fillna(False).to_numpy()
+        if rows.any():
+            keys[rows] = index.resolve(df.loc[rows, item_id_column], natural_column).to_numpy()
+    return df.assign(product_key=keys)
+
+
+def link_products(pairs, index=None):
+    """
+    Give Shopee items the product_key of their matching Lazada item.
+
+    Args:
+        pairs (DataFrame): lazada_item_id and shopee_item_id columns
+
+    Returns:
+        DataFrame: Pairs not linked because the Shopee item's key already
+            belongs to another Lazada item
+    """
+    index = index or product_keys
+    lazada_keys = index.resolve(pairs["lazada_item_id"], "lazada_item_id")
+    shopee_keys = index.resolve(pairs["shopee_item_id"], "shopee_item_id", assign_new=False)
+    owners = index.natural_ids(shopee_keys, "lazada_item_id")
+    refused = []
+    for position, (key, shopee_id, shopee_key, owner) in enumerate(
+        zip(lazada_keys.tolist(), pairs["shopee_item_id"].tolist(), shopee_keys.tolist(), owners.tolist())
+    ):
+        if key is pd.NA or shopee_id is None:
+            continue
+        if shopee_key is pd.NA:
+            index.link(key, "shopee_item_id", shopee_id)
+        elif shopee_key == key:
+            continue
+        elif pd.isna(owner):
+            index.merge(shopee_key, key)
+        else:
+            refused.append(position)
+    if refused:
+        print(f"Not linking {len(refused)} Shopee item(s) already sharing a product_key with another Lazada item")
+    return pairs.iloc[refused]
+
+
+def flush_product_keys(index=None):
+    return (index or product_keys).flush()
@@ -0,0 +1,185 @@
+"""
+Dim_Time generation and date -> time_key lookup.
+
+build_dim_time() builds every attribute for a date range in one vectorized
+pass. TimeKeyCache remembers which time_keys already exist in the database,
+so fact transforms can map dates to keys without a query per row and only
+missing dates are ever inserted.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from app import config
+
+SEASONS = np.array(["Winter", "Winter", "Spring", "Spring", "Spring", "Summer",
+                    "Summer", "Summer", "Fall", "Fall", "Fall", "Winter"])
+
+
+def parse_mega_sale_calendar(spec=None):
+    """
+    Parse a mega-sale calendar.
+
+    Args:
+        spec (str): Comma-separated entries, each "M.D" for a yearly sale
+            (11.11) or "YYYY-MM-DD" for a one-off date. Defaults to
+            config.MEGA_SALE_DAYS.
+
+    Returns:
+        tuple: (set of (month, day) recurring days, set of one-off Timestamps)
+    """
+    spec = config.MEGA_SALE_DAYS if spec is None else spec
+    recurring, one_off = set(), set()
+    for entry in (e.strip() for e in spec.split(",")):
+        if not entry:
+            continue
+        if "-" in entry:
+            one_off.add(pd.Timestamp(entry).normalize())
+        else:
+            month, day = entry.split(".")
+            recurring.add((int(month), int(day)))
+    return recurring, one_off
+
+
+def date_to_time_key(dates):
+    """Vectorized date -> YYYYMMDD time_key (NaT becomes <NA>)."""
+    dates = pd.to_datetime(pd.Series(dates))
+    keys = dates.dt.year * 10000 + dates.dt.month * 100 + dates.dt.day
+    return keys.astype("Int64")
+
+
+def build_dim_time(start, end, calendar=None, fiscal_year_start_month=None):
+    """
+    Build Dim_Time rows for every date in [start, end].
+
+    Columns cover both the LA_Collections schema and the enhanced schema;
+    the loader keeps the ones the target table has. day_of_week is ISO
+    (1 = Monday, 7 = Sunday).
+
+    Args:
+        start, end: Anything pd.Timestamp accepts
+        calendar (tuple): parse_mega_sale_calendar() result, default from config
+        fiscal_year_start_month (int): First month of the fiscal year (1 = calendar year)
+
+    Returns:
+        DataFrame: One row per date
+    """
+    recurring, one_off = calendar if calendar is not None else parse_mega_sale_calendar()
+    fiscal_start = fiscal_year_start_month or config.FISCAL_YEAR_START_MONTH
+
+    dates = pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize(), freq="D")
+    year, month, day = dates.year.to_numpy(), dates.month.to_numpy(), dates.day.to_numpy()
+    day_of_week = dates.dayofweek.to_numpy() + 1
+
+    month_day = month * 100 + day
+    is_mega_sale = np.isin(month_day, [m * 100 + d for m, d in recurring]) | dates.isin(list(one_off))
+
+    fiscal_month = (month - fiscal_start) % 12
+    fiscal_year = np.where(month >= fiscal_start, year, year - 1) if fiscal_start > 1 else year
+
+    return pd.DataFrame({
+        "time_key": year * 10000 + month_day,
+        "date": dates,
+        "year": year,
+        "quarter": (month - 1) // 3 + 1,
+        "month": month,
+        "month_name": dates.month_name(),
+        "week": dates.isocalendar().week.to_numpy(),
+        "day_of_month": day,
+        "day_of_week": day_of_week,
+        "day_name": dates.day_name(),
+        "is_weekend": day_of_week >= 6,
+        "is_mega_sale_day": is_mega_sale,
+        "is_holiday": False,
+        "fiscal_year": fiscal_year,
+        "fiscal_quarter": fiscal_month // 3 + 1,
+        "season": SEASONS[month - 1],
+    })
+
+
+class TimeKeyCache:
+    """
+    In-process set of time_keys known to exist in Dim_Time.
+
+    lookup() is pure arithmetic; ensure() also inserts any Dim_Time rows the
+    dates need, after one query per uncovered range to learn what exists.
+    """
+
+    def __init__(self, db_conn_string=None, table_name="Dim_Time"):
+        self.db_conn_string = db_conn_string
+        self.table_name = table_name
+        self._known = set()
+        self._loaded_ranges = []
+        self._lock = threading.Lock()
+
+    def lookup(self, dates):
+        return date_to_time_key(dates)
+
+    def _covered(self, low, high):
+        return any(lo <= low and high <= hi for lo, hi in self._loaded_ranges)
+
+    def _load_existing(self, low, high):
+        from app.db import get_pool
+        from app.loading_script import quote_ident
+
+        with get_pool(self.db_conn_string).connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT time_key FROM {quote_ident(self.table_name)} WHERE time_key BETWEEN %s AND %s",
+                    (int(low), int(high)),
+                )
+                self._known.update(row[0] for row in cursor.fetchall())
+            conn.rollback()
+        self._loaded_ranges.append((low, high))
+
+    def missing(self, dates):
+        """Dates (normalized, unique) whose time_key is not in Dim_Time yet."""
+        keys = self.lookup(dates).dropna()
+        if keys.empty:
+            return pd.DatetimeIndex([])
+        low, high = int(keys.min()), int(keys.max())
+        with self._lock:
+            if not self._covered(low, high):
+                self._load_existing(low, high)
+            unknown = sorted(set(keys.unique().tolist()) - self._known)
+        return pd.to_datetime([str(k) for k in unknown], format="%Y%m%d")
+
+    def ensure(self, dates):
+        """
+        Map dates to time_keys, inserting Dim_Time rows for any new dates.
+
+        Returns:
+            Series: time_key per input date
+        """
+        from app.loading_script import load_tables
+
+        missing = self.missing(dates)
+        if len(missing):
+            rows = pd.concat([build_dim_time(lo, hi) for lo, hi in _contiguous_ranges(missing)], ignore_index=True)
+            result = load_tables({self.table_name: rows}, self.db_conn_string)
+            if result["status"] != "success":
+                raise RuntimeError(f"Could not insert Dim_Time rows: {result['detail']}")
+            with self._lock:
+                self._known.update(rows["time_key"].tolist())
+        return self.lookup(dates)
+
+
+def _contiguous_ranges(dates):
+    """Split sorted dates into (first, last) runs of consecutive days."""
+    dates = pd.DatetimeIndex(sorted(dates))
+    breaks = np.flatnonzero(np.diff(dates.values).astype("timedelta64[D]").astype(int) != 1) + 1
+    for chunk in np.split(dates, breaks):
+        yield chunk[0], chunk[-1]
+
+
+def load_missing_dates(start, end, db_conn_string=None, cache=None):
+    """Insert Dim_Time rows for the dates in [start, end] that are not there yet. Returns rows inserted."""
+    cache = cache or TimeKeyCache(db_conn_string)
+    dates = pd.date_range(start, end, freq="D")
+    missing = cache.missing(dates)
+    cache.ensure(missing)
+    return len(missing)
+
+
+time_key_cache = TimeKeyCache()
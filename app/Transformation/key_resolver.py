@@ -0,0 +1,335 @@
+"""
+Natural ID -> surrogate key resolution for the dimension tables.
+
+A SurrogateKeyIndex keeps, per natural-ID column, a pandas Series indexed by
+natural ID. A whole fact batch is resolved with one hashed get_indexer()
+call. IDs it has not seen get the next keys in bulk and are queued as new
+dimension rows for flush().
+
+The index is saved under config.STATE_DIR between runs. On load it only
+reads dimension rows with keys above the saved maximum from the database,
+so rows added elsewhere are picked up without a full rescan.
+
+Several ETL processes may resolve keys for the same table at once, so new
+keys are never taken from the in-memory maximum alone:
+
+    - with a database, unseen IDs are first looked up in the dimension
+      table (rows another process flushed since this index loaded) and the
+      rest get keys from a Postgres sequence, <table>_<key>_seq, created on
+      first use to start above the table's current maximum
+    - without one, keys come from a counter file next to the saved index,
+      read and advanced under an exclusive file lock
+"""
+import os
+import pickle
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: keys are only unique within a process
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+from app import config
+
+
+class SurrogateKeyIndex:
+    def __init__(self, table_name, key_column, natural_columns, db_conn_string=None, state_path=None):
+        self.table_name = table_name
+        self.key_column = key_column
+        self.natural_columns = list(natural_columns)
+        self.db_conn_string = db_conn_string
+        self.state_path = state_path or os.path.join(config.STATE_DIR, "keys", f"{table_name}.pkl")
+
+        self._maps = {column: pd.Series([], dtype="int64", index=pd.Index([], dtype="object")) for column in self.natural_columns}
+        self._max_key = 0
+        self._pending = []
+        self._merged = {}  # old key -> key it was merged into, applied to the database by flush()
+        self._loaded = False
+        self._from_db = False
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------ state
+
+    def load(self, from_db=True):
+        """Read the saved index, then catch up on dimension rows added since."""
+        with self._lock:
+            if os.path.exists(self.state_path):
+                with open(self.state_path, "rb") as f:
+                    state = pickle.load(f)
+                self._maps.update(state["maps"])
+                self._max_key = state["max_key"]
+                self._merged = state.get("merged", {})
+            self._from_db = bool(from_db and (self.db_conn_string or config.DB_URL))
+            if self._from_db:
+                self._merge(self._fetch_since(self._max_key))
+            self._loaded = True
+        return self
+
+    def _query(self, sql, params=None):
+        """Rows of one read-only statement on a pooled connection."""
+        from app.db import get_pool
+
+        with get_pool(self.db_conn_string).connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(sql, params)
+                    return cursor.fetchall()
+            finally:
+                conn.rollback()
+
+    def _fetch_since(self, key):
+        from app.loading_script import quote_ident
+
+        columns = [self.key_column] + self.natural_columns
+        rows = self._query(
+            f"SELECT {', '.join(quote_ident(c) for c in columns)} FROM {quote_ident(self.table_name)} "
+            f"WHERE {quote_ident(self.key_column)} > %s",
+            (int(key),),
+        )
+        return pd.DataFrame(rows, columns=columns)
+
+    def _fetch_natural(self, natural_column, natural_ids):
+        """Stored dimension rows for some natural IDs of one column."""
+        from app.loading_script import quote_ident
+
+        columns = [self.key_column] + self.natural_columns
+        rows = self._query(
+            f"SELECT {', '.join(quote_ident(c) for c in columns)} FROM {quote_ident(self.table_name)} "
+            f"WHERE {quote_ident(natural_column)} = ANY(%s)",
+            ([str(natural_id) for natural_id in natural_ids],),
+        )
+        return pd.DataFrame(rows, columns=columns)
+
+    @contextmanager
+    def _file_lock(self):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        with open(self.state_path + ".lock", "a+") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield lock_file
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _reserve_keys(self, count):
+        """count new keys that no other process is given."""
+        if self._from_db:
+            return self._reserve_db_keys(count)
+        with self._file_lock() as lock_file:
+            lock_file.seek(0)
+            issued = lock_file.read().strip()
+            start = max(int(issued or 0), self._max_key)
+            lock_file.seek(0)
+            lock_file.truncate()
+            lock_file.write(str(start + count))
+            lock_file.flush()
+        return np.arange(start + 1, start + 1 + count, dtype="int64")
+
+    def _reserve_db_keys(self, count):
+        from app.db import get_pool
+        from app.loading_script import quote_ident
+
+        sequence = f"{self.table_name}_{self.key_column}_seq"
+        with get_pool(self.db_conn_string).connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    # Only the first caller creates the sequence; the lock ends with the transaction
+                    cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (sequence,))
+                    cursor.execute("SELECT to_regclass(%s)", (quote_ident(sequence),))
+                    if cursor.fetchone()[0] is None:
+                        cursor.execute(
+                            f"SELECT coalesce(max({quote_ident(self.key_column)}), 0) FROM {quote_ident(self.table_name)}"
+                        )
+                        start = max(int(cursor.fetchone()[0]), self._max_key) + 1
+                        cursor.execute(f"CREATE SEQUENCE {quote_ident(sequence)} START WITH {start}")
+                    cursor.execute("SELECT nextval(%s) FROM generate_series(1, %s)", (quote_ident(sequence), int(count)))
+                    keys = [row[0] for row in cursor.fetchall()]
+                conn.commit()
+            finally:
+                conn.rollback()
+        return np.sort(np.asarray(keys, dtype="int64"))
+
+    def _merge(self, rows):
+        """Add (key, natural ids...) rows to the maps."""
+        if rows.empty:
+            return
+        for column in self.natural_columns:
+            if column not in rows:
+                continue
+            known = rows[[self.key_column, column]].dropna(subset=[column])
+            if known.empty:
+                continue
+            addition = pd.Series(
+                known[self.key_column].to_numpy(dtype="int64"),
+                index=pd.Index(known[column].astype(str).to_numpy(dtype=object)),
+            )
+            merged = pd.concat([self._maps[column], addition])
+            self._maps[column] = merged[~merged.index.duplicated(keep="last")]
+        self._max_key = max(self._max_key, int(rows[self.key_column].max()))
+
+    def save(self):
+        """Write the index atomically (temp file + rename)."""
+        with self._lock:
+            state = {"maps": self._maps, "max_key": self._max_key, "merged": self._merged}
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.state_path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.state_path)
+
+    # ------------------------------------------------------------- resolution
+
+    def resolve(self, natural_ids, natural_column=None, assign_new=True):
+        """
+        Map a batch of natural IDs to surrogate keys in one vectorized pass.
+
+        Args:
+            natural_ids: Series/array of natural IDs (None/NaN stay <NA>)
+            natural_column (str): Which natural column they belong to (default: the first)
+            assign_new (bool): Give unseen IDs new keys (queued for flush());
+                otherwise they resolve to <NA>
+
+        Returns:
+            Series: Int64 keys aligned with natural_ids
+        """
+        natural_column = natural_column or self.natural_columns[0]
+        if not self._loaded:
+            self.load()
+
+        ids = pd.Series(natural_ids)
+        index = ids.index
+        nulls = ids.isna().to_numpy()
+        values = ids.astype(str).to_numpy(dtype=object)
+
+        with self._lock:
+            mapping = self._maps[natural_column]
+            positions = mapping.index.get_indexer(values)
+            unseen_mask = (positions == -1) & ~nulls
+            if assign_new and unseen_mask.any() and self._from_db:
+                # Another process may have stored some of them since this index loaded
+                self._merge(self._fetch_natural(natural_column, pd.unique(values[unseen_mask])))
+                mapping = self._maps[natural_column]
+                positions = mapping.index.get_indexer(values)
+                unseen_mask = (positions == -1) & ~nulls
+            if assign_new and unseen_mask.any():
+                unseen = pd.unique(values[unseen_mask])
+                new_rows = pd.DataFrame({self.key_column: self._reserve_keys(len(unseen)), natural_column: unseen})
+                self._merge(new_rows)
+                self._pending.append(new_rows)
+                mapping = self._maps[natural_column]
+                positions = mapping.index.get_indexer(values)
+
+            found = positions != -1
+            keys = np.zeros(len(values), dtype="int64")
+            keys[found] = mapping.to_numpy()[positions[found]]
+        return pd.Series(pd.arrays.IntegerArray(keys, ~found), index=index)
+
+    def link(self, key, natural_column, natural_id):
+        """Point another natural ID (e.g. the Shopee listing of a Lazada product) at an existing key."""
+        with self._lock:
+            row = pd.DataFrame({self.key_column: [int(key)], natural_column: [str(natural_id)]})
+            self._merge(row)
+            self._pending.append(row)
+
+    def merge(self, old_key, key):
+        """
+        Fold old_key into key: its natural IDs point at key from now on and,
+        on flush(), fact rows referencing old_key are moved to key and the
+        old dimension row is deleted (in the same transaction).
+        """
+        old_key, key = int(old_key), int(key)
+        with self._lock:
+            moved = False
+            for column in self.natural_columns:
+                mapping = self._maps[column]
+                if (mapping == old_key).any():
+                    self._maps[column] = mapping.mask(mapping == old_key, key)
+                    moved = True
+            self._merged = {old: (key if new == old_key else new) for old, new in self._merged.items()}
+            self._merged[old_key] = key
+            if moved:
+                self._pending.append(pd.DataFrame({self.key_column: [key]}))
+
+    def _apply_merges(self, cursor, merged):
+        """Move fact rows off merged keys and delete their dimension rows, using an open cursor."""
+        from app.loading_script import quote_ident
+        from app.schema import load_schema
+
+        referencing = [
+            (table["name"], column)
+            for table in load_schema().values()
+            for column, reference in table["references"].items()
+            if reference == (self.table_name, self.key_column)
+        ]
+        for old_key, key in merged.items():
+            for table, column in referencing:
+                cursor.execute(
+                    f"UPDATE {quote_ident(table)} SET {quote_ident(column)} = %s WHERE {quote_ident(column)} = %s",
+                    (key, old_key),
+                )
+            cursor.execute(
+                f"DELETE FROM {quote_ident(self.table_name)} WHERE {quote_ident(self.key_column)} = %s", (old_key,)
+            )
+
+    def natural_ids(self, keys, natural_column=None):
+        """Surrogate keys -> natural IDs (the last one linked when a key has several); unknown keys give NaN."""
+        natural_column = natural_column or self.natural_columns[0]
+        if not self._loaded:
+            self.load()
+        with self._lock:
+            by_key = self._maps[natural_column]
+            by_key = pd.Series(by_key.index, index=by_key.to_numpy())
+            by_key = by_key[~by_key.index.duplicated(keep="last")]
+        keys = pd.Series(keys)
+        return keys.map(by_key)
+
+    def pending_rows(self):
+        """
+        Dimension rows for keys added or linked since the last flush, one row
+        per key with every natural ID known for it (so an upsert never
+        blanks an ID written earlier).
+        """
+        with self._lock:
+            if not self._pending:
+                return pd.DataFrame(columns=[self.key_column] + self.natural_columns)
+            keys = pd.unique(np.concatenate([rows[self.key_column].to_numpy() for rows in self._pending]))
+            keys = keys[~np.isin(keys, list(self._merged))]
+            rows = pd.DataFrame({self.key_column: np.sort(keys)})
+            for column in self.natural_columns:
+                by_key = self._maps[column]
+                by_key = pd.Series(by_key.index, index=by_key.to_numpy())
+                rows[column] = rows[self.key_column].map(by_key[~by_key.index.duplicated(keep="last")])
+        return rows
+
+    def flush(self, extra_frames=None):
+        """
+        Insert pending dimension rows (with any extra tables and the
+        merge() key moves in the same transaction) and save the index.
+
+        Returns:
+            dict: load_tables() result
+        """
+        from app.loading_script import load_tables
+
+        rows = self.pending_rows()
+        merged = dict(self._merged)
+        frames = dict(extra_frames or {})
+        if not rows.empty:
+            frames[self.table_name] = rows
+        if merged:
+            result = load_tables(frames, self.db_conn_string,
+                                 before_commit=lambda cursor: self._apply_merges(cursor, merged))
+        else:
+            result = load_tables(frames, self.db_conn_string) if frames else {"status": "success", "rows": {}}
+        if result["status"] == "success":
+            with self._lock:
+                self._pending = []
+                self._merged = {old: new for old, new in self._merged.items() if old not in merged}
+            self.save()
+        return result
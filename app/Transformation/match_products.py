@@ -0,0 +1,245 @@
+"""
+Cross-platform product matching for Dim_Product.
+
+The same product is listed separately on Lazada and Shopee. Comparing every
+Lazada listing with every Shopee listing is quadratic, so ProductMatcher
+blocks first: listings are only compared when they share a seller SKU or
+a name token. Tokens that occur in more than max_block_size listings
+(brand names, "shirt") are too common to narrow anything down and are not
+used for blocking, and each listing keeps only the max_candidates
+listings sharing the most tokens with it. Candidate pairs are scored by character-trigram
+Jaccard similarity of the normalized names (a shared SKU scores 1.0) and
+assigned one-to-one, best score first.
+
+Matches and every listing already compared are saved under
+config.STATE_DIR. Later runs only compare new listings, against listings
+of the other platform that are still unmatched. harmonize_products() then
+gives each matched Shopee item the product_key of its Lazada item through
+link_products(). It holds an exclusive file lock from reading the saved
+state to writing it back, so concurrent runs never overwrite each other's
+listings or matches.
+"""
+import os
+import pickle
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: runs are only serialized within a process
+    fcntl = None
+
+import pandas as pd
+
+from app import config
+from app.Transformation.harmonize_dim_product import flush_product_keys, link_products
+
+PLATFORMS = ("lazada", "shopee")
+# Words that say nothing about which product a listing is
+STOPWORDS = {"and", "the", "for", "with", "of", "in", "new", "original", "free", "shipping", "ready", "stock", "cod",
+             "sale", "hot", "best", "seller", "authentic", "pcs", "pc"}
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+_NON_SKU = re.compile(r"[^0-9A-Z]+")
+
+
+def normalize_names(names):
+    """Vectorized: lowercase, punctuation to spaces, stopwords dropped."""
+    words = names.fillna("").astype(str).str.lower().str.replace(_NON_WORD, " ", regex=True).str.split()
+    return words.map(lambda tokens: " ".join(t for t in tokens if t not in STOPWORDS))
+
+
+def normalize_skus(skus):
+    """Uppercase alphanumerics only; blank SKUs become ""."""
+    return skus.fillna("").astype(str).str.upper().str.replace(_NON_SKU, "", regex=True)
+
+
+def trigrams(name):
+    padded = f"  {name} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _listing_frame(listings):
+    """item_id / product_name / seller_sku input -> normalized listing rows."""
+    listings = listings.drop_duplicates("item_id", keep="last")
+    skus = listings["seller_sku"] if "seller_sku" in listings else pd.Series("", index=listings.index)
+    return pd.DataFrame({
+        "item_id": listings["item_id"].astype(str).to_numpy(),
+        "name": normalize_names(listings["product_name"]).to_numpy(),
+        "sku": normalize_skus(skus).to_numpy(),
+        "matched": False,
+    })
+
+
+class ProductMatcher:
+    def __init__(self, state_path=None, threshold=None, max_block_size=None, max_candidates=None):
+        self.state_path = state_path or os.path.join(config.STATE_DIR, "product_matches.pkl")
+        self.threshold = config.PRODUCT_MATCH_THRESHOLD if threshold is None else threshold
+        self.max_block_size = max_block_size or config.PRODUCT_MATCH_MAX_BLOCK
+        self.max_candidates = max_candidates or config.PRODUCT_MATCH_MAX_CANDIDATES
+        self.listings = {platform: _listing_frame(pd.DataFrame(columns=["item_id", "product_name"])) for platform in PLATFORMS}
+        self.matches = pd.DataFrame(columns=["lazada_item_id", "shopee_item_id", "score"])
+        self._lock = threading.Lock()
+
+    def load(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "rb") as f:
+                state = pickle.load(f)
+            self.listings, self.matches = state["listings"], state["matches"]
+        return self
+
+    @contextmanager
+    def file_lock(self):
+        """Exclusive lock on the saved state, across processes."""
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        with open(self.state_path + ".lock", "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def save(self):
+        """Write listings and matches atomically (temp file + rename)."""
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.state_path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump({"listings": self.listings, "matches": self.matches}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.state_path)
+
+    def _add(self, platform, listings):
+        """Store listings not seen before; returns them."""
+        if listings is None or listings.empty:
+            return self.listings[platform].iloc[0:0]
+        rows = _listing_frame(listings)
+        rows = rows[~rows["item_id"].isin(self.listings[platform]["item_id"])]
+        self.listings[platform] = pd.concat([self.listings[platform], rows], ignore_index=True)
+        return rows
+
+    def candidate_pairs(self, left, right):
+        """
+        (left label, right label) pairs sharing a SKU or a name token, via
+        an inverted index instead of a cross join.
+        """
+        pairs = []
+        skus_left, skus_right = left[left["sku"] != ""], right[right["sku"] != ""]
+        if not skus_left.empty and not skus_right.empty:
+            pairs.append(
+                skus_left[["sku"]].reset_index(names="left")
+                .merge(skus_right[["sku"]].reset_index(names="right"), on="sku")[["left", "right"]]
+            )
+
+        def postings(frame, side):
+            tokens = frame["name"].str.split().explode().dropna()
+            tokens = tokens[tokens.str.len() > 1]
+            return pd.DataFrame({side: tokens.index, "token": tokens.to_numpy()}).drop_duplicates()
+
+        left_tokens, right_tokens = postings(left, "left"), postings(right, "right")
+        common = pd.concat([left_tokens["token"], right_tokens["token"]]).value_counts()
+        useful = common.index[common <= self.max_block_size]
+        shared = (
+            left_tokens[left_tokens["token"].isin(useful)]
+            .merge(right_tokens[right_tokens["token"].isin(useful)], on="token")
+            .groupby(["left", "right"]).size().rename("shared").reset_index()
+        )
+        # Only the max_candidates listings sharing the most tokens are scored
+        shared = shared.sort_values(["left", "shared"], ascending=[True, False], kind="stable")
+        pairs.append(shared[shared.groupby("left").cumcount() < self.max_candidates][["left", "right"]])
+        return pd.concat(pairs, ignore_index=True).drop_duplicates().reset_index(drop=True)
+
+    def score_pairs(self, left, right, pairs):
+        """Trigram Jaccard per candidate pair; 1.0 when the SKUs are equal."""
+        left_grams = {i: trigrams(name) for i, name in left["name"].items()}
+        right_grams = {i: trigrams(name) for i, name in right["name"].items()}
+        scores = []
+        for i, j in zip(pairs["left"].tolist(), pairs["right"].tolist()):
+            a, b = left_grams[i], right_grams[j]
+            scores.append(len(a & b) / len(a | b) if a or b else 0.0)
+        left_skus = left["sku"].loc[pairs["left"]].to_numpy()
+        same_sku = (left_skus == right["sku"].loc[pairs["right"]].to_numpy()) & (left_skus != "")
+        return pairs.assign(score=[1.0 if same else score for score, same in zip(scores, same_sku)])
+
+    def _assign(self, left, right, scored):
+        """Greedy one-to-one: best-scoring pairs first, each listing used once."""
+        scored = scored[scored["score"] >= self.threshold].sort_values("score", ascending=False, kind="stable")
+        used_left, used_right, accepted = set(), set(), []
+        for i, j, score in zip(scored["left"].tolist(), scored["right"].tolist(), scored["score"].tolist()):
+            if i in used_left or j in used_right:
+                continue
+            used_left.add(i)
+            used_right.add(j)
+            accepted.append((left.at[i, "item_id"], right.at[j, "item_id"], round(score, 4)))
+        return pd.DataFrame(accepted, columns=["lazada_item_id", "shopee_item_id", "score"])
+
+    def match(self, lazada=None, shopee=None):
+        """
+        Record new listings and match them against the other platform.
+
+        Args:
+            lazada (DataFrame): item_id, product_name and optional seller_sku
+            shopee (DataFrame): Same columns for Shopee listings
+
+        Returns:
+            DataFrame: Matches found in this run (lazada_item_id, shopee_item_id, score)
+        """
+        with self._lock:
+            new = {"lazada": self._add("lazada", lazada), "shopee": self._add("shopee", shopee)}
+            open_listings = {p: self.listings[p][~self.listings[p]["matched"]] for p in PLATFORMS}
+
+            # new Lazada x open Shopee, plus old open Lazada x new Shopee: every pair is compared once
+            left = open_listings["lazada"]
+            old_left = left[~left["item_id"].isin(new["lazada"]["item_id"])]
+            right = open_listings["shopee"]
+            new_right = right[right["item_id"].isin(new["shopee"]["item_id"])]
+            new_left = left[left["item_id"].isin(new["lazada"]["item_id"])]
+
+            scored = []
+            for l_part, r_part in ((new_left, right), (old_left, new_right)):
+                if l_part.empty or r_part.empty:
+                    continue
+                pairs = self.candidate_pairs(l_part, r_part)
+                if not pairs.empty:
+                    scored.append(self.score_pairs(l_part, r_part, pairs))
+            if not scored:
+                return self.matches.iloc[0:0]
+
+            found = self._assign(self.listings["lazada"], self.listings["shopee"], pd.concat(scored, ignore_index=True))
+            for platform, column in (("lazada", "lazada_item_id"), ("shopee", "shopee_item_id")):
+                matched = self.listings[platform]["item_id"].isin(found[column])
+                self.listings[platform].loc[matched, "matched"] = True
+            self.matches = pd.concat([self.matches, found], ignore_index=True)
+            return found
+
+
+def harmonize_products(lazada=None, shopee=None, matcher=None, index=None, flush=False):
+    """
+    Match new listings across platforms and link the matches in Dim_Product.
+
+    The matcher's saved state is (re-)read and written back under its file
+    lock.
+
+    Args:
+        lazada/shopee (DataFrame): item_id, product_name and optional seller_sku
+        matcher (ProductMatcher): Defaults to the one saved under config.STATE_DIR
+        flush (bool): Also write pending Dim_Product rows/links to the database;
+            a failed write raises RuntimeError and leaves the matcher state unsaved
+
+    Returns:
+        DataFrame: New matches (lazada_item_id, shopee_item_id, score)
+    """
+    matcher = matcher or ProductMatcher()
+    with matcher.file_lock():
+        matcher.load()
+        found = matcher.match(lazada, shopee)
+        if not found.empty:
+            link_products(found, index)
+        if flush:
+            result = flush_product_keys(index)
+            if result["status"] != "success":
+                # Unsaved, the pairs are matched (and linked) again on the next run
+                raise RuntimeError(result["detail"])
+        matcher.save()
+    return found
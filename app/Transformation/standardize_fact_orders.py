@@ -0,0 +1,405 @@
+"""
+Marketplace order-item payloads -> Fact_Orders rows.
+
+Lazada (GetOrderItems) and Shopee (get_order_detail item_list) name and
+format the same amounts differently: Lazada sends one row per unit with
+string prices ("1,299.00"), Shopee one row per model with a unit price
+and a quantity. ORDER_ITEM_COLUMNS maps each payload onto one set of
+standard columns; a list of payload fields is summed (amounts) or joined
+(IDs). Fields a payload lacks are missing; voucher and shipping_fee then
+count as 0.
+
+Items are transformed a batch at a time and every check is a vectorized
+mask over the whole batch:
+
+    - IDs present: order line, buyer, item, a parseable order time
+    - price present, no negative amount, quantity a whole number >= 1
+    - buyer_paid_price = price - voucher + shipping_fee, within
+      ORDER_AMOUNT_TOLERANCE, where the payload reports what the buyer paid
+      (otherwise paid_price is computed from that identity)
+    - resolved surrogate keys not null
+
+Rows failing any check are appended to the quarantine file (NDJSON: the
+raw payload fields plus platform, quarantine_reason and quarantined_at)
+and the rest of the batch carries on. Keys are only resolved for rows
+that passed, so quarantined rows never create dimension members.
+
+order_item_key is derived from platform and order line ID, so loading
+the same items again upserts the same Fact_Orders rows.
+"""
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from app import config
+from app.dtypes import apply_table_dtypes
+from app.Transformation.harmonize_dim_customer import customer_keys, resolve_customer_keys
+from app.Transformation.harmonize_dim_platform import PLATFORM_KEYS, build_dim_platform
+from app.Transformation.harmonize_dim_product import product_keys, resolve_product_keys
+from app.Transformation.harmonize_dim_time import build_dim_time, date_to_time_key
+from app.Transformation.standardize_fact_traffic import parse_numbers
+
+# Standard column -> payload field(s)
+ORDER_ITEM_COLUMNS = {
+    "Lazada": {
+        "line_id": "order_item_id",
+        "buyer_id": "buyer_id",
+        "item_id": "product_id",
+        "ordered_at": "created_at",
+        "status": "status",
+        "reason": "reason",
+        "price": "item_price",
+        "voucher": "voucher_amount",
+        "shipping_fee": "shipping_amount",
+        "buyer_paid_price": "paid_price",
+        "seller_commission_fee": "commission_fee",
+        "platform_subsidy_amount": "voucher_platform",
+    },
+    # Voucher and commission fields come from get_escrow_detail items when merged in
+    "Shopee": {
+        "line_id": ["order_sn", "item_id", "model_id"],
+        "buyer_id": "buyer_user_id",
+        "item_id": "item_id",
+        "ordered_at": "create_time",
+        "status": "order_status",
+        "reason": "cancel_reason",
+        "unit_price": "model_discounted_price",
+        "item_quantity": "model_quantity_purchased",
+        "voucher": ["discount_from_voucher_seller", "discount_from_voucher_shopee"],
+        "seller_commission_fee": "commission_fee",
+        "platform_subsidy_amount": "discount_from_voucher_shopee",
+    },
+}
+# Order field holding the order's items (Lazada items are attached by get_combined_transactions())
+ITEM_LIST_FIELDS = {"Lazada": "order_items", "Shopee": "item_list"}
+ID_COLUMNS = ["line_id", "buyer_id", "item_id"]
+AMOUNT_COLUMNS = ["price", "voucher", "shipping_fee", "buyer_paid_price", "seller_commission_fee",
+                  "platform_subsidy_amount"]
+
+CANCELLED_STATUSES = {"canceled", "cancelled", "in_cancel"}
+RETURNED_STATUSES = {"returned", "shipped_back", "to_return", "return_waiting_for_approval"}
+
+# order_item_key = platform_key * _KEY_FACTOR + hash(order line ID) % _KEY_FACTOR
+_KEY_FACTOR = 10 ** 17
+# Tried in order on the local part; a trailing offset (+0800, +08:00, Z) is applied separately
+ORDER_TIME_FORMATS = ["%Y-%m-%d %H:%M:%S", "ISO8601", "mixed"]
+_OFFSET = r"\s*(?:Z|[+-]\d{2}:?\d{2})$"
+_EPOCH = r"\d{9,}(?:\.\d*)?"  # seconds since 1970 (YYYYMMDD has 8 digits)
+
+_quarantine_lock = threading.Lock()
+
+
+def order_items(orders, platform):
+    """Order dicts -> one dict per entry of their ITEM_LIST_FIELDS list, with the order fields."""
+    field = ITEM_LIST_FIELDS[platform]
+    items = []
+    for order in orders:
+        fields = {k: v for k, v in order.items() if k != field}
+        listed = order.get(field)
+        for item in listed if isinstance(listed, list) else []:
+            items.append({**fields, **item})
+    return items
+
+
+def shopee_order_items(order_details):
+    """get_order_detail orders -> one dict per item_list entry, with the order fields."""
+    return order_items(order_details, "Shopee")
+
+
+def iter_item_batches(items, batch_rows=None):
+    """Split a list of item dicts or a DataFrame into DataFrames of batch_rows items."""
+    batch_rows = batch_rows or config.ORDER_BATCH_ROWS
+    for start in range(0, len(items), batch_rows):
+        batch = items[start:start + batch_rows]
+        yield batch if isinstance(batch, pd.DataFrame) else pd.DataFrame(batch)
+
+
+def _parse_text_times(text):
+    """Local text timestamps, trying each of ORDER_TIME_FORMATS only on rows still unparsed."""
+    parsed = pd.Series(pd.NaT, index=text.index, dtype="datetime64[ns]")
+    for fmt in ORDER_TIME_FORMATS:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(text[missing], format=fmt, errors="coerce")
+    return parsed
+
+
+def parse_order_times(values, tz=None):
+    """
+    Order timestamps -> local datetimes (NaT when unparseable).
+
+    Epoch seconds (Shopee) and text with an offset (Lazada's
+    "2024-05-01 09:00:00 +0800") are converted to ORDER_TIMEZONE; text
+    without one is taken as local already. Each distinct value is parsed once.
+    """
+    tz = tz or config.ORDER_TIMEZONE
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    text = pd.Series(uniques, dtype=object).astype(str).str.strip()
+    parsed = pd.Series(pd.NaT, index=text.index, dtype="datetime64[ns]")
+
+    is_epoch = text.str.fullmatch(_EPOCH).to_numpy(dtype=bool)
+    if is_epoch.any():
+        epoch = pd.to_datetime(text[is_epoch].astype("float64"), unit="s", utc=True)
+        parsed[is_epoch] = epoch.dt.tz_convert(tz).dt.tz_localize(None)
+    # The offset is cut off and applied as a timedelta: strptime with %z is much slower
+    has_offset = ~is_epoch & text.str.contains(_OFFSET).to_numpy(dtype=bool)
+    if has_offset.any():
+        with_offset = text[has_offset]
+        zulu = with_offset.str.endswith("Z").to_numpy(dtype=bool)
+        # The last 6 characters hold " +0800" or "+08:00"; keep the sign and digits
+        offset = with_offset.str.slice(-6).str.replace(r"[^+\-\d]", "", regex=True)
+        minutes = offset.str.slice(1, 3).astype("float64") * 60 + offset.str.slice(3, 5).astype("float64")
+        minutes = np.where(zulu, 0, np.where(offset.str.slice(0, 1) == "+", minutes, -minutes))
+        local_part = with_offset.str.replace(_OFFSET, "", regex=True)
+        utc = _parse_text_times(local_part) - pd.to_timedelta(minutes, unit="m")
+        parsed[has_offset] = utc.dt.tz_localize("UTC").dt.tz_convert(tz).dt.tz_localize(None).to_numpy()
+    local = ~is_epoch & ~has_offset
+    if local.any():
+        parsed[local] = _parse_text_times(text[local]).to_numpy()
+
+    result = parsed.to_numpy()[codes]
+    result[codes < 0] = np.datetime64("NaT")
+    return pd.Series(result, index=pd.Series(values).index)
+
+
+def _id_text(values):
+    """IDs as stripped text; whole floats (an int column with gaps) lose their ".0"."""
+    if values.dtype.kind == "f" and (values.dropna() % 1 == 0).all():
+        values = values.astype("Int64")
+    text = values.astype(str).str.strip()
+    return text.astype(object).where(values.notna().to_numpy() & (text != "").to_numpy())
+
+
+def _field(raw, fields, amount=False):
+    """One standard column from its payload field(s); missing fields give NaN."""
+    fields = [fields] if isinstance(fields, str) else list(fields)
+    parts = [raw[f] for f in fields if f in raw]
+    if not parts:
+        return pd.Series(np.nan, index=raw.index, dtype="float64" if amount else object)
+    if amount:
+        numbers = pd.concat([parse_numbers(p) for p in parts], axis=1)
+        return numbers.sum(axis=1, min_count=1)
+    parts = [_id_text(p) for p in parts]
+    if len(parts) == 1:
+        return parts[0]
+    missing = pd.concat([p.isna() for p in parts], axis=1).any(axis=1)
+    joined = parts[0].astype(str).str.cat([p.astype(str) for p in parts[1:]], sep="-")
+    return joined.astype(object).where(~missing)
+
+
+def standardize_columns(raw, platform, columns=None):
+    """
+    Map a raw item batch onto the standard columns.
+
+    Returns:
+        DataFrame: line_id, buyer_id, item_id, ordered_at, status, reason,
+            price, voucher, shipping_fee, buyer_paid_price, item_quantity,
+            seller_commission_fee, platform_subsidy_amount
+    """
+    mapping = (columns or ORDER_ITEM_COLUMNS)[platform]
+    items = pd.DataFrame(index=raw.index)
+    for column in ID_COLUMNS + ["status", "reason"]:
+        items[column] = _field(raw, mapping.get(column, []))
+    items["ordered_at"] = parse_order_times(_field(raw, mapping.get("ordered_at", [])))
+
+    for column in AMOUNT_COLUMNS + ["unit_price", "item_quantity"]:
+        items[column] = _field(raw, mapping.get(column, []), amount=True)
+    # Lazada rows are single units
+    if "item_quantity" not in mapping:
+        items["item_quantity"] = 1.0
+    if "price" not in mapping:
+        items["price"] = items["unit_price"] * items["item_quantity"]
+    return items.drop(columns="unit_price")
+
+
+def check_items(items, tolerance=None):
+    """
+    Vectorized checks over a standardized batch.
+
+    Returns:
+        dict: check name -> boolean array of failing rows
+    """
+    tolerance = config.ORDER_AMOUNT_TOLERANCE if tolerance is None else tolerance
+    amounts = items[AMOUNT_COLUMNS].to_numpy(dtype="float64")
+    quantity = items["item_quantity"].to_numpy(dtype="float64")
+    expected = items["price"] - items["voucher"].fillna(0) + items["shipping_fee"].fillna(0)
+    paid = items["buyer_paid_price"]
+
+    checks = {f"missing {column}": items[column].isna().to_numpy() for column in ID_COLUMNS}
+    checks["unparseable ordered_at"] = items["ordered_at"].isna().to_numpy()
+    checks["missing price"] = items["price"].isna().to_numpy()
+    checks["negative amount"] = (amounts < 0).any(axis=1)
+    checks["bad item_quantity"] = ~((quantity >= 1) & (quantity == np.floor(quantity)))
+    checks["paid price mismatch"] = (paid.notna() & ((paid - expected).abs() > tolerance + 1e-9)).to_numpy()
+    return checks
+
+
+def order_item_keys(line_ids, platform_key):
+    """Stable fact keys from order line IDs, separate per platform."""
+    hashes = pd.util.hash_pandas_object(pd.Series(line_ids, dtype=object).astype(str), index=False).to_numpy()
+    return platform_key * _KEY_FACTOR + (hashes % np.uint64(_KEY_FACTOR)).astype("int64")
+
+
+def quarantine(rejected, path=None):
+    """Append rejected rows to the quarantine file (NDJSON); returns the rows written."""
+    if rejected.empty:
+        return 0
+    path = path or config.ORDER_QUARANTINE_PATH
+    records = rejected.assign(quarantined_at=datetime.now(timezone.utc).isoformat())
+    lines = records.to_json(orient="records", lines=True, date_format="iso", default_handler=str)
+    with _quarantine_lock:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(lines if lines.endswith("\n") else lines + "\n")
+    return len(rejected)
+
+
+def read_quarantine(path=None):
+    """Quarantined rows as a DataFrame (empty when nothing was quarantined)."""
+    path = path or config.ORDER_QUARANTINE_PATH
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    with open(path, encoding="utf-8") as f:
+        return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+
+
+def to_fact_orders(raw, platform, columns=None, customer_index=None, product_index=None, tolerance=None):
+    """
+    Transform one batch of raw order items.
+
+    Args:
+        raw (DataFrame): Payload items of one platform (see ORDER_ITEM_COLUMNS)
+        platform (str): "Lazada" or "Shopee"
+        columns (dict): Override for ORDER_ITEM_COLUMNS
+        customer_index, product_index (SurrogateKeyIndex): Default to the
+            shared customer_keys / product_keys
+
+    Returns:
+        tuple: (Fact_Orders rows, rejected raw rows with platform and quarantine_reason)
+    """
+    if platform not in PLATFORM_KEYS:
+        raise ValueError(f"Unsupported platform: {platform}")
+    platform_key = PLATFORM_KEYS[platform]
+    raw = raw.reset_index(drop=True)
+    items = standardize_columns(raw, platform, columns)
+    checks = check_items(items, tolerance)
+
+    failed = np.logical_or.reduce(list(checks.values()))
+    passed = items[~failed].assign(platform=platform)
+    passed = resolve_customer_keys(passed, "buyer_id", index=customer_index)
+    passed = resolve_product_keys(passed, "item_id", "platform", index=product_index)
+    unresolved = (passed["customer_key"].isna() | passed["product_key"].isna()).to_numpy()
+    checks["missing key"] = np.zeros(len(items), dtype=bool)
+    checks["missing key"][np.flatnonzero(~failed)[unresolved]] = True
+    passed = passed[~unresolved]
+
+    rejected = np.logical_or.reduce(list(checks.values()))
+    reasons = pd.Series("", index=raw.index[rejected], dtype=object)
+    for name, mask in checks.items():
+        hit = mask[rejected]
+        reasons[hit] = reasons[hit] + "; " + name
+    rejected_rows = raw[rejected].assign(platform=platform, quarantine_reason=reasons.str.lstrip("; ").to_numpy())
+
+    status = passed["status"].astype(str).str.strip().str.lower()
+    reason = passed["reason"].where(passed["reason"].notna(), passed["status"])
+    paid = passed["buyer_paid_price"].fillna(
+        passed["price"] - passed["voucher"].fillna(0) + passed["shipping_fee"].fillna(0)
+    )
+    fact = pd.DataFrame({
+        "order_item_key": order_item_keys(passed["line_id"], platform_key),
+        "time_key": date_to_time_key(passed["ordered_at"]).to_numpy(),
+        "product_key": passed["product_key"].to_numpy(),
+        "customer_key": passed["customer_key"].to_numpy(),
+        "platform_key": platform_key,
+        "paid_price": paid.to_numpy(),
+        "item_quantity": passed["item_quantity"].to_numpy(),
+        "cancellation_reason": reason.where(status.isin(CANCELLED_STATUSES)).to_numpy(dtype=object),
+        "return_reason": reason.where(status.isin(RETURNED_STATUSES)).to_numpy(dtype=object),
+        "seller_commission_fee": passed["seller_commission_fee"].to_numpy(),
+        "platform_subsidy_amount": passed["platform_subsidy_amount"].to_numpy(),
+    })
+    fact = apply_table_dtypes(fact, "Fact_Orders")
+    # The same line twice in one batch (overlapping extraction windows): keep the last
+    fact = fact.drop_duplicates("order_item_key", keep="last")
+    return fact.reset_index(drop=True), rejected_rows.reset_index(drop=True)
+
+
+def referenced_dimensions(fact):
+    """Dim_Platform and the Dim_Time days of a Fact_Orders batch, upserted with it so its foreign keys hold."""
+    days = pd.to_datetime(fact["time_key"].astype(str), format="%Y%m%d")
+    return {"Dim_Platform": build_dim_platform(), "Dim_Time": build_dim_time(days.min(), days.max())}
+
+
+def stage_items(raw, platform, staging, batch_id, columns=None):
+    """Stage a raw item batch as Parquet, partitioned by order date. Returns the paths written."""
+    ordered_at = (columns or ORDER_ITEM_COLUMNS)[platform].get("ordered_at", [])
+    return staging.write(raw, "order_items", platform=platform, batch_id=batch_id,
+                         dates=parse_order_times(_field(raw, ordered_at)))
+
+
+def process_order_items(batches, platform, load=False, quarantine_path=None, on_batch=None, columns=None,
+                        customer_index=None, product_index=None, staging=None, batch_id=None):
+    """
+    Stream raw order-item batches into Fact_Orders.
+
+    Each batch is transformed, its rejected rows quarantined and, with
+    load, its new Dim_Product rows and then its new Dim_Customer rows plus
+    the Fact_Orders rows, the Dim_Platform rows and the Dim_Time rows of its
+    days (one transaction) written before the next batch is read.
+    on_batch(fact) is called with every transformed batch.
+
+    With staging (a StagingArea), every raw batch is first written to its
+    "order_items" dataset as part-<batch_id>-<n>, so a failed load is
+    retried from disk (pass the staged items back in without staging).
+
+    Args:
+        batches: DataFrames or lists of item dicts, e.g. iter_item_batches()
+            or shopee_order_items() output split into batches
+        staging (StagingArea): Stage the raw batches before transforming them
+        batch_id (str): Stem of the staged file names, a new one by default
+
+    Returns:
+        dict: status, batches, rows_processed, inserted, quarantined (and
+            staged, the files written, with staging)
+    """
+    customer_index = customer_index or customer_keys
+    product_index = product_index or product_keys
+    batch_id = batch_id or uuid.uuid4().hex
+    processed = inserted = quarantined = count = staged = 0
+    try:
+        for raw in batches:
+            raw = raw if isinstance(raw, pd.DataFrame) else pd.DataFrame(raw)
+            if staging is not None and platform in PLATFORM_KEYS:
+                staged += len(stage_items(raw, platform, staging, f"{batch_id}-{count:05d}", columns))
+            fact, rejected = to_fact_orders(raw, platform, columns, customer_index, product_index)
+            quarantined += quarantine(rejected, quarantine_path)
+            if load and not fact.empty:
+                frames = {**referenced_dimensions(fact), "Fact_Orders": fact}
+                for step in (lambda: product_index.flush(),
+                             lambda: customer_index.flush(extra_frames=frames)):
+                    result = step()
+                    if result["status"] != "success":
+                        raise RuntimeError(result["detail"])
+                inserted += len(fact)
+            if on_batch is not None:
+                on_batch(fact)
+            processed += len(raw)
+            count += 1
+        result = {
+            "status": "success",
+            "batches": count,
+            "rows_processed": processed,
+            "inserted": inserted,
+            "quarantined": quarantined,
+        }
+        if staging is not None:
+            result["staged"] = staged
+        return result
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}
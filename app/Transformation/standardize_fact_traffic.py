@@ -0,0 +1,206 @@
+"""
+Traffic-report parsing and Fact_Traffic rows.
+
+Lazada/Shopee business-advisor exports mix three kinds of rows: a period
+summary whose Date is a range (2024-05-01~2024-05-31), "-" separator rows,
+and the daily rows (DD/MM/YYYY or YYYY-MM-DD). split_summary_rows() pulls
+the first two out, coerce_report_columns() types the rest column by column
+(explicit date formats, "9.47%" -> 0.0947, thousands separators), and
+to_fact_traffic() shapes the daily rows for the Fact_Traffic table, ready
+for load_tables({"Fact_Traffic": ...}), which also upserts the "all
+products" / "all customers" members those rows reference.
+"""
+import numpy as np
+import pandas as pd
+
+from app.dtypes import apply_table_dtypes
+from app.Transformation.harmonize_dim_platform import PLATFORM_KEYS
+from app.Transformation.harmonize_dim_time import date_to_time_key
+
+# Date formats seen in exports, tried in order
+DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y"]
+PERIOD_FORMAT = "%Y-%m-%d"
+# Cells that mean "no value"
+BLANKS = ["", "-"]
+
+# Standardized columns holding percentages
+RATE_COLUMNS = {"conversion_rate"}
+
+# Shop-level reports have no product or customer: rows point at the
+# "all products" / "all customers" member of those dimensions
+SHOP_LEVEL_KEY = 0
+
+
+def parse_dates(values, formats=None):
+    """
+    Parse a string Series trying each format explicitly, only on rows still unparsed.
+
+    Each distinct string is parsed once: concatenated or multi-shop exports
+    repeat the same days many times.
+    """
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques)
+    parsed = pd.Series(pd.NaT, index=uniques.index, dtype="datetime64[ns]")
+    for fmt in formats or DATE_FORMATS:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(uniques[missing], format=fmt, errors="coerce")
+    result = parsed.to_numpy()[codes]
+    result[codes < 0] = np.datetime64("NaT")
+    return pd.Series(result, index=values.index)
+
+
+def parse_numbers(values, percent=False):
+    """
+    Vectorized text -> float: "-"/"" become NaN, thousands separators are
+    stripped and with percent "9.47%" -> 0.0947.
+
+    A column of plain numbers is cast directly; otherwise only the cells
+    to_numeric cannot read get the string clean-up.
+    """
+    if not percent:
+        try:
+            return values.astype("float64")
+        except (TypeError, ValueError):
+            pass
+    numbers = pd.to_numeric(values, errors="coerce").astype("float64")
+    retry = numbers.isna() & ~values.isin(BLANKS)
+    if retry.any():
+        text = values[retry].astype(str).str.strip().str.replace(",", "", regex=False).str.rstrip("%")
+        numbers[retry] = pd.to_numeric(text, errors="coerce")
+    return numbers / 100 if percent else numbers
+
+
+def split_summary_rows(df, date_column="date"):
+    """
+    Separate period summary rows from daily rows.
+
+    Args:
+        df (DataFrame): Export read with dtype=str, columns already standardized
+
+    Returns:
+        tuple: (daily rows, summary rows with period_start/period_end added);
+            "-" separator and blank rows are in neither
+    """
+    dates = df[date_column].astype(str).str.strip()
+    is_summary = dates.str.contains("~", regex=False)
+    is_daily = ~is_summary & ~dates.isin(BLANKS)
+
+    summary = df[is_summary].copy()
+    if not summary.empty:
+        bounds = dates[is_summary].str.split("~", n=1, expand=True)
+        summary["period_start"] = pd.to_datetime(bounds[0].str.strip(), format=PERIOD_FORMAT, errors="coerce")
+        summary["period_end"] = pd.to_datetime(bounds[1].str.strip(), format=PERIOD_FORMAT, errors="coerce")
+    return df[is_daily].copy(), summary
+
+
+def coerce_report_columns(df, columns, date_column="date"):
+    """Type the date column and every column in columns in place; returns df."""
+    if date_column in df:
+        df[date_column] = parse_dates(df[date_column].astype(str).str.strip())
+    for column in columns:
+        if column != date_column and column in df:
+            df[column] = parse_numbers(df[column], percent=column in RATE_COLUMNS)
+    return df
+
+
+def parse_traffic_report(raw, column_map):
+    """
+    Parse a raw traffic export.
+
+    Args:
+        raw (DataFrame): Export read with dtype=str, keep_default_na=False
+        column_map (dict): Export header -> standardized column name
+
+    Returns:
+        tuple: (typed daily rows, typed summary rows)
+    """
+    df = raw.rename(columns=lambda c: column_map.get(c.strip(), c.strip()))
+    if "date" not in df.columns:
+        raise ValueError("Export has no Date column")
+    daily, summary = split_summary_rows(df)
+    columns = [c for c in df.columns if c in column_map.values()]
+    coerce_report_columns(daily, columns)
+    coerce_report_columns(summary, [c for c in columns if c != "date"])
+    return daily.reset_index(drop=True), summary.reset_index(drop=True)
+
+
+def to_fact_traffic(daily, platform, product_key=SHOP_LEVEL_KEY, customer_key=SHOP_LEVEL_KEY):
+    """
+    Daily report rows -> Fact_Traffic columns.
+
+    traffic_event_key is derived from platform and day, so uploading an
+    overlapping export again upserts the same rows instead of duplicating
+    them. Days without a parseable date are dropped.
+
+    Args:
+        daily (DataFrame): Typed daily rows from parse_traffic_report()
+        platform (str): "Lazada" or "Shopee"
+
+    Returns:
+        DataFrame: Fact_Traffic rows
+    """
+    if platform not in PLATFORM_KEYS:
+        raise ValueError(f"Unsupported platform: {platform}")
+    platform_key = PLATFORM_KEYS[platform]
+    daily = daily[daily["date"].notna()]
+    time_key = date_to_time_key(daily["date"]).to_numpy(dtype="int64")
+
+    def counts(column, fill=None):
+        values = daily[column] if column in daily else pd.Series(float("nan"), index=daily.index)
+        return (values if fill is None else values.fillna(fill)).to_numpy()
+
+    fact = pd.DataFrame({
+        "traffic_event_key": platform_key * 100_000_000 + time_key,
+        "time_key": time_key,
+        "product_key": product_key,
+        "customer_key": customer_key,
+        "platform_key": platform_key,
+        "page_views": counts("page_views", fill=0),  # NOT NULL: "-" means no traffic
+        "visits": counts("visitors", fill=0),
+        "add_to_cart_count": counts("add_to_cart_units"),
+        "wishlist_add_count": counts("wishlists"),
+    })
+    fact = apply_table_dtypes(fact, "Fact_Traffic")
+    # Same day twice in one upload (overlapping exports concatenated): keep the last
+    fact = fact.drop_duplicates("traffic_event_key", keep="last").sort_values("traffic_event_key")
+    return fact.reset_index(drop=True)
+
+
+def shop_level_members():
+    """Dim_Product / Dim_Customer rows for SHOP_LEVEL_KEY, which shop-level Fact_Traffic rows reference."""
+    return {
+        "Dim_Product": pd.DataFrame({"product_key": [SHOP_LEVEL_KEY], "product_name": ["All products"]}),
+        "Dim_Customer": pd.DataFrame({"customer_key": [SHOP_LEVEL_KEY], "platform_buyer_id": ["ALL"]}),
+    }
+
+
+def with_shop_level_members(frames):
+    """
+    Add the SHOP_LEVEL_KEY members to a load when its Fact_Traffic(_Shop) rows reference them.
+
+    load_tables() calls this, so shop-level facts never load ahead of the
+    dimension rows their foreign keys point at; members already in the
+    frames are left as they are.
+
+    Args:
+        frames (dict): table name -> DataFrame
+
+    Returns:
+        dict: frames, with Dim_Product / Dim_Customer extended where needed
+    """
+    facts = [frames[name] for name in ("Fact_Traffic", "Fact_Traffic_Shop") if frames.get(name) is not None]
+    if not any(len(fact) for fact in facts):
+        return frames
+    frames = dict(frames)
+    for table, key_column in (("Dim_Product", "product_key"), ("Dim_Customer", "customer_key")):
+        if not any((fact[key_column] == SHOP_LEVEL_KEY).any() for fact in facts):
+            continue
+        member = shop_level_members()[table]
+        existing = frames.get(table)
+        if existing is None or existing.empty:
+            frames[table] = member
+        elif not (existing[key_column] == SHOP_LEVEL_KEY).any():
+            frames[table] = pd.concat([member, existing], ignore_index=True)
+    return frames
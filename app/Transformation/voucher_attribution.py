@@ -0,0 +1,241 @@
+"""
+Voucher attribution for order batches (enhanced schema).
+
+Checking every order item against every voucher is orders x vouchers.
+VoucherIndex avoids that for both kinds of voucher:
+
+    - product-specific vouchers (applicable_products, a JSON text array, is
+      parsed once into a product -> voucher map): one merge on product_id,
+      then a vectorized validity-window check
+    - store-wide vouchers (empty or missing list): the timeline is cut at
+      every start/end into non-overlapping segments held in a pandas
+      IntervalIndex, so one get_indexer() call finds each item's segment.
+      Each segment keeps only the vouchers some order total could pick
+      (a voucher that started earlier and needs a higher minimum spend than
+      another active one never wins), which keeps the expansion small.
+
+Minimum spend is checked against the order total. When several vouchers
+qualify, a product-specific voucher beats a store-wide one, then the one
+that started last wins. voucher_usage_rows() rolls the attributed items up
+to one Voucher_Usage row per order and voucher; loading them through
+load_tables() refreshes Voucher_Summary for just those vouchers (see
+app/summary.py).
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+from app.Transformation.harmonize_dim_time import date_to_time_key
+
+# Dim_Vouchers.status values that are never attributed
+INACTIVE_STATUSES = {"inactive"}
+USAGE_CONFLICT_KEYS = {"Voucher_Usage": ["voucher_key", "order_key"]}
+
+
+def parse_applicable_products(values):
+    """
+    JSON text arrays -> (position, product_id) pairs.
+
+    Returns:
+        tuple: (DataFrame with voucher/product_id columns, boolean array of
+            store-wide vouchers whose list is empty, missing or unreadable)
+    """
+    def parse(text):
+        if text is None or (isinstance(text, float) and np.isnan(text)) or not str(text).strip():
+            return []
+        try:
+            parsed = json.loads(text)
+        except (TypeError, ValueError):
+            return []
+        return parsed if isinstance(parsed, list) else [parsed]
+
+    lists = pd.Series(values).reset_index(drop=True).map(parse)
+    exploded = lists.explode().dropna()
+    pairs = pd.DataFrame({
+        "voucher": exploded.index.to_numpy(dtype="int64"),
+        "product_id": exploded.astype(str).str.strip().to_numpy(dtype=object),
+    }).drop_duplicates()
+    return pairs, (lists.str.len() == 0).to_numpy()
+
+
+class VoucherIndex:
+    def __init__(self, vouchers):
+        """
+        Args:
+            vouchers (DataFrame): Dim_Vouchers rows (voucher_key, voucher_code,
+                start_date, end_date, applicable_products, minimum_spend, status)
+        """
+        if "status" in vouchers:
+            vouchers = vouchers[~vouchers["status"].astype(str).str.lower().isin(INACTIVE_STATUSES)]
+        vouchers = vouchers.reset_index(drop=True)
+        self.vouchers = vouchers
+        self.voucher_keys = vouchers["voucher_key"].to_numpy(dtype="int64")
+
+        # Validity is inclusive of end_date; open-ended vouchers run to the end of time
+        self.starts = pd.to_datetime(vouchers["start_date"]).fillna(pd.Timestamp.min).to_numpy(dtype="datetime64[ns]")
+        ends = pd.to_datetime(vouchers["end_date"]).fillna(pd.Timestamp.max - pd.Timedelta(1, "ns"))
+        self.ends = (ends + pd.Timedelta(1, "ns")).to_numpy(dtype="datetime64[ns]")
+
+        applicable = vouchers["applicable_products"] if "applicable_products" in vouchers else [None] * len(vouchers)
+        self.product_vouchers, self.store_wide = parse_applicable_products(applicable)
+        minimum = vouchers["minimum_spend"] if "minimum_spend" in vouchers else pd.Series(0.0, index=vouchers.index)
+        self.minimum_spend = pd.to_numeric(minimum, errors="coerce").fillna(0).to_numpy(dtype="float64")
+        self._build_segments()
+
+    def _build_segments(self):
+        store_wide = np.flatnonzero(self.store_wide)
+        starts, ends = self.starts[store_wide], self.ends[store_wide]
+        bounds = np.unique(np.concatenate([starts, ends]))
+        self.segments = pd.IntervalIndex.from_breaks(bounds, closed="left") if len(bounds) > 1 else None
+
+        # Voucher v covers segments [first[v], first[v] + counts[v]); expand to (segment, voucher) pairs
+        first = np.searchsorted(bounds, starts)
+        counts = np.maximum(np.searchsorted(bounds, ends) - first, 0)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        pairs = pd.DataFrame({
+            "segment": np.repeat(first, counts) + offsets,
+            "voucher": np.repeat(store_wide, counts),
+        })
+        pairs["start"] = self.starts[pairs["voucher"].to_numpy()]
+        pairs["minimum_spend"] = self.minimum_spend[pairs["voucher"].to_numpy()]
+
+        # Latest start first; keep a voucher only if it needs less than every later-starting one
+        pairs = pairs.sort_values(["segment", "start", "voucher"], ascending=[True, False, True], kind="stable")
+        lowest_before = pairs.groupby("segment")["minimum_spend"].cummin().groupby(pairs["segment"]).shift(1)
+        self.segment_vouchers = pairs[pairs["minimum_spend"] < lowest_before.fillna(np.inf)][["segment", "voucher"]]
+
+    def candidates(self, timestamps, products):
+        """
+        (row, voucher, specific) pairs: for each item position, the vouchers
+        valid at its timestamp that cover its product.
+        """
+        timestamps = pd.to_datetime(pd.Series(timestamps)).to_numpy(dtype="datetime64[ns]")
+        rows = pd.DataFrame({"row": np.arange(len(timestamps)), "product_id": np.asarray(products, dtype=object)})
+
+        specific = rows.merge(self.product_vouchers, on="product_id")[["row", "voucher"]]
+        voucher = specific["voucher"].to_numpy()
+        when = timestamps[specific["row"].to_numpy()]
+        specific = specific[(self.starts[voucher] <= when) & (when < self.ends[voucher])].assign(specific=True)
+
+        if self.segments is None or not len(timestamps):
+            return specific.reset_index(drop=True)
+        rows["segment"] = self.segments.get_indexer(timestamps)
+        store_wide = rows[rows["segment"] >= 0].merge(self.segment_vouchers, on="segment")[["row", "voucher"]]
+        return pd.concat([specific, store_wide.assign(specific=False)], ignore_index=True)
+
+    def attribute(self, items, order_column="order_key", date_column="order_date", product_column="product_id",
+                  value_column="total_item_price", discount_column="item_voucher_discount"):
+        """
+        Attribute each discounted order item to the voucher it most likely used.
+
+        Args:
+            items (DataFrame): Order items of a batch; rows without a voucher
+                discount (when discount_column is present) are not attributed
+
+        Returns:
+            DataFrame: items with voucher_key (Int64, <NA> when none applies) and voucher_code
+        """
+        items = items.reset_index(drop=True)
+        discounted = np.ones(len(items), dtype=bool)
+        if discount_column in items:
+            discounted = (pd.to_numeric(items[discount_column], errors="coerce").fillna(0) > 0).to_numpy()
+        positions = np.flatnonzero(discounted)
+
+        products = items[product_column].astype(str).str.strip().to_numpy(dtype=object)[positions]
+        pairs = self.candidates(items[date_column].to_numpy()[positions], products)
+        pairs["row"] = positions[pairs["row"].to_numpy()]
+
+        # Minimum spend against the order total
+        if value_column in items and len(pairs):
+            values = pd.to_numeric(items[value_column], errors="coerce").fillna(0)
+            totals = values.groupby(items[order_column]).transform("sum").to_numpy(dtype="float64")
+            pairs = pairs[totals[pairs["row"].to_numpy()] >= self.minimum_spend[pairs["voucher"].to_numpy()]]
+
+        pairs = pairs.assign(start=self.starts[pairs["voucher"].to_numpy()])
+        best = (
+            pairs.sort_values(["row", "specific", "start", "voucher"], ascending=[True, False, False, True], kind="stable")
+            .drop_duplicates("row")
+        )
+        voucher = np.full(len(items), -1, dtype="int64")
+        voucher[best["row"].to_numpy()] = best["voucher"].to_numpy()
+        found = voucher >= 0
+        keys = np.zeros(len(items), dtype="int64")
+        keys[found] = self.voucher_keys[voucher[found]]
+        codes = np.full(len(items), None, dtype=object)
+        if "voucher_code" in self.vouchers:
+            codes[found] = self.vouchers["voucher_code"].to_numpy(dtype=object)[voucher[found]]
+        return items.assign(voucher_key=pd.arrays.IntegerArray(keys, ~found), voucher_code=codes)
+
+
+def voucher_usage_rows(attributed, first_time_customers=None, order_column="order_key", date_column="order_date",
+                       value_column="total_item_price", paid_column="paid_price",
+                       discount_column="item_voucher_discount"):
+    """
+    Attributed order items -> one Voucher_Usage row per (order, voucher).
+
+    Args:
+        attributed (DataFrame): VoucherIndex.attribute() output with customer_key
+        first_time_customers: customer_keys placing their first order in this batch
+
+    Returns:
+        DataFrame: Voucher_Usage rows, loadable with conflict_keys=USAGE_CONFLICT_KEYS
+    """
+    used = attributed[attributed["voucher_key"].notna()]
+    if used.empty:
+        return pd.DataFrame(columns=["voucher_key", "order_key", "customer_key", "time_key", "voucher_code",
+                                     "discount_amount", "order_value_before_discount", "order_value_after_discount",
+                                     "usage_date", "first_time_customer"])
+    frame = pd.DataFrame({
+        "voucher_key": used["voucher_key"].astype("int64").to_numpy(),
+        "order_key": used[order_column].to_numpy(),
+        "customer_key": used["customer_key"].to_numpy() if "customer_key" in used else None,
+        "voucher_code": used["voucher_code"].fillna("").to_numpy(dtype=object),
+        "discount_amount": pd.to_numeric(used[discount_column], errors="coerce").fillna(0).to_numpy(),
+        "order_value_before_discount": pd.to_numeric(used[value_column], errors="coerce").to_numpy(),
+        "order_value_after_discount": pd.to_numeric(used[paid_column], errors="coerce").to_numpy(),
+        "usage_date": pd.to_datetime(used[date_column]).to_numpy(),
+    })
+    usage = frame.groupby(["voucher_key", "order_key"], sort=True).agg(
+        customer_key=("customer_key", "first"),
+        voucher_code=("voucher_code", "first"),
+        discount_amount=("discount_amount", "sum"),
+        order_value_before_discount=("order_value_before_discount", "sum"),
+        order_value_after_discount=("order_value_after_discount", "sum"),
+        usage_date=("usage_date", "min"),
+    ).reset_index()
+    usage["time_key"] = date_to_time_key(usage["usage_date"]).to_numpy()
+    first = set(first_time_customers) if first_time_customers is not None else set()
+    usage["first_time_customer"] = usage["customer_key"].isin(first)
+    for column in ("discount_amount", "order_value_before_discount", "order_value_after_discount"):
+        usage[column] = usage[column].round(2)
+    return usage
+
+
+def attribute_vouchers(items, vouchers, first_time_customers=None, load=False, db_conn_string=None, **columns):
+    """
+    Attribute an order-item batch to vouchers and build its Voucher_Usage rows.
+
+    Args:
+        items (DataFrame): Order items with order_key, order_date, product_id,
+            customer_key, total_item_price, paid_price, item_voucher_discount
+        vouchers: Dim_Vouchers DataFrame or a prebuilt VoucherIndex
+        load (bool): Upsert the usage rows, which refreshes Voucher_Summary
+            for the vouchers they touch (enhanced schema)
+
+    Returns:
+        tuple: (attributed items, Voucher_Usage rows)
+    """
+    index = vouchers if isinstance(vouchers, VoucherIndex) else VoucherIndex(vouchers)
+    attributed = index.attribute(items, **columns)
+    usage_columns = {k: v for k, v in columns.items() if k != "product_column"}
+    usage = voucher_usage_rows(attributed, first_time_customers, **usage_columns)
+    if load and not usage.empty:
+        from app import config
+        from app.loading_script import load_tables
+
+        result = load_tables({"Voucher_Usage": usage}, db_conn_string, conflict_keys=USAGE_CONFLICT_KEYS,
+                             schema_path=config.ENHANCED_SCHEMA_PATH)
+        if result["status"] != "success":
+            raise RuntimeError(result["detail"])
+    return attributed, usage
@@ -0,0 +1,98 @@
+"""
+Dashboard queries over the analytical views of the enhanced schema.
+
+Each function runs one parameterized SELECT through the shared pool and
+returns JSON-ready rows. Results go through query_cache, keyed by the
+view and parameters, so repeated dashboard refreshes do not reach Postgres
+until the TTL passes or a load touches the view's tables.
+"""
+from decimal import Decimal
+
+from app.db import get_pool
+from app.query_cache import query_cache
+
+# View -> tables it reads (drives cache invalidation)
+VIEW_TABLES = {
+    "v_product_performance": ("Fact_Sales", "Dim_Products"),
+    "v_customer_segments": ("Dim_Customers",),
+    "v_voucher_effectiveness": ("Dim_Vouchers", "Voucher_Usage"),
+    "v_sales_trends": ("Dim_Time", "Sales_Summary", "Fact_Sales", "Orders"),
+}
+MONTH_NAMES = ["January", "February", "March", "April", "May", "June", "July", "August", "September",
+               "October", "November", "December"]
+
+
+def _run(sql, params=None, db_conn_string=None):
+    with get_pool(db_conn_string).connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            columns = [c[0] for c in cursor.description]
+            rows = cursor.fetchall()
+        conn.rollback()
+    return [
+        {column: float(value) if isinstance(value, Decimal) else value for column, value in zip(columns, row)}
+        for row in rows
+    ]
+
+
+def _cached(view, params, sql, query_params=None, time_range=None, cache=None):
+    cache = cache or query_cache
+    return cache.get_or_load(view, params, lambda: _run(sql, query_params), VIEW_TABLES[view], time_range=time_range)
+
+
+def product_performance(category=None, limit=50, cache=None):
+    """Best-selling products by net sales, optionally within one category."""
+    sql = 'SELECT * FROM "v_product_performance"'
+    params = {"limit": limit}
+    if category:
+        sql += " WHERE category = %(category)s"
+        params["category"] = category
+    sql += " ORDER BY net_sales DESC NULLS LAST LIMIT %(limit)s"
+    return _cached("v_product_performance", params, sql, params, cache=cache)
+
+
+def customer_segments(cache=None):
+    sql = 'SELECT * FROM "v_customer_segments" ORDER BY segment_total_revenue DESC NULLS LAST'
+    return _cached("v_customer_segments", {}, sql, cache=cache)
+
+
+def voucher_effectiveness(voucher_type=None, limit=50, cache=None):
+    sql = 'SELECT * FROM "v_voucher_effectiveness"'
+    params = {"limit": limit}
+    if voucher_type:
+        sql += " WHERE voucher_type = %(voucher_type)s"
+        params["voucher_type"] = voucher_type
+    sql += " ORDER BY net_revenue_generated DESC NULLS LAST LIMIT %(limit)s"
+    return _cached("v_voucher_effectiveness", params, sql, params, cache=cache)
+
+
+def sales_trends(year=None, quarter=None, month=None, cache=None):
+    """
+    Daily trend rows, optionally for one year / quarter / month.
+
+    The cached entry's time_key range is derived from the filters, so a load
+    only invalidates the trend queries covering its dates.
+    """
+    conditions, params = [], {"year": year, "quarter": quarter, "month": month}
+    if year:
+        conditions.append("year = %(year)s")
+    if quarter:
+        conditions.append("quarter = %(quarter)s")
+    if month:
+        conditions.append("month_name = %(month_name)s")
+    sql = 'SELECT * FROM "v_sales_trends"' + (" WHERE " + " AND ".join(conditions) if conditions else "")
+    query_params = {**params, "month_name": MONTH_NAMES[month - 1] if month else None}
+    return _cached("v_sales_trends", params, sql, query_params, time_range=_time_range(year, quarter, month), cache=cache)
+
+
+def _time_range(year, quarter=None, month=None):
+    """(first, last) time_key for the filters; None when no year limits it."""
+    if not year:
+        return None
+    if month:
+        first_month, last_month = month, month
+    elif quarter:
+        first_month, last_month = 3 * quarter - 2, 3 * quarter
+    else:
+        first_month, last_month = 1, 12
+    return year * 10000 + first_month * 100 + 1, year * 10000 + last_month * 100 + 31
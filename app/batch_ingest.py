@@ -0,0 +1,290 @@
+"""
+Batch ingestion of many marketplace exports at once.
+
+    python -m app.batch_ingest exports/2024-05/            # every *.csv below the directory
+    python -m app.batch_ingest "exports/**/*.csv" --workers 8 --no-load
+    python -m app.batch_ingest --from-staging --start 2024-05-01 --end 2024-05-31
+
+Each file's platform and report type are detected from its header row,
+then files are transformed in parallel on a process pool. The per-file
+frames are merged into one batch per table and loaded with a single
+load_tables() call (one upsert per table, one transaction). A per-file
+report of rows and timings is printed, or returned by run_batch().
+
+Exports are grouped by shop: the directory a file sits in
+(exports/<shop>/...). Overlapping exports of the same shop keep the row
+from the newest file. Rows are loaded per shop into Fact_Traffic_Shop and
+load_tables() re-sums Fact_Traffic (one row per platform and day) for the
+loaded days over every shop stored so far, so a later run with only one
+shop's exports does not overwrite the other shops' share of the total.
+
+The merged Fact_Traffic_Shop rows are staged as Parquet (app/staging.py)
+before the load unless --no-stage is given, so a failed load or a
+backfill is re-run with --from-staging instead of re-reading the exports.
+
+Only traffic exports are ingested; any other CSV is reported as skipped
+with the reason, and listed in the summary at the end.
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from app import config
+from app.dtypes import apply_table_dtypes
+from app.etl import PLATFORM_COLUMN_MAPS
+from app.Transformation.harmonize_dim_platform import PLATFORM_KEYS, build_dim_platform
+from app.Transformation.harmonize_dim_time import build_dim_time
+from app.Transformation.standardize_fact_traffic import parse_traffic_report, shop_level_members, to_fact_traffic
+
+# Headers that only appear in one platform's traffic export
+PLATFORM_MARKERS = {
+    "Lazada": {"Revenue", "Pageviews", "Add to Cart Users", "Wishlists", "Visitor Value"},
+    "Shopee": {"Sales (PHP)", "Page Views", "Order Conversion Rate", "Sales per Order", "Returned / Refunded Sales"},
+}
+TRAFFIC_MARKERS = {"Visitors", "Pageviews", "Page Views"}
+
+
+def expand_inputs(inputs):
+    """Directories (searched recursively) and glob patterns -> sorted unique .csv paths."""
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.update(glob.glob(os.path.join(item, "**", "*.csv"), recursive=True))
+        else:
+            paths.update(p for p in glob.glob(item, recursive=True) if os.path.isfile(p))
+    return sorted(paths)
+
+
+def detect_report(path):
+    """
+    Platform and report type of an export from its header row (file name as a tie-break).
+
+    Returns:
+        tuple: (platform or None, report type or None)
+    """
+    with open(path, "r", encoding="utf-8-sig") as f:
+        header = {c.strip().strip('"') for c in f.readline().split(",")}
+
+    scores = {platform: len(header & markers) for platform, markers in PLATFORM_MARKERS.items()}
+    platform = max(scores, key=scores.get) if max(scores.values()) else None
+    if platform is None or list(scores.values()).count(scores[platform]) > 1:
+        name = os.path.basename(path).lower()
+        platform = next((p for p in PLATFORM_MARKERS if p.lower() in name), platform)
+
+    report = "traffic" if "Date" in header and header & TRAFFIC_MARKERS else None
+    return platform, report
+
+
+def transform_file(path, root=None):
+    """
+    Detect and transform one export (runs in a worker process).
+
+    Returns:
+        dict: file, shop, platform, report, rows, seconds, status and the
+            table frames, or status/detail when the file was skipped or failed
+    """
+    started = time.perf_counter()
+    shop = os.path.relpath(os.path.dirname(path), root) if root else os.path.basename(os.path.dirname(path))
+    result = {"file": path, "shop": shop or ".", "platform": None, "report": None, "rows": 0}
+    try:
+        platform, report = detect_report(path)
+        result.update(platform=platform, report=report)
+        if platform is None:
+            result.update(status="skipped", detail="Not a Lazada or Shopee export")
+        elif report is None:
+            result.update(status="skipped", detail=f"Not a traffic report ({platform}); only traffic exports are ingested")
+        else:
+            raw = pd.read_csv(path, dtype=str, keep_default_na=False)
+            daily, _ = parse_traffic_report(raw, PLATFORM_COLUMN_MAPS[platform])
+            fact = to_fact_traffic(daily, platform)
+            result.update(status="success", rows=len(fact), frames={"Fact_Traffic": fact})
+    except Exception as e:
+        result.update(status="error", detail=str(e))
+    result["seconds"] = round(time.perf_counter() - started, 4)
+    return result
+
+
+def merge_results(results):
+    """
+    Per-file frames -> one DataFrame per table, plus the dimension rows they reference.
+
+    results must be in file order; later files win within a shop. Traffic
+    is returned per shop as Fact_Traffic_Shop; load_tables() derives the
+    Fact_Traffic totals from it.
+    """
+    facts = []
+    for result in results:
+        if result["status"] == "success" and not result["frames"]["Fact_Traffic"].empty:
+            fact = result["frames"]["Fact_Traffic"]
+            facts.append(fact.assign(shop=result["shop"], _mtime=os.path.getmtime(result["file"])))
+    if not facts:
+        return {}
+
+    fact = pd.concat(facts, ignore_index=True).sort_values("_mtime", kind="stable")
+    return traffic_frames(fact.drop(columns="_mtime"))
+
+
+def traffic_frames(fact):
+    """
+    Per-shop traffic rows (later rows win) -> Fact_Traffic_Shop plus the
+    dimension rows it references.
+    """
+    fact = fact.drop_duplicates(["shop", "traffic_event_key"], keep="last")
+    fact = fact.sort_values(["traffic_event_key", "shop"]).reset_index(drop=True)
+    fact = apply_table_dtypes(fact, "Fact_Traffic_Shop")
+
+    days = traffic_days(fact)
+    frames = {
+        "Dim_Platform": build_dim_platform(),
+        "Dim_Time": build_dim_time(days.min(), days.max()),
+        **shop_level_members(),
+        "Fact_Traffic_Shop": fact,
+    }
+    return frames
+
+
+def traffic_days(fact):
+    return pd.to_datetime(fact["time_key"].astype(str), format="%Y%m%d")
+
+
+def stage_traffic(fact, staging, batch_id=None):
+    """Stage Fact_Traffic_Shop rows as Parquet by platform and day. Returns the paths written."""
+    platforms = {key: name for name, key in PLATFORM_KEYS.items()}
+    batch_id = batch_id or pd.Timestamp.now(tz="UTC").strftime("%Y%m%dT%H%M%S")
+    paths = []
+    for key, part in fact.groupby("platform_key", sort=True):
+        paths += staging.write(part, "Fact_Traffic_Shop", platform=platforms.get(key, str(key)), batch_id=batch_id,
+                               dates=traffic_days(part))
+    return paths
+
+
+def load_staged(platforms=None, start=None, end=None, db_conn_string=None, staging=None):
+    """
+    Load staged Fact_Traffic_Shop rows again without re-reading the exports
+    (a failed load, a backfill); rows of later batches win.
+
+    Returns:
+        dict: status, rows per table and the load result
+    """
+    from app.loading_script import load_tables
+    from app.staging import staging_area
+
+    started = time.perf_counter()
+    fact = (staging or staging_area).read("Fact_Traffic_Shop", platforms, start, end)
+    if fact.empty:
+        return {"status": "error", "detail": "Nothing staged in range", "files": []}
+    frames = traffic_frames(fact)
+    result = load_tables(frames, db_conn_string)
+    result["seconds"] = round(time.perf_counter() - started, 4)
+    return {"status": result["status"], "files": [], "tables": {name: len(df) for name, df in frames.items()},
+            "load": result, "seconds": result["seconds"]}
+
+
+def run_batch(inputs, max_workers=None, load=True, db_conn_string=None, staging=None):
+    """
+    Transform every export under inputs in parallel and load the merged batches.
+
+    Args:
+        inputs (list): Directories and/or glob patterns
+        max_workers (int): Worker processes, config.ETL_MAX_WORKERS by default
+        load (bool): Upsert the merged tables (otherwise only transform and report)
+        staging (StagingArea): Stage the merged Fact_Traffic_Shop rows before
+            loading them, for load_staged()
+
+    Returns:
+        dict: status, per-file report, rows per table, the staged files and the load result
+    """
+    started = time.perf_counter()
+    paths = expand_inputs(inputs)
+    if not paths:
+        return {"status": "error", "detail": "No CSV files found", "files": []}
+
+    roots = [item for item in inputs if os.path.isdir(item)]
+    root = roots[0] if len(roots) == 1 else None
+    max_workers = min(max_workers or config.ETL_MAX_WORKERS, len(paths))
+    if max_workers > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(transform_file, paths, [root] * len(paths)))
+    else:
+        results = [transform_file(path, root) for path in paths]
+
+    frames = merge_results(results)
+    report = {
+        "status": "success",
+        "files": [{k: v for k, v in result.items() if k != "frames"} for result in results],
+        "skipped": [result["file"] for result in results if result["status"] == "skipped"],
+        "tables": {name: len(df) for name, df in frames.items()},
+        "staged": [],
+        "load": None,
+    }
+    if staging is not None and frames:
+        report["staged"] = stage_traffic(frames["Fact_Traffic_Shop"], staging)
+    if load and frames:
+        from app.loading_script import load_tables
+
+        load_started = time.perf_counter()
+        report["load"] = load_tables(frames, db_conn_string)
+        report["load"]["seconds"] = round(time.perf_counter() - load_started, 4)
+        report["status"] = report["load"]["status"]
+    if any(f["status"] == "error" for f in report["files"]) and report["status"] == "success":
+        report["status"] = "partial"
+    report["seconds"] = round(time.perf_counter() - started, 4)
+    return report
+
+
+def print_report(report):
+    if report.get("detail"):
+        print(report["detail"])
+    for f in report["files"]:
+        line = f"{f['status']:<8} {f['seconds']:8.3f}s {f['rows']:>7} rows  {f['platform'] or '-':<7} {f['report'] or '-':<8} {f['file']}"
+        print(line + (f"  ({f['detail']})" if f.get("detail") else ""))
+    if report.get("skipped"):
+        print(f"{len(report['skipped'])} file(s) skipped, not traffic exports: {', '.join(report['skipped'])}")
+    for table, rows in report.get("tables", {}).items():
+        print(f"{table:<14} {rows:>8} rows")
+    if report.get("staged"):
+        print(f"staged {len(report['staged'])} Parquet file(s)")
+    if report.get("load"):
+        load = report["load"]
+        detail = f" - {load['detail']}" if load.get("detail") else ""
+        print(f"load: {load['status']} in {load.get('seconds', 0)}s{detail}")
+    print(f"{report['status']} in {report.get('seconds', 0)}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="*", help="Export directories or glob patterns")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no-load", action="store_true", help="Transform and report only")
+    parser.add_argument("--no-stage", action="store_true", help="Do not stage the merged rows as Parquet")
+    parser.add_argument("--from-staging", action="store_true",
+                        help="Load the staged rows (within --start/--end) instead of reading exports")
+    parser.add_argument("--start", help="First staged day to load (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Last staged day to load (YYYY-MM-DD)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+    if not args.inputs and not args.from_staging:
+        parser.error("give export directories or glob patterns, or --from-staging")
+
+    from app.staging import staging_area
+
+    db_conn_string = None if args.no_load else os.getenv("SUPABASE_DB_URL")
+    if args.from_staging:
+        report = load_staged(start=args.start, end=args.end, db_conn_string=db_conn_string)
+    else:
+        report = run_batch(args.inputs, args.workers, load=not args.no_load, db_conn_string=db_conn_string,
+                           staging=None if args.no_stage else staging_area)
+    if args.json:
+        print(json.dumps(report, indent=2, default=str))
+    else:
+        print_report(report)
+    return 0 if report["status"] == "success" else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,7 +1,109 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
 # KEYS
 # access tokens
 # env connections
+DB_URL = os.getenv("SUPABASE_DB_URL")
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 10))
+DB_POOL_HEALTH_CHECK_SECONDS = float(os.getenv("DB_POOL_HEALTH_CHECK_SECONDS", 30))  # ping connections idle longer than this
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", 30))
+
 # base urls for api calling
+LAZADA_APP_KEY = os.getenv("LAZADA_APP_KEY")
+LAZADA_APP_SECRET = os.getenv("LAZADA_APP_SECRET")
+LAZADA_ACCESS_TOKEN = os.getenv("LAZADA_ACCESS_TOKEN")
+LAZADA_API_BASE = os.getenv("LAZADA_API_BASE", "https://api.lazada.com.ph/rest")
+LAZADA_AUTH_URL = os.getenv("LAZADA_AUTH_URL", "https://auth.lazada.com/rest")
+LAZADA_TOKEN_FILE = os.getenv("LAZADA_TOKEN_FILE", "lazada_tokens.json")  # token cache (app/Extraction/token_manager.py)
+LAZADA_QPS = float(os.getenv("LAZADA_QPS", 10))  # per-app call limit the token bucket is tuned to
+LAZADA_TRAFFIC_PATH = os.getenv("LAZADA_TRAFFIC_PATH", "/sycm/traffic/get")  # report API the app is granted
+SHOPEE_PARTNER_ID = os.getenv("SHOPEE_PARTNER_ID")
+SHOPEE_PARTNER_KEY = os.getenv("SHOPEE_PARTNER_KEY")
+SHOPEE_SHOP_ID = os.getenv("SHOPEE_SHOP_ID")
+SHOPEE_ACCESS_TOKEN = os.getenv("SHOPEE_ACCESS_TOKEN")
+SHOPEE_API_BASE = os.getenv("SHOPEE_API_BASE", "https://partner.shopeemobile.com")
+SHOPEE_QPS = float(os.getenv("SHOPEE_QPS", 10))
+
+# Extraction clients (app/Extraction/connector.py); the concurrency cap is shared when run together
+API_MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", 8))  # requests in flight per client
+API_MAX_RETRIES = int(os.getenv("API_MAX_RETRIES", 5))
+API_BACKOFF_SECONDS = float(os.getenv("API_BACKOFF_SECONDS", 0.5))  # base of the jittered exponential backoff
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", 10))
+TOKEN_EXPIRY_BUFFER_SECONDS = int(os.getenv("TOKEN_EXPIRY_BUFFER_SECONDS", 300))  # token counts as expired this early
+TOKEN_REFRESH_AHEAD_SECONDS = int(os.getenv("TOKEN_REFRESH_AHEAD_SECONDS", 900))  # background refresh starts this long before the buffer
 
 # Table struc
 # empty df for each table
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_PATH = os.getenv("SCHEMA_PATH", os.path.join(BASE_DIR, "data", "LA_Collections_Schema.sql"))
+ENHANCED_SCHEMA_PATH = os.path.join(BASE_DIR, "Enhanced_Lazada_Sales_Schema_Dimensional.sql")
+LOAD_BATCH_ROWS = int(os.getenv("LOAD_BATCH_ROWS", 50000))  # rows per COPY into the staging table
+LOAD_COPY_FORMAT = os.getenv("LOAD_COPY_FORMAT", "csv")  # csv or binary (app/pg_binary.py)
+
+# Upload ingestion
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))  # bytes read per chunk
+UPLOAD_BATCH_ROWS = int(os.getenv("UPLOAD_BATCH_ROWS", 50000))  # rows per transform batch
+UPLOAD_PREVIEW_ROWS = int(os.getenv("UPLOAD_PREVIEW_ROWS", 100))  # rows echoed back in stream mode
+UPLOAD_TABLE = os.getenv("UPLOAD_TABLE", "uploaded_traffic")
+TRACK_UPLOAD_MEMORY = os.getenv("TRACK_UPLOAD_MEMORY", "0") == "1"  # tracemalloc slows every allocation; for profiling only
+UPLOAD_DEDUPE = os.getenv("UPLOAD_DEDUPE", "1") == "1"  # skip files/rows already saved (app/ledger.py)
+
+# Upload results (served back by result ID)
+RESULTS_DIR = os.getenv("RESULTS_DIR")  # defaults to a folder in the system temp dir
+RESULTS_TTL_SECONDS = int(os.getenv("RESULTS_TTL_SECONDS", 3600))
+RESULTS_MAX_PAGE_SIZE = int(os.getenv("RESULTS_MAX_PAGE_SIZE", 1000))
+
+# Dashboard query cache (app/query_cache.py)
+QUERY_CACHE_TTL_SECONDS = int(os.getenv("QUERY_CACHE_TTL_SECONDS", 300))
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", 256))
+
+# In-process OLAP cube (app/cube.py)
+CUBE_FACT_TABLE = os.getenv("CUBE_FACT_TABLE", "Fact_Orders")
+CUBE_LOOKBACK_DAYS = int(os.getenv("CUBE_LOOKBACK_DAYS", 366))  # facts read from the database on first use
+CUBE_MAX_GROUPS = int(os.getenv("CUBE_MAX_GROUPS", 10000))  # cells returned per query
+
+# ETL execution backend: thread, process or queue (see app/jobs.py)
+ETL_EXECUTOR = os.getenv("ETL_EXECUTOR", "thread")
+ETL_MAX_WORKERS = int(os.getenv("ETL_MAX_WORKERS", 4))
+ETL_MAX_PENDING = int(os.getenv("ETL_MAX_PENDING", 8))  # waiting jobs before uploads get a 429
+JOBS_TTL_SECONDS = int(os.getenv("JOBS_TTL_SECONDS", 3600))
+
+# Dim_Time
+# Mega-sale calendar: "M.D" repeats yearly, "YYYY-MM-DD" is a one-off (see harmonize_dim_time.py)
+MEGA_SALE_DAYS = os.getenv("MEGA_SALE_DAYS", "1.1,2.2,3.3,4.4,5.5,6.6,7.7,8.8,9.9,10.10,11.11,12.12")
+FISCAL_YEAR_START_MONTH = int(os.getenv("FISCAL_YEAR_START_MONTH", 1))
+
+# Local state kept between ETL runs (surrogate key indexes, ...)
+STATE_DIR = os.getenv("STATE_DIR", os.path.join(BASE_DIR, ".state"))
+
+# Cross-platform product matching (app/Transformation/match_products.py)
+PRODUCT_MATCH_THRESHOLD = float(os.getenv("PRODUCT_MATCH_THRESHOLD", 0.6))
+PRODUCT_MATCH_MAX_BLOCK = int(os.getenv("PRODUCT_MATCH_MAX_BLOCK", 200))  # tokens in more listings are not used for blocking
+PRODUCT_MATCH_MAX_CANDIDATES = int(os.getenv("PRODUCT_MATCH_MAX_CANDIDATES", 10))  # scored pairs per listing
+
+# Customer RFM / LTV metrics (app/Transformation/customer_metrics.py)
+LTV_GOLD_MIN_SPEND = float(os.getenv("LTV_GOLD_MIN_SPEND", 10000))  # lifetime spend for the Gold tier (and VIP)
+LTV_SILVER_MIN_SPEND = float(os.getenv("LTV_SILVER_MIN_SPEND", 2000))  # below this a customer is Bronze
+REGULAR_MIN_ORDERS = int(os.getenv("REGULAR_MIN_ORDERS", 2))  # orders before a customer is Regular/Returning
+INACTIVE_AFTER_DAYS = int(os.getenv("INACTIVE_AFTER_DAYS", 180))  # days since the last order before Inactive
+CUSTOMER_METRICS_WINDOW_DAYS = int(os.getenv("CUSTOMER_METRICS_WINDOW_DAYS", 35))  # days of item keys kept to skip reloaded items
+CUSTOMER_METRICS_ENHANCED = os.getenv("CUSTOMER_METRICS_ENHANCED", "1") == "1"  # also upsert the enhanced Dim_Customers
+
+# Fact_Orders transform (app/Transformation/standardize_fact_orders.py)
+ORDER_BATCH_ROWS = int(os.getenv("ORDER_BATCH_ROWS", 50000))  # order items per transform batch
+ORDER_AMOUNT_TOLERANCE = float(os.getenv("ORDER_AMOUNT_TOLERANCE", 0.01))  # allowed paid price vs price - voucher + shipping gap
+ORDER_TIMEZONE = os.getenv("ORDER_TIMEZONE", "Asia/Manila")  # order timestamps are bucketed into days here
+ORDER_QUARANTINE_PATH = os.getenv("ORDER_QUARANTINE_PATH", os.path.join(BASE_DIR, "quarantine", "fact_orders.ndjson"))
+
+# Parquet staging area between extraction and load (app/staging.py)
+STAGING_DIR = os.getenv("STAGING_DIR", os.path.join(BASE_DIR, "staging"))
+STAGING_COMPRESSION = os.getenv("STAGING_COMPRESSION", "zstd")
+
+# Incremental extraction (app/watermarks.py)
+WATERMARK_BACKEND = os.getenv("WATERMARK_BACKEND", "file")  # file or postgres
+WATERMARK_OVERLAP_SECONDS = int(os.getenv("WATERMARK_OVERLAP_SECONDS", 6 * 3600))  # re-read window for late edits
+SYNC_INITIAL_LOOKBACK_DAYS = int(os.getenv("SYNC_INITIAL_LOOKBACK_DAYS", 90))  # first run with no watermark
@@ -0,0 +1,431 @@
+"""
+In-process OLAP cube over a fact table (Fact_Orders by default).
+
+The SQL views re-aggregate on every dashboard query. OlapCube keeps the
+facts as columns instead: one int32 code array per dimension (the row's
+position in that dimension's member table) and one float64 array per
+measure. Dimensions and measures come from the schema: every foreign key
+is a dimension, every other numeric column a measure.
+
+A query works on member tables (a few thousand rows), not on facts, until
+the last step:
+
+    - slice / dice: where={"year": [2024], "platform_name": ["Lazada"]}
+      marks the allowed members, then one take per filtered dimension gives
+      the row mask
+    - group: each "by" attribute is factorized once per member table, the
+      row group id is one take + multiply-add, and every measure is summed
+      with np.bincount
+
+Time members carry the Dim_Time attributes built by build_dim_time(), with
+the roll-up levels as labels: year (2024) -> quarter ("2024-Q2") -> month
+("2024-05") -> day ("2024-05-01"). Product, customer and platform members
+carry whatever dimension columns were loaded (category_l2, LTV_tier,
+platform_name, ...); the key columns themselves are attributes too.
+
+add() upserts fact batches by primary key, so load_tables() refreshes the
+shared olap_cube with the frames it just committed. Like query_cache, that
+only reaches the cube in the loading process; other processes see new facts
+after reload().
+
+A cube filled by reload() holds a rolling window of CUBE_LOOKBACK_DAYS:
+add() ignores facts dated before it, and once the window start moves (a
+new day) the rows that fell out of it are dropped, so memory stays bounded
+however long the process runs.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from app import config
+from app.dtypes import table_dtypes
+from app.schema import get_table
+from app.Transformation.harmonize_dim_platform import build_dim_platform
+from app.Transformation.harmonize_dim_time import build_dim_time
+
+TIME_HIERARCHY = ["year", "quarter", "month", "day"]
+COUNT_MEASURE = "fact_rows"
+_DENSE_CELLS = 1 << 22  # group by with fewer possible cells sums with bincount, skipping np.unique
+_DIRECT_MEMBERS = 4096  # dimensions this small are grouped by member position (no per-row lookup)
+
+
+class CubeQueryError(ValueError):
+    pass
+
+
+def _time_members(time_keys):
+    """Dim_Time attributes for YYYYMMDD time_keys, with the roll-up levels as labels."""
+    dates = pd.to_datetime(pd.Series(time_keys).astype(str), format="%Y%m%d", errors="coerce")
+    if dates.notna().any():
+        dim = build_dim_time(dates.min(), dates.max())
+        members = pd.DataFrame({"time_key": np.asarray(time_keys, dtype="int64")}).merge(
+            dim.astype({"time_key": "int64"}), on="time_key", how="left"
+        )
+    else:
+        members = pd.DataFrame({"time_key": np.asarray(time_keys, dtype="int64")})
+        members["date"] = pd.NaT
+    day = pd.to_datetime(members["date"])
+    members["year"] = day.dt.year.astype("Int64")
+    members["quarter"] = day.dt.year.astype("Int64").astype(str) + "-Q" + day.dt.quarter.astype("Int64").astype(str)
+    members["month"] = day.dt.strftime("%Y-%m")
+    members["day"] = day.dt.strftime("%Y-%m-%d")
+    return members
+
+
+class OlapCube:
+    def __init__(self, table_name=None, schema_path=None, db_conn_string=None, lookback_days=None):
+        self.table_name = table_name or config.CUBE_FACT_TABLE
+        self.schema_path = schema_path
+        self.db_conn_string = db_conn_string
+        self.lookback_days = lookback_days  # rolling window add() keeps (days); reload() sets CUBE_LOOKBACK_DAYS
+        table = get_table(self.table_name, schema_path)
+        self.key_column = table["primary_key"][0]
+        self.dimensions = {column: reference for column, reference in table["references"].items()}
+        dtypes = table_dtypes(self.table_name, schema_path)
+        self.measures = [
+            c["name"] for c in table["columns"]
+            if c["name"] != self.key_column and c["name"] not in self.dimensions
+            and (isinstance(dtypes.get(c["name"]), tuple) or str(dtypes.get(c["name"], "")).startswith(("int", "float")))
+        ]
+
+        self.loaded = False
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._size = 0
+        self._window_start = 0  # time_key rows were last trimmed to
+        self._sorted_keys = np.array([], dtype="int64")  # fact keys, sorted
+        self._sorted_rows = np.array([], dtype="int64")  # their row positions
+        self._codes = {column: np.array([], dtype="int32") for column in self.dimensions}
+        self._values = {measure: np.array([], dtype="float64") for measure in self.measures}
+        self._members = {column: pd.DataFrame({column: pd.Series(dtype="int64")}) for column in self.dimensions}
+        self._member_index = {column: pd.Index([], dtype="int64") for column in self.dimensions}
+        self._factorized = {}
+        if "platform_key" in self.dimensions:
+            self.set_members("platform_key", build_dim_platform())
+
+    # ---------------------------------------------------------------- members
+
+    def set_members(self, column, frame):
+        """Add or update the attributes of a dimension's members (frame holds the key column)."""
+        with self._lock:
+            update = frame.drop_duplicates(column, keep="last").astype({column: "int64"}).set_index(column)
+            members = self._members[column].set_index(column)
+            # Member positions are fact codes: existing members keep theirs, new ones are appended
+            members = members.reindex(members.index.append(update.index[~update.index.isin(members.index)]))
+            for attribute in update.columns:
+                if attribute not in members:
+                    members[attribute] = pd.Series(index=members.index, dtype=update[attribute].dtype)
+                members.loc[update.index, attribute] = update[attribute].to_numpy()
+            self._members[column] = members.reset_index(names=column)
+            self._member_index[column] = members.index
+            self._factorized = {k: v for k, v in self._factorized.items() if k[0] != column}
+
+    def _member_codes(self, column, keys):
+        """Fact keys -> member positions, adding members for keys not seen before."""
+        keys = np.asarray(keys, dtype="int64")
+        positions = self._member_index[column].get_indexer(keys)
+        if (positions < 0).any():
+            unseen = np.unique(keys[positions < 0])
+            new = _time_members(unseen) if column == "time_key" else pd.DataFrame({column: unseen})
+            self.set_members(column, new)
+            positions = self._member_index[column].get_indexer(keys)
+        return positions.astype("int32")
+
+    def attributes(self):
+        """Attribute name -> dimension column, for where / by."""
+        with self._lock:
+            names = {}
+            for column, members in self._members.items():
+                for attribute in members.columns:
+                    names.setdefault(attribute, column)
+            return names
+
+    # ------------------------------------------------------------------ facts
+
+    def window_start(self):
+        """First time_key of the lookback window, or None when the cube keeps everything."""
+        if not self.lookback_days or "time_key" not in self.dimensions:
+            return None
+        return int((datetime.now() - timedelta(days=self.lookback_days)).strftime("%Y%m%d"))
+
+    def _trim(self, start):
+        """Drop rows dated before start; positions of the rows kept are renumbered."""
+        time_keys = self._members["time_key"]["time_key"].to_numpy(dtype="int64")
+        keep = time_keys[self._codes["time_key"]] >= start
+        self._window_start = start
+        if keep.all():
+            return
+        for column in self.dimensions:
+            self._codes[column] = self._codes[column][keep]
+        for measure in self.measures:
+            self._values[measure] = self._values[measure][keep]
+        renumber = np.cumsum(keep) - 1
+        kept_keys = keep[self._sorted_rows]
+        self._sorted_keys = self._sorted_keys[kept_keys]
+        self._sorted_rows = renumber[self._sorted_rows[kept_keys]]
+        self._size = int(keep.sum())
+
+    def add(self, facts):
+        """
+        Upsert a fact batch: rows with a known key replace their values,
+        new keys are appended. With a lookback window, facts dated before
+        it are ignored and rows that have aged out of it are dropped.
+
+        Returns:
+            int: Rows added or replaced
+        """
+        start = self.window_start()
+        if start is not None and "time_key" in facts:
+            facts = facts[pd.to_numeric(facts["time_key"], errors="coerce") >= start]
+        facts = facts.dropna(subset=[self.key_column]).drop_duplicates(self.key_column, keep="last")
+        with self._lock:
+            if start is not None and start > self._window_start:
+                self._trim(start)
+        if facts.empty:
+            return 0
+        with self._lock:
+            keys = facts[self.key_column].to_numpy(dtype="int64")
+            found = np.searchsorted(self._sorted_keys, keys)
+            found = found.clip(max=max(len(self._sorted_keys) - 1, 0))
+            known = (self._sorted_keys[found] == keys) if len(self._sorted_keys) else np.zeros(len(keys), dtype=bool)
+            rows = np.full(len(keys), -1, dtype="int64")
+            rows[known] = self._sorted_rows[found[known]]
+            new_count = int((~known).sum())
+            rows[~known] = np.arange(self._size, self._size + new_count)
+
+            columns = {}
+            for column in self.dimensions:
+                values = facts[column] if column in facts else pd.Series(0, index=facts.index)
+                columns[column] = self._member_codes(column, values.fillna(0).to_numpy(dtype="int64"))
+            for measure in self.measures:
+                values = facts[measure] if measure in facts else pd.Series(np.nan, index=facts.index)
+                # Sums skip missing values, so they are stored as 0
+                columns[measure] = np.nan_to_num(pd.to_numeric(values, errors="coerce").to_numpy(dtype="float64"))
+
+            for column in self.dimensions:
+                self._codes[column] = np.concatenate([self._codes[column], np.empty(new_count, dtype="int32")])
+                self._codes[column][rows] = columns[column]
+            for measure in self.measures:
+                self._values[measure] = np.concatenate([self._values[measure], np.empty(new_count, dtype="float64")])
+                self._values[measure][rows] = columns[measure]
+
+            new_keys = keys[~known]
+            order = np.argsort(new_keys, kind="stable")
+            at = np.searchsorted(self._sorted_keys, new_keys[order])
+            self._sorted_keys = np.insert(self._sorted_keys, at, new_keys[order])
+            self._sorted_rows = np.insert(self._sorted_rows, at, rows[~known][order])
+            self._size += new_count
+            return len(keys)
+
+    def add_loaded(self, frames):
+        """load_tables() hook: fold committed dimension and fact frames into a loaded cube."""
+        if not self.loaded:
+            return
+        for column, (dim_table, dim_key) in self.dimensions.items():
+            frame = frames.get(dim_table)
+            if frame is not None and not frame.empty and dim_key in frame and dim_table != "Dim_Time":
+                self.set_members(column, frame.rename(columns={dim_key: column}))
+        facts = frames.get(self.table_name)
+        if facts is not None and not facts.empty:
+            self.add(facts)
+
+    def load(self, since_time_key=None):
+        """Read facts (since a time_key) and dimension attributes from the database."""
+        from app.db import get_pool
+        from app.loading_script import quote_ident
+
+        with self._lock:
+            self._reset()
+            with get_pool(self.db_conn_string).connection() as conn:
+                with conn.cursor() as cursor:
+                    for column, (dim_table, dim_key) in self.dimensions.items():
+                        if dim_table == "Dim_Time":
+                            continue
+                        cursor.execute(f"SELECT * FROM {quote_ident(dim_table)}")
+                        names = [c[0] for c in cursor.description]
+                        frame = pd.DataFrame(cursor.fetchall(), columns=names)
+                        if not frame.empty:
+                            self.set_members(column, frame.rename(columns={dim_key: column}))
+
+                    columns = [self.key_column, *self.dimensions, *self.measures]
+                    sql = f"SELECT {', '.join(quote_ident(c) for c in columns)} FROM {quote_ident(self.table_name)}"
+                    params = None
+                    if since_time_key is not None and "time_key" in self.dimensions:
+                        sql += ' WHERE "time_key" >= %s'
+                        params = (int(since_time_key),)
+                    cursor.execute(sql, params)
+                    while True:
+                        rows = cursor.fetchmany(config.LOAD_BATCH_ROWS)
+                        if not rows:
+                            break
+                        self.add(pd.DataFrame(rows, columns=columns))
+                conn.rollback()
+            self.loaded = True
+        return self
+
+    def reload(self):
+        self.lookback_days = self.lookback_days or config.CUBE_LOOKBACK_DAYS
+        return self.load(self.window_start())
+
+    # ---------------------------------------------------------------- queries
+
+    def _attribute_codes(self, attribute):
+        """Member-level factorization of an attribute: (dimension column, codes per member, labels)."""
+        column = self.attributes().get(attribute)
+        if column is None:
+            raise CubeQueryError(f"Unknown attribute: {attribute}")
+        cache_key = (column, attribute)
+        if cache_key not in self._factorized:
+            codes, labels = pd.factorize(self._members[column][attribute], sort=True)
+            self._factorized[cache_key] = (codes, labels)
+        return column, *self._factorized[cache_key]
+
+    def query(self, by=(), where=None, measures=None):
+        """
+        Slice, dice and aggregate.
+
+        Args:
+            by (list): Attributes to group by, e.g. ["month", "platform_name"]
+            where (dict): Attribute -> allowed values (a scalar or list); values
+                are compared as text, so "2024" matches year 2024
+            measures (list): Measures to sum (all by default); fact_rows counts rows
+
+        Returns:
+            dict: cells (one dict per group with the by attributes and sums),
+                rows_scanned, truncated, elapsed_ms
+        """
+        started = time.perf_counter()
+        measures = list(measures) if measures else self.measures + [COUNT_MEASURE]
+        unknown = [m for m in measures if m not in self.measures and m != COUNT_MEASURE]
+        if unknown:
+            raise CubeQueryError(f"Unknown measure: {', '.join(unknown)}")
+        by = list(dict.fromkeys(by))
+
+        with self._lock:
+            attributes = {attribute: self._attribute_codes(attribute) for attribute in [*by, *(where or {})]}
+            mask = None
+            for attribute, allowed in (where or {}).items():
+                column, codes, labels = attributes[attribute]
+                allowed = allowed if isinstance(allowed, (list, tuple, set)) else [allowed]
+                allowed_labels = np.asarray(pd.Index(labels).astype(str).isin([str(v) for v in allowed]))
+                allowed_members = np.zeros(len(codes), dtype=bool)
+                allowed_members[codes >= 0] = allowed_labels[codes[codes >= 0]]
+                matches = allowed_members[self._codes[column]]
+                mask = matches if mask is None else mask & matches
+
+            # A selective where is applied by taking the matching rows; otherwise rows outside
+            # it fall into one extra discard cell, which is cheaper than compressing every array
+            rows = np.flatnonzero(mask) if mask is not None and mask.mean() < 0.5 else None
+
+            # Per grouped dimension, a local code per row: the member position itself for small
+            # dimensions (no lookup), else the member's combination of grouped attributes
+            columns = list(dict.fromkeys(attributes[attribute][0] for attribute in by))
+            sizes, local_labels = [], {}
+            combo = None
+            for column in columns:
+                dim_by = [attribute for attribute in by if attributes[attribute][0] == column]
+                # Missing attribute values (code -1) get their own label
+                member_labels = [np.where(attributes[a][1] >= 0, attributes[a][1], len(attributes[a][2])) for a in dim_by]
+                codes = self._codes[column] if rows is None else self._codes[column][rows]
+                if len(self._members[column]) <= _DIRECT_MEMBERS:
+                    row_local, size = codes, len(self._members[column])
+                    local_labels.update(zip(dim_by, member_labels))
+                else:
+                    label_sizes = [len(attributes[a][2]) + 1 for a in dim_by]
+                    combined, member_local = np.unique(np.ravel_multi_index(member_labels, label_sizes), return_inverse=True)
+                    row_local, size = member_local[codes], len(combined)
+                    local_labels.update(zip(dim_by, np.unravel_index(combined, label_sizes)))
+                combo = row_local.astype("int64") if combo is None else combo * size + row_local
+                sizes.append(size)
+            cell_count = int(np.prod(sizes, dtype="float64")) if columns else 1
+            if cell_count > 2 ** 62:
+                raise CubeQueryError("Too many group combinations; filter or group by fewer attributes")
+            if rows is None and combo is None:
+                combo = np.zeros(self._size, dtype="int64") if mask is None else (~mask).astype("int64")
+            elif rows is None and mask is not None:
+                combo = np.where(mask, combo, cell_count)
+            elif combo is None:
+                combo = np.zeros(len(rows), dtype="int64")
+
+            def values(measure):
+                return self._values[measure] if rows is None else self._values[measure][rows]
+
+            if cell_count < _DENSE_CELLS:
+                counts = np.bincount(combo, minlength=cell_count + 1)[:cell_count]
+                cells = np.flatnonzero(counts)
+                sums = {COUNT_MEASURE: counts[cells]}
+                for measure in measures:
+                    if measure != COUNT_MEASURE:
+                        sums[measure] = np.bincount(combo, weights=values(measure), minlength=cell_count + 1)[cells]
+            else:
+                keep = combo < cell_count
+                cells, ids = np.unique(combo[keep], return_inverse=True)
+                sums = {COUNT_MEASURE: np.bincount(ids, minlength=len(cells))}
+                for measure in measures:
+                    if measure != COUNT_MEASURE:
+                        sums[measure] = np.bincount(ids, weights=values(measure)[keep], minlength=len(cells))
+            scanned = int(sums[COUNT_MEASURE].sum())
+
+            # Roll the cells up to the grouped attributes
+            locals_ = dict(zip(columns, np.unravel_index(cells, sizes))) if columns else {}
+            group = np.zeros(len(cells), dtype="int64")
+            group_shape, label_sets = [], []
+            for attribute in by:
+                column, _, labels = attributes[attribute]
+                group = group * (len(labels) + 1) + local_labels[attribute][locals_[column]]
+                group_shape.append(len(labels) + 1)
+                label_sets.append(list(labels) + [None])
+            groups, ids = np.unique(group, return_inverse=True)
+            sums = {measure: np.bincount(ids, weights=sums[measure], minlength=len(groups)) for measure in measures}
+
+        cells = []
+        positions = np.unravel_index(groups, group_shape) if by else []
+        truncated = len(groups) > config.CUBE_MAX_GROUPS
+        for i in range(min(len(groups), config.CUBE_MAX_GROUPS)):
+            cell = {attribute: _json_value(label_sets[j][positions[j][i]]) for j, attribute in enumerate(by)}
+            for measure in measures:
+                value = sums[measure][i]
+                cell[measure] = int(value) if measure == COUNT_MEASURE else round(float(value), 2)
+            cells.append(cell)
+        return {
+            "cells": cells,
+            "rows_scanned": scanned,
+            "truncated": truncated,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    def rollup(self, level, by=(), where=None, measures=None):
+        """Aggregate at one level of the time hierarchy (year, quarter, month or day), plus other by attributes."""
+        if level not in TIME_HIERARCHY:
+            raise CubeQueryError(f"Unknown time level: {level} (use one of {', '.join(TIME_HIERARCHY)})")
+        return self.query([level, *by], where, measures)
+
+    def stats(self):
+        with self._lock:
+            nbytes = sum(a.nbytes for a in self._codes.values()) + sum(a.nbytes for a in self._values.values())
+            return {
+                "table": self.table_name,
+                "loaded": self.loaded,
+                "rows": self._size,
+                "members": {column: len(members) for column, members in self._members.items()},
+                "measures": self.measures + [COUNT_MEASURE],
+                "fact_mb": round(nbytes / (1024 * 1024), 2),
+            }
+
+
+def _json_value(value):
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value
+
+
+olap_cube = OlapCube()
@@ -0,0 +1,184 @@
+"""
+Process-wide Postgres connection pool.
+
+Opening a TLS connection to the remote Supabase database costs more than
+most short loads, so the upload routes and loading_script.py borrow
+connections from one pool per DSN:
+
+    with get_pool().connection() as conn:
+        ...
+
+Connections idle longer than DB_POOL_HEALTH_CHECK_SECONDS are pinged before
+being handed out and replaced if dead (a replacement that is itself an idle
+connection is checked the same way). stats() reports pool wait times and the
+connections checked out, tracked here rather than read from psycopg2's
+internals.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+
+from app import config
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, dsn, minconn=None, maxconn=None, health_check_seconds=None, acquire_timeout=None):
+        self.minconn = config.DB_POOL_MIN if minconn is None else minconn
+        self.maxconn = maxconn or config.DB_POOL_MAX
+        self.health_check_seconds = (
+            config.DB_POOL_HEALTH_CHECK_SECONDS if health_check_seconds is None else health_check_seconds
+        )
+        self.acquire_timeout = acquire_timeout or config.DB_POOL_ACQUIRE_TIMEOUT
+
+        self._pool = pg_pool.ThreadedConnectionPool(self.minconn, self.maxconn, dsn)
+        # ThreadedConnectionPool raises when exhausted; the semaphore makes callers wait instead
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._last_used = {}
+        self._checked_out = set()  # id() of connections handed out and not yet returned
+        self._lock = threading.Lock()
+        self._stats = {
+            "acquired": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "timeouts": 0,
+            "replaced": 0,
+        }
+
+    def _healthy(self, conn):
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is None or time.monotonic() - last_used < self.health_check_seconds:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        """Borrow a connection, waiting up to acquire_timeout for a free slot."""
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise PoolTimeout(f"No database connection free after {self.acquire_timeout}s")
+        waited = time.monotonic() - started
+
+        try:
+            conn = self._pool.getconn()
+            # Every idle connection may be dead (e.g. after a server restart); a new one is never pinged
+            replaced = 0
+            while not self._healthy(conn):
+                self._last_used.pop(id(conn), None)
+                self._pool.putconn(conn, close=True)
+                if replaced == self.maxconn:
+                    raise psycopg2.OperationalError("No healthy database connection")
+                conn = self._pool.getconn()
+                replaced += 1
+                with self._lock:
+                    self._stats["replaced"] += 1
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._checked_out.add(id(conn))
+            self._stats["acquired"] += 1
+            self._stats["wait_seconds_total"] += waited
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+        return conn
+
+    def putconn(self, conn, close=False):
+        """Return a connection; broken ones (or close=True) are discarded."""
+        try:
+            if not conn.closed and conn.status != psycopg2.extensions.STATUS_READY:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    close = True
+            close = close or bool(conn.closed)
+            if close:
+                self._last_used.pop(id(conn), None)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+            self._pool.putconn(conn, close=close)
+        finally:
+            with self._lock:
+                self._checked_out.discard(id(conn))
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the with block; uncommitted work is rolled back."""
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            in_use = len(self._checked_out)
+            # Returned open (idle) or checked out; startup connections count once first used
+            opened = len(self._checked_out | set(self._last_used))
+        acquired = stats["acquired"]
+        stats["wait_seconds_avg"] = stats["wait_seconds_total"] / acquired if acquired else 0.0
+        stats["min_size"] = self.minconn
+        stats["max_size"] = self.maxconn
+        stats["open"] = opened
+        stats["in_use"] = in_use
+        return stats
+
+    def close(self):
+        self._pool.closeall()
+
+
+_pools = {}
+_pools_pid = os.getpid()
+_pools_lock = threading.Lock()
+
+
+def get_pool(dsn=None):
+    """
+    Return the shared pool for dsn (config.DB_URL by default).
+
+    Pools are per process: a forked ETL worker builds its own instead of
+    reusing the parent's sockets.
+    """
+    global _pools, _pools_pid
+    dsn = dsn or config.DB_URL
+    if not dsn:
+        raise ValueError("SUPABASE_DB_URL environment variable is not set")
+
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            _pools, _pools_pid = {}, os.getpid()
+        if dsn not in _pools:
+            _pools[dsn] = ConnectionPool(dsn)
+        return _pools[dsn]
+
+
+def pool_stats():
+    """Stats for every pool opened in this process, keyed by database host."""
+    with _pools_lock:
+        pools = dict(_pools) if _pools_pid == os.getpid() else {}
+    return {psycopg2.extensions.parse_dsn(dsn).get("host", "default"): p.stats() for dsn, p in pools.items()}
+
+
+def close_pools():
+    with _pools_lock:
+        for p in _pools.values():
+            p.close()
+        _pools.clear()
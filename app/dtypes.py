@@ -0,0 +1,141 @@
+"""
+Compact pandas dtypes for table frames, derived from the schema SQL.
+
+pandas defaults to int64 / float64 / object. table_dtypes() declares, per
+column of a schema table:
+
+    - keys (primary key, foreign keys, *_key) at the width of their SQL type:
+      int -> int32, smallint -> int16, bigint -> int64
+    - other integers (counts, quantities) -> int16, widened to int32 by
+      apply_table_dtypes() when a batch holds larger values
+    - low-cardinality strings (every varchar of a Fact_ table, and dimension
+      columns such as *_type / *_status / *_reason) -> category
+    - decimal(p,s) -> float64 rounded to s places (2 without a scale)
+    - date / timestamp -> datetime64[ns], boolean -> boolean
+
+Integer columns holding nulls use the matching nullable dtype (Int32, ...).
+Transforms call apply_table_dtypes() on the frames they build (or pass
+read_csv_dtypes() to pd.read_csv), and memory_report() compares the deep
+memory use of two frames.
+"""
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from app.schema import get_table
+
+_KEY_INTS = {"smallint": "int16", "int": "int32", "integer": "int32", "serial": "int32", "bigint": "int64",
+             "bigserial": "int64"}
+COUNT_DTYPE = "int16"
+CATEGORY_SUFFIXES = ("_type", "_status", "_reason", "_tier", "_segment", "_region", "_method", "platform", "season",
+                     "month_name", "day_name")
+DEFAULT_DECIMAL_SCALE = 2
+_DECIMAL = re.compile(r"(?:decimal|numeric)\s*\(\s*\d+\s*,\s*(\d+)\s*\)")
+
+
+@lru_cache(maxsize=None)
+def table_dtypes(table_name, path=None):
+    """
+    Declared compact dtype per column of a schema table.
+
+    Returns:
+        dict: column -> dtype name, or ("decimal", scale) for decimals;
+            text columns that stay as Python strings are left out
+    """
+    table = get_table(table_name, path)
+    keys = set(table["primary_key"]) | set(table["references"])
+    is_fact = table["name"].startswith("Fact_")
+
+    dtypes = {}
+    for column in table["columns"]:
+        name, column_type = column["name"], column["type"]
+        base = column_type.split("(")[0].strip()
+        if base in _KEY_INTS:
+            is_key = name in keys or name.endswith("_key") or base == "bigint"
+            dtypes[name] = _KEY_INTS[base] if is_key else COUNT_DTYPE
+        elif base in ("decimal", "numeric"):
+            scale = _DECIMAL.match(column_type)
+            dtypes[name] = ("decimal", int(scale.group(1)) if scale else DEFAULT_DECIMAL_SCALE)
+        elif base in ("real", "float", "double"):
+            dtypes[name] = "float64"
+        elif base in ("date", "timestamp", "timestamptz"):
+            dtypes[name] = "datetime64[ns]"
+        elif base == "boolean":
+            dtypes[name] = "boolean"
+        elif base in ("varchar", "text", "char") and (is_fact or name.lower().endswith(CATEGORY_SUFFIXES)):
+            if name not in keys and [name] not in table["unique"]:
+                dtypes[name] = "category"
+    return dtypes
+
+
+def _fit_int(values, dtype):
+    """
+    Cast a Series to dtype, widening counts that do not fit and using the
+    nullable dtype for nulls. Text of any dtype (object, str, category) is
+    parsed first; what does not parse becomes null.
+    """
+    if not pd.api.types.is_numeric_dtype(values.dtype):
+        values = pd.to_numeric(values, errors="coerce")
+    if values.dtype.kind == "f":
+        values = values.round()
+    present = values.dropna()
+    if not present.empty:
+        low, high = present.min(), present.max()
+        while dtype != "int64" and (low < np.iinfo(dtype).min or high > np.iinfo(dtype).max):
+            dtype = {"int8": "int16", "int16": "int32", "int32": "int64"}[dtype]
+    if len(present) < len(values):
+        return values.astype(dtype.capitalize())
+    return values.astype(dtype)
+
+
+def apply_table_dtypes(df, table_name, path=None):
+    """
+    Return df with the declared compact dtypes of table_name applied to the
+    columns it has (other columns are left as they are).
+    """
+    converted = {}
+    for column, dtype in table_dtypes(table_name, path).items():
+        if column not in df:
+            continue
+        values = df[column]
+        if isinstance(dtype, tuple):
+            converted[column] = pd.to_numeric(values, errors="coerce").astype("float64").round(dtype[1])
+        elif dtype.startswith("int"):
+            converted[column] = _fit_int(values, dtype)
+        elif dtype == "datetime64[ns]":
+            converted[column] = values if values.dtype.kind == "M" else pd.to_datetime(values, errors="coerce")
+        elif str(values.dtype) != dtype:
+            converted[column] = values.astype(dtype)
+    return df.assign(**converted) if converted else df
+
+
+def read_csv_dtypes(table_name, path=None):
+    """
+    dtype= argument for pd.read_csv() so table columns are parsed compact
+    straight from the file. NOT NULL integers are read as numpy ints (counts
+    at int32 until apply_table_dtypes() narrows them); nullable integers are
+    left to apply_table_dtypes(), since nullable parsing is several times slower.
+    """
+    nullable = {c["name"] for c in get_table(table_name, path)["columns"] if c["nullable"]}
+    dtypes = {}
+    for column, dtype in table_dtypes(table_name, path).items():
+        if isinstance(dtype, tuple):
+            dtypes[column] = "float64"
+        elif dtype.startswith("int") and column not in nullable:
+            dtypes[column] = "int32" if dtype == COUNT_DTYPE else dtype
+        elif dtype in ("category", "boolean"):
+            dtypes[column] = dtype
+    return dtypes
+
+
+def memory_report(before, after):
+    """Deep memory use of two versions of a frame, in MB, and how many times smaller after is."""
+    before_bytes = int(before.memory_usage(deep=True).sum())
+    after_bytes = int(after.memory_usage(deep=True).sum())
+    return {
+        "before_mb": round(before_bytes / (1024 * 1024), 2),
+        "after_mb": round(after_bytes / (1024 * 1024), 2),
+        "ratio": round(before_bytes / after_bytes, 2) if after_bytes else None,
+    }
@@ -0,0 +1,393 @@
+"""
+ETL for uploaded marketplace exports (Lazada / Shopee).
+
+process_csv_file() handles an already-buffered file, process_csv_stream()
+reads a binary file object in fixed-size chunks and pushes bounded row
+batches through the same transform so memory does not grow with file size.
+"""
+import codecs
+import io
+import os
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+from app import config
+from app.Transformation.standardize_fact_traffic import parse_traffic_report
+from app.results import batch_filename
+
+# Export header -> standardized column name
+LAZADA_COLUMN_MAP = {
+    "Date": "date",
+    "Revenue": "total_sales_value",
+    "Visitors": "visitors",
+    "Buyers": "buyers",
+    "Orders": "total_orders",
+    "Pageviews": "page_views",
+    "Units Sold": "units_sold",
+    "Conversion Rate": "conversion_rate",
+    "Revenue per Buyer": "revenue_per_buyer",
+    "Visitor Value": "visitor_value",
+    "Add to Cart Users": "add_to_cart_users",
+    "Add to Cart Units": "add_to_cart_units",
+    "Wishlists": "wishlists",
+    "Wishlist Users": "wishlist_users",
+    "Average Order Value": "average_order_value",
+    "Average Basket Size": "average_basket_size",
+    "Cancelled Amount": "cancelled_amount",
+    "Return/Refund Amount": "return_refund_amount",
+}
+
+SHOPEE_COLUMN_MAP = {
+    "Date": "date",
+    "Sales (PHP)": "total_sales_value",
+    "Sales": "total_sales_value",
+    "Orders": "total_orders",
+    "Visitors": "visitors",
+    "Page Views": "page_views",
+    "Buyers": "buyers",
+    "Units Sold": "units_sold",
+    "Order Conversion Rate": "conversion_rate",
+    "Sales per Order": "average_order_value",
+    "Cancelled Sales": "cancelled_amount",
+    "Returned / Refunded Sales": "return_refund_amount",
+}
+
+PLATFORM_COLUMN_MAPS = {
+    "Lazada": LAZADA_COLUMN_MAP,
+    "Shopee": SHOPEE_COLUMN_MAP,
+}
+
+_memory_lock = threading.Lock()
+_memory_users = 0
+
+
+@contextmanager
+def track_memory():
+    """
+    Measure Python-level allocations for the duration of the block.
+
+    Yields a dict that is filled with current_mb / peak_mb on exit. The
+    tracer is process-wide, so with several uploads in flight the peak
+    covers all of them.
+    """
+    global _memory_users
+    stats = {}
+    if not config.TRACK_UPLOAD_MEMORY:
+        yield stats
+        return
+
+    with _memory_lock:
+        if _memory_users == 0:
+            tracemalloc.start()
+        _memory_users += 1
+        tracemalloc.reset_peak()
+    try:
+        yield stats
+    finally:
+        current, peak = tracemalloc.get_traced_memory()
+        stats["current_mb"] = round(current / (1024 * 1024), 2)
+        stats["peak_mb"] = round(peak / (1024 * 1024), 2)
+        with _memory_lock:
+            _memory_users -= 1
+            if _memory_users == 0:
+                tracemalloc.stop()
+
+
+def transform_dataframe(df, platform):
+    """
+    Standardize a raw export DataFrame.
+
+    Args:
+        df (DataFrame): Raw export read with dtype=str
+        platform (str): "Lazada" or "Shopee"
+
+    Returns:
+        DataFrame: Renamed, typed rows with summary/placeholder rows removed
+    """
+    if platform not in PLATFORM_COLUMN_MAPS:
+        raise ValueError(f"Unsupported platform: {platform}")
+
+    df, _ = parse_traffic_report(df, PLATFORM_COLUMN_MAPS[platform])
+    df["platform"] = platform
+    return df.reset_index(drop=True)
+
+
+def dataframe_records(df):
+    """DataFrame -> list of JSON-safe row dicts (NaN/NaT become None)."""
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def save_dataframe(df, replace_existing=False):
+    """
+    Append a transformed batch to the upload table over a pooled connection.
+
+    With replace_existing, rows already stored for the same platform, shop
+    and dates are deleted first (in the same transaction), so a changed day
+    replaces its old row instead of duplicating it. Returns rows written.
+    """
+    from app.db import get_pool
+    from app.ledger import LEDGER_COLUMNS
+    from app.loading_script import copy_in_batches, quote_ident
+
+    if df.empty:
+        return 0
+    if "shop" not in df:
+        df = df.assign(shop="")
+    table = quote_ident(config.UPLOAD_TABLE)
+    with get_pool().connection() as conn:
+        with conn.cursor() as cursor:
+            create_sql = pd.io.sql.get_schema(df.drop(columns=list(LEDGER_COLUMNS), errors="ignore"), config.UPLOAD_TABLE)
+            cursor.execute(create_sql.replace("CREATE TABLE", "CREATE TABLE IF NOT EXISTS", 1))
+            for column, definition in LEDGER_COLUMNS.items():
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {quote_ident(column)} {definition}")
+            if replace_existing and "date" in df and "platform" in df:
+                for (platform, shop), dates in df.groupby(["platform", "shop"])["date"]:
+                    cursor.execute(
+                        f"DELETE FROM {table} WHERE platform = %s AND shop = %s AND date = ANY(%s)",
+                        (platform, shop, [d.to_pydatetime() for d in dates.dropna().unique()]),
+                    )
+            copy_in_batches(cursor, df, config.UPLOAD_TABLE, list(df.columns))
+        conn.commit()
+    return len(df)
+
+
+def _transform_and_save(raw, platform, save_to_db, ledger, shop=""):
+    """
+    Transform one raw batch and save it, each row tagged with its shop and
+    row fingerprint. With a ledger, rows already stored unchanged are
+    dropped first.
+
+    Returns:
+        tuple: (transformed DataFrame, rows written, rows skipped,
+            fingerprints of every dated row of the batch)
+    """
+    from app.ledger import daily_row_keys
+
+    column_map = PLATFORM_COLUMN_MAPS.get(platform, {})
+    skipped = 0
+    if ledger is not None and save_to_db:
+        raw, pending, skipped, fingerprints = ledger.filter_batch(raw, platform, column_map, shop)
+    elif save_to_db:
+        _, keys, fingerprints = daily_row_keys(raw, column_map)
+        pending = pd.Series(fingerprints, index=pd.Index(keys), dtype="int64")
+    else:
+        pending, fingerprints = None, []
+    df = transform_dataframe(raw, platform)
+    inserted = 0
+    if save_to_db:
+        days = df["date"].dt.strftime("%Y-%m-%d") if "date" in df else pd.Series(index=df.index, dtype=object)
+        tagged = df.assign(shop=shop, row_fingerprint=days.map(pending[~pending.index.duplicated(keep="last")]).astype("Int64"))
+        inserted = save_dataframe(tagged, replace_existing=ledger is not None)
+    return df, inserted, skipped, list(fingerprints)
+
+
+def process_csv_file(file_like, platform, save_to_db=True, ledger=None, shop=""):
+    """
+    Read, transform and optionally save a whole CSV export.
+
+    Args:
+        file_like: Text file object with the CSV contents
+        platform (str): "Lazada" or "Shopee"
+        save_to_db (bool): Append the result to the upload table
+        ledger (IngestionLedger): Skip rows saved before unchanged (with save_to_db)
+        shop (str): Shop the export belongs to (part of the saved rows' key)
+
+    Returns:
+        dict: status, dataframe, rows_processed, inserted, skipped,
+            fingerprints (or status/detail on error)
+    """
+    try:
+        df = pd.read_csv(file_like, dtype=str, keep_default_na=False)
+        df, inserted, skipped, fingerprints = _transform_and_save(df, platform, save_to_db, ledger, shop)
+        return {
+            "status": "success",
+            "dataframe": df,
+            "rows_processed": len(df),
+            "inserted": inserted,
+            "skipped": skipped,
+            "fingerprints": fingerprints,
+        }
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}
+
+
+def iter_csv_batches(binary_file, chunk_size=None, batch_rows=None, encoding="utf-8-sig"):
+    """
+    Yield raw DataFrames of at most batch_rows rows from a binary CSV file.
+
+    The file is read chunk_size bytes at a time and decoded incrementally, so
+    multi-byte characters split across chunks are handled. Quoted fields
+    containing newlines are kept together.
+    """
+    chunk_size = chunk_size or config.UPLOAD_CHUNK_SIZE
+    batch_rows = batch_rows or config.UPLOAD_BATCH_ROWS
+    decoder = codecs.getincrementaldecoder(encoding)()
+
+    header = None
+    rows = []
+    partial = ""  # text after the last newline of the previous chunk
+    record = ""  # record still inside an open quoted field
+
+    def to_frame(batch):
+        text = header + "\n" + "\n".join(batch)
+        return pd.read_csv(io.StringIO(text), dtype=str, keep_default_na=False)
+
+    while True:
+        chunk = binary_file.read(chunk_size)
+        text = decoder.decode(chunk or b"", final=not chunk)
+        lines = (partial + text).split("\n")
+        partial = "" if not chunk else lines.pop()
+
+        for line in lines:
+            line = line.rstrip("\r") if not record else line
+            record = record + "\n" + line if record else line
+            if record.count('"') % 2:
+                continue
+            if header is None:
+                header = record
+            elif record.strip():
+                rows.append(record)
+            record = ""
+            if len(rows) >= batch_rows:
+                yield to_frame(rows)
+                rows = []
+
+        if not chunk:
+            break
+
+    if record.strip() and header is not None:
+        rows.append(record)
+    if rows:
+        yield to_frame(rows)
+
+
+def process_csv_stream(binary_file, platform, save_to_db=True, chunk_size=None, batch_rows=None, on_batch=None,
+                       ledger=None, shop=""):
+    """
+    Stream a CSV export through transform_dataframe in bounded batches.
+
+    Only the current batch and a small preview are held in memory. Each batch
+    is saved before the next one is read when save_to_db is set, and passed
+    to on_batch(df) if given. With a ledger (and save_to_db), rows saved
+    before unchanged are skipped before the transform.
+
+    Returns:
+        dict: status, rows_processed, inserted, skipped, batches, columns,
+            preview, fingerprints
+    """
+    rows_processed = 0
+    inserted = 0
+    skipped = 0
+    batches = 0
+    columns = []
+    preview = []
+    fingerprints = []
+    try:
+        for raw in iter_csv_batches(binary_file, chunk_size, batch_rows):
+            df, batch_inserted, batch_skipped, batch_fingerprints = _transform_and_save(
+                raw, platform, save_to_db, ledger, shop
+            )
+            fingerprints.extend(batch_fingerprints)
+            inserted += batch_inserted
+            skipped += batch_skipped
+            batches += 1
+            rows_processed += len(df)
+            if not columns:
+                columns = list(df.columns)
+            if len(preview) < config.UPLOAD_PREVIEW_ROWS:
+                preview.extend(dataframe_records(df.head(config.UPLOAD_PREVIEW_ROWS - len(preview))))
+            if on_batch is not None:
+                on_batch(df)
+        return {
+            "status": "success",
+            "rows_processed": rows_processed,
+            "inserted": inserted,
+            "skipped": skipped,
+            "batches": batches,
+            "columns": columns,
+            "preview": preview,
+            "fingerprints": fingerprints,
+        }
+    except Exception as e:
+        return {"status": "error", "detail": str(e)}
+
+
+def run_upload(source, platform, save_to_db=True, stream=True, result_dir=None, delete_source=False, dedupe=None,
+               shop=""):
+    """
+    Job entry point used by app.jobs executors (must stay picklable).
+
+    Args:
+        source: Path to the uploaded file, or an open binary file object
+        platform (str): "Lazada" or "Shopee"
+        save_to_db (bool): Append batches to the upload table
+        stream (bool): Transform in bounded batches instead of reading it whole
+        result_dir (str): Write each batch there as batch_filename(i)
+        delete_source (bool): Remove the source path when done
+        dedupe (bool): With save_to_db, skip a file saved before and rows saved
+            before unchanged (app.ledger); defaults to config.UPLOAD_DEDUPE
+        shop (str): Shop the export belongs to; saved rows are keyed by
+            platform, shop and day
+
+    Returns:
+        dict: process_csv_stream result plus batch_rows, memory and duplicate_file
+    """
+    from app.ledger import file_sha256, upload_ledger
+
+    batch_rows = []
+    dedupe = config.UPLOAD_DEDUPE if dedupe is None else dedupe
+    ledger = upload_ledger if dedupe and save_to_db else None
+
+    def spool(df):
+        if result_dir:
+            df.to_pickle(os.path.join(result_dir, batch_filename(len(batch_rows))))
+        batch_rows.append(len(df))
+
+    binary_file = open(source, "rb") if isinstance(source, str) else source
+    try:
+        content_hash = file_sha256(binary_file) if ledger is not None else None
+        seen_rows = ledger.seen_file(content_hash, platform, shop) if ledger is not None else None
+        if seen_rows is not None:
+            # Identical file already saved: nothing to parse or write
+            return {
+                "status": "success",
+                "rows_processed": 0,
+                "inserted": 0,
+                "skipped": seen_rows,
+                "duplicate_file": True,
+                "batches": 0,
+                "columns": [],
+                "preview": [],
+                "batch_rows": [],
+                "memory": {},
+            }
+        with track_memory() as memory:
+            if stream:
+                result = process_csv_stream(binary_file, platform, save_to_db=save_to_db, on_batch=spool,
+                                            ledger=ledger, shop=shop)
+            else:
+                text = io.TextIOWrapper(binary_file, encoding="utf-8-sig")
+                result = process_csv_file(text, platform, save_to_db=save_to_db, ledger=ledger, shop=shop)
+                if result["status"] == "success":
+                    df = result.pop("dataframe")
+                    spool(df)
+                    result["columns"] = list(df.columns)
+                    result["preview"] = dataframe_records(df.head(config.UPLOAD_PREVIEW_ROWS))
+                    result["batches"] = 1
+                text.detach()
+    finally:
+        if isinstance(source, str):
+            binary_file.close()
+            if delete_source:
+                os.remove(source)
+
+    fingerprints = result.pop("fingerprints", [])
+    if ledger is not None and result["status"] == "success":
+        ledger.record_file(content_hash, platform, shop, fingerprints)
+    result["duplicate_file"] = False
+    result["batch_rows"] = batch_rows
+    result["memory"] = memory
+    return result
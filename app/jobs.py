@@ -0,0 +1,171 @@
+"""
+Execution backend for CPU-bound ETL work.
+
+The upload routes hand process_csv_* work to an EtlExecutor so pandas never
+runs on the event loop. Backends (ETL_EXECUTOR):
+    thread  - ThreadPoolExecutor, route awaits the result
+    process - ProcessPoolExecutor, route awaits the result
+    queue   - ThreadPoolExecutor, route returns a job_id to poll at /jobs/{id}
+
+At most max_workers jobs run and max_pending wait; beyond that submit()
+raises Saturated and the routes answer 429.
+"""
+import asyncio
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from starlette.concurrency import run_in_threadpool
+
+from app import config
+
+BACKENDS = ("thread", "process", "queue")
+
+
+class Saturated(Exception):
+    pass
+
+
+class JobNotFound(KeyError):
+    pass
+
+
+class EtlExecutor:
+    def __init__(self, backend=None, max_workers=None, max_pending=None, job_ttl_seconds=None):
+        self.backend = backend or config.ETL_EXECUTOR
+        if self.backend not in BACKENDS:
+            raise ValueError(f"ETL_EXECUTOR must be one of {', '.join(BACKENDS)}")
+        self.max_workers = max_workers or config.ETL_MAX_WORKERS
+        self.max_pending = config.ETL_MAX_PENDING if max_pending is None else max_pending
+        self.job_ttl_seconds = job_ttl_seconds or config.JOBS_TTL_SECONDS
+
+        pool_class = ProcessPoolExecutor if self.backend == "process" else ThreadPoolExecutor
+        self._pool = pool_class(max_workers=self.max_workers)
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_pending)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    @property
+    def queued(self):
+        """True when routes should return a job_id instead of waiting."""
+        return self.backend == "queue"
+
+    def submit(self, fn, *args, on_done=None, **kwargs):
+        """
+        Schedule fn(*args, **kwargs) and return (job_id, future).
+
+        on_done(result) runs in the calling process once fn succeeds; its
+        return value becomes the job result reported by status().
+
+        Raises:
+            Saturated: All worker and pending slots are taken
+        """
+        if not self._slots.acquire(blocking=False):
+            raise Saturated()
+
+        self._purge_finished()
+        job_id = uuid.uuid4().hex
+        job = {"job_id": job_id, "submitted_at": time.time(), "finished_at": None, "result": None, "error": None}
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        job["future"] = future
+        with self._lock:
+            self._jobs[job_id] = job
+
+        def finish(done):
+            try:
+                result = done.result()
+                job["result"] = on_done(result) if on_done is not None else result
+            except Exception as e:
+                job["error"] = str(e)
+            finally:
+                job["finished_at"] = time.time()
+                self._slots.release()
+
+        future.add_done_callback(finish)
+        return job_id, future
+
+    async def run(self, fn, *args, on_done=None, **kwargs):
+        """Submit and await fn without blocking the event loop."""
+        job_id, future = self.submit(fn, *args, on_done=on_done, **kwargs)
+        # finish() was registered first, so it has run by the time this resumes
+        await asyncio.wrap_future(future)
+        job = self._jobs[job_id]
+        if job["error"] is not None:
+            raise RuntimeError(job["error"])
+        return job["result"]
+
+    def status(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise JobNotFound(job_id)
+
+        future = job["future"]
+        if job["finished_at"] is not None:
+            state = "error" if job["error"] is not None else "done"
+        elif future.running():
+            state = "running"
+        else:
+            state = "queued"
+        return {
+            "job_id": job_id,
+            "status": state,
+            "submitted_at": job["submitted_at"],
+            "finished_at": job["finished_at"],
+            "result": job["result"],
+            "error": job["error"],
+        }
+
+    def stats(self):
+        with self._lock:
+            unfinished = sum(1 for job in self._jobs.values() if job["finished_at"] is None)
+        return {
+            "backend": self.backend,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "in_flight": unfinished,
+        }
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+    def _purge_finished(self):
+        cutoff = time.time() - self.job_ttl_seconds
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job["finished_at"] is not None and job["finished_at"] < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+
+def _copy_to_temp(file_obj):
+    with tempfile.NamedTemporaryFile(prefix="upload_", suffix=".csv", delete=False) as tmp:
+        file_obj.seek(0)
+        shutil.copyfileobj(file_obj, tmp, config.UPLOAD_CHUNK_SIZE)
+        return tmp.name
+
+
+async def upload_source(upload_file, executor):
+    """
+    Return (source, delete_source) for run_upload.
+
+    The thread backend reads the UploadFile directly. Process workers cannot
+    share it and queued jobs outlive the request (which closes the upload),
+    so those get a temp copy on disk that the job deletes when done.
+    """
+    if executor.backend == "thread":
+        return upload_file.file, False
+    path = await run_in_threadpool(_copy_to_temp, upload_file.file)
+    return path, True
+
+
+etl_executor = EtlExecutor()
@@ -0,0 +1,167 @@
+"""
+Ingestion ledger for uploaded exports.
+
+Staff re-upload the same or overlapping exports. The ledger lives in the
+target database, next to the rows it describes, so it is always in step
+with what is actually stored there (another database, a truncated table
+or a failed write all simply mean "not saved yet"):
+
+    - every saved upload row carries its shop and the row_fingerprint of
+      the raw cells it came from, written in the same COPY as the row; an
+      overlapping file only transforms and writes the days that are new
+      or whose numbers changed
+    - ingest_files keeps the SHA-256 of every file that was fully saved
+      with the fingerprints of its rows, so an identical file is answered
+      without being parsed at all, provided the upload table still holds
+      every one of those rows
+
+Rows are keyed by platform, shop and day: two shops' exports of the same
+platform never replace each other's days.
+
+Fingerprints are pandas' vectorized 64-bit row hashes of the raw cells, so
+checking a batch is one hash pass plus one indexed query.
+"""
+import hashlib
+
+import pandas as pd
+
+from app import config
+from app.Transformation.standardize_fact_traffic import parse_dates, split_summary_rows
+
+LEDGER_FILES_TABLE = "ingest_files"
+# Columns save_dataframe() adds to the upload table for the ledger
+LEDGER_COLUMNS = {"shop": "varchar NOT NULL DEFAULT ''", "row_fingerprint": "bigint"}
+
+
+def file_sha256(binary_file, chunk_size=1024 * 1024):
+    """Hex SHA-256 of a binary file object from its current position; rewinds to where it started."""
+    start = binary_file.tell()
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: binary_file.read(chunk_size), b""):
+        digest.update(chunk)
+    binary_file.seek(start)
+    return digest.hexdigest()
+
+
+def row_fingerprints(raw):
+    """Signed 64-bit hash per row of a raw (all-string) DataFrame."""
+    return pd.util.hash_pandas_object(raw, index=False).to_numpy().view("int64")
+
+
+def daily_row_keys(raw, column_map):
+    """
+    Day and fingerprint of every dated daily row of a raw export batch.
+
+    Returns:
+        tuple: (raw index of those rows, "YYYY-MM-DD" keys, fingerprints);
+            empty when the export has no Date column
+    """
+    renamed = raw.rename(columns=lambda c: column_map.get(c.strip(), c.strip()))
+    if "date" not in renamed.columns:
+        return raw.index[:0], [], row_fingerprints(raw.iloc[:0])
+    daily, _ = split_summary_rows(renamed)
+    dates = parse_dates(daily["date"].astype(str).str.strip())
+    dated = dates.notna().to_numpy()
+    index = daily.index[dated]
+    return index, dates[dated].dt.strftime("%Y-%m-%d").tolist(), row_fingerprints(raw.loc[index])
+
+
+class IngestionLedger:
+    def __init__(self, table_name=None, db_conn_string=None):
+        self.table_name = table_name or config.UPLOAD_TABLE
+        self.db_conn_string = db_conn_string
+
+    def _fetch(self, sql, params):
+        """Rows of a read-only query; a missing table or ledger column reads as no rows."""
+        import psycopg2
+
+        from app.db import get_pool
+
+        with get_pool(self.db_conn_string).connection() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(sql, params)
+                    return cursor.fetchall()
+            except (psycopg2.errors.UndefinedTable, psycopg2.errors.UndefinedColumn):
+                return []
+            finally:
+                conn.rollback()
+
+    # ------------------------------------------------------------------ files
+
+    def seen_file(self, content_hash, platform, shop=""):
+        """Rows saved from an identical earlier file that are all still stored, or None."""
+        from app.loading_script import quote_ident
+
+        rows = self._fetch(
+            f"SELECT f.rows FROM {quote_ident(LEDGER_FILES_TABLE)} f "
+            "WHERE f.content_hash = %s AND f.platform = %s AND f.shop = %s AND f.target_table = %s "
+            f"AND (SELECT count(*) FROM {quote_ident(self.table_name)} u WHERE u.platform = f.platform "
+            "AND u.shop = f.shop AND u.row_fingerprint = ANY(f.fingerprints)) >= f.rows",
+            (content_hash, platform, shop, self.table_name),
+        )
+        return rows[0][0] if rows else None
+
+    def record_file(self, content_hash, platform, shop, fingerprints):
+        """Remember a fully saved file and the fingerprints of its rows."""
+        from app.db import get_pool
+        from app.loading_script import quote_ident
+
+        table = quote_ident(LEDGER_FILES_TABLE)
+        with get_pool(self.db_conn_string).connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} (content_hash varchar NOT NULL, platform varchar NOT NULL, "
+                    "shop varchar NOT NULL, target_table varchar NOT NULL, rows int NOT NULL, fingerprints bigint[], "
+                    "recorded_at timestamptz DEFAULT now(), PRIMARY KEY (content_hash, platform, shop, target_table))"
+                )
+                cursor.execute(
+                    f"INSERT INTO {table} (content_hash, platform, shop, target_table, rows, fingerprints) "
+                    "VALUES (%s, %s, %s, %s, %s, %s) ON CONFLICT (content_hash, platform, shop, target_table) "
+                    "DO UPDATE SET rows = EXCLUDED.rows, fingerprints = EXCLUDED.fingerprints, recorded_at = now()",
+                    (content_hash, platform, shop, self.table_name, len(fingerprints), [int(f) for f in fingerprints]),
+                )
+            conn.commit()
+
+    # ------------------------------------------------------------------- rows
+
+    def stored_fingerprints(self, platform, shop, keys):
+        """Series "YYYY-MM-DD" -> fingerprint of the upload rows stored for those days."""
+        from app.loading_script import quote_ident
+
+        days = list(dict.fromkeys(keys))
+        if not days:
+            return pd.Series([], dtype="int64")
+        found = self._fetch(
+            f"SELECT to_char(date, 'YYYY-MM-DD'), row_fingerprint FROM {quote_ident(self.table_name)} "
+            "WHERE platform = %s AND shop = %s AND date::date = ANY(%s::date[]) AND row_fingerprint IS NOT NULL",
+            (platform, shop, days),
+        )
+        return pd.Series([f for _, f in found], index=[k for k, _ in found], dtype="int64")
+
+    def filter_batch(self, raw, platform, column_map, shop=""):
+        """
+        Drop the rows of a raw export batch that are already stored unchanged.
+
+        Args:
+            raw (DataFrame): Batch read with dtype=str
+            platform (str): "Lazada" or "Shopee"
+            column_map (dict): Export header -> standardized column name
+            shop (str): Shop the export belongs to
+
+        Returns:
+            tuple: (raw rows to transform, Series day -> fingerprint of the
+                rows kept, number of rows skipped, fingerprints of every
+                dated row of the batch)
+        """
+        index, keys, fingerprints = daily_row_keys(raw, column_map)
+        stored = self.stored_fingerprints(platform, shop, keys)
+        stored = stored[~stored.index.duplicated(keep="last")]
+        previous = stored.astype("Int64").reindex(keys)
+        unchanged = (previous == fingerprints).fillna(False).to_numpy(dtype=bool)
+        keep = raw.index.difference(index[unchanged])
+        pending = pd.Series(fingerprints[~unchanged], index=pd.Index(keys)[~unchanged], dtype="int64")
+        return raw.loc[keep], pending, int(unchanged.sum()), fingerprints
+
+
+upload_ledger = IngestionLedger()
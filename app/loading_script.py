@@ -1,87 +1,438 @@
 import pandas as pd
 import psycopg2
 from io import StringIO
-import os 
+import os
 
-# from [.py file name] import [function_name] 
+from app import config
+from app.cube import olap_cube
+from app.db import get_pool
+from app.pg_binary import BinaryCopyStream, dtype_staging_type, staging_type
+from app.query_cache import query_cache
+from app.schema import get_table, load_order
 
-from shopee_transform import get_shopee_transactions
-from lazada_transform import get_lazada_transactions
+# from [.py file name] import [function_name]
 
-def get_combined_transactions():
-    print("Fetching standardized data from transformation codes...")
-    shopee_df = get_shopee_transactions()
-    lazada_df = get_lazada_transactions()
 
-    combined_df = pd.concat([shopee_df, lazada_df], ignore_index=True)
-    
-    return combined_df
+def get_combined_transactions(sync=None, now=None):
+    """
+    Orders changed since the last successful load, from both marketplaces.
 
-def load_data_with_upsert(df, table_name, db_conn_string):
-    conn = None
+    Each source is read from its watermark (minus the overlap window, see
+    app/watermarks.py) up to now, both in parallel. New watermarks are
+    staged on sync; call sync.commit() once the rows are loaded. A source
+    that fails is skipped and keeps its old watermark.
+
+    Returns:
+        DataFrame: One row per order with transaction_id, platform, updated_at
+            and the order's items (order_items for Lazada, item_list for Shopee)
+    """
+    # Extraction modules are imported here so the loader can be used on its own
+    from app.Extraction import lazada_api_calls as lazada
+    from app.Extraction import shopee_api_calls as shopee
+    from app.Extraction.connector import run_extraction
+    from app.watermarks import IncrementalSync
+
+    sync = sync or IncrementalSync()
+    lazada_start, end = sync.window("lazada", "orders", now)
+    shopee_start, _ = sync.window("shopee", "orders", end)
+
+    print(f"Fetching orders changed since {lazada_start} (Lazada) / {shopee_start} (Shopee)...")
+    results = run_extraction({
+        "lazada": (lazada.LazadaClient(), lambda c: lazada.collect_orders(c, lazada_start.isoformat())),
+        "shopee": (shopee.ShopeeClient(), lambda c: shopee.collect_orders(c, int(shopee_start.timestamp()), int(end.timestamp()))),
+    })
+
+    frames = []
+    if results["lazada"].get("status") != "error":
+        lazada_df = pd.json_normalize(results["lazada"]["orders"])
+        if not lazada_df.empty:
+            by_order = {}
+            for item in results["lazada"].get("order_items") or []:
+                by_order.setdefault(str(item.get("order_id")), []).append(item)
+            lazada_df["order_items"] = [by_order.get(str(order_id), []) for order_id in lazada_df["order_id"]]
+            lazada_df["updated_at"] = pd.to_datetime(lazada_df["updated_at"], utc=True)
+            lazada_df["transaction_id"] = "LZ-" + lazada_df["order_id"].astype(str)
+            lazada_df["platform"] = "Lazada"
+            frames.append(lazada_df)
+            sync.advance("lazada", "orders", lazada_df["updated_at"], lazada_df["order_id"])
+
+    if results["shopee"].get("status") != "error":
+        shopee_df = pd.json_normalize(results["shopee"]["order_details"])
+        if not shopee_df.empty:
+            shopee_df["updated_at"] = pd.to_datetime(shopee_df.get("update_time"), unit="s", utc=True)
+            shopee_df["transaction_id"] = "SP-" + shopee_df["order_sn"].astype(str)
+            shopee_df["platform"] = "Shopee"
+            frames.append(shopee_df)
+        # get_order_list filters on update_time server-side, so the window end is safe to keep
+        sync.advance("shopee", "orders", shopee_df.get("updated_at", pd.Series(dtype="datetime64[ns, UTC]")),
+                     shopee_df.get("order_sn"), fallback=end)
+
+    if not frames:
+        return pd.DataFrame(columns=["transaction_id", "platform", "updated_at"])
+    combined_df = pd.concat(frames, ignore_index=True)
+    # The overlap window re-reads some orders; keep the latest version of each
+    combined_df = combined_df.sort_values("updated_at").drop_duplicates("transaction_id", keep="last")
+    print(f"Fetched {len(combined_df)} changed orders.")
+
+    return combined_df.reset_index(drop=True)
+
+
+def transaction_items(transactions):
+    """
+    get_combined_transactions() orders -> their items, one DataFrame per platform.
+
+    Every item row carries its order's fields (buyer, order time, ...), as
+    the Fact_Orders transform expects.
+
+    Returns:
+        dict: platform -> DataFrame of raw order items
+    """
+    from app.Transformation.standardize_fact_orders import order_items
+
+    items = {}
+    for platform, orders in transactions.groupby("platform", sort=True):
+        rows = order_items(orders.to_dict("records"), platform)
+        if rows:
+            items[platform] = pd.DataFrame(rows)
+    return items
+
+
+def load_order_items(items, staging=None, batch_id=None):
+    """
+    Load raw order items through the Fact_Orders transform (validation,
+    quarantine, surrogate keys), a batch at a time.
+
+    Args:
+        items (dict): platform -> DataFrame, e.g. transaction_items() output
+        staging (StagingArea): Stage every raw batch before it is transformed
+        batch_id (str): Stem of the staged file names
+
+    Returns:
+        dict: status, the process_order_items() result per platform and a
+            detail naming the platforms that failed
+    """
+    from app.Transformation.standardize_fact_orders import iter_item_batches, process_order_items
+
+    platforms = {platform: process_order_items(iter_item_batches(df), platform, load=True, staging=staging,
+                                               batch_id=batch_id)
+                 for platform, df in items.items()}
+    failed = [f"{platform}: {result['detail']}" for platform, result in platforms.items() if result["status"] != "success"]
+    if failed:
+        return {"status": "error", "detail": "; ".join(failed), "platforms": platforms}
+    return {"status": "success", "platforms": platforms}
+
+
+def quote_ident(name):
+    """Quote a table/column name (the schema uses mixed-case names like "LTV_tier")."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def resolve_columns(df, table_name, columns=None, conflict_keys=None, schema_path=None):
+    """
+    Work out which columns to load and which columns identify a row.
+
+    Columns default to the schema columns present in df; conflict keys
+    default to the table's primary key. Tables that are not in the schema
+    file need both passed explicitly.
+
+    Returns:
+        tuple: (table dict or None, columns, conflict_keys)
+    """
     try:
-        conn = psycopg2.connect(db_conn_string)
-        conn.autocommit = False # Ensures the operation is atomic
-        cursor = conn.cursor()
+        table = get_table(table_name, schema_path)
+    except KeyError:
+        table = None
+
+    if columns is None:
+        if table is None:
+            columns = list(df.columns)
+        else:
+            columns = [c["name"] for c in table["columns"] if c["name"] in df.columns]
+    if conflict_keys is None:
+        if table is None or not table["primary_key"]:
+            raise ValueError(f"conflict_keys must be given for table {table_name}")
+        conflict_keys = table["primary_key"]
+
+    missing = [key for key in conflict_keys if key not in columns]
+    if missing:
+        raise ValueError(f"DataFrame for {table_name} is missing key columns: {', '.join(missing)}")
+    return table, list(columns), list(conflict_keys)
+
+
+def prepare_frame(df, table, columns, conflict_keys):
+    """
+    Select the load columns and make their text form COPY-safe.
 
-        # Create an in-memory CSV file from the DataFrame
+    Integer columns holding NaN are floats in pandas and would be written as
+    "5.0", date columns would carry a time part. Rows repeating a conflict key
+    keep the last one, since ON CONFLICT cannot touch a row twice.
+    """
+    df = df[columns].drop_duplicates(subset=conflict_keys, keep="last")
+    if table is None:
+        return df
+
+    types = {c["name"]: c["type"] for c in table["columns"]}
+    converted = {}
+    for column in columns:
+        column_type = types.get(column, "")
+        if column_type in ("int", "integer", "bigint", "smallint", "serial") and df[column].dtype.kind == "f":
+            converted[column] = df[column].astype("Int64")
+        elif column_type == "date" and df[column].dtype.kind == "M":
+            converted[column] = df[column].dt.date
+    return df.assign(**converted) if converted else df
+
+
+def build_upsert_sql(table_name, staging_table, columns, conflict_keys):
+    """INSERT ... SELECT from the staging table with ON CONFLICT on conflict_keys."""
+    column_list = ", ".join(quote_ident(c) for c in columns)
+    updates = [c for c in columns if c not in conflict_keys]
+    if updates:
+        action = "DO UPDATE SET " + ", ".join(f"{quote_ident(c)} = EXCLUDED.{quote_ident(c)}" for c in updates)
+    else:
+        action = "DO NOTHING"
+    return (
+        f"INSERT INTO {quote_ident(table_name)} ({column_list}) "
+        f"SELECT {column_list} FROM {quote_ident(staging_table)} "
+        f"ON CONFLICT ({', '.join(quote_ident(k) for k in conflict_keys)}) {action};"
+    )
+
+
+def copy_in_batches(cursor, df, staging_table, columns, batch_rows=None):
+    """COPY df into the staging table batch_rows rows at a time, so only one batch is ever held as CSV text."""
+    batch_rows = batch_rows or config.LOAD_BATCH_ROWS
+    copy_sql = f"COPY {quote_ident(staging_table)} ({', '.join(quote_ident(c) for c in columns)}) FROM STDIN WITH (FORMAT CSV)"
+    for start in range(0, len(df), batch_rows):
         csv_buffer = StringIO()
-        df.to_csv(csv_buffer, index=False, header=False) 
+        df.iloc[start:start + batch_rows].to_csv(csv_buffer, index=False, header=False)
         csv_buffer.seek(0)
-        
-        # Create a temporary table with the same structure as the destination
-        print("Creating temporary table...")
-        cursor.execute(f"CREATE TEMP TABLE temp_import (LIKE {table_name} INCLUDING DEFAULTS);")
-
-        print("Copying data to temporary table...")
-        cursor.copy_expert(f"COPY temp_import FROM STDIN WITH (FORMAT CSV)", csv_buffer)
-
-        # Execute the upsert query using ON CONFLICT (for PostgreSQL)
-        # Query contents to be changed to match actual table columns
-        upsert_query = f"""
-        INSERT INTO {table_name} (
-            transaction_id, product_name, quantity, price, customer_name, transaction_date, source
+        cursor.copy_expert(copy_sql, csv_buffer)
+
+
+def copy_binary(cursor, df, staging_table, columns, pg_types, batch_rows=None):
+    """COPY df into the staging table in binary format, encoded batch_rows rows at a time from the column arrays."""
+    stream = BinaryCopyStream(df[columns], pg_types, batch_rows or config.LOAD_BATCH_ROWS)
+    copy_sql = f"COPY {quote_ident(staging_table)} ({', '.join(quote_ident(c) for c in columns)}) FROM STDIN WITH (FORMAT BINARY)"
+    cursor.copy_expert(copy_sql, stream, size=1024 * 1024)
+
+
+def staging_types(df, table, columns):
+    """Binary staging column types, from the schema where known, else from the pandas dtype."""
+    types = {c["name"]: c["type"] for c in table["columns"]} if table else {}
+    return [staging_type(types[c]) if c in types else dtype_staging_type(df[c]) for c in columns]
+
+
+def upsert_table(cursor, df, table_name, columns=None, conflict_keys=None, batch_rows=None, schema_path=None,
+                 copy_format=None):
+    """
+    Upsert one DataFrame through a temp staging table using an open cursor.
+
+    copy_format is "csv" (text COPY) or "binary" (binary COPY encoded from the
+    column arrays, see app/pg_binary.py); config.LOAD_COPY_FORMAT by default.
+    The caller owns the transaction. Returns the number of rows staged.
+    """
+    copy_format = copy_format or config.LOAD_COPY_FORMAT
+    table, columns, conflict_keys = resolve_columns(df, table_name, columns, conflict_keys, schema_path)
+    df = prepare_frame(df, table, columns, conflict_keys)
+
+    if copy_format == "binary":
+        staging_table = f"tmpb_{table_name}"
+        pg_types = staging_types(df, table, columns)
+        column_defs = ", ".join(f"{quote_ident(c)} {t}" for c, t in zip(columns, pg_types))
+        cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS {quote_ident(staging_table)} ({column_defs}) ON COMMIT DROP;")
+        cursor.execute(f"TRUNCATE {quote_ident(staging_table)};")
+        copy_binary(cursor, df, staging_table, columns, pg_types, batch_rows)
+    else:
+        staging_table = f"tmp_{table_name}"
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {quote_ident(staging_table)} "
+            f"(LIKE {quote_ident(table_name)} INCLUDING DEFAULTS) ON COMMIT DROP;"
         )
-        SELECT 
-            transaction_id, product_name, quantity, price, customer_name, transaction_date, source
-        FROM temp_import
-        ON CONFLICT (transaction_id) DO UPDATE SET
-            product_name = EXCLUDED.product_name,
-            quantity = EXCLUDED.quantity,
-            price = EXCLUDED.price,
-            customer_name = EXCLUDED.customer_name,
-            transaction_date = EXCLUDED.transaction_date,
-            source = EXCLUDED.source;
-        """
-        print("Executing upsert...")
-        cursor.execute(upsert_query)
+        cursor.execute(f"TRUNCATE {quote_ident(staging_table)};")
+        copy_in_batches(cursor, df, staging_table, columns, batch_rows)
+
+    cursor.execute(build_upsert_sql(table_name, staging_table, columns, conflict_keys))
+    return len(df)
+
+
+def load_tables(frames, db_conn_string=None, conflict_keys=None, batch_rows=None, schema_path=None, copy_format=None,
+                refresh_summary=True, before_commit=None):
+    """
+    Upsert several tables in one transaction.
+
+    Args:
+        frames (dict): table name -> DataFrame; shop-level Fact_Traffic rows bring
+            the key-0 Dim_Product / Dim_Customer members they reference
+        db_conn_string (str): Postgres connection string (config.DB_URL if None); the
+            connection is borrowed from the shared pool for that DSN
+        conflict_keys (dict): Optional table name -> conflict key columns
+        batch_rows (int): Rows per COPY batch (config.LOAD_BATCH_ROWS by default)
+        schema_path (str): Schema file to read table structure from
+        copy_format (str): "csv" or "binary" (config.LOAD_COPY_FORMAT by default)
+        refresh_summary (bool): Re-aggregate Daily_Sales_Summary / Sales_Summary for
+            the days touched by Fact_Orders / Fact_Sales and Orders rows (their
+            new days and the days they were stored under), Voucher_Summary for
+            the vouchers in Voucher_Usage rows and Fact_Traffic for the platform
+            days in Fact_Traffic_Shop rows, in the same transaction (schemas
+            that have them)
+        before_commit: Optional callable run with the cursor after the upserts,
+            for more statements in the same transaction
+
+    Returns:
+        dict: status and rows per table, or status/detail on error (nothing is committed)
+    """
+    from app.Transformation.standardize_fact_traffic import with_shop_level_members
+
+    conflict_keys = conflict_keys or {}
+    frames = with_shop_level_members(frames)
+    pool = None
+    conn = None
+    try:
+        pool = get_pool(db_conn_string)
+        conn = pool.getconn()
+        conn.autocommit = False # Ensures the operation is atomic
+        cursor = conn.cursor()
+
+        rows = {}
+        stored_days = summary_stored_days(cursor, frames, schema_path) if refresh_summary else {}
+        # Dimensions first so fact foreign keys resolve
+        for table_name in load_order(list(frames), schema_path):
+            df = frames[table_name]
+            if df is None or df.empty:
+                continue
+            print(f"Upserting {len(df)} rows into '{table_name}'...")
+            rows[table_name] = upsert_table(
+                cursor, df, table_name, conflict_keys=conflict_keys.get(table_name),
+                batch_rows=batch_rows, schema_path=schema_path, copy_format=copy_format
+            )
+        if refresh_summary:
+            refresh_touched_summaries(cursor, frames, schema_path, stored_days)
+        if before_commit is not None:
+            before_commit(cursor)
         conn.commit()
-        
-        print(f"Successfully upserted {len(df)} records into '{table_name}'.")
 
     except (Exception, psycopg2.DatabaseError) as error:
         print(f"An error occurred: {error}")
         if conn:
             conn.rollback() # Rollback if an error occurs
+        return {"status": "error", "detail": str(error)}
     finally:
         if conn:
-            conn.close()
+            pool.putconn(conn)
+
+    # The rows are committed: a failure refreshing this process's caches is logged, not returned
+    for refresh in (query_cache.invalidate_loaded, olap_cube.add_loaded):
+        try:
+            refresh(frames)
+        except Exception as error:
+            print(f"Committed load, but {refresh.__qualname__} failed: {error}")
+
+    print(f"Successfully upserted {sum(rows.values())} records into {len(rows)} tables.")
+    return {"status": "success", "rows": rows}
+
+
+def _has_table(name, schema_path=None):
+    try:
+        get_table(name, schema_path)
+    except KeyError:
+        return False
+    return True
+
+
+def _daily_summaries():
+    """(summary table, its fact source tables, refresh function) per daily summary."""
+    from app.summary import (DAILY_SOURCE_TABLES, DAILY_SUMMARY_TABLE, SOURCE_TABLES, SUMMARY_TABLE,
+                             refresh_daily_summary, refresh_sales_summary)
+
+    return [(SUMMARY_TABLE, SOURCE_TABLES, refresh_sales_summary),
+            (DAILY_SUMMARY_TABLE, DAILY_SOURCE_TABLES, refresh_daily_summary)]
+
+
+def summary_stored_days(cursor, frames, schema_path=None):
+    """
+    Before an upsert: summary table -> time_keys the loaded fact rows are
+    stored under now, so a day a row moves away from is refreshed too.
+    """
+    from app.summary import stored_time_keys
+
+    stored = {}
+    for summary, sources, _ in _daily_summaries():
+        loaded = [name for name in sources if name in frames and _has_table(name, schema_path)]
+        if loaded and _has_table(summary, schema_path):
+            stored[summary] = stored_time_keys(cursor, frames, loaded, schema_path)
+    return stored
+
+
+def refresh_touched_summaries(cursor, frames, schema_path=None, stored_days=None):
+    """
+    Refresh Sales_Summary / Daily_Sales_Summary / Voucher_Summary /
+    Fact_Traffic for the days / vouchers / traffic keys in the loaded frames,
+    if the schema has them. stored_days (summary_stored_days()) adds the
+    days the loaded rows were stored under before the load.
+    """
+    from app.summary import (TRAFFIC_SHOP_TABLE, TRAFFIC_TABLE, VOUCHER_SOURCE_TABLE, VOUCHER_SUMMARY_TABLE,
+                             refresh_fact_traffic, refresh_voucher_summary, touched_time_keys, touched_traffic_keys,
+                             touched_voucher_keys)
+
+    def has_table(name):
+        return _has_table(name, schema_path)
+
+    for summary, sources, refresh in _daily_summaries():
+        if any(name in frames for name in sources) and has_table(summary):
+            time_keys = touched_time_keys(frames, sources, (stored_days or {}).get(summary))
+            if time_keys:
+                print(f"Refreshing {summary} for {len(time_keys)} days...")
+                refresh(cursor, time_keys)
+    if VOUCHER_SOURCE_TABLE in frames and has_table(VOUCHER_SUMMARY_TABLE):
+        voucher_keys = touched_voucher_keys(frames)
+        if voucher_keys:
+            print(f"Refreshing {VOUCHER_SUMMARY_TABLE} for {len(voucher_keys)} vouchers...")
+            refresh_voucher_summary(cursor, voucher_keys)
+    if TRAFFIC_SHOP_TABLE in frames and has_table(TRAFFIC_TABLE):
+        traffic_keys = touched_traffic_keys(frames)
+        if traffic_keys:
+            print(f"Refreshing {TRAFFIC_TABLE} for {len(traffic_keys)} platform days...")
+            refresh_fact_traffic(cursor, traffic_keys)
+
+
+def load_data_with_upsert(df, table_name, db_conn_string, conflict_keys=None):
+    """Upsert a single table; columns and conflict keys come from the schema file."""
+    keys = {table_name: conflict_keys} if conflict_keys else None
+    return load_tables({table_name: df}, db_conn_string, conflict_keys=keys)
 
 
 if __name__ == "__main__":
     # Get database connection string from environment variables for security
-    DB_CONNECTION_STRING = os.getenv("SUPABASE_DB_URL") 
-    TABLE_NAME = "ecommerce_transactions"
+    DB_CONNECTION_STRING = os.getenv("SUPABASE_DB_URL")
 
     if not DB_CONNECTION_STRING:
         print("Error: SUPABASE_DB_URL environment variable is not set. Please add it to GitHub Secrets.")
     else:
         print("Starting data loading process...")
-        
-        final_df = get_combined_transactions()
-        
-        # Change table_name into the actual table from DB
-        # DB_CONNECTION_STRING should use .env properties
-        load_data_with_upsert(final_df, TABLE_NAME, DB_CONNECTION_STRING)
-        
-        print("Data loading process finished.")
\ No newline at end of file
+
+        from app.staging import staging_area
+        from app.watermarks import IncrementalSync
+
+        sync = IncrementalSync()
+        items = transaction_items(get_combined_transactions(sync))
+
+        # Orders go through the Fact_Orders transform; the loader tables come from the schema.
+        # Every batch is staged first: a failed load is retried from disk with
+        # load_order_items({p: staging_area.read("order_items", platforms=[p]), ...})
+        # instead of calling the APIs again
+        batch_id = pd.Timestamp.now(tz="UTC").strftime("%Y%m%dT%H%M%S")
+        result = load_order_items(items, staging=staging_area, batch_id=batch_id)
+        if result["status"] == "success":
+            sync.commit()  # only move the watermarks once the delta is stored
+        else:
+            print(f"Load failed: {result['detail']}")
+
+        # Customers who stopped buying turn Inactive without a new order
+        from app.Transformation.customer_metrics import refresh_customer_recency
+
+        try:
+            lapsed = refresh_customer_recency(flush=True)
+            print(f"Customers turned inactive: {len(lapsed)}")
+        except Exception as e:
+            print(f"Customer recency pass failed: {e}")
+
+        print("Data loading process finished.")
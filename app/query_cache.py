@@ -0,0 +1,164 @@
+"""
+In-process TTL + LRU cache for dashboard query results.
+
+Entries are keyed by view name and query parameters, and carry a scope:
+the tables the view reads and the time_key range the query covers (None
+for all time). When load_tables() commits, it calls invalidate_loaded()
+with the frames it wrote, and only entries whose tables and dates overlap
+the load are dropped.
+
+Every invalidation bumps a generation counter. get_or_load() notes the
+generation before running its query and the result is not stored if an
+invalidation happened meanwhile: a query that started before a load
+committed may have read the old rows.
+
+The cache lives in one process: loads run in a separate worker process
+(ETL_EXECUTOR=process, the nightly script) cannot reach it, and those
+entries expire after QUERY_CACHE_TTL_SECONDS instead.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from app import config
+
+# Tables whose rows carry dates the cache can match against
+DATED_TABLES = ("Fact_Sales", "Orders", "Order_Items", "Sales_Summary", "Voucher_Usage", "Fact_Orders", "Fact_Traffic",
+                "Fact_Traffic_Shop", "Daily_Sales_Summary")
+# Tables load_tables() rewrites from a loaded table (app/summary.py)
+REFRESHED_TABLES = {"Fact_Traffic_Shop": "Fact_Traffic", "Fact_Orders": "Daily_Sales_Summary",
+                    "Fact_Sales": "Sales_Summary", "Orders": "Sales_Summary"}
+
+
+class QueryCache:
+    def __init__(self, max_entries=None, ttl_seconds=None):
+        self.max_entries = max_entries or config.QUERY_CACHE_MAX_ENTRIES
+        self.ttl_seconds = config.QUERY_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0, "invalidated": 0, "discarded": 0}
+
+    @staticmethod
+    def make_key(view, params):
+        return (view, tuple(sorted((k, v) for k, v in params.items() if v is not None)))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry["stored_at"] > self.ttl_seconds:
+                del self._entries[key]
+                self._stats["expired"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry["value"]
+
+    def generation(self):
+        """Number of invalidations so far; pass it to put() from before the query ran."""
+        with self._lock:
+            return self._generation
+
+    def put(self, key, value, tables, time_range=None, generation=None):
+        """
+        Store a query result; skipped (returns False) when generation is
+        given and an invalidation has happened since.
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                self._stats["discarded"] += 1
+                return False
+            self._entries[key] = {
+                "value": value,
+                "stored_at": time.monotonic(),
+                "tables": frozenset(tables),
+                "time_range": time_range,
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evicted"] += 1
+            return True
+
+    def get_or_load(self, view, params, loader, tables, time_range=None):
+        """
+        Cached loader() result for view + params.
+
+        Args:
+            loader: Zero-argument function running the query
+            tables (iterable): Tables the view reads
+            time_range (tuple): (first, last) time_key the query covers, None for all
+        """
+        key = self.make_key(view, params)
+        value = self.get(key)
+        if value is None:
+            generation = self.generation()
+            value = loader()
+            self.put(key, value, tables, time_range, generation)
+        return value
+
+    def invalidate(self, tables, time_keys=None):
+        """
+        Drop entries reading any of tables whose date range overlaps the
+        change. time_keys of None means "unknown, assume all".
+
+        Returns:
+            int: Entries dropped
+        """
+        tables = set(tables)
+        keys = None if time_keys is None else sorted(set(time_keys))
+
+        def affected(entry):
+            if not entry["tables"] & tables:
+                return False
+            if keys is not None and entry["time_range"] is not None:
+                first, last = entry["time_range"]
+                if not any(first <= key <= last for key in keys):
+                    return False
+            return True
+
+        with self._lock:
+            self._generation += 1
+            stale = [key for key, entry in self._entries.items() if affected(entry)]
+            for key in stale:
+                del self._entries[key]
+            self._stats["invalidated"] += len(stale)
+        return len(stale)
+
+    def invalidate_loaded(self, frames):
+        """Invalidate for a committed load_tables() call (table name -> DataFrame)."""
+        tables = [name for name, df in frames.items() if df is not None and not df.empty]
+        if not tables:
+            return 0
+        time_keys = set()
+        for name in tables:
+            df = frames[name]
+            if name not in DATED_TABLES or "time_key" not in df:
+                time_keys = None  # dimension change: affects every date
+                break
+            time_keys.update(pd.to_numeric(df["time_key"], errors="coerce").dropna().astype("int64").tolist())
+        tables += [REFRESHED_TABLES[name] for name in tables if name in REFRESHED_TABLES]
+        return self.invalidate(tables, time_keys)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["max_entries"] = self.max_entries
+        stats["ttl_seconds"] = self.ttl_seconds
+        return stats
+
+
+query_cache = QueryCache()
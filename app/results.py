@@ -0,0 +1,150 @@
+"""
+Spooled upload results.
+
+Transformed batches are written to disk as they are produced and served back
+through a result ID, either page by page or as NDJSON, instead of being
+serialized into one JSON response.
+"""
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+from app import config
+
+
+# IDs create() hands out (uuid4 hex); anything else never reaches the filesystem
+_RESULT_ID = re.compile(r"[0-9a-f]{32}")
+
+
+class ResultNotFound(KeyError):
+    pass
+
+
+def batch_filename(index):
+    return f"batch_{index:05d}.pkl"
+
+
+class ResultStore:
+    def __init__(self, root=None, ttl_seconds=None):
+        self.root = root or config.RESULTS_DIR or os.path.join(tempfile.gettempdir(), "la_collections_results")
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else config.RESULTS_TTL_SECONDS
+        self._results = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def create(self, platform):
+        """Start a new result and return its ID."""
+        self.purge_expired()
+        result_id = uuid.uuid4().hex
+        os.makedirs(os.path.join(self.root, result_id))
+        with self._lock:
+            self._results[result_id] = {
+                "result_id": result_id,
+                "platform": platform,
+                "columns": [],
+                "batch_rows": [],
+                "rows": 0,
+                "created_at": time.time(),
+                "complete": False,
+            }
+        return result_id
+
+    def result_dir(self, result_id):
+        """Directory a worker process can write batch_filename(i) files into."""
+        self._get(result_id)
+        return os.path.join(self.root, result_id)
+
+    def append(self, result_id, df):
+        """Spool one transformed batch to disk."""
+        meta = self._get(result_id)
+        df.to_pickle(os.path.join(self.root, result_id, batch_filename(len(meta["batch_rows"]))))
+        self.add_batches(result_id, list(df.columns), [len(df)])
+
+    def add_batches(self, result_id, columns, batch_rows):
+        """Register batch files already written to result_dir()."""
+        meta = self._get(result_id)
+        with self._lock:
+            if not meta["columns"]:
+                meta["columns"] = list(columns)
+            meta["batch_rows"].extend(batch_rows)
+            meta["rows"] += sum(batch_rows)
+
+    def finish(self, result_id):
+        self._get(result_id)["complete"] = True
+
+    def meta(self, result_id):
+        meta = self._get(result_id)
+        return {key: value for key, value in meta.items() if key != "batch_rows"}
+
+    def delete(self, result_id):
+        """Remove a result and its spooled batches; unknown IDs raise ResultNotFound."""
+        if not isinstance(result_id, str) or not _RESULT_ID.fullmatch(result_id):
+            raise ResultNotFound(result_id)
+        with self._lock:
+            if self._results.pop(result_id, None) is None:
+                raise ResultNotFound(result_id)
+        root = os.path.realpath(self.root)
+        target = os.path.realpath(os.path.join(root, result_id))
+        if os.path.dirname(target) != root:
+            raise ResultNotFound(result_id)
+        shutil.rmtree(target, ignore_errors=True)
+
+    def purge_expired(self):
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [rid for rid, meta in self._results.items() if meta["created_at"] < cutoff]
+        for result_id in expired:
+            try:
+                self.delete(result_id)
+            except ResultNotFound:
+                pass  # deleted meanwhile
+
+    def iter_batches(self, result_id, columns=None, offset=0, limit=None):
+        """
+        Yield DataFrame slices covering rows [offset, offset + limit).
+
+        Batches entirely outside the window are never read from disk.
+
+        Args:
+            result_id (str): ID returned by create()
+            columns (list): Column subset to return, None for all
+            offset (int): First row to return
+            limit (int): Maximum number of rows, None for the rest
+        """
+        meta = self._get(result_id)
+        if columns:
+            unknown = [c for c in columns if c not in meta["columns"]]
+            if unknown:
+                raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+
+        end = None if limit is None else offset + limit
+        start_row = 0
+        for index, count in enumerate(list(meta["batch_rows"])):
+            batch_start, batch_end = start_row, start_row + count
+            start_row = batch_end
+            if batch_end <= offset:
+                continue
+            if end is not None and batch_start >= end:
+                break
+            df = pd.read_pickle(os.path.join(self.root, result_id, batch_filename(index)))
+            if columns:
+                df = df[columns]
+            lo = max(offset - batch_start, 0)
+            hi = count if end is None else min(end - batch_start, count)
+            yield df.iloc[lo:hi]
+
+    def _get(self, result_id):
+        with self._lock:
+            meta = self._results.get(result_id)
+        if meta is None:
+            raise ResultNotFound(result_id)
+        return meta
+
+
+result_store = ResultStore()
@@ -1,21 +1,46 @@
 #FastAPI endpoints
 
+import os
+
 from fastapi import APIRouter, UploadFile, Form, HTTPException
-import pandas as pd
-import io
-from app.etl import process_csv_file
+from fastapi.responses import JSONResponse
+from app.etl import run_upload
+from app.jobs import Saturated, etl_executor, upload_source
 
 router = APIRouter()
 
 @router.post("/upload")
 async def upload_file(file: UploadFile, platform: str = Form(...)):
-    contents = await file.read()
-    file_like = io.StringIO(contents.decode("utf-8"))
-    
-    result = process_csv_file(file_like, platform)
-    
-    if result["status"] == "success":
-        return {"message": f"Uploaded {result['inserted']} rows from {platform}", "inserted": result["inserted"]}
+    # Stream the upload in chunks on the ETL executor so large exports are
+    # saved batch by batch without blocking the event loop
+    source, delete_source = await upload_source(file, etl_executor)
+    on_done = lambda result: _upload_response(platform, result)
+
+    try:
+        if etl_executor.queued:
+            job_id, _ = etl_executor.submit(run_upload, source, platform, delete_source=delete_source, on_done=on_done)
+            return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued"})
+        response = await etl_executor.run(run_upload, source, platform, delete_source=delete_source, on_done=on_done)
+    except Saturated:
+        if delete_source:
+            os.remove(source)
+        raise HTTPException(status_code=429, detail="Too many uploads in progress, retry shortly")
+
+    if response["status"] == "success":
+        return response
     else:
-        raise HTTPException(status_code=400, detail=result["detail"])
+        raise HTTPException(status_code=400, detail=response["detail"])
+
 
+def _upload_response(platform, result):
+    if result["status"] != "success":
+        return result
+    return {
+        "status": "success",
+        "message": f"Uploaded {result['inserted']} rows from {platform}",
+        "inserted": result["inserted"],
+        "rows_skipped": result["skipped"],
+        "duplicate_file": result["duplicate_file"],
+        "batches": result["batches"],
+        "memory": result["memory"]
+    }
@@ -0,0 +1,152 @@
+"""
+Table structure read from the schema SQL files.
+
+parse_schema() turns the CREATE TABLE / ALTER TABLE ... FOREIGN KEY
+statements in data/LA_Collections_Schema.sql into plain dicts, so loaders
+can be driven by the schema instead of hand-written column lists:
+
+    {
+        "name": "Fact_Orders",
+        "columns": [{"name": "order_item_key", "type": "bigint", "nullable": False, "default": None}, ...],
+        "primary_key": ["order_item_key"],
+        "unique": [["..."]],
+        "references": {"time_key": ("Dim_Time", "time_key"), ...},
+    }
+"""
+import re
+from functools import lru_cache
+
+from app import config
+
+_CREATE_TABLE = re.compile(r'CREATE TABLE\s+"?(\w+)"?\s*\((.*?)\n\);', re.S | re.I)
+_COLUMN = re.compile(r'^"?(\w+)"?\s+([A-Za-z]+(?:\s+precision)?(?:\(\s*\d+(?:\s*,\s*\d+)?\s*\))?)(.*)$', re.I)
+_ALTER_FK = re.compile(
+    r'ALTER TABLE\s+"?(\w+)"?\s+ADD FOREIGN KEY\s*\("?(\w+)"?\)\s*REFERENCES\s+"?(\w+)"?\s*\("?(\w+)"?\)', re.I
+)
+_INLINE_REFERENCES = re.compile(r'REFERENCES\s+"?(\w+)"?\s*\("?(\w+)"?\)', re.I)
+_DEFAULT = re.compile(r"DEFAULT\s+('[^']*'|\S+)", re.I)
+_KEY_LIST = re.compile(r"\((.*?)\)")
+
+
+def _split_definitions(body):
+    """Split a CREATE TABLE body on top-level commas, dropping -- comments."""
+    body = "\n".join(line.split("--", 1)[0] for line in body.splitlines())
+    parts, depth, current = [], 0, []
+    for char in body:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current).strip())
+    return [part for part in parts if part]
+
+
+def _key_list(text):
+    match = _KEY_LIST.search(text)
+    return [name.strip().strip('"') for name in match.group(1).split(",")] if match else []
+
+
+def parse_schema(sql):
+    """
+    Parse schema SQL text.
+
+    Args:
+        sql (str): Contents of a schema .sql file
+
+    Returns:
+        dict: table name -> table dict (see module docstring), in file order
+    """
+    tables = {}
+    for name, body in _CREATE_TABLE.findall(sql):
+        table = {"name": name, "columns": [], "primary_key": [], "unique": [], "references": {}}
+        for definition in _split_definitions(body):
+            upper = definition.upper()
+            if upper.startswith("INDEX"):
+                continue
+            if upper.startswith("CONSTRAINT"):
+                definition = definition.split(None, 2)[2] if len(definition.split(None, 2)) == 3 else ""
+                upper = definition.upper()
+            if upper.startswith("PRIMARY KEY"):
+                table["primary_key"] = _key_list(definition)
+                continue
+            if upper.startswith("UNIQUE"):
+                table["unique"].append(_key_list(definition))
+                continue
+            if upper.startswith(("FOREIGN KEY", "CHECK")):
+                continue
+
+            match = _COLUMN.match(definition)
+            if not match:
+                continue
+            column, column_type, rest = match.group(1), match.group(2).lower(), match.group(3)
+            rest_upper = rest.upper()
+            default = _DEFAULT.search(rest)
+            table["columns"].append({
+                "name": column,
+                "type": column_type,
+                "nullable": "NOT NULL" not in rest_upper and "PRIMARY KEY" not in rest_upper,
+                "default": default.group(1) if default else None,
+            })
+            if "PRIMARY KEY" in rest_upper:
+                table["primary_key"] = [column]
+            if re.search(r"\bUNIQUE\b", rest_upper):
+                table["unique"].append([column])
+            reference = _INLINE_REFERENCES.search(rest)
+            if reference:
+                table["references"][column] = (reference.group(1), reference.group(2))
+        tables[name] = table
+
+    for table, column, ref_table, ref_column in _ALTER_FK.findall(sql):
+        if table in tables:
+            tables[table]["references"][column] = (ref_table, ref_column)
+    return tables
+
+
+@lru_cache(maxsize=None)
+def load_schema(path=None):
+    """Parse a schema file (config.SCHEMA_PATH by default), cached per path."""
+    with open(path or config.SCHEMA_PATH, "r", encoding="utf-8") as f:
+        return parse_schema(f.read())
+
+
+def get_table(table_name, path=None):
+    """
+    Look up one table, case-insensitively.
+
+    Raises:
+        KeyError: The table is not in the schema file
+    """
+    tables = load_schema(path)
+    if table_name in tables:
+        return tables[table_name]
+    for name, table in tables.items():
+        if name.lower() == table_name.lower():
+            return table
+    raise KeyError(f"Table {table_name} not found in {path or config.SCHEMA_PATH}")
+
+
+def load_order(table_names, path=None):
+    """Sort table names so referenced tables load before the tables using them."""
+    tables = load_schema(path)
+    ordered, visiting = [], set()
+
+    def visit(name):
+        if name in ordered or name in visiting:
+            return
+        visiting.add(name)
+        table = tables.get(name)
+        if table:
+            for ref_table, _ in table["references"].values():
+                if ref_table in table_names and ref_table != name:
+                    visit(ref_table)
+        visiting.discard(name)
+        ordered.append(name)
+
+    for name in table_names:
+        visit(name)
+    return ordered
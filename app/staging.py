@@ -0,0 +1,154 @@
+"""
+Local Parquet staging area between extraction/transform and load.
+
+Batches are written as compressed Parquet files partitioned by platform
+and date:
+
+    STAGING_DIR/<dataset>/platform=Lazada/date=2024-05-01/part-<batch_id>.parquet
+
+so a failed load, a backfill or a reprocess reads them back from disk
+(memory-mapped) instead of calling the marketplace APIs again. Writing the
+same batch_id again replaces its files, which keeps re-staging idempotent.
+"""
+import os
+import shutil
+import tempfile
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app import config
+
+UNKNOWN_DATE = "unknown"
+
+
+class StagingArea:
+    def __init__(self, root=None, compression=None):
+        self.root = root or config.STAGING_DIR
+        self.compression = compression or config.STAGING_COMPRESSION
+
+    def _partition_dir(self, dataset, platform, date):
+        return os.path.join(self.root, dataset, f"platform={platform}", f"date={date}")
+
+    def write(self, df, dataset, platform=None, platform_column="platform", date_column=None, batch_id=None,
+              dates=None):
+        """
+        Stage a DataFrame, one Parquet file per platform/date partition.
+
+        Args:
+            df (DataFrame): Rows to stage
+            dataset (str): Dataset name, e.g. "orders" or "Fact_Traffic"
+            platform (str): Platform of every row; otherwise taken from platform_column
+            date_column (str): Column whose calendar date picks the partition
+            dates (Series): Datetimes aligned with df picking the partition, instead of date_column
+            batch_id (str): File name stem; reusing one overwrites its files
+
+        Returns:
+            list: Paths written
+        """
+        batch_id = batch_id or uuid.uuid4().hex
+        if df.empty:
+            return []
+
+        platforms = pd.Series(platform, index=df.index) if platform else df[platform_column].fillna("unknown").astype(str)
+        if dates is not None or date_column:
+            dates = pd.to_datetime(df[date_column] if dates is None else dates, errors="coerce")
+            dates = dates.dt.strftime("%Y-%m-%d").fillna(UNKNOWN_DATE)
+        else:
+            dates = pd.Series(UNKNOWN_DATE, index=df.index)
+
+        paths = []
+        for (part_platform, part_date), part in df.groupby([platforms.to_numpy(), dates.to_numpy()], sort=True):
+            directory = self._partition_dir(dataset, part_platform, part_date)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{batch_id}.parquet")
+            table = pa.Table.from_pandas(part.reset_index(drop=True), preserve_index=False)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            os.close(fd)
+            pq.write_table(table, tmp_path, compression=self.compression)
+            os.replace(tmp_path, path)
+            paths.append(path)
+        return paths
+
+    def partitions(self, dataset, platforms=None, start=None, end=None):
+        """
+        (platform, date, directory) for every staged partition in range, sorted.
+
+        start/end are inclusive dates; partitions without a date are only
+        included when no range is given.
+        """
+        base = os.path.join(self.root, dataset)
+        if not os.path.isdir(base):
+            return []
+        start = None if start is None else pd.Timestamp(start).strftime("%Y-%m-%d")
+        end = None if end is None else pd.Timestamp(end).strftime("%Y-%m-%d")
+
+        found = []
+        for platform_dir in sorted(os.listdir(base)):
+            platform = platform_dir.partition("=")[2]
+            if platforms and platform not in platforms:
+                continue
+            for date_dir in sorted(os.listdir(os.path.join(base, platform_dir))):
+                date = date_dir.partition("=")[2]
+                if (start or end) and (date == UNKNOWN_DATE or (start and date < start) or (end and date > end)):
+                    continue
+                found.append((platform, date, os.path.join(base, platform_dir, date_dir)))
+        return found
+
+    def read_partition(self, directory, columns=None):
+        """All files of one partition, memory-mapped, as one DataFrame."""
+        files = sorted(f for f in os.listdir(directory) if f.endswith(".parquet"))
+        tables = [pq.read_table(os.path.join(directory, f), columns=columns, memory_map=True) for f in files]
+        return pa.concat_tables(tables, promote_options="default").to_pandas() if tables else pd.DataFrame()
+
+    def iter_partitions(self, dataset, platforms=None, start=None, end=None, columns=None):
+        """Yield (platform, date, DataFrame) one partition at a time, so memory stays bounded."""
+        for platform, date, directory in self.partitions(dataset, platforms, start, end):
+            yield platform, date, self.read_partition(directory, columns)
+
+    def read(self, dataset, platforms=None, start=None, end=None, columns=None):
+        """Every staged row in range as one DataFrame."""
+        frames = [df for _, _, df in self.iter_partitions(dataset, platforms, start, end, columns)]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def delete(self, dataset, platforms=None, start=None, end=None):
+        """Remove staged partitions in range. Returns the number removed."""
+        removed = self.partitions(dataset, platforms, start, end)
+        for _, _, directory in removed:
+            shutil.rmtree(directory, ignore_errors=True)
+        return len(removed)
+
+    def size_bytes(self, dataset):
+        total = 0
+        for _, _, directory in self.partitions(dataset):
+            total += sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+        return total
+
+
+def load_from_staging(dataset, table_name, platforms=None, start=None, end=None, db_conn_string=None,
+                      conflict_keys=None, staging=None):
+    """
+    Upsert staged partitions into table_name, one transaction per partition,
+    without touching the APIs (re-loads, backfills, reprocessing).
+
+    Returns:
+        dict: status, rows loaded and partitions loaded, or status/detail of
+            the first partition that failed (earlier partitions stay committed)
+    """
+    from app.loading_script import load_tables
+
+    staging = staging or staging_area
+    keys = {table_name: conflict_keys} if conflict_keys else None
+    rows, loaded = 0, 0
+    for platform, date, df in staging.iter_partitions(dataset, platforms, start, end):
+        result = load_tables({table_name: df}, db_conn_string, conflict_keys=keys)
+        if result["status"] != "success":
+            return {"status": "error", "detail": f"{platform}/{date}: {result['detail']}", "rows": rows, "partitions": loaded}
+        rows += len(df)
+        loaded += 1
+    return {"status": "success", "rows": rows, "partitions": loaded}
+
+
+staging_area = StagingArea()
@@ -0,0 +1,347 @@
+"""
+Incremental daily sales summaries.
+
+Sales_Summary (enhanced schema) holds one row per (time_key, platform) so
+dashboards and v_sales_trends read days, not order items. After a load,
+only the time_keys the loaded Fact_Sales/Orders rows touch are
+re-aggregated from Fact_Sales and upserted with ON CONFLICT (time_key,
+platform); summary rows of touched days that no longer have any sales are
+deleted.
+
+Daily_Sales_Summary is the default schema's counterpart, one row per
+(time_key, platform_key) re-aggregated from Fact_Orders.
+
+A touched day is both a day of the loaded rows and the day those rows
+were stored under before the load (stored_time_keys(), read before the
+upsert): an order whose date moved leaves the old day to be re-summed too.
+
+new_customers counts customers whose first Fact_Sales day is that day. A
+backfill that moves a customer's first day earlier leaves the later day's
+count stale until that day is refreshed; refresh_sales_summary(cursor)
+with no time_keys rebuilds everything.
+
+Voucher_Summary is the same idea for v_voucher_effectiveness: one row per
+voucher, re-aggregated from Voucher_Usage only for the voucher_keys in the
+loaded Voucher_Usage rows.
+
+Fact_Traffic (default schema) is kept the same way: batch ingestion stores
+one row per shop, platform and day in Fact_Traffic_Shop, and the
+Fact_Traffic rows of the loaded days are re-summed over every stored shop,
+so a later run with only some shops' exports keeps the other shops' numbers.
+"""
+import pandas as pd
+
+from app.loading_script import quote_ident
+
+SUMMARY_TABLE = "Sales_Summary"
+SOURCE_TABLES = ("Fact_Sales", "Orders")
+
+# Aggregates over Fact_Sales f joined to Orders o, filtered to the days in the CTE "days"
+_AGGREGATE_SQL = """
+WITH days AS (
+    SELECT DISTINCT f.time_key FROM "Fact_Sales" f {day_filter}
+),
+sales AS (
+    SELECT f.*, COALESCE(o.platform, 'Lazada') AS platform
+    FROM "Fact_Sales" f
+    JOIN days d ON d.time_key = f.time_key
+    LEFT JOIN "Orders" o ON o.order_key = f.order_key
+),
+first_days AS (
+    SELECT f.customer_key, MIN(f.time_key) AS first_time_key
+    FROM "Fact_Sales" f
+    WHERE f.customer_key IN (SELECT DISTINCT customer_key FROM sales)
+    GROUP BY f.customer_key
+),
+summary AS (
+    SELECT
+        s.time_key,
+        s.platform,
+        COUNT(DISTINCT s.order_key) AS total_orders,
+        COUNT(DISTINCT s.order_key) FILTER (WHERE NOT s.is_cancelled AND NOT s.is_returned) AS successful_orders,
+        COUNT(DISTINCT s.order_key) FILTER (WHERE s.is_cancelled) AS cancelled_orders,
+        COUNT(DISTINCT s.order_key) FILTER (WHERE s.is_returned) AS returned_orders,
+        COALESCE(SUM(s.quantity_sold) FILTER (WHERE NOT s.is_cancelled), 0) AS total_items_sold,
+        COALESCE(SUM(s.gross_sales_amount) FILTER (WHERE NOT s.is_cancelled), 0) AS gross_revenue,
+        COALESCE(SUM(s.discount_amount) FILTER (WHERE NOT s.is_cancelled), 0) AS total_discounts,
+        COALESCE(SUM(s.net_sales_amount) FILTER (WHERE NOT s.is_cancelled), 0) AS net_revenue,
+        COALESCE(SUM(s.shipping_revenue) FILTER (WHERE NOT s.is_cancelled), 0) AS shipping_revenue,
+        COUNT(DISTINCT s.customer_key) AS unique_customers,
+        COUNT(DISTINCT s.customer_key) FILTER (WHERE fd.first_time_key = s.time_key) AS new_customers,
+        COUNT(DISTINCT s.order_key) FILTER (WHERE s.is_voucher_used) AS vouchers_used,
+        COALESCE(SUM(s.discount_amount) FILTER (WHERE s.is_voucher_used), 0) AS voucher_discount_total,
+        COUNT(DISTINCT s.order_key) FILTER (WHERE NOT s.is_cancelled) AS paid_orders
+    FROM sales s
+    LEFT JOIN first_days fd ON fd.customer_key = s.customer_key
+    GROUP BY s.time_key, s.platform
+)
+INSERT INTO "Sales_Summary" (
+    "time_key", "date", "platform", "total_orders", "successful_orders", "cancelled_orders", "returned_orders",
+    "total_items_sold", "gross_revenue", "total_discounts", "net_revenue", "shipping_revenue", "average_order_value",
+    "unique_customers", "new_customers", "returning_customers", "vouchers_used", "voucher_discount_total",
+    "voucher_adoption_rate", "updated_at"
+)
+SELECT
+    sm.time_key, t.date, sm.platform, sm.total_orders, sm.successful_orders, sm.cancelled_orders, sm.returned_orders,
+    sm.total_items_sold, sm.gross_revenue, sm.total_discounts, sm.net_revenue, sm.shipping_revenue,
+    COALESCE(ROUND(sm.net_revenue / NULLIF(sm.paid_orders, 0), 2), 0),
+    sm.unique_customers, sm.new_customers, sm.unique_customers - sm.new_customers,
+    sm.vouchers_used, sm.voucher_discount_total,
+    COALESCE(ROUND(100.0 * sm.vouchers_used / NULLIF(sm.total_orders, 0), 2), 0),
+    CURRENT_TIMESTAMP
+FROM summary sm
+JOIN "Dim_Time" t ON t.time_key = sm.time_key
+ON CONFLICT ("time_key", "platform") DO UPDATE SET
+{updates};
+"""
+
+_SUMMARY_COLUMNS = [
+    "date", "total_orders", "successful_orders", "cancelled_orders", "returned_orders", "total_items_sold",
+    "gross_revenue", "total_discounts", "net_revenue", "shipping_revenue", "average_order_value",
+    "unique_customers", "new_customers", "returning_customers", "vouchers_used", "voucher_discount_total",
+    "voucher_adoption_rate", "updated_at",
+]
+
+
+def touched_time_keys(frames, tables=SOURCE_TABLES, stored=None):
+    """Distinct time_keys in the loaded frames of tables, plus the stored ones they replace."""
+    keys = [
+        frames[name]["time_key"].dropna()
+        for name in tables
+        if name in frames and frames[name] is not None and "time_key" in frames[name]
+    ]
+    keys.append(pd.Series(list(stored or []), dtype="int64"))
+    return sorted(pd.unique(pd.concat(keys).astype("int64")).tolist())
+
+
+def stored_time_keys(cursor, frames, tables, schema_path=None, batch_rows=None):
+    """
+    Distinct time_keys the rows of frames[tables] are stored under now,
+    looked up by primary key (single-column keys) before they are upserted.
+    """
+    from app import config
+    from app.schema import get_table
+
+    batch_rows = batch_rows or config.LOAD_BATCH_ROWS
+    found = set()
+    for name in tables:
+        df = frames.get(name)
+        if df is None or df.empty:
+            continue
+        primary_key = get_table(name, schema_path)["primary_key"]
+        if len(primary_key) != 1 or primary_key[0] not in df:
+            continue
+        ids = pd.unique(df[primary_key[0]].dropna().astype("int64"))
+        sql = (f"SELECT DISTINCT time_key FROM {quote_ident(name)} "
+               f"WHERE {quote_ident(primary_key[0])} = ANY(%(ids)s)")
+        for start in range(0, len(ids), batch_rows):
+            cursor.execute(sql, {"ids": ids[start:start + batch_rows].tolist()})
+            found.update(row[0] for row in cursor.fetchall() if row[0] is not None)
+    return sorted(found)
+
+
+def build_refresh_sql(time_keys=None):
+    """
+    SQL to re-aggregate Sales_Summary for time_keys (all days when None).
+
+    Returns:
+        tuple: (sql, params) for cursor.execute
+    """
+    updates = ",\n".join(f"    {quote_ident(c)} = EXCLUDED.{quote_ident(c)}" for c in _SUMMARY_COLUMNS)
+    if time_keys is None:
+        return _AGGREGATE_SQL.format(day_filter="", updates=updates), None
+    return _AGGREGATE_SQL.format(day_filter="WHERE f.time_key = ANY(%(time_keys)s)", updates=updates), {
+        "time_keys": list(time_keys)
+    }
+
+
+def refresh_sales_summary(cursor, time_keys=None):
+    """
+    Upsert Sales_Summary rows for time_keys (every day when None) using an open cursor.
+
+    Summary rows of those days whose (time_key, platform) no longer has
+    sales are removed. The caller owns the transaction.
+
+    Returns:
+        int: Number of days refreshed (None for a full rebuild)
+    """
+    if time_keys is not None and not len(time_keys):
+        return 0
+    sql, params = build_refresh_sql(time_keys)
+    day_filter = "" if time_keys is None else "WHERE ss.time_key = ANY(%(time_keys)s) AND"
+    cursor.execute(
+        f'DELETE FROM {quote_ident(SUMMARY_TABLE)} ss {day_filter or "WHERE"} NOT EXISTS ('
+        'SELECT 1 FROM "Fact_Sales" f LEFT JOIN "Orders" o ON o.order_key = f.order_key '
+        "WHERE f.time_key = ss.time_key AND COALESCE(o.platform, 'Lazada') = ss.platform);",
+        params,
+    )
+    cursor.execute(sql, params)
+    return None if time_keys is None else len(time_keys)
+
+
+DAILY_SUMMARY_TABLE = "Daily_Sales_Summary"
+DAILY_SOURCE_TABLES = ("Fact_Orders",)
+
+_DAILY_COLUMNS = ["order_items", "items_sold", "cancelled_items", "returned_items", "revenue",
+                  "seller_commission_fees", "platform_subsidies", "unique_customers", "updated_at"]
+
+_DAILY_AGGREGATE_SQL = """
+INSERT INTO "Daily_Sales_Summary" ("time_key", "platform_key", {columns})
+SELECT
+    f.time_key,
+    f.platform_key,
+    COUNT(*),
+    COALESCE(SUM(f.item_quantity) FILTER (WHERE f.cancellation_reason IS NULL), 0),
+    COUNT(*) FILTER (WHERE f.cancellation_reason IS NOT NULL),
+    COUNT(*) FILTER (WHERE f.return_reason IS NOT NULL),
+    COALESCE(SUM(f.paid_price) FILTER (WHERE f.cancellation_reason IS NULL AND f.return_reason IS NULL), 0),
+    SUM(f.seller_commission_fee),
+    SUM(f.platform_subsidy_amount),
+    COUNT(DISTINCT f.customer_key),
+    CURRENT_TIMESTAMP
+FROM "Fact_Orders" f
+{day_filter}
+GROUP BY f.time_key, f.platform_key
+ON CONFLICT ("time_key", "platform_key") DO UPDATE SET
+{updates};
+"""
+
+
+def refresh_daily_summary(cursor, time_keys=None):
+    """
+    Upsert Daily_Sales_Summary rows for time_keys (every day when None)
+    from Fact_Orders using an open cursor; rows of those days whose
+    platform no longer has order items are removed. The caller owns the
+    transaction.
+
+    Returns:
+        int: Number of days refreshed (None for a full rebuild)
+    """
+    if time_keys is not None and not len(time_keys):
+        return 0
+    params = None if time_keys is None else {"time_keys": [int(key) for key in time_keys]}
+    day_filter = "" if time_keys is None else "ds.time_key = ANY(%(time_keys)s) AND"
+    cursor.execute(
+        f"DELETE FROM {quote_ident(DAILY_SUMMARY_TABLE)} ds WHERE {day_filter} NOT EXISTS ("
+        'SELECT 1 FROM "Fact_Orders" f WHERE f.time_key = ds.time_key AND f.platform_key = ds.platform_key);',
+        params,
+    )
+    cursor.execute(
+        _DAILY_AGGREGATE_SQL.format(
+            columns=", ".join(quote_ident(c) for c in _DAILY_COLUMNS),
+            day_filter="" if time_keys is None else "WHERE f.time_key = ANY(%(time_keys)s)",
+            updates=",\n".join(f"    {quote_ident(c)} = EXCLUDED.{quote_ident(c)}" for c in _DAILY_COLUMNS),
+        ),
+        params,
+    )
+    return None if time_keys is None else len(time_keys)
+
+
+VOUCHER_SUMMARY_TABLE = "Voucher_Summary"
+VOUCHER_SOURCE_TABLE = "Voucher_Usage"
+
+_VOUCHER_COLUMNS = [
+    "total_usage", "unique_customers", "total_discount_given", "avg_discount_per_use",
+    "total_order_value_generated", "new_customer_acquisitions", "net_revenue_generated", "first_used_at",
+    "last_used_at", "updated_at",
+]
+
+# Same measures as the v_voucher_effectiveness view, for the vouchers in the filter
+_VOUCHER_AGGREGATE_SQL = """
+INSERT INTO "Voucher_Summary" ("voucher_key", {columns})
+SELECT
+    vu.voucher_key,
+    COUNT(*),
+    COUNT(DISTINCT vu.customer_key),
+    COALESCE(SUM(vu.discount_amount), 0),
+    COALESCE(ROUND(AVG(vu.discount_amount), 2), 0),
+    COALESCE(SUM(vu.order_value_after_discount), 0),
+    COUNT(*) FILTER (WHERE vu.first_time_customer),
+    COALESCE(SUM(vu.order_value_after_discount), 0) - COALESCE(SUM(vu.discount_amount), 0),
+    MIN(vu.usage_date),
+    MAX(vu.usage_date),
+    CURRENT_TIMESTAMP
+FROM "Voucher_Usage" vu
+WHERE vu.voucher_key IS NOT NULL {voucher_filter}
+GROUP BY vu.voucher_key
+ON CONFLICT ("voucher_key") DO UPDATE SET
+{updates};
+"""
+
+
+def touched_voucher_keys(frames):
+    """Distinct voucher_keys in the loaded Voucher_Usage frame."""
+    usage = frames.get(VOUCHER_SOURCE_TABLE)
+    if usage is None or "voucher_key" not in usage:
+        return []
+    return sorted(pd.unique(usage["voucher_key"].dropna().astype("int64")).tolist())
+
+
+def refresh_voucher_summary(cursor, voucher_keys=None):
+    """
+    Upsert Voucher_Summary rows for voucher_keys (every voucher when None)
+    using an open cursor; rows of those vouchers that no longer have any
+    usage are removed. The caller owns the transaction.
+
+    Returns:
+        int: Number of vouchers refreshed (None for a full rebuild)
+    """
+    if voucher_keys is not None and not len(voucher_keys):
+        return 0
+    params = None if voucher_keys is None else {"voucher_keys": [int(key) for key in voucher_keys]}
+    key_filter = "" if voucher_keys is None else "vs.voucher_key = ANY(%(voucher_keys)s) AND"
+    cursor.execute(
+        f"DELETE FROM {quote_ident(VOUCHER_SUMMARY_TABLE)} vs WHERE {key_filter} NOT EXISTS ("
+        'SELECT 1 FROM "Voucher_Usage" vu WHERE vu.voucher_key = vs.voucher_key);',
+        params,
+    )
+    cursor.execute(
+        _VOUCHER_AGGREGATE_SQL.format(
+            columns=", ".join(quote_ident(c) for c in _VOUCHER_COLUMNS),
+            voucher_filter="" if voucher_keys is None else "AND vu.voucher_key = ANY(%(voucher_keys)s)",
+            updates=",\n".join(f"    {quote_ident(c)} = EXCLUDED.{quote_ident(c)}" for c in _VOUCHER_COLUMNS),
+        ),
+        params,
+    )
+    return None if voucher_keys is None else len(voucher_keys)
+
+
+TRAFFIC_TABLE = "Fact_Traffic"
+TRAFFIC_SHOP_TABLE = "Fact_Traffic_Shop"
+
+_TRAFFIC_KEYS = ["traffic_event_key", "time_key", "product_key", "customer_key", "platform_key"]
+_TRAFFIC_SUMS = ["page_views", "visits", "add_to_cart_count", "wishlist_add_count"]
+
+
+def touched_traffic_keys(frames):
+    """Distinct traffic_event_keys in the loaded Fact_Traffic_Shop frame."""
+    shops = frames.get(TRAFFIC_SHOP_TABLE)
+    if shops is None or "traffic_event_key" not in shops:
+        return []
+    return sorted(pd.unique(shops["traffic_event_key"].dropna().astype("int64")).tolist())
+
+
+def refresh_fact_traffic(cursor, traffic_event_keys=None):
+    """
+    Upsert Fact_Traffic rows for traffic_event_keys (every key when None) as
+    the sum of their Fact_Traffic_Shop rows, using an open cursor. The
+    caller owns the transaction.
+
+    Returns:
+        int: Number of keys refreshed (None for a full rebuild)
+    """
+    if traffic_event_keys is not None and not len(traffic_event_keys):
+        return 0
+    params = None if traffic_event_keys is None else {"keys": [int(key) for key in traffic_event_keys]}
+    keys = ", ".join(quote_ident(c) for c in _TRAFFIC_KEYS)
+    cursor.execute(
+        f"INSERT INTO {quote_ident(TRAFFIC_TABLE)} ({keys}, {', '.join(quote_ident(c) for c in _TRAFFIC_SUMS)}) "
+        f"SELECT {keys}, {', '.join(f'SUM({quote_ident(c)})' for c in _TRAFFIC_SUMS)} "
+        f"FROM {quote_ident(TRAFFIC_SHOP_TABLE)} "
+        f"{'' if traffic_event_keys is None else 'WHERE traffic_event_key = ANY(%(keys)s) '}"
+        f"GROUP BY {keys} "
+        f'ON CONFLICT ("traffic_event_key") DO UPDATE SET '
+        + ", ".join(f"{quote_ident(c)} = EXCLUDED.{quote_ident(c)}" for c in _TRAFFIC_KEYS[1:] + _TRAFFIC_SUMS),
+        params,
+    )
+    return None if traffic_event_keys is None else len(traffic_event_keys)
@@ -0,0 +1,163 @@
+"""
+Per-source, per-endpoint sync watermarks for incremental extraction.
+
+Each (source, endpoint) pair remembers the latest update time it has loaded
+and the ID of that record. A run asks IncrementalSync.window() for its
+range, which starts WATERMARK_OVERLAP_SECONDS before the watermark so
+orders edited late (or committed out of order on the marketplace side)
+are picked up again; the upsert makes the re-read rows harmless.
+
+Watermarks are staged with advance() and only written by commit(), which
+the loader calls after the upsert succeeds, so a failed load is retried
+from the same point next run.
+
+Stores: "file" (JSON under STATE_DIR) or "postgres" (etl_watermarks table).
+"""
+import json
+import os
+import tempfile
+import threading
+
+import pandas as pd
+
+from app import config
+
+WATERMARK_TABLE = "etl_watermarks"
+
+
+class FileWatermarkStore:
+    def __init__(self, path=None):
+        self.path = path or os.path.join(config.STATE_DIR, "watermarks.json")
+        self._lock = threading.Lock()
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as f:
+            return json.load(f)
+
+    def get(self, source, endpoint):
+        return self._read().get(f"{source}/{endpoint}")
+
+    def set_many(self, marks):
+        """Write {(source, endpoint): {"watermark", "last_id"}} atomically."""
+        with self._lock:
+            state = self._read()
+            for (source, endpoint), mark in marks.items():
+                state[f"{source}/{endpoint}"] = mark
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+class PostgresWatermarkStore:
+    def __init__(self, db_conn_string=None, table_name=WATERMARK_TABLE):
+        self.db_conn_string = db_conn_string
+        self.table_name = table_name
+        self._created = False
+
+    def _ensure_table(self, cursor):
+        if not self._created:
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS "{self.table_name}" ('
+                '"source" varchar NOT NULL, "endpoint" varchar NOT NULL, "watermark" timestamptz, '
+                '"last_id" varchar, "updated_at" timestamptz DEFAULT now(), PRIMARY KEY ("source", "endpoint"));'
+            )
+            self._created = True
+
+    def get(self, source, endpoint):
+        from app.db import get_pool
+
+        with get_pool(self.db_conn_string).connection() as conn:
+            with conn.cursor() as cursor:
+                self._ensure_table(cursor)
+                cursor.execute(
+                    f'SELECT "watermark", "last_id" FROM "{self.table_name}" WHERE "source" = %s AND "endpoint" = %s',
+                    (source, endpoint),
+                )
+                row = cursor.fetchone()
+            conn.commit()
+        return {"watermark": row[0].isoformat(), "last_id": row[1]} if row and row[0] else None
+
+    def set_many(self, marks):
+        from app.db import get_pool
+
+        with get_pool(self.db_conn_string).connection() as conn:
+            with conn.cursor() as cursor:
+                self._ensure_table(cursor)
+                for (source, endpoint), mark in marks.items():
+                    cursor.execute(
+                        f'INSERT INTO "{self.table_name}" ("source", "endpoint", "watermark", "last_id", "updated_at") '
+                        'VALUES (%s, %s, %s, %s, now()) ON CONFLICT ("source", "endpoint") DO UPDATE SET '
+                        '"watermark" = EXCLUDED."watermark", "last_id" = EXCLUDED."last_id", "updated_at" = now();',
+                        (source, endpoint, mark["watermark"], mark["last_id"]),
+                    )
+            conn.commit()
+
+
+def _utc(value):
+    stamp = pd.Timestamp(value)
+    return stamp.tz_localize("UTC") if stamp.tzinfo is None else stamp.tz_convert("UTC")
+
+
+def get_store(backend=None):
+    backend = backend or config.WATERMARK_BACKEND
+    if backend == "postgres":
+        return PostgresWatermarkStore()
+    if backend == "file":
+        return FileWatermarkStore()
+    raise ValueError("WATERMARK_BACKEND must be file or postgres")
+
+
+class IncrementalSync:
+    def __init__(self, store=None, overlap_seconds=None, initial_lookback_days=None):
+        self.store = store or get_store()
+        self.overlap = pd.Timedelta(seconds=config.WATERMARK_OVERLAP_SECONDS if overlap_seconds is None else overlap_seconds)
+        self.initial_lookback = pd.Timedelta(days=initial_lookback_days or config.SYNC_INITIAL_LOOKBACK_DAYS)
+        self.pending = {}
+
+    def window(self, source, endpoint, now=None):
+        """
+        Range to extract for one source/endpoint.
+
+        Returns:
+            tuple: (start, end) UTC Timestamps; start is the watermark minus the
+                overlap, or end minus SYNC_INITIAL_LOOKBACK_DAYS on the first run
+        """
+        end = _utc(pd.Timestamp.now(tz="UTC") if now is None else now)
+        mark = self.store.get(source, endpoint)
+        if not mark:
+            return end - self.initial_lookback, end
+        return min(_utc(mark["watermark"]) - self.overlap, end), end
+
+    def advance(self, source, endpoint, update_times, ids=None, fallback=None):
+        """
+        Stage the new watermark from the records just extracted.
+
+        Args:
+            update_times: Series of record update times (tz-aware or UTC)
+            ids: Series of record IDs aligned with update_times
+            fallback: Watermark to use when no record carries a time (e.g. the
+                window end for APIs filtered server-side on update time)
+        """
+        times = pd.to_datetime(pd.Series(update_times), utc=True)
+        if times.notna().any():
+            position = times.reset_index(drop=True).idxmax()
+            watermark = times.iloc[position]
+            last_id = None if ids is None else str(pd.Series(ids).iloc[position])
+        elif fallback is not None:
+            watermark, last_id = _utc(fallback), None
+        else:
+            return
+        previous = self.store.get(source, endpoint)
+        if previous and _utc(previous["watermark"]) >= watermark:
+            return
+        self.pending[(source, endpoint)] = {"watermark": watermark.isoformat(), "last_id": last_id}
+
+    def commit(self):
+        """Persist staged watermarks; call after the extracted rows are loaded."""
+        if self.pending:
+            self.store.set_many(self.pending)
+            self.pending = {}
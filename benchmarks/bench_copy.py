@@ -0,0 +1,120 @@
+"""
+Benchmark: CSV text COPY vs binary COPY encoding for a Fact_Orders load.
+
+    python -m benchmarks.bench_copy --rows 1000000
+    python -m benchmarks.bench_copy --rows 1000000 --dsn postgresql://...
+
+Without --dsn only client-side encoding is timed (what load_tables spends
+before the bytes hit the socket). With --dsn each format is also COPYed
+into a temp table that is rolled back afterwards.
+"""
+import argparse
+import time
+import tracemalloc
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+
+from app.loading_script import prepare_frame, quote_ident, resolve_columns, staging_types
+from app.pg_binary import BinaryCopyStream
+
+
+def make_fact_orders(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "order_item_key": np.arange(1, rows + 1, dtype="int64"),
+        "time_key": rng.integers(20240101, 20241231, rows),
+        "product_key": rng.integers(1, 5000, rows),
+        "customer_key": rng.integers(1, 200000, rows),
+        "platform_key": rng.integers(1, 3, rows),
+        "paid_price": rng.uniform(50, 5000, rows).round(2),
+        "item_quantity": rng.integers(1, 5, rows),
+        "cancellation_reason": rng.choice(np.array([None, "Change of mind", "Out of stock"], dtype=object), rows),
+        "return_reason": None,
+        "seller_commission_fee": rng.uniform(1, 200, rows).round(2),
+        "platform_subsidy_amount": rng.uniform(0, 50, rows).round(2),
+    })
+
+
+def csv_chunks(df, batch_rows):
+    for start in range(0, len(df), batch_rows):
+        buffer = StringIO()
+        df.iloc[start:start + batch_rows].to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        yield buffer
+
+
+def drain(file_like, size=1024 * 1024):
+    total = 0
+    while True:
+        piece = file_like.read(size)
+        if not piece:
+            return total
+        total += len(piece)
+
+
+def measure(label, fn, memory=False):
+    """Time fn(); with memory=True run it again under tracemalloc (slow) for the peak."""
+    started = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - started
+    line = f"{label:<16} {elapsed:8.3f}s  {size / 1e6:9.1f} MB sent"
+    if memory:
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        line += f"  peak {peak / 1e6:8.1f} MB"
+    print(line)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--batch-rows", type=int, default=50000)
+    parser.add_argument("--memory", action="store_true", help="Also report peak Python allocations")
+    parser.add_argument("--dsn", help="Also COPY into a rolled-back temp table on this database")
+    args = parser.parse_args()
+
+    df = make_fact_orders(args.rows)
+    table, columns, keys = resolve_columns(df, "Fact_Orders")
+    df = prepare_frame(df, table, columns, keys)
+    pg_types = staging_types(df, table, columns)
+    print(f"Fact_Orders, {len(df)} rows, {len(columns)} columns")
+
+    csv_time = measure("csv encode", lambda: sum(drain(chunk) for chunk in csv_chunks(df, args.batch_rows)), args.memory)
+    binary_time = measure("binary encode", lambda: drain(BinaryCopyStream(df, pg_types, args.batch_rows)), args.memory)
+    print(f"binary/csv encode time: {binary_time / csv_time:.2f}x")
+
+    if args.dsn:
+        import psycopg2
+
+        column_list = ", ".join(quote_ident(c) for c in columns)
+        column_defs = ", ".join(f"{quote_ident(c)} {t}" for c, t in zip(columns, pg_types))
+        conn = psycopg2.connect(args.dsn)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"CREATE TEMP TABLE bench_copy ({column_defs})")
+
+                def copy_csv():
+                    for chunk in csv_chunks(df, args.batch_rows):
+                        cursor.copy_expert(f"COPY bench_copy ({column_list}) FROM STDIN WITH (FORMAT CSV)", chunk)
+                    return 0
+
+                def copy_binary():
+                    stream = BinaryCopyStream(df, pg_types, args.batch_rows)
+                    cursor.copy_expert(f"COPY bench_copy ({column_list}) FROM STDIN WITH (FORMAT BINARY)", stream, size=1024 * 1024)
+                    return 0
+
+                measure("csv COPY", copy_csv)
+                cursor.execute("TRUNCATE bench_copy")
+                measure("binary COPY", copy_binary)
+        finally:
+            conn.rollback()
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: dashboard-style queries against the in-process OLAP cube.
+
+    python -m benchmarks.bench_cube --rows 2000000
+
+Builds a cube from a year of synthetic Fact_Orders rows (5k products, 200k
+customers, two platforms), then times each query (best of --repeat runs)
+and checks the first one against a pandas groupby on the same frame.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.cube import OlapCube
+from benchmarks.bench_copy import make_fact_orders
+
+CATEGORIES = np.array(["Dresses", "Tops", "Bags", "Shoes", "Accessories"], dtype=object)
+
+QUERIES = [
+    {"by": ["month"]},
+    {"by": ["quarter", "platform_name"]},
+    {"by": ["month", "category_l2"], "where": {"platform_name": "Lazada"}},
+    {"by": ["day"]},
+    {"by": ["product_key"], "where": {"month": "2024-05"}},
+    {"by": ["category_l2"], "where": {"day": "2024-11-11", "platform_name": "Shopee"}},
+    {"by": ["customer_key", "product_key"], "where": {"day": "2024-05-05"}},
+    {"by": ["customer_key"]},
+]
+
+
+def make_cube(rows, seed=0):
+    facts = make_fact_orders(rows, seed)
+    days = pd.date_range("2024-01-01", "2024-12-31")
+    rng = np.random.default_rng(seed + 1)
+    facts["time_key"] = (days.year * 10000 + days.month * 100 + days.day).to_numpy()[rng.integers(0, len(days), rows)]
+
+    cube = OlapCube()
+    started = time.perf_counter()
+    cube.add(facts)
+    cube.set_members("product_key", pd.DataFrame({
+        "product_key": np.arange(1, 5000), "category_l2": rng.choice(CATEGORIES, 4999),
+    }))
+    return cube, facts, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cube, facts, build_seconds = make_cube(args.rows)
+    stats = cube.stats()
+    print(f"Fact_Orders cube, {stats['rows']} rows, {stats['fact_mb']} MB, built in {build_seconds:.2f}s")
+
+    for query in QUERIES:
+        best = min(cube.query(**query)["elapsed_ms"] for _ in range(args.repeat))
+        result = cube.query(**query)
+        print(f"{best:9.1f} ms  {len(result['cells']):>6} cells  {query}")
+
+    expected = facts.groupby(facts["time_key"] // 100)["paid_price"].sum().round(2).to_numpy()
+    actual = np.array([cell["paid_price"] for cell in cube.query(**QUERIES[0])["cells"]])
+    print(f"month totals match pandas: {np.allclose(expected, actual)}")
+
+
+if __name__ == "__main__":
+    main()
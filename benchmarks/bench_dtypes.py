@@ -0,0 +1,77 @@
+"""
+Benchmark: memory of a year of Fact_Orders rows with default vs compact dtypes.
+
+    python -m benchmarks.bench_dtypes --rows 2000000
+
+The rows are written to a CSV file once, then parsed with pandas' default
+inference (int64 / float64 and object strings, as pandas < 3 does), with
+default inference under pandas' own string dtype, and with
+read_csv_dtypes() + apply_table_dtypes() from the schema. Reports the
+resulting frame size and the peak Python allocations of each parse.
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from app.dtypes import apply_table_dtypes, memory_report, read_csv_dtypes
+from benchmarks.bench_copy import make_fact_orders
+
+REASONS = np.array([None, "Change of mind", "Out of stock", "Wrong address", "Found cheaper elsewhere"], dtype=object)
+
+
+def make_year_of_orders(rows, seed=0):
+    df = make_fact_orders(rows, seed)
+    rng = np.random.default_rng(seed + 1)
+    df["return_reason"] = rng.choice(REASONS, rows)
+    return df
+
+
+def parse(path, mode):
+    """(frame, seconds, peak MB) for one parse of the CSV file."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    if mode == "compact":
+        df = pd.read_csv(path, dtype=read_csv_dtypes("Fact_Orders"))
+        df = apply_table_dtypes(df, "Fact_Orders")
+    elif mode == "object":
+        df = pd.read_csv(path, dtype={"cancellation_reason": object, "return_reason": object})
+    else:
+        df = pd.read_csv(path)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return df, elapsed, peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    try:
+        make_year_of_orders(args.rows).to_csv(path, index=False)
+        print(f"Fact_Orders, {args.rows} rows, {os.path.getsize(path) / 1e6:.1f} MB CSV")
+        frames = {}
+        for mode in ("object", "default", "compact"):
+            frames[mode], elapsed, peak = parse(path, mode)
+            print(f"{mode:<10} {elapsed:7.2f}s  peak {peak:8.1f} MB")
+    finally:
+        os.remove(path)
+
+    compact = frames["compact"]
+    for mode in ("object", "default"):
+        report = memory_report(frames[mode], compact)
+        print(f"{mode} -> compact: {report['before_mb']} MB -> {report['after_mb']} MB ({report['ratio']}x smaller)")
+    for column in compact.columns:
+        print(f"  {column:<26} {str(frames['object'][column].dtype):<8} -> {compact[column].dtype}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+End-to-end ETL benchmark on synthetic Lazada/Shopee data.
+
+    python -m benchmarks.bench_etl --rows 100000
+    python -m benchmarks.bench_etl --rows 1000000 --update-baseline
+    python -m benchmarks.bench_etl --rows 1000000 --dsn postgresql://...
+
+Generates order items, daily traffic exports and shop activity for both
+platforms (--rows order items; traffic and activity scale with it), then
+times each stage separately. Traffic exports use each platform's own
+format: Lazada's monthly sections with "~" summary rows, Shopee's plain
+daily rows with dd-mm-yyyy dates and "1,234.50" amounts.
+
+    parse       CSV text -> typed frames (traffic exports via parse_traffic_report)
+    harmonize   dates -> time_key, platform -> platform_key, Dim_Time / Dim_Platform rows
+    keys        item / buyer IDs -> product_key / customer_key (SurrogateKeyIndex),
+                fact frames in the schema's compact dtypes
+    load        upsert into SQLite (default, a file under a temp dir) or
+                Postgres with --dsn (upsert_table per table, rolled back afterwards)
+
+At 10M order items the generated CSV text alone takes about 1 GB.
+
+Results are written to --output as JSON. When --baseline holds a result
+for the same --rows and load target, each stage is compared with it and
+the run exits 1 if any stage is more than --tolerance slower.
+--update-baseline stores this run as the new baseline instead; the
+committed baseline.json holds the default scale (SQLite, 100k items).
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+
+from app.dtypes import apply_table_dtypes
+from app.etl import PLATFORM_COLUMN_MAPS
+from app.loading_script import prepare_frame
+from app.schema import get_table, load_order
+from app.Transformation.harmonize_dim_customer import resolve_customer_keys
+from app.Transformation.harmonize_dim_platform import build_dim_platform, resolve_platform_keys
+from app.Transformation.harmonize_dim_product import resolve_product_keys
+from app.Transformation.harmonize_dim_time import build_dim_time, date_to_time_key
+from app.Transformation.key_resolver import SurrogateKeyIndex
+from app.Transformation.standardize_fact_traffic import parse_traffic_report, shop_level_members, to_fact_traffic
+from benchmarks.bench_traffic_parse import make_export
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+STAGES = ("parse", "harmonize", "keys", "load")
+REASONS = np.array(["", "Change of mind", "Out of stock", "Wrong address"], dtype=object)
+ACTIVITY_TYPES = np.array(["chat", "follow", "unfollow", "review"], dtype=object)
+# Shopee Business Insights export header, in export order (all mapped by SHOPEE_COLUMN_MAP)
+SHOPEE_HEADER = ["Date", "Sales (PHP)", "Orders", "Visitors", "Page Views", "Buyers", "Units Sold",
+                 "Order Conversion Rate", "Sales per Order", "Cancelled Sales", "Returned / Refunded Sales"]
+SQLITE_TYPES = {"int": "INTEGER", "integer": "INTEGER", "bigint": "INTEGER", "smallint": "INTEGER",
+                "decimal": "REAL", "numeric": "REAL", "boolean": "INTEGER"}
+
+
+# ------------------------------------------------------------------ synthetic data
+
+def make_orders(rows, seed=0):
+    """Raw order-item export rows for both platforms, as CSV text."""
+    rng = np.random.default_rng(seed)
+    platform = rng.choice(np.array(["Lazada", "Shopee"], dtype=object), rows)
+    prefix = np.where(platform == "Lazada", "LZ", "SP")
+    seconds = rng.integers(0, 365 * 86400, rows)
+    df = pd.DataFrame({
+        "order_item_id": np.arange(1, rows + 1),
+        "created_at": (pd.Timestamp("2024-01-01") + pd.to_timedelta(seconds, unit="s")).strftime("%Y-%m-%d %H:%M:%S"),
+        "platform": platform,
+        "item_id": prefix + "-" + rng.integers(1, max(rows // 50, 10), rows).astype(str),
+        "buyer_id": prefix + "-B" + rng.integers(1, max(rows // 5, 10), rows).astype(str),
+        "paid_price": rng.uniform(50, 5000, rows).round(2),
+        "quantity": rng.integers(1, 5, rows),
+        "cancellation_reason": rng.choice(REASONS, rows, p=[0.9, 0.04, 0.03, 0.03]),
+        "seller_commission_fee": rng.uniform(1, 200, rows).round(2),
+        "platform_subsidy_amount": rng.uniform(0, 50, rows).round(2),
+    })
+    return df.to_csv(index=False)
+
+
+def make_activity(rows, seed=0):
+    rng = np.random.default_rng(seed + 2)
+    platform = rng.choice(np.array(["Lazada", "Shopee"], dtype=object), rows)
+    df = pd.DataFrame({
+        "activity_id": np.arange(1, rows + 1),
+        "date": (pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D")).strftime("%Y-%m-%d"),
+        "platform": platform,
+        "buyer_id": np.where(platform == "Lazada", "LZ", "SP") + "-B" + rng.integers(1, max(rows // 5, 10), rows).astype(str),
+        "activity_type": rng.choice(ACTIVITY_TYPES, rows),
+        "chat_response_time_seconds": rng.integers(5, 3600, rows),
+        "follower_count_change": rng.integers(-3, 10, rows),
+    })
+    return df.to_csv(index=False)
+
+
+def make_shopee_export(years, repeat=1, seed=0):
+    """CSV text of a Shopee daily export covering years full years from 2020, repeated per shop."""
+    rng = np.random.default_rng(seed + 3)
+    days = pd.date_range("2020-01-01", pd.Timestamp("2020-01-01") + pd.DateOffset(years=years) - pd.Timedelta(days=1))
+    orders = rng.integers(0, 500, len(days))
+    sales = orders * rng.uniform(100, 3000, len(days))
+    visitors = orders * 20 + rng.integers(1, 200, len(days))
+    df = pd.DataFrame({
+        "Date": days.strftime("%d-%m-%Y"),
+        "Sales (PHP)": [f"{v:,.2f}" for v in sales],
+        "Orders": orders,
+        "Visitors": visitors,
+        "Page Views": visitors * 3,
+        "Buyers": orders - rng.integers(0, 3, len(days)).clip(max=orders),
+        "Units Sold": orders + rng.integers(0, 50, len(days)),
+        "Order Conversion Rate": [f"{v:.2f}%" for v in orders / visitors * 100],
+        "Sales per Order": [f"{v:,.2f}" for v in sales / np.maximum(orders, 1)],
+        "Cancelled Sales": [f"{v:,.2f}" for v in sales * rng.uniform(0, 0.05, len(days))],
+        "Returned / Refunded Sales": [f"{v:,.2f}" for v in sales * rng.uniform(0, 0.03, len(days))],
+    }, columns=SHOPEE_HEADER)
+    return pd.concat([df] * repeat, ignore_index=True).to_csv(index=False)
+
+
+def generate(rows, seed=0):
+    """
+    Raw inputs for one benchmark run: order items (rows), shop activity
+    (rows / 10) and one year of daily traffic per shop and platform (a shop
+    per 10k order items, at least one).
+    """
+    shops = max(rows // 10000, 1)
+    return {
+        "orders": make_orders(rows, seed),
+        "activity": make_activity(max(rows // 10, 1), seed),
+        "traffic": {"Lazada": make_export(1, shops, seed), "Shopee": make_shopee_export(1, shops, seed)},
+    }
+
+
+# ------------------------------------------------------------------ stages
+
+def parse(raw):
+    orders = pd.read_csv(StringIO(raw["orders"]), dtype={"cancellation_reason": "category"})
+    orders["created_at"] = pd.to_datetime(orders["created_at"], format="%Y-%m-%d %H:%M:%S")
+    activity = pd.read_csv(StringIO(raw["activity"]), dtype={"activity_type": "category"})
+    activity["date"] = pd.to_datetime(activity["date"], format="%Y-%m-%d")
+    traffic = {}
+    for platform, text in raw["traffic"].items():
+        raw_traffic = pd.read_csv(StringIO(text), dtype=str, keep_default_na=False)
+        traffic[platform], _ = parse_traffic_report(raw_traffic, PLATFORM_COLUMN_MAPS[platform])
+    return {"orders": orders, "activity": activity, "traffic": traffic}
+
+
+def harmonize(parsed):
+    orders = parsed["orders"]
+    orders = orders.assign(
+        time_key=date_to_time_key(orders["created_at"].dt.normalize()).to_numpy(),
+        platform_key=resolve_platform_keys(orders["platform"]).to_numpy(),
+    )
+    activity = parsed["activity"]
+    activity = activity.assign(
+        time_key=date_to_time_key(activity["date"]).to_numpy(),
+        platform_key=resolve_platform_keys(activity["platform"]).to_numpy(),
+    )
+    traffic = pd.concat([to_fact_traffic(daily, platform) for platform, daily in parsed["traffic"].items()], ignore_index=True)
+    traffic = traffic.drop_duplicates("traffic_event_key", keep="last")
+
+    time_keys = pd.concat([orders["time_key"], activity["time_key"], traffic["time_key"]])
+    days = pd.to_datetime(time_keys.astype(str), format="%Y%m%d")
+    dimensions = {"Dim_Platform": build_dim_platform(), "Dim_Time": build_dim_time(days.min(), days.max())}
+    return {"orders": orders, "activity": activity, "Fact_Traffic": traffic, "dimensions": dimensions}
+
+
+def resolve_keys(harmonized, state_dir):
+    """Fresh key indexes (state under state_dir, no database) as on a first load."""
+    products = SurrogateKeyIndex("Dim_Product", "product_key", ["lazada_item_id", "shopee_item_id"],
+                                 state_path=os.path.join(state_dir, "products.pkl")).load(from_db=False)
+    customers = SurrogateKeyIndex("Dim_Customer", "customer_key", ["platform_buyer_id"],
+                                  state_path=os.path.join(state_dir, "customers.pkl")).load(from_db=False)
+
+    orders = resolve_product_keys(harmonized["orders"], "item_id", "platform", index=products)
+    orders = resolve_customer_keys(orders, "buyer_id", index=customers)
+    activity = resolve_customer_keys(harmonized["activity"], "buyer_id", index=customers)
+
+    fact_orders = apply_table_dtypes(orders.rename(columns={"order_item_id": "order_item_key", "quantity": "item_quantity"}), "Fact_Orders")
+    fact_activity = apply_table_dtypes(activity.rename(columns={"activity_id": "activity_event_key"}), "Fact_Activity")
+    members = shop_level_members()  # referenced by the shop-level traffic rows
+    return {
+        **harmonized["dimensions"],
+        "Dim_Product": pd.concat([members["Dim_Product"], products.pending_rows()], ignore_index=True),
+        "Dim_Customer": pd.concat([members["Dim_Customer"], customers.pending_rows()], ignore_index=True),
+        "Fact_Orders": fact_orders[[c["name"] for c in get_table("Fact_Orders")["columns"] if c["name"] in fact_orders]],
+        "Fact_Activity": fact_activity[[c["name"] for c in get_table("Fact_Activity")["columns"] if c["name"] in fact_activity]],
+        "Fact_Traffic": harmonized["Fact_Traffic"],
+    }
+
+
+def sqlite_load(frames, path):
+    """Upsert each frame into a SQLite file, tables created from the schema file."""
+    from app.loading_script import quote_ident
+
+    conn = sqlite3.connect(path)
+    try:
+        for table_name in load_order(list(frames)):
+            df, table = frames[table_name], get_table(table_name)
+            names = [c["name"] for c in table["columns"] if c["name"] in df]
+            types = {c["name"]: SQLITE_TYPES.get(c["type"].split("(")[0], "TEXT") for c in table["columns"]}
+            keys = ", ".join(quote_ident(k) for k in table["primary_key"])
+            column_defs = ", ".join(f"{quote_ident(n)} {types[n]}" for n in names)
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {quote_ident(table_name)} ({column_defs}, PRIMARY KEY ({keys}))")
+
+            updates = [f"{quote_ident(n)} = excluded.{quote_ident(n)}" for n in names if n not in table["primary_key"]]
+            action = "DO UPDATE SET " + ", ".join(updates) if updates else "DO NOTHING"
+            sql = (
+                f"INSERT INTO {quote_ident(table_name)} ({', '.join(quote_ident(n) for n in names)}) "
+                f"VALUES ({', '.join('?' * len(names))}) ON CONFLICT ({keys}) {action}"
+            )
+            values = prepare_frame(df, table, names, table["primary_key"])
+            values = values.astype(object).where(values.notna(), None)
+            conn.executemany(sql, values.itertuples(index=False, name=None))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def postgres_load(frames, dsn):
+    """load_tables() into a transaction that is rolled back, so the database is left as it was."""
+    import psycopg2
+
+    from app.loading_script import upsert_table
+
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cursor:
+            for table_name in load_order(list(frames)):
+                upsert_table(cursor, frames[table_name], table_name)
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+# ------------------------------------------------------------------ harness
+
+def run(rows, dsn=None, seed=0):
+    """Generate, then time each stage. Returns the result dict written to --output."""
+    raw = generate(rows, seed)
+    timings, counts = {}, {}
+    with tempfile.TemporaryDirectory() as state_dir:
+        def timed(stage, fn, *args):
+            started = time.perf_counter()
+            value = fn(*args)
+            timings[stage] = round(time.perf_counter() - started, 4)
+            return value
+
+        parsed = timed("parse", parse, raw)
+        harmonized = timed("harmonize", harmonize, parsed)
+        frames = timed("keys", resolve_keys, harmonized, state_dir)
+        if dsn:
+            timed("load", postgres_load, frames, dsn)
+        else:
+            timed("load", sqlite_load, frames, os.path.join(state_dir, "bench.sqlite"))
+        counts = {name: len(df) for name, df in frames.items()}
+
+    return {
+        "rows": rows,
+        "target": "postgres" if dsn else "sqlite",
+        "stages": timings,
+        "total": round(sum(timings.values()), 4),
+        "tables": counts,
+        "rows_per_second": round(rows / sum(timings.values())),
+    }
+
+
+def baseline_key(result):
+    return f"{result['target']}:{result['rows']}"
+
+
+def compare(result, baseline, tolerance, min_seconds=0.05):
+    """
+    Stages (and the total) more than tolerance slower than the baseline:
+    list of (stage, baseline, now). Slowdowns under min_seconds are timer
+    noise on small runs and are ignored.
+    """
+    previous = baseline.get(baseline_key(result))
+    if not previous:
+        return []
+    regressions = []
+    for stage in STAGES + ("total",):
+        before = previous["total"] if stage == "total" else previous["stages"].get(stage)
+        now = result["total"] if stage == "total" else result["stages"].get(stage)
+        if before and now is not None and now > before * (1 + tolerance) and now - before > min_seconds:
+            regressions.append((stage, before, now))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000, help="Order items to generate (10k - 10M)")
+    parser.add_argument("--dsn", help="Load into this Postgres database (rolled back) instead of SQLite")
+    parser.add_argument("--output", default=os.path.join(BENCH_DIR, "results", "latest.json"))
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown per stage (0.25 = 25%%)")
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="Ignore slowdowns smaller than this")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    result = run(args.rows, args.dsn, args.seed)
+    for stage in STAGES:
+        print(f"{stage:<10} {result['stages'][stage]:8.3f}s")
+    print(f"{'total':<10} {result['total']:8.3f}s  {result['rows_per_second']:,} order items/s")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    if args.update_baseline:
+        baseline[baseline_key(result)] = result
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"baseline updated: {args.baseline} [{baseline_key(result)}]")
+        return 0
+
+    regressions = compare(result, baseline, args.tolerance, args.min_seconds)
+    for stage, before, now in regressions:
+        print(f"REGRESSION {stage}: {before:.3f}s -> {now:.3f}s (+{(now / before - 1) * 100:.0f}%)")
+    if baseline_key(result) not in baseline:
+        print(f"no baseline for {baseline_key(result)}; run with --update-baseline to record one")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
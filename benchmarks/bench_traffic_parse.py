@@ -0,0 +1,85 @@
+"""
+Benchmark: parsing multi-year traffic-report exports.
+
+    python -m benchmarks.bench_traffic_parse --years 5 --repeat 20
+
+Builds a Lazada-style export with a period summary row and a "-"
+separator per month, DD/MM/YYYY daily rows and "9.47%" rates, repeated
+--repeat times (as when several shops' exports are concatenated), then
+times parse_traffic_report() + to_fact_traffic() against a row-by-row
+apply() parse of the same text.
+"""
+import argparse
+import time
+from io import StringIO
+
+import numpy as np
+import pandas as pd
+
+from app.etl import LAZADA_COLUMN_MAP
+from app.Transformation.standardize_fact_traffic import parse_traffic_report, to_fact_traffic
+
+
+def make_export(years, repeat=1, seed=0):
+    """CSV text of a monthly-sectioned export covering years full years from 2020."""
+    rng = np.random.default_rng(seed)
+    lines = [",".join(LAZADA_COLUMN_MAP)]
+    width = len(LAZADA_COLUMN_MAP) - 1
+    for month_start in pd.date_range("2020-01-01", periods=12 * years, freq="MS"):
+        days = pd.date_range(month_start, month_start + pd.offsets.MonthEnd(0))
+        lines.append(f"{days[0]:%Y-%m-%d}~{days[-1]:%Y-%m-%d}," + ",".join(["1000"] * 6 + ["3.62%"] + ["1"] * (width - 7)))
+        lines.append(",".join(["-"] * (width + 1)))
+        values = rng.integers(0, 5000, (len(days), width))
+        rates = rng.uniform(0, 20, len(days))
+        for day, row, rate in zip(days, values, rates):
+            cells = [str(v) for v in row]
+            cells[6] = f"{rate:.2f}%"
+            lines.append(f"{day:%d/%m/%Y}," + ",".join(cells))
+    body = "\n".join(lines[1:])
+    return lines[0] + "\n" + "\n".join([body] * repeat) + "\n"
+
+
+def parse_rowwise(raw):
+    """Per-row baseline: apply() with a format guess per cell."""
+    df = raw.rename(columns=LAZADA_COLUMN_MAP)
+    df = df[df["date"].apply(lambda d: "~" not in d and d.strip() not in ("-", ""))].copy()
+    df["date"] = df["date"].apply(lambda d: pd.to_datetime(d, dayfirst=True))
+    for column in df.columns[1:]:
+        df[column] = df[column].apply(
+            lambda v: float(v.rstrip("%")) / 100 if v.endswith("%") else float(v.replace(",", "") or "nan")
+        )
+    return df
+
+
+def measure(label, fn):
+    started = time.perf_counter()
+    rows = fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<12} {elapsed:8.3f}s  {rows / elapsed:12,.0f} rows/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--skip-rowwise", action="store_true", help="Only time the vectorized parser")
+    args = parser.parse_args()
+
+    text = make_export(args.years, args.repeat)
+    raw = pd.read_csv(StringIO(text), dtype=str, keep_default_na=False)
+    print(f"{len(raw)} raw rows ({args.years} years x {args.repeat}), {len(text) / 1e6:.1f} MB")
+
+    def vectorized():
+        daily, _ = parse_traffic_report(raw, LAZADA_COLUMN_MAP)
+        to_fact_traffic(daily, "Lazada")
+        return len(daily)
+
+    vector_time = measure("vectorized", vectorized)
+    if not args.skip_rowwise:
+        rowwise_time = measure("row apply", lambda: len(parse_rowwise(raw)))
+        print(f"row apply / vectorized: {rowwise_time / vector_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
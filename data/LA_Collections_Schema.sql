@@ -61,6 +61,20 @@ CREATE TABLE "Fact_Traffic" (
   "wishlist_add_count" int
 );
 
+CREATE TABLE "Fact_Traffic_Shop" (
+  "shop" varchar NOT NULL,
+  "traffic_event_key" bigint NOT NULL,
+  "time_key" int NOT NULL,
+  "product_key" int NOT NULL,
+  "customer_key" int NOT NULL,
+  "platform_key" int NOT NULL,
+  "page_views" int NOT NULL,
+  "visits" int NOT NULL,
+  "add_to_cart_count" int,
+  "wishlist_add_count" int,
+  PRIMARY KEY ("shop", "traffic_event_key")
+);
+
 CREATE TABLE "Fact_Activity" (
   "activity_event_key" bigint PRIMARY KEY NOT NULL,
   "time_key" int NOT NULL,
@@ -71,6 +85,21 @@ CREATE TABLE "Fact_Activity" (
   "follower_count_change" int
 );
 
+CREATE TABLE "Daily_Sales_Summary" (
+  "time_key" int NOT NULL,
+  "platform_key" int NOT NULL,
+  "order_items" int NOT NULL,
+  "items_sold" int NOT NULL,
+  "cancelled_items" int NOT NULL,
+  "returned_items" int NOT NULL,
+  "revenue" decimal NOT NULL,
+  "seller_commission_fees" decimal,
+  "platform_subsidies" decimal,
+  "unique_customers" int NOT NULL,
+  "updated_at" timestamp DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY ("time_key", "platform_key")
+);
+
 COMMENT ON COLUMN "Dim_Platform"."platform_key" IS 'Surrogate key for the marketplace (1=Lazada, 2=Shopee)';
 
 COMMENT ON COLUMN "Dim_Platform"."platform_region" IS 'e.g., PH, MY, SG';
@@ -115,6 +144,10 @@ COMMENT ON COLUMN "Fact_Orders"."seller_commission_fee" IS 'Fee paid by seller t
 
 COMMENT ON COLUMN "Fact_Orders"."platform_subsidy_amount" IS 'Voucher/discount amount subsidized by the platform';
 
+COMMENT ON COLUMN "Fact_Traffic_Shop"."shop" IS 'Shop the export came from; Fact_Traffic rows are the sum over shops';
+
+COMMENT ON COLUMN "Daily_Sales_Summary"."revenue" IS 'paid_price of items neither cancelled nor returned; refreshed from Fact_Orders by the loader';
+
 COMMENT ON COLUMN "Fact_Activity"."activity_type" IS 'e.g., CHAT_SENT, SHOP_FOLLOWED, COUPON_CLAIMED';
 
 COMMENT ON COLUMN "Fact_Activity"."follower_count_change" IS 'e.g., +1 when shop is followed';
@@ -135,8 +168,25 @@ ALTER TABLE "Fact_Traffic" ADD FOREIGN KEY ("customer_key") REFERENCES "Dim_Cust
 
 ALTER TABLE "Fact_Traffic" ADD FOREIGN KEY ("platform_key") REFERENCES "Dim_Platform" ("platform_key");
 
+ALTER TABLE "Fact_Traffic_Shop" ADD FOREIGN KEY ("time_key") REFERENCES "Dim_Time" ("time_key");
+
+ALTER TABLE "Fact_Traffic_Shop" ADD FOREIGN KEY ("product_key") REFERENCES "Dim_Product" ("product_key");
+
+ALTER TABLE "Fact_Traffic_Shop" ADD FOREIGN KEY ("customer_key") REFERENCES "Dim_Customer" ("customer_key");
+
+ALTER TABLE "Fact_Traffic_Shop" ADD FOREIGN KEY ("platform_key") REFERENCES "Dim_Platform" ("platform_key");
+
+ALTER TABLE "Daily_Sales_Summary" ADD FOREIGN KEY ("time_key") REFERENCES "Dim_Time" ("time_key");
+
+ALTER TABLE "Daily_Sales_Summary" ADD FOREIGN KEY ("platform_key") REFERENCES "Dim_Platform" ("platform_key");
+
 ALTER TABLE "Fact_Activity" ADD FOREIGN KEY ("time_key") REFERENCES "Dim_Time" ("time_key");
 
 ALTER TABLE "Fact_Activity" ADD FOREIGN KEY ("customer_key") REFERENCES "Dim_Customer" ("customer_key");
 
 ALTER TABLE "Fact_Activity" ADD FOREIGN KEY ("platform_key") REFERENCES "Dim_Platform" ("platform_key");
+
+-- Shop-level Fact_Traffic rows (no product / customer) reference key 0
+INSERT INTO "Dim_Product" ("product_key", "product_name") VALUES (0, 'All products') ON CONFLICT DO NOTHING;
+
+INSERT INTO "Dim_Customer" ("customer_key", "platform_buyer_id") VALUES (0, 'ALL') ON CONFLICT DO NOTHING;
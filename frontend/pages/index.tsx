@@ -2,8 +2,12 @@ import { useState, ChangeEvent } from "react";
 
 type Platform = "Lazada" | "Shopee";
 
+const API_BASE = "http://localhost:8000";
+const PAGE_SIZE = 100;
+
 interface DataFrameData {
   message: string;
+  result_id: string;
   rows_processed: number;
   columns: string[];
   data: Record<string, any>[];
@@ -15,6 +19,7 @@ export default function UploadPage() {
   const [platform, setPlatform] = useState<Platform>("Lazada");
   const [status, setStatus] = useState<string>("");
   const [dataFrameData, setDataFrameData] = useState<DataFrameData | null>(null);
+  const [offset, setOffset] = useState<number>(0);
 
   // Handle file selection
   const handleFileChange = (e: ChangeEvent<HTMLInputElement>) => {
@@ -26,9 +31,33 @@ export default function UploadPage() {
     setPlatform(e.target.value as Platform);
   };
 
+  // Fetch one page of rows from the stored upload result
+  const loadPage = async (newOffset: number) => {
+    if (!dataFrameData) return;
+    try {
+      const res = await fetch(
+        `${API_BASE}/results/${dataFrameData.result_id}/rows?offset=${newOffset}&limit=${PAGE_SIZE}`
+      );
+      if (res.ok) {
+        const page = await res.json();
+        setDataFrameData({ ...dataFrameData, data: page.data });
+        setOffset(newOffset);
+      } else {
+        setStatus("Result expired, please upload the file again");
+      }
+    } catch (err) {
+      console.error(err);
+      setStatus("Error connecting to server");
+    }
+  };
+
   // Handle clear data
   const handleClear = () => {
+    if (dataFrameData) {
+      fetch(`${API_BASE}/results/${dataFrameData.result_id}`, { method: "DELETE" }).catch(() => {});
+    }
     setDataFrameData(null);
+    setOffset(0);
     setStatus("");
     setFile(null);
   };
@@ -46,7 +75,8 @@ export default function UploadPage() {
     setStatus("Processing...");
 
     try {
-      const res = await fetch("http://localhost:8000/upload", {
+      formData.append("stream", "true");
+      const res = await fetch(`${API_BASE}/upload`, {
         method: "POST",
         body: formData,
       });
@@ -55,6 +85,7 @@ export default function UploadPage() {
         const data = await res.json();
         setStatus(`File processed successfully! Processed: ${data.rows_processed || 0} rows. Columns: ${data.columns?.length || 0}`);
         setDataFrameData(data);
+        setOffset(0);
       } else {
         setStatus("Processing failed");
         setDataFrameData(null);
@@ -114,6 +145,27 @@ export default function UploadPage() {
           <div className="mb-4 text-black">
             <p><strong>Shape:</strong> {dataFrameData.dataframe_shape[0]} rows × {dataFrameData.dataframe_shape[1]} columns</p>
             <p><strong>Platform:</strong> {platform}</p>
+            <p>
+              <strong>Rows:</strong> {Math.min(offset + 1, dataFrameData.rows_processed)}–
+              {Math.min(offset + PAGE_SIZE, dataFrameData.rows_processed)} of {dataFrameData.rows_processed}
+            </p>
+          </div>
+
+          <div className="mb-4 flex gap-2">
+            <button
+              onClick={() => loadPage(Math.max(offset - PAGE_SIZE, 0))}
+              disabled={offset === 0}
+              className="bg-gray-200 text-black py-1 px-3 rounded-lg disabled:opacity-50"
+            >
+              Previous
+            </button>
+            <button
+              onClick={() => loadPage(offset + PAGE_SIZE)}
+              disabled={offset + PAGE_SIZE >= dataFrameData.rows_processed}
+              className="bg-gray-200 text-black py-1 px-3 rounded-lg disabled:opacity-50"
+            >
+              Next
+            </button>
           </div>
           
           <div className="overflow-x-auto max-h-96 overflow-y-auto">
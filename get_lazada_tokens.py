@@ -10,10 +10,9 @@ from tests.lazada_test import (
     get_authorization_url, 
     get_access_token, 
     refresh_access_token,
-    save_tokens_to_file,
-    load_tokens_from_file,
-    is_token_expired
 )
+from app.Extraction.lazada_api_calls import lazada_tokens
+from app.Extraction.token_manager import TokenError
 
 # Load environment variables
 load_dotenv()
@@ -76,9 +75,9 @@ def main():
         # Step 4: Update .env file with tokens
         update_env_file_tokens(token_result)
         
-        # Step 5: Save tokens to JSON file as backup
-        if save_tokens_to_file(token_result):
-            print("✅ Tokens also saved to lazada_tokens.json as backup")
+        # Step 5: Save tokens to the token cache the extraction clients read
+        lazada_tokens.save(token_result)
+        print(f"✅ Tokens also saved to {lazada_tokens.path}")
         
         # Step 6: Test token refresh
         print(f"\nStep 3: Testing token refresh...")
@@ -98,47 +97,19 @@ def test_saved_tokens():
     """Test loading and checking saved tokens"""
     print("\n=== Testing Saved Tokens ===")
     
-    # Load tokens from file
-    tokens = load_tokens_from_file()
-    
-    if tokens:
-        print("✅ Tokens loaded from file")
-        print(f"Access Token: {tokens['access_token'][:20]}...")
-        
-        # Check if expired
-        if is_token_expired(tokens):
-            print("⚠️ Access token is expired")
-            
-            # Try to refresh
-            print("Attempting to refresh token...")
-            refresh_result = refresh_access_token(tokens['refresh_token'])
-            
-            if refresh_result['success']:
-                print("✅ Token refreshed successfully!")
-                
-                # Update tokens
-                tokens.update({
-                    'access_token': refresh_result['access_token'],
-                    'refresh_token': refresh_result['refresh_token'],
-                    'expires_in': refresh_result['expires_in'],
-                    'created_at': int(time.time())
-                })
-                
-                # Save updated tokens
-                import json
-                with open('lazada_tokens.json', 'w') as f:
-                    json.dump(tokens, f, indent=2)
-                print("✅ Updated tokens saved")
-            else:
-                print(f"❌ Token refresh failed: {refresh_result['error']}")
-        else:
-            print("✅ Access token is still valid")
-    else:
+    if not lazada_tokens.available():
         print("❌ No saved tokens found")
+        return
+    
+    # The token manager refreshes (once, across processes) if the token is near expiry
+    try:
+        access_token = lazada_tokens.access_token()
+        print(f"✅ Access token valid: {access_token[:20]}...")
+        print(f"Expires (minus buffer) in {int(lazada_tokens.seconds_left())} seconds")
+    except TokenError as e:
+        print(f"❌ {e}")
 
 if __name__ == "__main__":
-    import time
-    
     choice = input("Choose option:\n1. Get new tokens\n2. Test saved tokens\nEnter choice (1/2): ").strip()
     
     if choice == "1":
@@ -1,10 +1,17 @@
-from fastapi import FastAPI, File, UploadFile, Form
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 import pandas as pd
 from dotenv import load_dotenv
-import io
+import os
 
-from app.etl import process_csv_file
+from app import analytics, config
+from app.cube import CubeQueryError, olap_cube
+from app.db import pool_stats
+from app.etl import dataframe_records, run_upload
+from app.jobs import JobNotFound, Saturated, etl_executor, upload_source
+from app.query_cache import query_cache
+from app.results import ResultNotFound, result_store
 
 load_dotenv()
 
@@ -12,7 +19,7 @@ app = FastAPI()
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],   
+    allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -21,31 +28,237 @@ app.add_middleware(
 @app.post("/upload")
 async def upload_csv(
     file: UploadFile = File(...),
-    platform: str = Form(...)
+    platform: str = Form(...),
+    stream: bool = Form(False),
+    save_to_db: bool = Form(False),
+    shop: str = Form("")
 ):
     """
     Upload CSV file + platform ("Lazada" or "Shopee"),
-    transform with mapping, and return DataFrame info (without saving to DB).
+    transform with mapping, and return DataFrame info (saved to the upload
+    table only with save_to_db=true).
+
+    The transformed rows are kept under a result_id and fetched page by page
+    from /results/{result_id}; only a preview is returned here. With
+    stream=true the file is read in chunks and transformed in bounded batches.
+    When saving, a file identical to one saved before is skipped outright and
+    days already saved unchanged are not written again (app/ledger.py);
+    rows_skipped / rows_written report the split. Saved rows are keyed by
+    platform, shop and day, so pass shop when several shops upload.
+
+    The transform runs on the ETL executor. With ETL_EXECUTOR=queue this
+    returns 202 and a job_id to poll at /jobs/{job_id}; when the executor is
+    saturated it returns 429.
     """
+    result_id = None
     try:
-        
-        contents = await file.read()
-        file_like = io.StringIO(contents.decode("utf-8"))
-        
-        # process 
-        result = process_csv_file(file_like, platform, save_to_db=False)
-        
-        if result["status"] == "success":
-            df = result["dataframe"]
-            return {
-                "message": f"Processed {result['rows_processed']} rows from {platform}",
-                "rows_processed": result["rows_processed"],
-                "columns": list(df.columns),
-                "data": df.to_dict('records'),  # Return all data
-                "dataframe_shape": df.shape
-            }
-        else:
-            return {"status": "error", "message": result["detail"]}
-            
+        source, delete_source = await upload_source(file, etl_executor)
+        result_id = result_store.create(platform)
+        job_args = (run_upload, source, platform)
+        job_kwargs = {
+            "save_to_db": save_to_db,
+            "stream": stream,
+            "shop": shop,
+            "result_dir": result_store.result_dir(result_id),
+            "delete_source": delete_source,
+            "on_done": lambda result: _upload_response(result_id, platform, result)
+        }
+
+        try:
+            if etl_executor.queued:
+                job_id, _ = etl_executor.submit(*job_args, **job_kwargs)
+                return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued", "result_id": result_id})
+            return await etl_executor.run(*job_args, **job_kwargs)
+        except Saturated:
+            result_store.delete(result_id)
+            if delete_source:
+                os.remove(source)
+            raise HTTPException(status_code=429, detail="Too many uploads in progress, retry shortly")
+
+    except HTTPException:
+        raise
     except Exception as e:
+        if result_id is not None:
+            try:
+                result_store.delete(result_id)
+            except ResultNotFound:
+                pass  # already removed by _upload_response()
         return {"status": "error", "message": str(e)}
+
+
+def _upload_response(result_id, platform, result):
+    """Register the spooled batches of a finished run_upload job."""
+    if result["status"] != "success":
+        result_store.delete(result_id)
+        return {"status": "error", "message": result["detail"]}
+
+    result_store.add_batches(result_id, result["columns"], result["batch_rows"])
+    result_store.finish(result_id)
+    return {
+        "message": f"Processed {result['rows_processed']} rows from {platform}",
+        "result_id": result_id,
+        "rows_processed": result["rows_processed"],
+        "columns": result["columns"],
+        "data": result["preview"],  # First UPLOAD_PREVIEW_ROWS rows, the rest via /results
+        "dataframe_shape": (result["rows_processed"], len(result["columns"])),
+        "batches": result["batches"],
+        "rows_written": result["inserted"],
+        "rows_skipped": result["skipped"],
+        "duplicate_file": result["duplicate_file"],
+        "memory": result["memory"]
+    }
+
+
+@app.get("/jobs")
+def get_executor_stats():
+    return etl_executor.stats()
+
+
+@app.get("/metrics/db-pool")
+def get_db_pool_metrics():
+    """Connection pool sizes and wait times for this worker process."""
+    return pool_stats()
+
+
+@app.get("/metrics/query-cache")
+def get_query_cache_metrics():
+    """Hit/miss counts and size of the dashboard query cache."""
+    return query_cache.stats()
+
+
+@app.get("/cube/query")
+def query_cube(
+    by: str = Query("", description="Comma-separated attributes, e.g. month,platform_name"),
+    where: list[str] = Query([], description="attribute:value1|value2, repeatable"),
+    measures: str = Query("", description="Comma-separated measures (all by default)"),
+):
+    """Slice, dice and roll up Fact_Orders from the in-process cube."""
+    filters = {}
+    for condition in where:
+        attribute, sep, values = condition.partition(":")
+        if not sep:
+            raise HTTPException(status_code=400, detail=f"Invalid where clause: {condition}")
+        filters[attribute.strip()] = [v.strip() for v in values.split("|")]
+    try:
+        if not olap_cube.loaded:
+            olap_cube.reload()
+        return olap_cube.query(
+            [b.strip() for b in by.split(",") if b.strip()],
+            filters,
+            [m.strip() for m in measures.split(",") if m.strip()] or None,
+        )
+    except CubeQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/cube/stats")
+def get_cube_stats():
+    return olap_cube.stats()
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Status of a queued ETL job; result holds the upload response when done."""
+    try:
+        return etl_executor.status(job_id)
+    except JobNotFound:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+
+
+def _parse_columns(columns):
+    return [c.strip() for c in columns.split(",") if c.strip()] if columns else None
+
+
+@app.get("/results/{result_id}")
+def get_result(result_id: str):
+    """Row count, columns and platform of an upload result."""
+    try:
+        return result_store.meta(result_id)
+    except ResultNotFound:
+        raise HTTPException(status_code=404, detail="Result not found or expired")
+
+
+@app.get("/results/{result_id}/rows")
+def get_result_rows(
+    result_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1),
+    columns: str = None
+):
+    """One page of rows. columns is a comma-separated subset to return."""
+    limit = min(limit, config.RESULTS_MAX_PAGE_SIZE)
+    selected = _parse_columns(columns)
+    try:
+        meta = result_store.meta(result_id)
+        pages = list(result_store.iter_batches(result_id, selected, offset, limit))
+    except ResultNotFound:
+        raise HTTPException(status_code=404, detail="Result not found or expired")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    data = []
+    for df in pages:
+        data.extend(dataframe_records(df))
+    return {
+        "result_id": result_id,
+        "offset": offset,
+        "limit": limit,
+        "total": meta["rows"],
+        "columns": selected or meta["columns"],
+        "data": data
+    }
+
+
+@app.get("/results/{result_id}/ndjson")
+def stream_result_rows(result_id: str, columns: str = None):
+    """All rows as newline-delimited JSON, streamed batch by batch."""
+    selected = _parse_columns(columns)
+    try:
+        batches = result_store.iter_batches(result_id, selected)
+        first = next(batches, None)
+    except ResultNotFound:
+        raise HTTPException(status_code=404, detail="Result not found or expired")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def generate():
+        df = first
+        while df is not None:
+            if not df.empty:
+                yield df.to_json(orient="records", lines=True, date_format="iso")
+            df = next(batches, None)
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@app.delete("/results/{result_id}")
+def delete_result(result_id: str):
+    try:
+        result_store.delete(result_id)
+    except ResultNotFound:
+        raise HTTPException(status_code=404, detail="Result not found or expired")
+    return {"status": "deleted", "result_id": result_id}
+
+
+@app.get("/analytics/product-performance")
+def get_product_performance(category: str = None, limit: int = Query(50, ge=1, le=500)):
+    return {"data": analytics.product_performance(category, limit)}
+
+
+@app.get("/analytics/customer-segments")
+def get_customer_segments():
+    return {"data": analytics.customer_segments()}
+
+
+@app.get("/analytics/voucher-effectiveness")
+def get_voucher_effectiveness(voucher_type: str = None, limit: int = Query(50, ge=1, le=500)):
+    return {"data": analytics.voucher_effectiveness(voucher_type, limit)}
+
+
+@app.get("/analytics/sales-trends")
+def get_sales_trends(
+    year: int = Query(None, ge=2000),
+    quarter: int = Query(None, ge=1, le=4),
+    month: int = Query(None, ge=1, le=12)
+):
+    return {"data": analytics.sales_trends(year, quarter, month)}
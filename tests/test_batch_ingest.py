@@ -0,0 +1,118 @@
+"""
+Tests for the batch ingestion CLI in app/batch_ingest.py
+"""
+import os
+import shutil
+
+from app import batch_ingest
+from app.batch_ingest import detect_report, expand_inputs, load_staged, print_report, run_batch
+from app.staging import StagingArea
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+SHOPEE_EXPORT = (
+    "Date,Sales (PHP),Orders,Visitors,Page Views,Buyers,Units Sold,Order Conversion Rate\n"
+    "01-05-2024,\"1,200.50\",3,40,90,3,4,7.50%\n"
+    "02-05-2024,800,2,30,70,2,2,6.67%\n"
+)
+
+
+def make_exports(root):
+    for shop in ("shop_a", "shop_b"):
+        os.makedirs(root / shop)
+        shutil.copy(os.path.join(DATA_DIR, "samplelazada.csv"), root / shop / "lazada_may.csv")
+    (root / "shop_a" / "shopee_may.csv").write_text(SHOPEE_EXPORT)
+    (root / "shop_a" / "notes.csv").write_text("Comment\nhello\n")
+
+
+def test_detects_platform_and_report(tmp_path):
+    make_exports(tmp_path)
+    assert detect_report(tmp_path / "shop_a" / "lazada_may.csv") == ("Lazada", "traffic")
+    assert detect_report(tmp_path / "shop_a" / "shopee_may.csv") == ("Shopee", "traffic")
+    assert detect_report(tmp_path / "shop_a" / "notes.csv") == (None, None)
+    assert len(expand_inputs([str(tmp_path)])) == 4
+    assert len(expand_inputs([str(tmp_path / "shop_a" / "*.csv")])) == 3
+
+
+def test_batch_merges_shops_and_loads_once(tmp_path, monkeypatch):
+    make_exports(tmp_path)
+    loads = []
+
+    def fake_load_tables(frames, db_conn_string=None):
+        loads.append(frames)
+        return {"status": "success", "detail": "ok"}
+
+    monkeypatch.setattr("app.loading_script.load_tables", fake_load_tables)
+    report = run_batch([str(tmp_path)], max_workers=2)
+
+    assert report["status"] == "success" and len(loads) == 1
+    by_file = {os.path.basename(f["file"]): f for f in report["files"]}
+    assert by_file["notes.csv"]["status"] == "skipped"
+    assert by_file["notes.csv"]["detail"] == "Not a Lazada or Shopee export"
+    assert report["skipped"] == [str(tmp_path / "shop_a" / "notes.csv")]
+    assert by_file["shopee_may.csv"]["rows"] == 2 and by_file["lazada_may.csv"]["seconds"] >= 0
+
+    # One row per shop and day; load_tables() sums them into Fact_Traffic
+    fact = loads[0]["Fact_Traffic_Shop"]
+    assert "Fact_Traffic" not in loads[0]
+    assert len(fact) == 2 * 31 + 2 and not fact.duplicated(["shop", "traffic_event_key"]).any()
+    may_first = fact[fact["traffic_event_key"] == 120240501]
+    assert may_first["shop"].tolist() == ["shop_a", "shop_b"] and may_first["page_views"].tolist() == [202, 202]
+    assert fact.set_index("traffic_event_key").loc[220240501, "visits"] == 40
+    assert {"Dim_Platform", "Dim_Time", "Dim_Product", "Dim_Customer"} <= set(loads[0])
+    assert loads[0]["Dim_Time"]["time_key"].min() == 20240501
+
+
+def test_failed_load_is_retried_from_staging(tmp_path, monkeypatch):
+    make_exports(tmp_path / "exports")
+    area = StagingArea(str(tmp_path / "staging"))
+    statuses = iter(["error", "success", "success"])
+    loads = []
+
+    def fake_load_tables(frames, db_conn_string=None):
+        loads.append(frames)
+        return {"status": next(statuses), "detail": "ok"}
+
+    monkeypatch.setattr("app.loading_script.load_tables", fake_load_tables)
+    report = run_batch([str(tmp_path / "exports")], max_workers=1, staging=area)
+    assert report["status"] == "error" and len(report["staged"]) == 31 + 2
+    assert [(p, d) for p, d, _ in area.partitions("Fact_Traffic_Shop")][-2:] == [
+        ("Shopee", "2024-05-01"), ("Shopee", "2024-05-02")
+    ]
+
+    # The exports are not read again
+    shutil.rmtree(tmp_path / "exports")
+    retry = load_staged(staging=area)
+    assert retry["status"] == "success" and len(loads) == 2
+    staged, merged = loads[1]["Fact_Traffic_Shop"], loads[0]["Fact_Traffic_Shop"]
+    assert staged[merged.columns].equals(merged)
+    assert loads[1]["Dim_Time"]["time_key"].tolist() == loads[0]["Dim_Time"]["time_key"].tolist()
+    assert load_staged(platforms=["Shopee"], start="2024-05-02", staging=area)["status"] == "success"
+    assert loads[2]["Fact_Traffic_Shop"]["time_key"].tolist() == [20240502]
+
+
+def test_reexport_of_same_shop_is_not_double_counted(tmp_path):
+    make_exports(tmp_path)
+    shutil.copy(tmp_path / "shop_a" / "lazada_may.csv", tmp_path / "shop_a" / "lazada_may_again.csv")
+    results = [batch_ingest.transform_file(path, str(tmp_path)) for path in expand_inputs([str(tmp_path)])]
+    fact = batch_ingest.merge_results(results)["Fact_Traffic_Shop"]
+    assert fact[fact["traffic_event_key"] == 120240501]["page_views"].tolist() == [202, 202]
+
+
+def test_non_traffic_exports_are_reported_as_skipped(tmp_path):
+    (tmp_path / "lazada_orders.csv").write_text("Order Number,Revenue,Pageviews\n1,10,2\n")
+    result = batch_ingest.transform_file(str(tmp_path / "lazada_orders.csv"))
+    assert result["status"] == "skipped"
+    assert result["detail"] == "Not a traffic report (Lazada); only traffic exports are ingested"
+
+
+def test_print_report_of_successful_load(tmp_path, monkeypatch, capsys):
+    make_exports(tmp_path)
+    rows = {"Fact_Traffic_Shop": 64}
+    monkeypatch.setattr("app.loading_script.load_tables",
+                        lambda frames, db_conn_string=None: {"status": "success", "rows": rows})
+    report = run_batch([str(tmp_path / "shop_b")], max_workers=1)
+
+    print_report(report)
+    out = capsys.readouterr().out
+    assert report["load"] == {"status": "success", "rows": rows, "seconds": report["load"]["seconds"]}
+    assert f"load: success in {report['load']['seconds']}s\n" in out
@@ -0,0 +1,43 @@
+"""
+Tests for the end-to-end benchmark harness in benchmarks/bench_etl.py
+"""
+import json
+
+import pandas as pd
+
+from benchmarks import bench_etl
+
+
+def test_small_run_covers_every_stage(tmp_path):
+    result = bench_etl.run(2000)
+    assert set(result["stages"]) == set(bench_etl.STAGES)
+    assert result["tables"]["Fact_Orders"] == 2000 and result["tables"]["Fact_Activity"] == 200
+    assert result["tables"]["Fact_Traffic"] == 2 * 366  # a leap year of daily rows per platform
+
+
+def test_traffic_exports_use_each_platforms_format():
+    raw = bench_etl.generate(2000)
+    assert raw["traffic"]["Shopee"].splitlines()[0] == ",".join(bench_etl.SHOPEE_HEADER)
+    assert raw["traffic"]["Lazada"].startswith("Date,Revenue,")
+
+    shopee = bench_etl.parse(raw)["traffic"]["Shopee"]
+    assert len(shopee) == 366 and shopee.notna().all().all()
+    assert shopee["date"].iloc[0] == pd.Timestamp("2020-01-01")
+
+
+def test_default_scale_has_a_committed_baseline():
+    with open(bench_etl.DEFAULT_BASELINE, encoding="utf-8") as f:
+        assert "sqlite:100000" in json.load(f)
+
+
+def test_baseline_regression_check(tmp_path):
+    baseline_path = tmp_path / "baseline.json"
+    assert bench_etl.main(["--rows", "1000", "--output", str(tmp_path / "out.json"), "--baseline", str(baseline_path),
+                           "--update-baseline"]) == 0
+    baseline = json.loads(baseline_path.read_text())
+    result = baseline["sqlite:1000"]
+
+    slower = dict(result, stages=dict(result["stages"], load=result["stages"]["load"] * 2 + 1), total=result["total"] + 1)
+    assert [stage for stage, _, _ in bench_etl.compare(slower, baseline, 0.25)] == ["load", "total"]
+    assert bench_etl.compare(result, baseline, 0.25) == []
+    assert bench_etl.compare(dict(result, rows=5), baseline, 0.25) == []  # no baseline for that scale
@@ -0,0 +1,128 @@
+"""
+Tests for the in-process OLAP cube in app/cube.py and the /cube endpoints
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from app.cube import CubeQueryError, OlapCube
+from main import app
+
+
+def sample_facts():
+    return pd.DataFrame({
+        "order_item_key": [1, 2, 3, 4, 5, 6],
+        "time_key": [20240115, 20240115, 20240220, 20240405, 20240405, 20241231],
+        "product_key": [10, 11, 10, 12, 11, 10],
+        "customer_key": [100, 100, 101, 102, 100, 103],
+        "platform_key": [1, 2, 1, 1, 2, 2],
+        "paid_price": [100.0, 50.0, 20.0, 30.0, 10.0, None],
+        "item_quantity": [1, 2, 1, 1, 3, 1],
+        "seller_commission_fee": [1.0, 0.5, 0.2, 0.3, 0.1, 0.0],
+        "platform_subsidy_amount": [0.0] * 6,
+    })
+
+
+def make_cube():
+    cube = OlapCube()
+    cube.add(sample_facts())
+    cube.set_members("product_key", pd.DataFrame({"product_key": [10, 11, 12], "category_l2": ["Dress", "Top", "Dress"]}))
+    return cube
+
+
+def cells_by(result, *attributes):
+    return {tuple(cell[a] for a in attributes): cell for cell in result["cells"]}
+
+
+def test_add_upserts_by_fact_key():
+    cube = make_cube()
+    assert cube.stats()["rows"] == 6
+
+    # Item 2 moves to Lazada at a new price; item 7 is new
+    cube.add(pd.DataFrame({
+        "order_item_key": [2, 7], "time_key": [20240115, 20240301], "product_key": [11, 13],
+        "customer_key": [100, 104], "platform_key": [1, 1], "paid_price": [55.0, 5.0],
+    }))
+
+    stats = cube.stats()
+    assert stats["rows"] == 7 and stats["members"]["product_key"] == 4
+    platforms = cells_by(cube.query(["platform_name"], measures=["paid_price", "fact_rows"]), "platform_name")
+    assert platforms[("Lazada",)]["paid_price"] == 210.0 and platforms[("Lazada",)]["fact_rows"] == 5
+    assert platforms[("Shopee",)]["paid_price"] == 10.0
+    # Columns missing from a batch are stored as 0
+    assert cube.query(measures=["item_quantity"])["cells"][0]["item_quantity"] == 7
+
+
+def test_slice_dice_and_rollup_match_pandas():
+    cube = make_cube()
+    facts = sample_facts()
+
+    quarters = cells_by(cube.rollup("quarter"), "quarter")
+    assert list(quarters) == [("2024-Q1",), ("2024-Q2",), ("2024-Q4",)]
+    assert quarters[("2024-Q1",)]["paid_price"] == 170.0 and quarters[("2024-Q1",)]["fact_rows"] == 3
+    assert cube.rollup("year")["cells"][0]["paid_price"] == facts["paid_price"].sum()
+
+    diced = cube.rollup("month", by=["category_l2"], where={"platform_name": "Lazada", "year": "2024"})
+    expected = {("2024-01", "Dress"): 100.0, ("2024-02", "Dress"): 20.0, ("2024-04", "Dress"): 30.0}
+    assert {k: v["paid_price"] for k, v in cells_by(diced, "month", "category_l2").items()} == expected
+    assert diced["rows_scanned"] == 3
+
+    # Grouping by a key attribute and filtering on a day
+    by_customer = cells_by(cube.query(["customer_key"], where={"day": ["2024-01-15", "2024-04-05"]}), "customer_key")
+    assert by_customer[(100,)]["fact_rows"] == 3 and by_customer[(102,)]["paid_price"] == 30.0
+
+    with pytest.raises(CubeQueryError):
+        cube.query(["colour"])
+    with pytest.raises(CubeQueryError):
+        cube.rollup("week")
+
+
+def test_load_tables_hook_and_endpoint(monkeypatch):
+    cube = make_cube()
+    cube.add_loaded({"Fact_Orders": sample_facts().assign(order_item_key=np.arange(7, 13))})
+    assert cube.stats()["rows"] == 6  # not loaded: load_tables() frames are ignored
+
+    cube.loaded = True
+    cube.add_loaded({
+        "Dim_Product": pd.DataFrame({"product_key": [12], "category_l2": ["Bag"]}),
+        "Fact_Orders": sample_facts().iloc[[3]].assign(order_item_key=7),
+    })
+    assert cube.stats()["rows"] == 7
+    bags = cube.query(["category_l2"], where={"category_l2": "Bag"})
+    assert bags["cells"] == [{"category_l2": "Bag", "paid_price": 60.0, "item_quantity": 2.0,
+                              "seller_commission_fee": 0.6, "platform_subsidy_amount": 0.0, "fact_rows": 2}]
+
+    monkeypatch.setattr("main.olap_cube", cube)
+    client = TestClient(app)
+    response = client.get("/cube/query", params={"by": "year,platform_name", "where": ["month:2024-01|2024-02"],
+                                                 "measures": "paid_price"})
+    assert response.status_code == 200
+    assert response.json()["cells"] == [
+        {"year": 2024, "platform_name": "Lazada", "paid_price": 120.0},
+        {"year": 2024, "platform_name": "Shopee", "paid_price": 50.0},
+    ]
+    assert client.get("/cube/query", params={"measures": "revenue"}).status_code == 400
+    assert client.get("/cube/query", params={"where": ["platform_name"]}).status_code == 400
+    assert client.get("/cube/stats").json()["rows"] == 7
+
+
+def test_lookback_window_bounds_the_cube():
+    def day(days_ago):
+        return int((datetime.now() - timedelta(days=days_ago)).strftime("%Y%m%d"))
+
+    cube = OlapCube(lookback_days=30)
+    facts = pd.DataFrame({"order_item_key": [1, 2, 3], "time_key": [day(0), day(10), day(100)],
+                          "product_key": [10, 11, 12], "paid_price": [1.0, 2.0, 4.0]})
+    assert cube.add(facts) == 2
+    assert cube.stats()["rows"] == 2
+
+    # A day later the window has moved on: rows that aged out are dropped on the next add
+    cube.lookback_days = 5
+    cube.add(pd.DataFrame({"order_item_key": [4, 1], "time_key": [day(0), day(0)], "paid_price": [8.0, 16.0]}))
+    assert cube.stats()["rows"] == 2
+    assert cube.query(measures=["paid_price"])["cells"][0]["paid_price"] == 24.0
+    cube.add(pd.DataFrame({"order_item_key": [4], "time_key": [day(1)], "paid_price": [32.0]}))
+    assert cube.query(measures=["paid_price", "fact_rows"])["cells"][0] == {"paid_price": 48.0, "fact_rows": 2}
@@ -0,0 +1,111 @@
+"""
+Tests for incremental customer metrics in app/Transformation/customer_metrics.py
+"""
+import pandas as pd
+
+from app.Transformation.customer_metrics import (
+    CustomerMetrics,
+    dim_customer_rows,
+    refresh_customer_recency,
+    update_customer_metrics,
+)
+from app.Transformation.key_resolver import SurrogateKeyIndex
+
+
+def orders(rows):
+    return pd.DataFrame(rows, columns=["order_item_key", "time_key", "customer_key", "platform_key", "paid_price",
+                                       "cancellation_reason"])
+
+
+FIRST = orders([
+    (1, 20240501, 1, 1, 1500.0, None),
+    (2, 20240501, 1, 1, 700.0, None),      # same order day: one order
+    (3, 20240502, 2, 2, 300.0, None),
+    (4, 20240502, 2, 2, 900.0, "Out of stock"),
+])
+SECOND = orders([
+    (2, 20240501, 1, 1, 700.0, None),      # loaded again: not counted twice
+    (5, 20240610, 1, 2, 9000.0, None),
+    (6, 20240611, 3, 1, 120.0, None),
+])
+
+
+def test_update_folds_batches_incrementally(tmp_path):
+    metrics = CustomerMetrics(str(tmp_path / "metrics.pkl"))
+    assert metrics.update(FIRST).tolist() == [1, 2]
+    affected = metrics.update(SECOND)
+
+    assert affected.tolist() == [1, 3]
+    state = metrics.customers.loc[1]
+    assert (state["total_orders"], state["total_items"], state["total_spent"]) == (2, 3, 11200.0)
+    assert (state["first_time_key"], state["last_time_key"]) == (20240501, 20240610)
+    assert metrics.customers.loc[2, "total_spent"] == 300.0  # the cancelled item is left out
+
+
+def test_profiles_segments_and_tiers(tmp_path):
+    metrics = CustomerMetrics(str(tmp_path / "metrics.pkl"))
+    metrics.update(FIRST)
+    metrics.update(SECOND)
+
+    profiles = metrics.profiles(as_of="2024-12-31").set_index("customer_key")
+    assert profiles.loc[1, ["buyer_segment", "LTV_tier", "customer_segment"]].tolist() == ["Returning", "Gold", "Inactive"]
+    assert profiles.loc[1, "average_order_value"] == 5600.0
+    assert profiles.loc[2, "recency_days"] == 243
+
+    recent = metrics.profiles([2, 3], as_of="2024-06-11").set_index("customer_key")
+    assert recent.index.tolist() == [2, 3]
+    assert recent["customer_segment"].tolist() == ["New", "New"]
+    assert recent["LTV_tier"].tolist() == ["Bronze", "Bronze"]
+
+
+def test_update_customer_metrics_returns_affected_dim_rows(tmp_path):
+    index = SurrogateKeyIndex("Dim_Customer", "customer_key", ["platform_buyer_id"], state_path=str(tmp_path / "k.pkl"))
+    index.load(from_db=False)
+    index.resolve(pd.Series(["buyer-a", "buyer-b", "buyer-c"]))
+    metrics = CustomerMetrics(str(tmp_path / "metrics.pkl"))
+    update_customer_metrics(FIRST, metrics, index)
+
+    rows = update_customer_metrics(SECOND, CustomerMetrics(str(tmp_path / "metrics.pkl")).load(), index)
+
+    assert rows["customer_key"].tolist() == [1, 3]
+    assert rows["platform_buyer_id"].tolist() == ["buyer-a", "buyer-c"]
+    assert rows["last_order_date"].tolist() == [pd.Timestamp("2024-06-10"), pd.Timestamp("2024-06-11")]
+    assert list(dim_customer_rows(metrics.profiles(), index).columns) == [
+        "customer_key", "platform_buyer_id", "buyer_segment", "LTV_tier", "last_order_date"]
+
+
+def test_counted_items_are_kept_for_the_window_only(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.config.CUSTOMER_METRICS_WINDOW_DAYS", 30)
+    metrics = CustomerMetrics(str(tmp_path / "metrics.pkl"))
+    metrics.update(FIRST)
+    metrics.update(SECOND)
+
+    # May 1-2 fell out of the 30 days before June 11
+    assert metrics._counted_items.tolist() == [5, 6]
+    assert len(metrics._order_days) == 2
+    metrics.save()
+    reloaded = CustomerMetrics(str(tmp_path / "metrics.pkl")).load()
+    assert reloaded.update(FIRST).empty  # older than the window: taken as counted
+    assert reloaded.customers.loc[1, "total_spent"] == 11200.0
+
+
+def test_recency_pass_writes_customers_that_turned_inactive_once(tmp_path, monkeypatch):
+    index = SurrogateKeyIndex("Dim_Customer", "customer_key", ["platform_buyer_id"], state_path=str(tmp_path / "k.pkl"))
+    index.load(from_db=False)
+    index.resolve(pd.Series(["buyer-a", "buyer-b", "buyer-c"]))
+    loaded = []
+    monkeypatch.setattr("app.loading_script.load_tables",
+                        lambda frames, dsn=None, schema_path=None: loaded.append(frames) or {"status": "success"})
+    metrics = CustomerMetrics(str(tmp_path / "metrics.pkl"))
+    metrics.update(FIRST)
+    metrics.update(SECOND)
+
+    # 180 days after May 2 only customer 2 has lapsed; customers 1 and 3 follow in December
+    assert refresh_customer_recency(metrics, index, as_of="2024-11-01", flush=True)["customer_key"].tolist() == [2]
+    assert refresh_customer_recency(metrics, index, as_of="2024-11-02")["customer_key"].tolist() == []
+    assert refresh_customer_recency(metrics, index, as_of="2024-12-31")["customer_key"].tolist() == [1, 3]
+
+    assert [list(frames) for frames in loaded] == [["Dim_Customer"], ["Dim_Customer"], ["Dim_Customers"]]
+    customers = loaded[-1]["Dim_Customers"]
+    assert customers[["customer_key", "customer_id", "customer_segment", "is_active"]].values.tolist() == [
+        [2, "buyer-b", "Inactive", False]]
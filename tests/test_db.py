@@ -0,0 +1,107 @@
+"""
+Tests for the connection pool in app/db.py
+"""
+import threading
+import time
+
+import pytest
+
+from app import db
+
+
+class FakeConnection:
+    closed = 0
+    status = 1  # psycopg2.extensions.STATUS_READY
+
+    def cursor(self):
+        raise AssertionError("fresh connections are not pinged")
+
+
+class FakeThreadedPool:
+    """Replaces psycopg2's ThreadedConnectionPool so no server is needed."""
+
+    def __init__(self, minconn, maxconn, dsn):
+        self._pool, self._used = [], {}
+
+    def getconn(self):
+        conn = self._pool.pop() if self._pool else FakeConnection()
+        self._used[id(conn)] = conn
+        return conn
+
+    def putconn(self, conn, close=False):
+        self._used.pop(id(conn))
+        if not close:
+            self._pool.append(conn)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(db.pg_pool, "ThreadedConnectionPool", FakeThreadedPool)
+    return db.ConnectionPool("postgresql://example/db", minconn=0, maxconn=1, acquire_timeout=1)
+
+
+def test_connections_are_reused(pool):
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is second
+    assert pool.stats()["acquired"] == 2
+    assert pool.stats()["in_use"] == 0
+
+
+def test_waiters_block_and_wait_time_is_recorded(pool):
+    conn = pool.getconn()
+    threading.Timer(0.2, pool.putconn, args=(conn,)).start()
+
+    with pool.connection():
+        pass
+
+    assert pool.stats()["wait_seconds_max"] >= 0.15
+
+
+def test_acquire_timeout(pool):
+    pool.acquire_timeout = 0.05
+    pool.getconn()
+
+    with pytest.raises(db.PoolTimeout):
+        pool.getconn()
+    assert pool.stats()["timeouts"] == 1
+
+
+class StaleConnection(FakeConnection):
+    def cursor(self):
+        raise db.psycopg2.OperationalError("server closed the connection")
+
+
+def test_stale_replacements_are_checked_too(pool, monkeypatch):
+    pool.maxconn = 3
+    pool.health_check_seconds = 0
+    stale = [StaleConnection(), StaleConnection()]
+    pool._pool._pool.extend(stale)
+    for conn in stale:
+        pool._last_used[id(conn)] = 0.0
+
+    with pool.connection() as conn:
+        assert isinstance(conn, FakeConnection) and not isinstance(conn, StaleConnection)
+        assert pool.stats()["in_use"] == 1
+    stats = pool.stats()
+    assert stats["replaced"] == 2 and stats["in_use"] == 0 and stats["open"] == 1
+
+
+def test_stats_do_not_read_the_psycopg2_pool(pool):
+    class OpaquePool:
+        """Only psycopg2's public pool methods."""
+
+        def getconn(self):
+            return FakeConnection()
+
+        def putconn(self, conn, close=False):
+            pass
+
+    pool._pool = OpaquePool()
+    conn = pool.getconn()
+    assert (pool.stats()["in_use"], pool.stats()["open"]) == (1, 1)
+    pool.putconn(conn, close=True)
+    assert (pool.stats()["in_use"], pool.stats()["open"]) == (0, 0)
@@ -0,0 +1,51 @@
+"""
+Tests for Dim_Time generation in app/Transformation/harmonize_dim_time.py
+"""
+import pandas as pd
+
+from app.Transformation import harmonize_dim_time as dim_time
+
+
+def test_build_dim_time_attributes():
+    calendar = dim_time.parse_mega_sale_calendar("11.11,12.12,2024-06-18")
+    df = dim_time.build_dim_time("2024-06-15", "2024-12-31", calendar)
+
+    assert len(df) == 200
+    row = df.set_index("time_key").loc[20241111]
+    assert row["is_mega_sale_day"] and row["quarter"] == 4 and row["season"] == "Fall"
+    assert row["day_of_week"] == 1 and not row["is_weekend"]
+    assert df.set_index("time_key").loc[20240618, "is_mega_sale_day"]
+    assert df["is_mega_sale_day"].sum() == 3
+    assert df.set_index("time_key").loc[20240615, "is_weekend"]
+
+
+def test_fiscal_year_offset():
+    df = dim_time.build_dim_time("2024-06-30", "2024-07-01", ([], []), fiscal_year_start_month=7)
+
+    assert df["fiscal_year"].tolist() == [2023, 2024]
+    assert df["fiscal_quarter"].tolist() == [4, 1]
+
+
+def test_ensure_inserts_only_missing_dates(monkeypatch):
+    cache = dim_time.TimeKeyCache()
+    loaded = []
+
+    def fake_existing(low, high):
+        cache._known.update({20240501, 20240502})
+        cache._loaded_ranges.append((low, high))
+
+    def fake_load_tables(frames, db_conn_string=None):
+        loaded.append(frames["Dim_Time"])
+        return {"status": "success"}
+
+    monkeypatch.setattr(cache, "_load_existing", fake_existing)
+    monkeypatch.setattr("app.loading_script.load_tables", fake_load_tables)
+
+    dates = pd.Series(pd.to_datetime(["2024-05-01", "2024-05-03", "2024-05-04", "2024-05-02", "2024-05-10"]))
+    keys = cache.ensure(dates)
+
+    assert keys.tolist() == [20240501, 20240503, 20240504, 20240502, 20240510]
+    assert loaded[0]["time_key"].tolist() == [20240503, 20240504, 20240510]
+
+    cache.ensure(dates)
+    assert len(loaded) == 1
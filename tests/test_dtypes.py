@@ -0,0 +1,64 @@
+"""
+Tests for the schema-derived compact dtypes in app/dtypes.py
+"""
+import pandas as pd
+
+from app import config
+from app.dtypes import apply_table_dtypes, memory_report, read_csv_dtypes, table_dtypes
+
+
+def test_declared_dtypes_follow_the_schema():
+    dtypes = table_dtypes("Fact_Orders")
+    assert dtypes["order_item_key"] == "int64" and dtypes["time_key"] == "int32"
+    assert dtypes["item_quantity"] == "int16"
+    assert dtypes["cancellation_reason"] == "category"
+    assert dtypes["paid_price"] == ("decimal", 2)
+
+    orders = table_dtypes("Orders", config.ENHANCED_SCHEMA_PATH)
+    assert orders["order_status"] == "category" and orders["order_date"] == "datetime64[ns]"
+    assert "order_id" in orders and "warehouse_code" not in orders  # free text stays as strings
+
+    assert read_csv_dtypes("Fact_Orders")["item_quantity"] == "int32"
+    assert "return_reason" in read_csv_dtypes("Fact_Orders") and "seller_commission_fee" in read_csv_dtypes("Fact_Orders")
+
+
+def test_apply_narrows_widens_and_keeps_nulls():
+    df = pd.DataFrame({
+        "order_item_key": [1, 2, 3],
+        "time_key": [20240501, 20240502, 20240503],
+        "item_quantity": [1, 2, 40000],  # does not fit int16
+        "paid_price": ["10.555", "3", None],
+        "cancellation_reason": ["Change of mind", None, "Change of mind"],
+        "seller_commission_fee": [1.0, None, 2.0],
+        "extra": ["a", "b", "c"],
+    })
+    compact = apply_table_dtypes(df, "Fact_Orders")
+
+    assert compact["time_key"].dtype == "int32"
+    assert compact["item_quantity"].dtype == "int32"
+    assert compact["paid_price"].tolist()[:2] == [10.56, 3.0] and pd.isna(compact["paid_price"].iloc[2])
+    assert compact["cancellation_reason"].dtype == "category"
+    assert compact["extra"].dtype == df["extra"].dtype
+
+    nullable = apply_table_dtypes(pd.DataFrame({"item_quantity": [1.0, None]}), "Fact_Orders")
+    assert str(nullable["item_quantity"].dtype) == "Int16"
+
+
+def test_apply_parses_integer_columns_of_any_text_dtype():
+    df = pd.DataFrame({
+        "time_key": pd.Series(["20240501", "20240502"], dtype="str"),
+        "item_quantity": pd.Series(["2", "n/a"], dtype="string"),
+        "platform_key": pd.Series(["1", "2"], dtype="category"),
+    })
+    compact = apply_table_dtypes(df, "Fact_Orders")
+
+    assert compact["time_key"].dtype == "int32" and compact["time_key"].tolist() == [20240501, 20240502]
+    assert str(compact["item_quantity"].dtype) == "Int16" and pd.isna(compact["item_quantity"].iloc[1])
+    assert compact["platform_key"].tolist() == [1, 2]
+
+
+def test_memory_report():
+    before = pd.DataFrame({"platform_key": [1, 2] * 5000, "cancellation_reason": ["Out of stock"] * 10000})
+    before["cancellation_reason"] = before["cancellation_reason"].astype(object)
+    report = memory_report(before, apply_table_dtypes(before, "Fact_Orders"))
+    assert report["ratio"] > 3 and report["after_mb"] < report["before_mb"]
@@ -0,0 +1,40 @@
+"""
+Tests for the upload ETL in app/etl.py
+"""
+import io
+
+from app.etl import iter_csv_batches, process_csv_file, process_csv_stream
+
+SAMPLE_PATH = "data/samplelazada.csv"
+
+
+def test_iter_csv_batches_bounds_rows():
+    with open(SAMPLE_PATH, "rb") as f:
+        batches = list(iter_csv_batches(f, chunk_size=64, batch_rows=7))
+
+    assert all(len(batch) <= 7 for batch in batches)
+    assert sum(len(batch) for batch in batches) == 32
+    assert list(batches[0].columns)[0] == "Date"
+
+
+def test_iter_csv_batches_split_characters_and_quoted_newlines():
+    text = 'Date,Note\n01/05/2024,"Piña\nline two"\n02/05/2024,ok\n'
+    data = io.BytesIO(text.encode("utf-8"))
+
+    batches = list(iter_csv_batches(data, chunk_size=3, batch_rows=1))
+
+    assert [len(batch) for batch in batches] == [1, 1]
+    assert batches[0]["Note"][0] == "Piña\nline two"
+
+
+def test_process_csv_stream_matches_file():
+    with open(SAMPLE_PATH, "r", encoding="utf-8") as f:
+        whole = process_csv_file(f, "Lazada", save_to_db=False)
+    with open(SAMPLE_PATH, "rb") as f:
+        streamed = process_csv_stream(f, "Lazada", save_to_db=False, chunk_size=128, batch_rows=5)
+
+    assert whole["status"] == streamed["status"] == "success"
+    assert streamed["rows_processed"] == whole["rows_processed"] == 31
+    assert streamed["batches"] == 7
+    assert streamed["columns"] == list(whole["dataframe"].columns)
+    assert streamed["preview"][0]["total_sales_value"] == 7595.81
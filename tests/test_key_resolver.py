@@ -0,0 +1,144 @@
+"""
+Tests for surrogate key resolution in app/Transformation/key_resolver.py
+"""
+from contextlib import contextmanager
+
+import pandas as pd
+
+from app.Transformation.harmonize_dim_product import link_products, resolve_product_keys
+from app.Transformation.key_resolver import SurrogateKeyIndex
+
+
+def test_resolve_assigns_new_keys_in_bulk(tmp_path):
+    index = SurrogateKeyIndex("Dim_Customer", "customer_key", ["platform_buyer_id"], state_path=str(tmp_path / "c.pkl"))
+    index.load(from_db=False)
+
+    keys = index.resolve(pd.Series(["b1", "b2", "b1", None, "b3"]))
+    assert keys.tolist() == [1, 2, 1, pd.NA, 3]
+    assert index.resolve(["b3", "b9"], assign_new=False).tolist() == [3, pd.NA]
+    assert index.pending_rows()["platform_buyer_id"].tolist() == ["b1", "b2", "b3"]
+
+
+def test_index_persists_between_runs(tmp_path, monkeypatch):
+    path = str(tmp_path / "c.pkl")
+    first = SurrogateKeyIndex("Dim_Customer", "customer_key", ["platform_buyer_id"], state_path=path)
+    first.load(from_db=False)
+    first.resolve(["b1", "b2"])
+    loaded = []
+    monkeypatch.setattr("app.loading_script.load_tables", lambda frames, dsn=None: loaded.append(frames) or {"status": "success"})
+
+    assert first.flush()["status"] == "success"
+    assert loaded[0]["Dim_Customer"]["customer_key"].tolist() == [1, 2]
+
+    second = SurrogateKeyIndex("Dim_Customer", "customer_key", ["platform_buyer_id"], state_path=path)
+    second.load(from_db=False)
+    assert second.resolve(["b2", "b3"]).tolist() == [2, 3]
+    assert second.pending_rows()["customer_key"].tolist() == [3]
+
+
+def test_products_share_key_across_platforms(tmp_path):
+    index = SurrogateKeyIndex("Dim_Product", "product_key", ["lazada_item_id", "shopee_item_id"],
+                              state_path=str(tmp_path / "p.pkl"))
+    index.load(from_db=False)
+    facts = pd.DataFrame({"platform": ["Lazada", "Lazada", "Shopee"], "item_id": ["L1", "L2", "S9"]})
+
+    assert resolve_product_keys(facts, index=index)["product_key"].tolist() == [1, 2, 3]
+
+    link_products(pd.DataFrame({"lazada_item_id": ["L2"], "shopee_item_id": ["S9"]}), index=index)
+    assert resolve_product_keys(facts, index=index)["product_key"].tolist() == [1, 2, 2]
+    row = index.pending_rows().set_index("product_key").loc[2]
+    assert (row["lazada_item_id"], row["shopee_item_id"]) == ("L2", "S9")
+
+
+def test_linking_merges_a_shopee_only_key_and_refuses_a_taken_one(tmp_path, monkeypatch):
+    index = SurrogateKeyIndex("Dim_Product", "product_key", ["lazada_item_id", "shopee_item_id"],
+                              state_path=str(tmp_path / "p.pkl")).load(from_db=False)
+    facts = pd.DataFrame({"platform": ["Lazada", "Shopee", "Lazada", "Shopee"], "item_id": ["L1", "S1", "L2", "S2"]})
+    assert resolve_product_keys(facts, index=index)["product_key"].tolist() == [1, 3, 2, 4]
+    link_products(pd.DataFrame({"lazada_item_id": ["L2"], "shopee_item_id": ["S2"]}), index=index)
+
+    refused = link_products(pd.DataFrame({"lazada_item_id": ["L1", "L1"], "shopee_item_id": ["S1", "S2"]}),
+                            index=index)
+
+    # S1 had a key of its own: it is folded into L1's; S2's key was folded into L2's
+    assert refused["shopee_item_id"].tolist() == ["S2"]
+    assert resolve_product_keys(facts, index=index)["product_key"].tolist() == [1, 1, 2, 2]
+    assert index.pending_rows()["product_key"].tolist() == [1, 2]
+
+    calls = []
+    monkeypatch.setattr("app.loading_script.load_tables",
+                        lambda frames, dsn=None, before_commit=None: calls.append(before_commit) or {"status": "success"})
+    statements = []
+
+    class Cursor:
+        def execute(self, sql, params=None):
+            statements.append((sql, params))
+
+    assert index.flush()["status"] == "success"
+    calls[0](Cursor())
+    assert ('UPDATE "Fact_Orders" SET "product_key" = %s WHERE "product_key" = %s', (1, 3)) in statements
+    deleted = [params for sql, params in statements if sql.startswith("DELETE")]
+    assert deleted == [(4,), (3,)]
+    index.flush()
+    assert len(calls) == 1  # the merges are applied once
+
+
+def test_processes_sharing_an_index_never_get_the_same_keys(tmp_path):
+    path = str(tmp_path / "c.pkl")
+    first = SurrogateKeyIndex("Dim_Customer", "customer_key", ["platform_buyer_id"], state_path=path).load(from_db=False)
+    second = SurrogateKeyIndex("Dim_Customer", "customer_key", ["platform_buyer_id"], state_path=path).load(from_db=False)
+
+    assert first.resolve(["a1", "a2"]).tolist() == [1, 2]
+    assert second.resolve(["b1"]).tolist() == [3]
+    assert first.resolve(["a3"]).tolist() == [4]
+
+
+def test_database_keys_come_from_a_sequence(monkeypatch):
+    statements = []
+
+    class Cursor:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def execute(self, sql, params=None):
+            statements.append((sql, params))
+
+        def fetchone(self):
+            return (None,) if "to_regclass" in statements[-1][0] else (40,)
+
+        def fetchall(self):
+            sql = statements[-1][0]
+            if "nextval" in sql:
+                return [(41,), (42,)]
+            if "= ANY" in sql:
+                return [(7, "b-stored")]  # flushed by another process
+            return []
+
+    class Connection:
+        def cursor(self):
+            return Cursor()
+
+        def commit(self):
+            statements.append(("COMMIT", None))
+
+        def rollback(self):
+            pass
+
+    class Pool:
+        @contextmanager
+        def connection(self):
+            yield Connection()
+
+    monkeypatch.setattr("app.db.get_pool", lambda dsn=None: Pool())
+    index = SurrogateKeyIndex("Dim_Customer", "customer_key", ["platform_buyer_id"], db_conn_string="postgres://test",
+                              state_path="/nonexistent/c.pkl")
+    index.load()
+
+    assert index.resolve(["b-stored", "b-new", "b-new2"]).tolist() == [7, 41, 42]
+    executed = [sql for sql, _ in statements]
+    assert any(sql.startswith("SELECT pg_advisory_xact_lock") for sql in executed)
+    assert 'CREATE SEQUENCE "Dim_Customer_customer_key_seq" START WITH 41' in executed
+    assert index.pending_rows()["customer_key"].tolist() == [41, 42]
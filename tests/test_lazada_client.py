@@ -0,0 +1,107 @@
+"""
+Tests for the async Lazada client in app/Extraction/lazada_api_calls.py,
+run against a local mock server.
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from app.Extraction import lazada_api_calls as lazada
+
+SECRET = "test-secret"
+ORDERS = [{"order_id": 1000 + i, "updated_at": f"2024-05-01 00:{i // 60:02d}:{i % 60:02d}"} for i in range(250)]
+
+
+class MockLazada(BaseHTTPRequestHandler):
+    calls = []
+    fail_first = set()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        MockLazada.calls.append((url.path, params))
+
+        sign = params.pop("sign")
+        if sign != lazada.generate_signature(SECRET, url.path.removeprefix("/rest"), params):
+            return self._reply(200, {"code": "IncompleteSignature", "message": "bad sign"})
+        key = (url.path, params.get("offset"))
+        if key in MockLazada.fail_first:
+            MockLazada.fail_first.discard(key)
+            return self._reply(200, {"code": "ApiCallLimit", "message": "slow down"})
+
+        if url.path == "/rest/orders/get":
+            offset, limit = int(params["offset"]), int(params["limit"])
+            data = {"count": len(ORDERS[offset:offset + limit]), "countTotal": len(ORDERS), "orders": ORDERS[offset:offset + limit]}
+        elif url.path == "/rest/orders/items/get":
+            data = [{"order_id": o, "order_items": [{"sku": f"SKU-{o}"}]} for o in json.loads(params["order_ids"])]
+        else:
+            return self._reply(500, {})
+        self._reply(200, {"code": "0", "data": data})
+
+    def _reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def mock_server():
+    MockLazada.calls = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockLazada)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/rest"
+    server.shutdown()
+
+
+def client(base_url, **kwargs):
+    kwargs.setdefault("qps", 200)
+    return lazada.LazadaClient("key", SECRET, "token", base_url=base_url, **kwargs)
+
+
+def test_orders_and_items_paginate_concurrently(mock_server, monkeypatch):
+    monkeypatch.setattr("app.Extraction.connector.backoff_delay", lambda attempt: 0.01)
+    MockLazada.fail_first = {("/rest/orders/get", "200")}
+
+    result = asyncio.run(lazada.extract_orders("2024-05-01T00:00:00+08:00", client(mock_server)))
+
+    assert [o["order_id"] for o in result["orders"]] == [o["order_id"] for o in ORDERS]
+    assert len(result["order_items"]) == 250 and result["order_items"][0] == {"order_id": 1000, "sku": "SKU-1000"}
+    assert result["stats"]["retries"] == 1
+    # 3 order pages + 1 retry + 5 item batches of 50
+    assert len(MockLazada.calls) == 9
+
+
+def test_non_retryable_error_raises(mock_server):
+    bad = lazada.LazadaClient("key", "wrong-secret", "token", base_url=mock_server, qps=200)
+
+    async def run():
+        async with bad:
+            await bad.get_orders(update_after="2024-05-01")
+
+    with pytest.raises(lazada.LazadaApiError) as error:
+        asyncio.run(run())
+    assert error.value.code == "IncompleteSignature"
+    assert len(MockLazada.calls) == 1
+
+
+def test_token_bucket_spaces_calls():
+    async def run():
+        bucket = lazada.TokenBucket(rate=50, capacity=5)
+        started = time.monotonic()
+        await asyncio.gather(*(bucket.acquire() for _ in range(15)))
+        return time.monotonic() - started
+
+    # 5 from the burst, 10 more at 50/s
+    assert 0.18 <= asyncio.run(run()) < 1.0
@@ -0,0 +1,163 @@
+"""
+Tests for the upload ingestion ledger in app/ledger.py
+"""
+import io
+from contextlib import contextmanager
+
+import pandas as pd
+
+from app import etl
+from app.etl import run_upload, save_dataframe
+from app.ledger import IngestionLedger
+
+SAMPLE_PATH = "data/samplelazada.csv"
+
+
+def read_sample():
+    return pd.read_csv(SAMPLE_PATH, dtype=str, keep_default_na=False)
+
+
+def csv_bytes(df):
+    return io.BytesIO(df.to_csv(index=False).encode("utf-8"))
+
+
+class MemoryLedger(IngestionLedger):
+    """The ledger's database reads answered from an in-memory upload table."""
+
+    def __init__(self):
+        super().__init__()
+        self.stored = {}  # (platform, shop, day) -> row_fingerprint
+        self.files = {}
+
+    def stored_fingerprints(self, platform, shop, keys):
+        found = {k: self.stored[(platform, shop, k)] for k in keys if (platform, shop, k) in self.stored}
+        return pd.Series(list(found.values()), index=list(found), dtype="int64")
+
+    def seen_file(self, content_hash, platform, shop=""):
+        fingerprints = self.files.get((content_hash, platform, shop))
+        stored = {f for (p, s, _), f in self.stored.items() if (p, s) == (platform, shop)}
+        return len(fingerprints) if fingerprints is not None and set(fingerprints) <= stored else None
+
+    def record_file(self, content_hash, platform, shop, fingerprints):
+        self.files[(content_hash, platform, shop)] = list(fingerprints)
+
+    def save_dataframe(self, df, replace_existing=False):
+        self.saved.append((df, replace_existing))
+        for row in df.itertuples():
+            self.stored[(row.platform, row.shop, row.date.strftime("%Y-%m-%d"))] = row.row_fingerprint
+        return len(df)
+
+
+def memory_ledger(monkeypatch):
+    ledger = MemoryLedger()
+    ledger.saved = []
+    monkeypatch.setattr(etl, "save_dataframe", ledger.save_dataframe)
+    monkeypatch.setattr("app.ledger.upload_ledger", ledger)
+    return ledger
+
+
+def test_filter_batch_skips_unchanged_rows(monkeypatch):
+    ledger = memory_ledger(monkeypatch)
+    raw = read_sample()
+    column_map = etl.PLATFORM_COLUMN_MAPS["Lazada"]
+
+    kept, pending, skipped, fingerprints = ledger.filter_batch(raw, "Lazada", column_map)
+    assert skipped == 0 and len(kept) == len(raw)
+    assert len(pending) == len(fingerprints) == 31 and pending.index[0] == "2024-05-01"
+    ledger.stored.update({("Lazada", "", day): f for day, f in pending.items()})
+
+    changed = raw.copy()
+    changed.loc[2, "Revenue"] = "1.00"
+    kept, pending, skipped, _ = ledger.filter_batch(changed, "Lazada", column_map)
+    assert skipped == 30
+    assert pending.index.tolist() == ["2024-05-02"]
+    # The summary row is always passed through; the transform drops it
+    assert list(kept["Date"]) == ["2024-05-01~2024-05-31", "02/05/2024"]
+    assert ledger.filter_batch(raw, "Shopee", column_map)[2] == 0
+    assert ledger.filter_batch(raw, "Lazada", column_map, shop="Shop B")[2] == 0
+
+
+def test_identical_file_is_skipped_while_its_rows_are_stored(monkeypatch):
+    ledger = memory_ledger(monkeypatch)
+    raw = read_sample()
+
+    first = run_upload(csv_bytes(raw), "Lazada", save_to_db=True)
+    second = run_upload(csv_bytes(raw), "Lazada", save_to_db=True)
+
+    assert first["inserted"] == 31 and first["skipped"] == 0 and not first["duplicate_file"]
+    assert "fingerprints" not in first
+    assert second["duplicate_file"]
+    assert second["inserted"] == 0 and second["skipped"] == 31
+    assert len(ledger.saved) == 1
+    saved = ledger.saved[0][0]
+    assert (saved["shop"] == "").all() and saved["row_fingerprint"].notna().all()
+
+    # Table truncated (or another database): the file is written again
+    ledger.stored.clear()
+    third = run_upload(csv_bytes(raw), "Lazada", save_to_db=True)
+    assert not third["duplicate_file"] and third["inserted"] == 31
+
+
+def test_overlapping_file_writes_only_new_or_changed_days_per_shop(monkeypatch):
+    ledger = memory_ledger(monkeypatch)
+    raw = read_sample()
+    first_half, overlap = raw.iloc[:16], raw.iloc[[0] + list(range(11, 32))].copy()
+    overlap.loc[12, "Visitors"] = "999"
+
+    run_upload(csv_bytes(first_half), "Lazada", save_to_db=True)
+    result = run_upload(csv_bytes(overlap), "Lazada", save_to_db=True)
+
+    # Days 11-15 were saved by the first file; day 12 changed
+    assert result["skipped"] == 4
+    assert result["inserted"] == 17
+    written = ledger.saved[-1][0]
+    assert ledger.saved[-1][1] is True
+    assert written["date"].min() == pd.Timestamp("2024-05-12")
+    assert written.loc[0, "visitors"] == 999
+
+    # Another shop's export of the same days is its own set of rows
+    other_shop = run_upload(csv_bytes(first_half), "Lazada", save_to_db=True, shop="Shop B")
+    assert other_shop["skipped"] == 0 and other_shop["inserted"] == 15
+    assert ("Lazada", "", "2024-05-01") in ledger.stored and ("Lazada", "Shop B", "2024-05-01") in ledger.stored
+
+    assert run_upload(csv_bytes(raw), "Lazada", save_to_db=True, dedupe=False)["skipped"] == 0
+
+
+def test_save_dataframe_replaces_days_of_the_same_shop_only(monkeypatch):
+    statements = []
+
+    class Cursor:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def execute(self, sql, params=None):
+            statements.append((sql, params))
+
+    class Connection:
+        def cursor(self):
+            return Cursor()
+
+        def commit(self):
+            statements.append(("COMMIT", None))
+
+    class Pool:
+        @contextmanager
+        def connection(self):
+            yield Connection()
+
+    monkeypatch.setattr("app.db.get_pool", lambda dsn=None: Pool())
+    monkeypatch.setattr("app.loading_script.copy_in_batches", lambda cursor, df, table, columns: statements.append(("COPY", columns)))
+    df = pd.DataFrame({"date": pd.to_datetime(["2024-05-01", "2024-05-02"]), "platform": "Lazada", "shop": "Shop B",
+                       "visitors": [1, 2], "row_fingerprint": [11, 12]})
+
+    assert save_dataframe(df, replace_existing=True) == 2
+
+    alters = [sql for sql, _ in statements if sql.startswith("ALTER TABLE")]
+    assert len(alters) == 2 and '"shop"' in alters[0] and '"row_fingerprint"' in alters[1]
+    delete_sql, params = next((sql, p) for sql, p in statements if sql.startswith("DELETE"))
+    assert "shop = %s" in delete_sql and params[:2] == ("Lazada", "Shop B") and len(params[2]) == 2
+    assert statements[-2] == ("COPY", ["date", "platform", "shop", "visitors", "row_fingerprint"])
+    assert statements[-1] == ("COMMIT", None)
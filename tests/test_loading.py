@@ -0,0 +1,152 @@
+"""
+Tests for the schema-driven loader in app/loading_script.py
+"""
+import pandas as pd
+
+from app.loading_script import (
+    build_upsert_sql,
+    load_order_items,
+    load_tables,
+    prepare_frame,
+    resolve_columns,
+    transaction_items,
+    upsert_table,
+)
+from app.schema import load_order
+
+
+class RecordingCursor:
+    """Stands in for a psycopg2 cursor and keeps what would be sent."""
+
+    def __init__(self):
+        self.statements = []
+        self.copies = []
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+
+    def fetchall(self):
+        return []
+
+    def copy_expert(self, sql, buffer):
+        self.copies.append((sql, buffer.read()))
+
+
+def fact_orders_frame(rows=5):
+    return pd.DataFrame({
+        "order_item_key": range(1, rows + 1),
+        "time_key": [20240501] * rows,
+        "product_key": [1] * rows,
+        "customer_key": [2.0] * (rows - 1) + [None],
+        "platform_key": [1] * rows,
+        "paid_price": [100.5] * rows,
+        "item_quantity": [1] * rows,
+        "not_in_schema": ["x"] * rows,
+    })
+
+
+def test_columns_and_keys_come_from_schema():
+    table, columns, keys = resolve_columns(fact_orders_frame(), "Fact_Orders")
+
+    assert keys == ["order_item_key"]
+    assert "not_in_schema" not in columns
+    assert columns[:2] == ["order_item_key", "time_key"]
+
+
+def test_upsert_sql_quotes_and_updates_non_key_columns():
+    sql = build_upsert_sql("Dim_Customer", "tmp_Dim_Customer", ["customer_key", "LTV_tier"], ["customer_key"])
+
+    assert 'INSERT INTO "Dim_Customer" ("customer_key", "LTV_tier")' in sql
+    assert 'ON CONFLICT ("customer_key") DO UPDATE SET "LTV_tier" = EXCLUDED."LTV_tier"' in sql
+    assert "DO NOTHING" in build_upsert_sql("Dim_Time", "tmp", ["time_key"], ["time_key"])
+
+
+def test_prepare_frame_keeps_integers_and_last_duplicate():
+    df = fact_orders_frame()
+    df.loc[4, "order_item_key"] = 4
+    table, columns, keys = resolve_columns(df, "Fact_Orders")
+
+    prepared = prepare_frame(df, table, columns, keys)
+
+    assert len(prepared) == 4
+    assert str(prepared["customer_key"].dtype) == "Int64"
+
+
+def test_upsert_table_copies_in_bounded_batches():
+    cursor = RecordingCursor()
+
+    staged = upsert_table(cursor, fact_orders_frame(5), "Fact_Orders", batch_rows=2)
+
+    assert staged == 5
+    assert len(cursor.copies) == 3
+    assert cursor.copies[0][1].splitlines()[0] == "1,20240501,1,2,1,100.5,1"
+    assert cursor.statements[-1].startswith('INSERT INTO "Fact_Orders"')
+
+
+def test_dimensions_load_before_facts():
+    order = load_order(["Fact_Orders", "Dim_Time", "Fact_Activity", "Dim_Customer"])
+
+    assert order.index("Dim_Time") < order.index("Fact_Orders")
+    assert order.index("Dim_Customer") < order.index("Fact_Activity")
+
+
+def test_transactions_load_as_order_items(monkeypatch):
+    transactions = pd.DataFrame([
+        {"transaction_id": "LZ-1", "platform": "Lazada", "order_id": 1,
+         "order_items": [{"order_item_id": 11, "buyer_id": 7}, {"order_item_id": 12, "buyer_id": 7}]},
+        {"transaction_id": "LZ-2", "platform": "Lazada", "order_id": 2, "order_items": []},
+        {"transaction_id": "SP-A", "platform": "Shopee", "order_sn": "A", "buyer_user_id": 8,
+         "item_list": [{"item_id": 30, "model_id": 1}]},
+    ])
+    items = transaction_items(transactions)
+
+    assert items["Lazada"]["order_item_id"].tolist() == [11, 12]
+    assert (items["Lazada"]["transaction_id"] == "LZ-1").all() and "order_items" not in items["Lazada"]
+    assert items["Shopee"][["order_sn", "item_id", "buyer_user_id"]].values.tolist() == [["A", 30, 8]]
+
+    calls = []
+
+    def fake_process(batches, platform, load=False, staging=None, batch_id=None):
+        calls.append((platform, sum(len(b) for b in batches), load))
+        return {"status": "error", "detail": "boom"} if platform == "Shopee" else {"status": "success"}
+
+    monkeypatch.setattr("app.Transformation.standardize_fact_orders.process_order_items", fake_process)
+    result = load_order_items(items)
+    assert calls == [("Lazada", 2, True), ("Shopee", 1, True)]
+    assert result["status"] == "error" and result["detail"] == "Shopee: boom"
+
+
+def test_committed_load_succeeds_when_a_cache_refresh_fails(monkeypatch):
+    class Connection:
+        autocommit = True
+        committed = False
+
+        def cursor(self):
+            return RecordingCursor()
+
+        def commit(self):
+            self.committed = True
+
+        def rollback(self):
+            raise AssertionError("rolled back a committed load")
+
+    class Pool:
+        conn = Connection()
+
+        def getconn(self):
+            return self.conn
+
+        def putconn(self, conn):
+            pass
+
+    pool = Pool()
+    monkeypatch.setattr("app.loading_script.get_pool", lambda dsn=None: pool)
+    monkeypatch.setattr("app.loading_script.upsert_table", lambda cursor, df, table_name, **kwargs: len(df))
+
+    def broken(frames):
+        raise RuntimeError("cube out of memory")
+
+    monkeypatch.setattr("app.loading_script.olap_cube.add_loaded", broken)
+    result = load_tables({"Fact_Orders": fact_orders_frame()})
+    assert result == {"status": "success", "rows": {"Fact_Orders": 5}}
+    assert pool.conn.committed
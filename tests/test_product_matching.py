@@ -0,0 +1,84 @@
+"""
+Tests for cross-platform product matching in app/Transformation/match_products.py
+"""
+import os
+
+import pandas as pd
+import pytest
+
+from app.Transformation.key_resolver import SurrogateKeyIndex
+from app.Transformation.match_products import ProductMatcher, harmonize_products, normalize_names
+
+LAZADA = pd.DataFrame({
+    "item_id": ["L1", "L2", "L3"],
+    "product_name": ["LA Collections Floral Summer Dress - Red [READY STOCK]", "Men's Cotton Polo Shirt Navy",
+                     "Leather Sling Bag Brown"],
+    "seller_sku": ["DRS-001", "POLO-NV", None],
+})
+SHOPEE = pd.DataFrame({
+    "item_id": ["S1", "S2", "S3"],
+    "product_name": ["Floral Summer Dress Red (LA Collections)", "Polo for men", "Canvas Tote Bag"],
+    "seller_sku": [None, "polo nv", None],
+})
+
+
+def test_normalize_names():
+    assert normalize_names(pd.Series(["Floral DRESS - Red [Ready Stock]!", None])).tolist() == ["floral dress red", ""]
+
+
+def test_blocked_matching_is_one_to_one(tmp_path):
+    matcher = ProductMatcher(str(tmp_path / "matches.pkl"), threshold=0.5)
+    found = matcher.match(LAZADA, SHOPEE)
+
+    assert found[["lazada_item_id", "shopee_item_id"]].values.tolist() == [["L2", "S2"], ["L1", "S1"]]
+    assert found["score"].iloc[0] == 1.0  # same SKU despite the different names
+    pairs = matcher.candidate_pairs(matcher.listings["lazada"], matcher.listings["shopee"])
+    assert len(pairs) < len(LAZADA) * len(SHOPEE)  # the bag listings share no token with dresses
+
+
+def test_later_runs_only_compare_new_listings(tmp_path, monkeypatch):
+    path = str(tmp_path / "matches.pkl")
+    matcher = ProductMatcher(path, threshold=0.5)
+    matcher.match(LAZADA, SHOPEE)
+    matcher.save()
+
+    reloaded = ProductMatcher(path, threshold=0.5).load()
+    compared = []
+    original = reloaded.candidate_pairs
+    monkeypatch.setattr(reloaded, "candidate_pairs", lambda left, right: compared.append((left, right)) or original(left, right))
+
+    assert reloaded.match(LAZADA, SHOPEE).empty and compared == []  # nothing new
+    new = pd.DataFrame({"item_id": ["L4"], "product_name": ["Canvas Tote Bag - Beige"]})
+    found = reloaded.match(lazada=new)
+    assert found[["lazada_item_id", "shopee_item_id"]].values.tolist() == [["L4", "S3"]]
+    left, right = compared[0]
+    assert left["item_id"].tolist() == ["L4"] and set(right["item_id"]) == {"S3"}  # matched S1/S2 are not compared
+    assert len(reloaded.matches) == 3
+
+
+def test_harmonize_links_shopee_items_to_lazada_keys(tmp_path):
+    index = SurrogateKeyIndex("Dim_Product", "product_key", ["lazada_item_id", "shopee_item_id"],
+                              state_path=str(tmp_path / "keys.pkl")).load(from_db=False)
+    lazada_keys = index.resolve(LAZADA["item_id"], "lazada_item_id")
+
+    matcher = ProductMatcher(str(tmp_path / "matches.pkl"), threshold=0.5)
+    harmonize_products(LAZADA, SHOPEE, matcher=matcher, index=index)
+
+    shopee_keys = index.resolve(pd.Series(["S1", "S2"]), "shopee_item_id", assign_new=False)
+    assert shopee_keys.tolist() == [lazada_keys.iloc[0], lazada_keys.iloc[1]]
+    assert ProductMatcher(str(tmp_path / "matches.pkl")).load().matches["shopee_item_id"].tolist() == ["S2", "S1"]
+
+
+def test_failed_flush_leaves_matches_unsaved(tmp_path, monkeypatch):
+    index = SurrogateKeyIndex("Dim_Product", "product_key", ["lazada_item_id", "shopee_item_id"],
+                              state_path=str(tmp_path / "keys.pkl")).load(from_db=False)
+    index.resolve(LAZADA["item_id"], "lazada_item_id")
+    monkeypatch.setattr("app.loading_script.load_tables",
+                        lambda frames, dsn=None: {"status": "error", "detail": "connection refused"})
+
+    matcher = ProductMatcher(str(tmp_path / "matches.pkl"), threshold=0.5)
+    with pytest.raises(RuntimeError, match="connection refused"):
+        harmonize_products(LAZADA, SHOPEE, matcher=matcher, index=index, flush=True)
+
+    assert not os.path.exists(tmp_path / "matches.pkl")
+    assert len(ProductMatcher(str(tmp_path / "matches.pkl"), threshold=0.5).load().match(LAZADA, SHOPEE)) == 2
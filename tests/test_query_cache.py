@@ -0,0 +1,87 @@
+"""
+Tests for the dashboard query cache in app/query_cache.py and the
+/analytics endpoints
+"""
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from app import analytics
+from app.query_cache import QueryCache, query_cache
+from main import app
+
+
+def test_lru_and_ttl():
+    cache = QueryCache(max_entries=2, ttl_seconds=60)
+    for name in ("a", "b", "c"):
+        cache.put(cache.make_key(name, {}), [name], ["T"])
+
+    assert cache.get(cache.make_key("a", {})) is None  # evicted as least recently used
+    assert cache.get(cache.make_key("c", {})) == ["c"]
+
+    expired = QueryCache(ttl_seconds=0)
+    expired.put("k", [1], ["T"])
+    assert expired.get("k") is None
+    assert cache.stats()["evicted"] == 1 and expired.stats()["expired"] == 1
+
+
+def test_load_invalidates_only_overlapping_entries():
+    cache = QueryCache()
+    cache.put("may", [1], ["Sales_Summary"], time_range=(20240501, 20240531))
+    cache.put("june", [2], ["Sales_Summary"], time_range=(20240601, 20240630))
+    cache.put("daily_may", [3], ["Daily_Sales_Summary"], time_range=(20240501, 20240531))
+    cache.put("segments", [4], ["Dim_Customers"])
+
+    dropped = cache.invalidate_loaded({"Sales_Summary": pd.DataFrame({"time_key": [20240510], "platform": ["Lazada"]})})
+
+    assert dropped == 1
+    assert cache.get("may") is None
+    assert cache.get("june") == [2] and cache.get("daily_may") == [3] and cache.get("segments") == [4]
+
+    # Fact_Orders loads refresh Daily_Sales_Summary
+    assert cache.invalidate_loaded({"Fact_Orders": pd.DataFrame({"time_key": [20240502], "platform_key": [2]})}) == 1
+    assert cache.get("daily_may") is None
+
+    cache.invalidate_loaded({"Dim_Customers": pd.DataFrame({"customer_key": [1]})})
+    assert cache.get("segments") is None
+
+
+def test_result_read_before_a_load_is_not_cached():
+    cache = QueryCache()
+
+    def query_racing_a_load():
+        # The load commits and invalidates while this query still holds the old rows
+        cache.invalidate_loaded({"Sales_Summary": pd.DataFrame({"time_key": [20240510]})})
+        return ["old rows"]
+
+    assert cache.get_or_load("v_sales_trends", {}, query_racing_a_load, ["Sales_Summary"]) == ["old rows"]
+    assert cache.get(cache.make_key("v_sales_trends", {})) is None
+    assert cache.stats()["discarded"] == 1
+
+    assert cache.get_or_load("v_sales_trends", {}, lambda: ["new rows"], ["Sales_Summary"]) == ["new rows"]
+    assert cache.get(cache.make_key("v_sales_trends", {})) == ["new rows"]
+
+
+def test_sales_trends_endpoint_is_cached(monkeypatch):
+    query_cache.clear()
+    queries = []
+
+    def fake_run(sql, params=None, db_conn_string=None):
+        queries.append((sql, params))
+        return [{"year": 2024, "net_revenue": 1500.0}]
+
+    monkeypatch.setattr(analytics, "_run", fake_run)
+    client = TestClient(app)
+    before = client.get("/metrics/query-cache").json()
+
+    for _ in range(3):
+        response = client.get("/analytics/sales-trends", params={"year": 2024, "month": 5})
+        assert response.json()["data"] == [{"year": 2024, "net_revenue": 1500.0}]
+
+    assert len(queries) == 1
+    assert queries[0][1]["month_name"] == "May"
+    stats = client.get("/metrics/query-cache").json()
+    assert stats["hits"] - before["hits"] == 2 and stats["misses"] - before["misses"] == 1
+
+    query_cache.invalidate_loaded({"Fact_Sales": pd.DataFrame({"time_key": [20240515]})})
+    client.get("/analytics/sales-trends", params={"year": 2024, "month": 5})
+    assert len(queries) == 2
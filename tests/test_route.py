@@ -0,0 +1,135 @@
+"""
+Tests for the FastAPI upload and result endpoints in main.py
+"""
+import json
+import os
+
+from fastapi.testclient import TestClient
+
+from main import app
+
+client = TestClient(app)
+
+SAMPLE_PATH = "data/samplelazada.csv"
+
+
+def upload_sample(stream="true"):
+    with open(SAMPLE_PATH, "rb") as f:
+        response = client.post(
+            "/upload",
+            files={"file": ("samplelazada.csv", f, "text/csv")},
+            data={"platform": "Lazada", "stream": stream},
+        )
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_upload_returns_result_handle(monkeypatch):
+    monkeypatch.setattr("app.config.TRACK_UPLOAD_MEMORY", True)
+    body = upload_sample()
+
+    assert body["rows_processed"] == 31
+    assert body["result_id"]
+    assert "peak_mb" in body["memory"]
+    assert client.get(f"/results/{body['result_id']}").json()["rows"] == 31
+
+
+def test_upload_memory_is_not_traced_by_default():
+    assert upload_sample()["memory"] == {}
+
+
+def test_failed_upload_leaves_no_result_behind(tmp_path, monkeypatch):
+    from app.results import ResultStore
+
+    store = ResultStore(root=str(tmp_path / "results"))
+    monkeypatch.setattr("main.result_store", store)
+
+    async def broken_run(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr("main.etl_executor.run", broken_run)
+    with open(SAMPLE_PATH, "rb") as f:
+        body = client.post("/upload", files={"file": ("samplelazada.csv", f, "text/csv")},
+                           data={"platform": "Lazada"}).json()
+
+    assert body == {"status": "error", "message": "disk full"}
+    assert store._results == {} and os.listdir(tmp_path / "results") == []
+
+
+def test_result_pages_with_column_selection():
+    result_id = upload_sample(stream="false")["result_id"]
+
+    page = client.get(f"/results/{result_id}/rows?offset=29&limit=5&columns=date,total_orders").json()
+
+    assert page["total"] == 31
+    assert page["columns"] == ["date", "total_orders"]
+    assert [row["total_orders"] for row in page["data"]] == [10, 7]
+
+
+def test_result_ndjson_stream():
+    result_id = upload_sample()["result_id"]
+
+    response = client.get(f"/results/{result_id}/ndjson?columns=total_sales_value")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert len(rows) == 31
+    assert rows[0] == {"total_sales_value": 7595.81}
+
+
+def test_unknown_result_and_column():
+    result_id = upload_sample()["result_id"]
+
+    assert client.get("/results/missing/rows").status_code == 404
+    assert client.get(f"/results/{result_id}/rows?columns=nope").status_code == 400
+
+
+def test_delete_only_accepts_issued_result_ids(tmp_path, monkeypatch):
+    from app.results import ResultStore
+
+    store = ResultStore(root=str(tmp_path / "results"))
+    monkeypatch.setattr("main.result_store", store)
+    (tmp_path / "keep.txt").write_text("x")
+    result_id = store.create("Lazada")
+
+    for bad in ("%2E%2E", "..", "0" * 32):
+        assert client.delete(f"/results/{bad}").status_code == 404
+    assert (tmp_path / "keep.txt").exists() and (tmp_path / "results" / result_id).exists()
+
+    assert client.delete(f"/results/{result_id}").status_code == 200
+    assert not (tmp_path / "results" / result_id).exists()
+    assert client.delete(f"/results/{result_id}").status_code == 404
+
+
+def test_queue_backend_polls_job_and_rejects_when_saturated(monkeypatch):
+    import threading
+    import time
+
+    import main
+    from app.jobs import EtlExecutor
+
+    executor = EtlExecutor("queue", max_workers=1, max_pending=0)
+    monkeypatch.setattr(main, "etl_executor", executor)
+
+    release = threading.Event()
+    executor.submit(release.wait)
+    with open(SAMPLE_PATH, "rb") as f:
+        busy = client.post("/upload", files={"file": ("a.csv", f, "text/csv")}, data={"platform": "Lazada"})
+    assert busy.status_code == 429
+
+    release.set()
+    while executor.stats()["in_flight"]:
+        time.sleep(0.01)
+    with open(SAMPLE_PATH, "rb") as f:
+        queued = client.post("/upload", files={"file": ("a.csv", f, "text/csv")}, data={"platform": "Lazada"})
+    assert queued.status_code == 202
+
+    job_id = queued.json()["job_id"]
+    for _ in range(500):
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("done", "error"):
+            break
+        time.sleep(0.01)
+    assert job["status"] == "done"
+    assert job["result"]["rows_processed"] == 31
+    executor.shutdown()
@@ -0,0 +1,60 @@
+"""
+Tests for the Parquet staging area in app/staging.py
+"""
+import pandas as pd
+
+from app.staging import StagingArea, load_from_staging
+
+
+def orders():
+    return pd.DataFrame({
+        "transaction_id": ["LZ-1", "LZ-2", "SP-1", "SP-2"],
+        "platform": ["Lazada", "Lazada", "Shopee", "Shopee"],
+        "updated_at": pd.to_datetime(["2024-05-01 10:00", "2024-05-02 09:00", "2024-05-01 23:00", None]),
+        "amount": [10.5, 20.0, 7.25, 1.0],
+    })
+
+
+def test_write_partitions_by_platform_and_date(tmp_path):
+    area = StagingArea(str(tmp_path))
+    paths = area.write(orders(), "transactions", date_column="updated_at", batch_id="b1")
+
+    assert len(paths) == 4
+    assert [(p, d) for p, d, _ in area.partitions("transactions")] == [
+        ("Lazada", "2024-05-01"), ("Lazada", "2024-05-02"), ("Shopee", "2024-05-01"), ("Shopee", "unknown")
+    ]
+
+    df = area.read("transactions", platforms=["Lazada"], start="2024-05-01", end="2024-05-01")
+    assert df["transaction_id"].tolist() == ["LZ-1"]
+    assert df["amount"].dtype == "float64"
+    assert len(area.read("transactions", start="2024-05-01")) == 3  # undated rows only without a range
+
+
+def test_same_batch_id_replaces_files(tmp_path):
+    area = StagingArea(str(tmp_path))
+    area.write(orders(), "transactions", date_column="updated_at", batch_id="b1")
+    area.write(orders(), "transactions", date_column="updated_at", batch_id="b1")
+    assert len(area.read("transactions")) == 4
+
+    area.write(orders().head(1), "transactions", date_column="updated_at", batch_id="b2")
+    assert len(area.read("transactions")) == 5
+    assert area.delete("transactions", platforms=["Shopee"]) == 2
+    assert set(area.read("transactions")["platform"]) == {"Lazada"}
+
+
+def test_load_from_staging_upserts_each_partition(tmp_path, monkeypatch):
+    area = StagingArea(str(tmp_path))
+    area.write(orders(), "transactions", date_column="updated_at", batch_id="b1")
+
+    calls = []
+
+    def fake_load_tables(frames, db_conn_string=None, conflict_keys=None):
+        calls.append((list(frames["ecommerce_transactions"]["transaction_id"]), conflict_keys))
+        return {"status": "success", "detail": "ok"}
+
+    monkeypatch.setattr("app.loading_script.load_tables", fake_load_tables)
+    result = load_from_staging("transactions", "ecommerce_transactions", start="2024-05-01", end="2024-05-31",
+                               conflict_keys=["transaction_id"], staging=area)
+
+    assert result == {"status": "success", "rows": 3, "partitions": 3}
+    assert calls[0] == (["LZ-1"], {"ecommerce_transactions": ["transaction_id"]})
@@ -0,0 +1,139 @@
+"""
+Tests for the Fact_Orders transform in app/Transformation/standardize_fact_orders.py
+"""
+import os
+
+import pandas as pd
+
+from app.staging import StagingArea
+from app.Transformation.key_resolver import SurrogateKeyIndex
+from app.Transformation.standardize_fact_orders import (
+    iter_item_batches,
+    process_order_items,
+    read_quarantine,
+    shopee_order_items,
+    to_fact_orders,
+)
+
+LAZADA_ITEMS = [
+    # item_price - voucher_amount + shipping_amount = paid_price
+    {"order_item_id": 9001, "order_id": 501, "buyer_id": 77, "product_id": "L1", "created_at": "2024-05-01 23:30:00 +0800",
+     "status": "delivered", "reason": "", "item_price": "1,299.00", "voucher_amount": "100.00", "shipping_amount": "50.00",
+     "paid_price": "1,249.00", "voucher_platform": "40.00"},
+    {"order_item_id": 9002, "order_id": 501, "buyer_id": 77, "product_id": "L2", "created_at": "2024-05-01 23:30:00 +0800",
+     "status": "canceled", "reason": "Out of stock", "item_price": "450.00", "voucher_amount": "0", "shipping_amount": "0",
+     "paid_price": "450.00", "voucher_platform": "0"},
+    # Paid price does not add up
+    {"order_item_id": 9003, "order_id": 502, "buyer_id": 78, "product_id": "L1", "created_at": "2024-05-02 08:00:00 +0800",
+     "status": "shipped", "reason": "", "item_price": "99.00", "voucher_amount": "0", "shipping_amount": "0",
+     "paid_price": "89.00", "voucher_platform": "0"},
+    # No buyer and a negative price
+    {"order_item_id": 9004, "order_id": 503, "buyer_id": None, "product_id": "L3", "created_at": "2024-05-02 09:00:00 +0800",
+     "status": "shipped", "reason": "", "item_price": "-5.00", "voucher_amount": "0", "shipping_amount": "0",
+     "paid_price": "-5.00", "voucher_platform": "0"},
+    {"order_item_id": 9005, "order_id": 504, "buyer_id": 79, "product_id": "L2", "created_at": "not a date",
+     "status": "shipped", "reason": "", "item_price": "10.00", "voucher_amount": "0", "shipping_amount": "0",
+     "paid_price": "10.00", "voucher_platform": "0"},
+]
+
+SHOPEE_ORDERS = [
+    {"order_sn": "240501ABC", "buyer_user_id": 88, "create_time": 1714579200, "order_status": "COMPLETED",
+     "item_list": [
+         {"item_id": 3001, "model_id": 1, "model_discounted_price": 300.0, "model_quantity_purchased": 2},
+         {"item_id": 3001, "model_id": 2, "model_discounted_price": 320.0, "model_quantity_purchased": 1},
+     ]},
+    {"order_sn": "240502XYZ", "buyer_user_id": 89, "create_time": 1714665600, "order_status": "CANCELLED",
+     "cancel_reason": "BUYER_CANCELLED",
+     "item_list": [{"item_id": 3002, "model_id": 0, "model_discounted_price": 45.0, "model_quantity_purchased": 0}]},
+]
+
+
+def key_indexes(tmp_path):
+    customers = SurrogateKeyIndex("Dim_Customer", "customer_key", ["platform_buyer_id"],
+                                  state_path=str(tmp_path / "c.pkl")).load(from_db=False)
+    products = SurrogateKeyIndex("Dim_Product", "product_key", ["lazada_item_id", "shopee_item_id"],
+                                 state_path=str(tmp_path / "p.pkl")).load(from_db=False)
+    return customers, products
+
+
+def test_lazada_items_map_and_bad_rows_are_rejected(tmp_path):
+    customers, products = key_indexes(tmp_path)
+    fact, rejected = to_fact_orders(pd.DataFrame(LAZADA_ITEMS), "Lazada", customer_index=customers,
+                                    product_index=products)
+
+    assert len(fact) == 2
+    first, cancelled = fact.iloc[0], fact.iloc[1]
+    assert (first["time_key"], first["platform_key"], first["item_quantity"]) == (20240501, 1, 1)
+    assert (first["paid_price"], first["platform_subsidy_amount"]) == (1249.0, 40.0)
+    assert first["customer_key"] == cancelled["customer_key"] == 1
+    assert pd.isna(first["cancellation_reason"]) and cancelled["cancellation_reason"] == "Out of stock"
+    assert str(fact["time_key"].dtype) == "int32"
+
+    reasons = dict(zip(rejected["order_item_id"], rejected["quarantine_reason"]))
+    assert reasons == {
+        9003: "paid price mismatch",
+        9004: "missing buyer_id; negative amount",
+        9005: "unparseable ordered_at",
+    }
+    # Rejected rows create no dimension members
+    assert customers.pending_rows()["platform_buyer_id"].tolist() == ["77"]
+    assert products.pending_rows()["lazada_item_id"].tolist() == ["L1", "L2"]
+
+    again, _ = to_fact_orders(pd.DataFrame(LAZADA_ITEMS[:2]), "Lazada", customer_index=customers,
+                              product_index=products)
+    assert again["order_item_key"].tolist() == fact["order_item_key"].tolist()
+
+
+def test_shopee_models_use_unit_price_times_quantity(tmp_path):
+    customers, products = key_indexes(tmp_path)
+    items = pd.DataFrame(shopee_order_items(SHOPEE_ORDERS))
+    fact, rejected = to_fact_orders(items, "Shopee", customer_index=customers, product_index=products)
+
+    assert fact["paid_price"].tolist() == [600.0, 320.0]
+    assert fact["item_quantity"].tolist() == [2, 1]
+    assert (fact["platform_key"] == 2).all() and fact["order_item_key"].nunique() == 2
+    # 1714579200 is 2024-05-01 16:00 UTC, already May 2 in Manila
+    assert fact["time_key"].tolist() == [20240502, 20240502]
+    assert fact["product_key"].nunique() == 1
+    assert rejected["quarantine_reason"].tolist() == ["bad item_quantity"]
+
+
+def test_batches_stream_to_quarantine_and_load(tmp_path, monkeypatch):
+    customers, products = key_indexes(tmp_path)
+    loaded = []
+    monkeypatch.setattr("app.loading_script.load_tables", lambda frames, dsn=None: loaded.append(frames) or {"status": "success"})
+    quarantine_path = str(tmp_path / "quarantine" / "orders.ndjson")
+
+    result = process_order_items(iter_item_batches(LAZADA_ITEMS, batch_rows=2), "Lazada", load=True,
+                                 quarantine_path=quarantine_path, customer_index=customers, product_index=products)
+
+    assert result == {"status": "success", "batches": 3, "rows_processed": 5, "inserted": 2, "quarantined": 3}
+    # Per batch: new products, then new customers with the facts and the dimension rows they reference
+    assert [sorted(frames) for frames in loaded] == [
+        ["Dim_Product"], ["Dim_Customer", "Dim_Platform", "Dim_Time", "Fact_Orders"]
+    ]
+    assert loaded[1]["Dim_Time"]["time_key"].tolist() == [20240501]
+    assert set(loaded[1]["Fact_Orders"]["platform_key"]) <= set(loaded[1]["Dim_Platform"]["platform_key"])
+    quarantined = read_quarantine(quarantine_path)
+    assert quarantined["order_item_id"].tolist() == [9003, 9004, 9005]
+    assert set(quarantined["platform"]) == {"Lazada"} and quarantined["quarantined_at"].notna().all()
+
+    assert process_order_items([LAZADA_ITEMS], "Amazon", quarantine_path=quarantine_path)["status"] == "error"
+
+
+def test_raw_batches_are_staged_by_order_date(tmp_path):
+    customers, products = key_indexes(tmp_path)
+    area = StagingArea(str(tmp_path / "staging"))
+
+    result = process_order_items(iter_item_batches(LAZADA_ITEMS, batch_rows=2), "Lazada", staging=area,
+                                 batch_id="run1", quarantine_path=str(tmp_path / "q.ndjson"),
+                                 customer_index=customers, product_index=products)
+
+    assert result["status"] == "success" and result["staged"] == 3
+    assert [(p, d) for p, d, _ in area.partitions("order_items")] == [
+        ("Lazada", "2024-05-01"), ("Lazada", "2024-05-02"), ("Lazada", "unknown")
+    ]
+    # Rejected rows are staged too: the raw batch is kept as extracted
+    staged = area.read("order_items")
+    assert sorted(staged["order_item_id"]) == [9001, 9002, 9003, 9004, 9005]
+    assert sorted(os.listdir(area.partitions("order_items")[1][2])) == ["part-run1-00001.parquet"]
@@ -0,0 +1,91 @@
+"""
+Tests for the incremental Sales_Summary refresh in app/summary.py
+"""
+import pandas as pd
+
+from app import config
+from app.loading_script import refresh_touched_summaries, summary_stored_days
+from app.summary import build_refresh_sql, refresh_sales_summary, touched_time_keys, touched_traffic_keys
+
+
+class RecordingCursor:
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+
+    def fetchall(self):
+        return [(20240430,)] if self.statements[-1][0].startswith("SELECT DISTINCT time_key") else []
+
+
+def test_touched_time_keys_from_fact_and_orders():
+    frames = {
+        "Fact_Sales": pd.DataFrame({"time_key": [20240502, 20240501, 20240502]}),
+        "Orders": pd.DataFrame({"time_key": [20240503.0, None]}),
+        "Dim_Time": pd.DataFrame({"time_key": [20991231]}),
+    }
+    assert touched_time_keys(frames) == [20240501, 20240502, 20240503]
+
+
+def test_refresh_only_touched_days():
+    cursor = RecordingCursor()
+    assert refresh_sales_summary(cursor, [20240501, 20240502]) == 2
+
+    (delete_sql, delete_params), (upsert_sql, upsert_params) = cursor.statements
+    assert delete_sql.startswith('DELETE FROM "Sales_Summary"') and "ANY(%(time_keys)s)" in delete_sql
+    assert "WHERE f.time_key = ANY(%(time_keys)s)" in upsert_sql
+    assert 'ON CONFLICT ("time_key", "platform") DO UPDATE SET' in upsert_sql
+    assert '"net_revenue" = EXCLUDED."net_revenue"' in upsert_sql
+    assert delete_params == upsert_params == {"time_keys": [20240501, 20240502]}
+
+    assert refresh_sales_summary(cursor, []) == 0
+    assert len(cursor.statements) == 2
+
+
+def test_full_rebuild_has_no_day_filter():
+    sql, params = build_refresh_sql()
+    assert "ANY(" not in sql and params is None
+
+
+def test_loader_refreshes_only_with_summary_schema():
+    frames = {"Fact_Sales": pd.DataFrame({"time_key": [20240501]})}
+
+    cursor = RecordingCursor()
+    refresh_touched_summaries(cursor, frames)  # LA_Collections schema has no Sales_Summary
+    assert cursor.statements == []
+
+    refresh_touched_summaries(cursor, frames, config.ENHANCED_SCHEMA_PATH)
+    assert len(cursor.statements) == 2
+
+
+def test_fact_traffic_is_resummed_over_stored_shops():
+    shops = pd.DataFrame({"shop": ["a", "b", "a"], "traffic_event_key": [120240501, 120240501, 120240502]})
+    assert touched_traffic_keys({"Fact_Traffic_Shop": shops}) == [120240501, 120240502]
+
+    cursor = RecordingCursor()
+    refresh_touched_summaries(cursor, {"Fact_Traffic_Shop": shops})
+    (sql, params), = cursor.statements
+    assert sql.startswith('INSERT INTO "Fact_Traffic"') and 'SUM("page_views")' in sql
+    assert 'FROM "Fact_Traffic_Shop" WHERE traffic_event_key = ANY(%(keys)s)' in sql
+    assert 'ON CONFLICT ("traffic_event_key") DO UPDATE SET' in sql and '"visits" = EXCLUDED."visits"' in sql
+    assert params == {"keys": [120240501, 120240502]}
+
+
+def test_daily_summary_refreshes_the_day_an_order_moved_from():
+    frames = {"Fact_Orders": pd.DataFrame({"order_item_key": [101, 102], "time_key": [20240501, 20240501]})}
+
+    cursor = RecordingCursor()
+    stored = summary_stored_days(cursor, frames)
+    assert stored == {"Daily_Sales_Summary": [20240430]}  # order 101 was stored under April 30
+    (lookup_sql, lookup_params), = cursor.statements
+    assert lookup_sql == 'SELECT DISTINCT time_key FROM "Fact_Orders" WHERE "order_item_key" = ANY(%(ids)s)'
+    assert lookup_params == {"ids": [101, 102]}
+
+    cursor = RecordingCursor()
+    refresh_touched_summaries(cursor, frames, stored_days=stored)
+    (delete_sql, params), (upsert_sql, _) = cursor.statements
+    assert delete_sql.startswith('DELETE FROM "Daily_Sales_Summary"')
+    assert upsert_sql.strip().startswith('INSERT INTO "Daily_Sales_Summary"') and 'FROM "Fact_Orders" f' in upsert_sql
+    assert 'ON CONFLICT ("time_key", "platform_key")' in upsert_sql
+    assert params == {"time_keys": [20240430, 20240501]}
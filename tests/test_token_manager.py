@@ -0,0 +1,106 @@
+"""
+Tests for the token cache in app/Extraction/token_manager.py
+"""
+import asyncio
+import json
+import multiprocessing
+import threading
+import time
+
+from app.Extraction.token_manager import TokenManager
+
+
+def cached(path, created_at, expires_in=3600):
+    with open(path, "w") as f:
+        json.dump({"access_token": "old", "refresh_token": "r1", "created_at": created_at, "expires_in": expires_in}, f)
+
+
+def slow_refresh(refresh_token, calls=None):
+    time.sleep(0.2)
+    if calls is not None:
+        calls.append(refresh_token)
+    return {"success": True, "access_token": "new", "refresh_token": "r2", "expires_in": 3600}
+
+
+def test_refresh_ahead_runs_in_background_once(tmp_path):
+    path = str(tmp_path / "tokens.json")
+    cached(path, int(time.time()) - 3000)  # 600s left, 300s past the buffer -> inside the refresh-ahead window
+    calls = []
+    manager = TokenManager("test", lambda token: slow_refresh(token, calls), path, expiry_buffer=300, refresh_ahead=600)
+
+    started = time.monotonic()
+    tokens = [manager.access_token() for _ in range(20)]
+    assert time.monotonic() - started < 0.1  # never waits on the refresh
+    assert set(tokens) == {"old"}
+
+    manager._refresh_thread.join()
+    assert calls == ["r1"]
+    assert manager.access_token() == "new"
+    with open(path) as f:
+        assert json.load(f)["refresh_token"] == "r2"
+
+
+def test_expired_token_blocks_threads_on_one_refresh(tmp_path):
+    path = str(tmp_path / "tokens.json")
+    cached(path, int(time.time()) - 4000)
+    calls = []
+    manager = TokenManager("test", lambda token: slow_refresh(token, calls), path)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(manager.access_token())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["new"] * 8
+    assert calls == ["r1"]
+
+
+def _worker(path, log_path):
+    def refresh(token):
+        with open(log_path, "a") as f:
+            f.write(token + "\n")
+        return slow_refresh(token)
+
+    TokenManager("test", refresh, path).access_token()
+
+
+def test_processes_share_one_refresh(tmp_path):
+    path, log_path = str(tmp_path / "tokens.json"), str(tmp_path / "refreshes.log")
+    cached(path, int(time.time()) - 4000)
+
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_worker, args=(path, log_path)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    with open(log_path) as f:
+        assert f.read().split() == ["r1"]
+
+
+def test_async_refresh_does_not_block_the_event_loop(tmp_path):
+    path = str(tmp_path / "tokens.json")
+    cached(path, int(time.time()) - 4000)
+    manager = TokenManager("test", slow_refresh, path)
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        token = await manager.access_token_async()
+        task.cancel()
+        return token, ticks
+
+    token, ticks = asyncio.run(main())
+    assert token == "new"
+    assert ticks >= 5  # the loop kept running during the 0.2s refresh
+    assert asyncio.run(manager.access_token_async()) == "new"
@@ -0,0 +1,72 @@
+"""
+Tests for the traffic-report parser in app/Transformation/standardize_fact_traffic.py
+"""
+import os
+
+import pandas as pd
+
+from app.etl import LAZADA_COLUMN_MAP
+from app.Transformation.standardize_fact_traffic import (
+    parse_dates,
+    parse_numbers,
+    parse_traffic_report,
+    to_fact_traffic,
+    with_shop_level_members,
+)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+
+
+def read_sample(name):
+    return pd.read_csv(os.path.join(DATA_DIR, name), dtype=str, keep_default_na=False)
+
+
+def test_summary_rows_split_from_daily_rows():
+    daily, summary = parse_traffic_report(read_sample("samplelazada.csv"), LAZADA_COLUMN_MAP)
+
+    assert len(daily) == 31 and daily["date"].min() == pd.Timestamp("2024-05-01")
+    assert summary[["period_start", "period_end"]].iloc[0].tolist() == [pd.Timestamp("2024-05-01"), pd.Timestamp("2024-05-31")]
+    assert summary["total_sales_value"].iloc[0] == 149140.9
+    assert daily["conversion_rate"].iloc[0] == 0.0947
+
+    daily2, _ = parse_traffic_report(read_sample("samplelazada2.csv"), LAZADA_COLUMN_MAP)  # ISO dates, "-" separator
+    assert daily2["date"].iloc[0] == pd.Timestamp("2025-01-01") and daily2["date"].notna().all()
+
+
+def test_explicit_formats_and_number_cleanup():
+    dates = parse_dates(pd.Series(["01/05/2024", "2024-05-02", "03-05-2024", "01/05/2024", "bad"]))
+    assert dates.tolist()[:4] == [pd.Timestamp("2024-05-01"), pd.Timestamp("2024-05-02"), pd.Timestamp("2024-05-03"),
+                                  pd.Timestamp("2024-05-01")]
+    assert pd.isna(dates.iloc[4])
+
+    numbers = parse_numbers(pd.Series(["1,234.5", "-", "", " 7 "]))
+    assert numbers.iloc[0] == 1234.5 and numbers.iloc[3] == 7.0 and numbers.iloc[1:3].isna().all()
+    assert parse_numbers(pd.Series(["9.47%", "100%"]), percent=True).tolist() == [0.0947, 1.0]
+
+
+def test_fact_traffic_rows_are_typed_and_keyed_by_day():
+    raw = read_sample("samplelazada.csv")
+    daily, _ = parse_traffic_report(pd.concat([raw, raw.head(3)]), LAZADA_COLUMN_MAP)  # overlapping re-export
+    fact = to_fact_traffic(daily, "Lazada")
+
+    assert len(fact) == 31
+    first = fact.iloc[0]
+    assert first["traffic_event_key"] == 120240501 and first["time_key"] == 20240501
+    assert (first["page_views"], first["visits"], first["add_to_cart_count"], first["wishlist_add_count"]) == (202, 95, 29, 9)
+    assert fact["page_views"].dtype == "int16" and fact["time_key"].dtype == "int32" and fact["platform_key"].eq(1).all()
+    assert fact["wishlist_add_count"].dtype == "int16"
+    assert to_fact_traffic(daily, "Shopee")["traffic_event_key"].iloc[0] == 220240501
+
+
+def test_shop_level_members_are_added_for_traffic_loads():
+    daily, _ = parse_traffic_report(read_sample("samplelazada.csv"), LAZADA_COLUMN_MAP)
+    fact = to_fact_traffic(daily, "Lazada")
+
+    frames = with_shop_level_members({"Fact_Traffic": fact})
+    assert frames["Dim_Product"]["product_key"].tolist() == [0]
+    assert frames["Dim_Customer"]["platform_buyer_id"].tolist() == ["ALL"]
+
+    customers = pd.DataFrame({"customer_key": [0, 5], "platform_buyer_id": ["ALL", "b5"]})
+    frames = with_shop_level_members({"Fact_Traffic": fact, "Dim_Customer": customers})
+    assert frames["Dim_Customer"] is customers
+    assert "Dim_Product" not in with_shop_level_members({"Fact_Orders": fact})
@@ -0,0 +1,67 @@
+"""
+Tests for voucher attribution in app/Transformation/voucher_attribution.py
+"""
+import pandas as pd
+
+from app import config
+from app.loading_script import refresh_touched_summaries
+from app.Transformation.voucher_attribution import VoucherIndex, attribute_vouchers, parse_applicable_products
+
+VOUCHERS = pd.DataFrame({
+    "voucher_key": [10, 11, 12, 13],
+    "voucher_code": ["STORE50", "DRESS100", "PAYDAY", "OLD"],
+    "start_date": pd.to_datetime(["2024-05-01", "2024-05-10", "2024-05-15", "2024-05-01"]),
+    "end_date": pd.to_datetime(["2024-05-31 23:59:59", "2024-05-20 23:59:59", "2024-05-15 23:59:59", "2024-05-31 23:59:59"]),
+    "applicable_products": [None, '["P1", 2]', "[]", "[]"],
+    "minimum_spend": [0, 0, 1000, 0],
+    "status": ["Active", "Active", "Active", "Inactive"],
+})
+
+ITEMS = pd.DataFrame({
+    "order_key": [1, 1, 2, 3, 4, 5],
+    "order_date": pd.to_datetime(["2024-05-12 09:00", "2024-05-12 09:00", "2024-05-15 10:00", "2024-05-15 11:00",
+                                  "2024-06-02 09:00", "2024-05-12 09:00"]),
+    "product_id": ["P1", "P9", "2", "P9", "P1", "P1"],
+    "customer_key": [100, 100, 101, 102, 100, 103],
+    "total_item_price": [500.0, 300.0, 1200.0, 400.0, 500.0, 500.0],
+    "paid_price": [450.0, 280.0, 1100.0, 390.0, 480.0, 500.0],
+    "item_voucher_discount": [50.0, 20.0, 100.0, 10.0, 20.0, 0.0],
+})
+
+
+def test_parse_applicable_products():
+    pairs, store_wide = parse_applicable_products(['["A", "B"]', None, "[]", "not json", "[7]"])
+    assert pairs.values.tolist() == [[0, "A"], [0, "B"], [4, "7"]]
+    assert store_wide.tolist() == [False, True, True, True, False]
+
+
+def test_attribute_prefers_specific_then_latest_voucher():
+    attributed = VoucherIndex(VOUCHERS).attribute(ITEMS)
+
+    # P1 during DRESS100 -> DRESS100; P9 same order -> store-wide STORE50;
+    # order 2 meets PAYDAY's minimum spend but product 2 is in DRESS100's list;
+    # order 3 is below PAYDAY's minimum; June is after every window; no discount, no voucher
+    assert attributed["voucher_code"].fillna("-").tolist() == ["DRESS100", "STORE50", "DRESS100", "STORE50", "-", "-"]
+    assert attributed["voucher_key"].isna().tolist() == [False, False, False, False, True, True]
+
+
+def test_usage_rows_and_summary_refresh():
+    attributed, usage = attribute_vouchers(ITEMS, VOUCHERS, first_time_customers=[102])
+
+    assert usage[["voucher_key", "order_key"]].values.tolist() == [[10, 1], [10, 3], [11, 1], [11, 2]]
+    row = usage.iloc[0]
+    assert (row["discount_amount"], row["order_value_before_discount"], row["order_value_after_discount"]) == (20.0, 300.0, 280.0)
+    assert usage["time_key"].tolist() == [20240512, 20240515, 20240512, 20240515]
+    assert usage["first_time_customer"].tolist() == [False, True, False, False]
+
+    statements = []
+
+    class Cursor:
+        def execute(self, sql, params=None):
+            statements.append((sql, params))
+
+    refresh_touched_summaries(Cursor(), {"Voucher_Usage": usage}, config.ENHANCED_SCHEMA_PATH)
+    (delete_sql, params), (upsert_sql, _) = statements
+    assert delete_sql.startswith('DELETE FROM "Voucher_Summary"')
+    assert 'ON CONFLICT ("voucher_key") DO UPDATE SET' in upsert_sql
+    assert params == {"voucher_keys": [10, 11]}
@@ -0,0 +1,56 @@
+"""
+Tests for incremental sync watermarks in app/watermarks.py
+"""
+import pandas as pd
+
+from app import loading_script
+from app.watermarks import FileWatermarkStore, IncrementalSync
+
+
+def test_window_starts_at_watermark_minus_overlap(tmp_path):
+    sync = IncrementalSync(FileWatermarkStore(str(tmp_path / "wm.json")), overlap_seconds=3600, initial_lookback_days=7)
+    now = pd.Timestamp("2024-05-10T00:00:00Z")
+
+    assert sync.window("lazada", "orders", now) == (now - pd.Timedelta(days=7), now)
+
+    sync.advance("lazada", "orders", ["2024-05-09 22:00:00 +0800", "2024-05-09 23:30:00 +0800"], [11, 12])
+    assert sync.window("lazada", "orders", now)[0] == now - pd.Timedelta(days=7)  # not committed yet
+
+    sync.commit()
+    start, _ = IncrementalSync(sync.store, overlap_seconds=3600).window("lazada", "orders", now)
+    assert start == pd.Timestamp("2024-05-09T14:30:00Z")
+    assert sync.store.get("lazada", "orders")["last_id"] == "12"
+
+
+def test_watermark_never_moves_back(tmp_path):
+    sync = IncrementalSync(FileWatermarkStore(str(tmp_path / "wm.json")))
+    sync.advance("shopee", "orders", [], fallback="2024-05-10T00:00:00Z")
+    sync.commit()
+
+    sync.advance("shopee", "orders", ["2024-05-01T00:00:00Z"])
+    assert sync.pending == {}
+
+
+def test_combined_transactions_pulls_only_the_delta(tmp_path, monkeypatch):
+    sync = IncrementalSync(FileWatermarkStore(str(tmp_path / "wm.json")), overlap_seconds=600)
+    sync.store.set_many({("lazada", "orders"): {"watermark": "2024-05-01T00:00:00+00:00", "last_id": "1"}})
+
+    def fake_run_extraction(jobs):
+        return {
+            "lazada": {"orders": [
+                {"order_id": 2, "updated_at": "2024-05-01 08:05:00 +0800"},
+                {"order_id": 3, "updated_at": "2024-05-01 09:00:00 +0800"},
+            ]},
+            "shopee": {"status": "error", "detail": "timeout"},
+        }
+
+    monkeypatch.setattr("app.Extraction.connector.run_extraction", fake_run_extraction)
+    monkeypatch.setattr("app.Extraction.lazada_api_calls.LazadaClient", lambda: None)
+    monkeypatch.setattr("app.Extraction.shopee_api_calls.ShopeeClient", lambda: None)
+
+    df = loading_script.get_combined_transactions(sync, now="2024-05-02T00:00:00Z")
+
+    assert df["transaction_id"].tolist() == ["LZ-2", "LZ-3"]
+    assert sync.window("lazada", "orders", "2024-05-02")[0] == pd.Timestamp("2024-04-30T23:50:00Z")
+    assert list(sync.pending) == [("lazada", "orders")]  # failed Shopee run keeps its watermark
+    assert sync.pending[("lazada", "orders")]["watermark"] == "2024-05-01T01:00:00+00:00"